@@ -34,18 +34,23 @@ class ExportableViewSetMixin:
     @action(detail=False, methods=['get'])
     def export(self, request):
         """
-        Exporta los datos en formato CSV o Excel.
+        Exporta los datos en formato CSV, Excel o Parquet (parámetro ``formato``).
+        
+        El parámetro no se llama ``format`` porque DRF lo reserva para elegir
+        el renderizador y responde 404 a los valores que no conoce.
         """
-        format = request.query_params.get('format', 'csv')
+        formato = request.query_params.get('formato', 'csv')
         queryset = self.filter_queryset(self.get_queryset())
         
-        if format == 'csv':
+        if formato == 'csv':
             return self._export_csv(queryset)
-        elif format == 'excel':
+        elif formato == 'excel':
             return self._export_excel(queryset)
+        elif formato == 'parquet':
+            return self._export_parquet(queryset)
         else:
             return Response(
-                {'error': f'Formato no soportado: {format}'},
+                {'error': f'Formato no soportado: {formato}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
     
@@ -68,6 +73,16 @@ class ExportableViewSetMixin:
             {'error': 'Exportación Excel no implementada'},
             status=status.HTTP_501_NOT_IMPLEMENTED
         )
+    
+    def _export_parquet(self, queryset):
+        """
+        Exporta los datos en formato Parquet.
+        """
+        # Implementación básica, debe ser sobrescrita
+        return Response(
+            {'error': 'Exportación Parquet no implementada'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
 
 
 class SafeDestroyModelMixin:
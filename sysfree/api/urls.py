@@ -9,7 +9,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView # Importar direct
 # Importar ViewSets de las aplicaciones específicas
 from inventario.api.views import ProductoViewSet, CategoriaViewSet
 from clientes.api.views import ClienteViewSet
-from ventas.api.views import VentaViewSet
+from ventas.api.views import VentaViewSet, PuntoVentaView
 from reparaciones.api.views import ReparacionViewSet
 from reparaciones.api.urls import ServicioReparacionViewSet
 from ecommerce.api.views import PedidoViewSet
@@ -41,6 +41,9 @@ router.register(r'servicios-reparacion', ServicioReparacionViewSet, basename='se
 router.register(r'pedidos', PedidoViewSet, basename='pedido')
 
 urlpatterns = [
+    # Punto de venta; antes del router, donde 'pos' coincidiría con el detalle de una venta
+    path('ventas/pos/', PuntoVentaView.as_view(), name='venta_pos'),
+
     # API Root
     path('', include(router.urls)),
     
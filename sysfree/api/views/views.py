@@ -18,7 +18,7 @@ from ..serializers import (
 )
 from ..mixins import AuditModelMixin, MultiSerializerViewSetMixin, ExportableViewSetMixin, SafeDestroyModelMixin
 from ..decorators import log_api_call, require_params
-from ..utils import export_queryset_to_csv, export_queryset_to_excel
+from ..utils import export_queryset_to_csv, export_queryset_to_excel, export_queryset_to_parquet
 from ..exceptions import BusinessLogicException, ResourceNotFoundException
 from core.services.cache_service import CacheService
 
@@ -46,7 +46,7 @@ class ProductoViewSet(AuditModelMixin, MultiSerializerViewSetMixin, ExportableVi
     Elimina un producto (soft delete).
     
     export:
-    Exporta la lista de productos en formato CSV o Excel.
+    Exporta la lista de productos en formato CSV, Excel o Parquet (parámetro formato).
     """
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
@@ -69,6 +69,11 @@ class ProductoViewSet(AuditModelMixin, MultiSerializerViewSetMixin, ExportableVi
         """Exporta productos a Excel."""
         fields = ['codigo', 'nombre', 'precio_venta', 'stock', 'categoria']
         return export_queryset_to_excel(queryset, fields, 'productos.xlsx')
+    
+    def _export_parquet(self, queryset):
+        """Exporta productos a Parquet."""
+        fields = ['codigo', 'nombre', 'precio_venta', 'stock', 'categoria']
+        return export_queryset_to_parquet(queryset, fields, 'productos.parquet')
 
 
 class CategoriaViewSet(AuditModelMixin, SafeDestroyModelMixin, viewsets.ModelViewSet):
@@ -153,7 +158,7 @@ def buscar_productos(request):
     
     # Intentar obtener resultados de caché para búsquedas comunes
     cache_key = f"buscar_productos_{query}_{categoria}_{precio_min}_{precio_max}_{disponible}"
-    cached_data = CacheService.get(cache_key)
+    cached_data = CacheService.get_tagged(cache_key, ['productos'])
     
     if cached_data:
         return Response(cached_data)
@@ -182,7 +187,7 @@ def buscar_productos(request):
     serializer = ProductoSerializer(productos, many=True)
     
     # Guardar en caché por 10 minutos
-    CacheService.set(cache_key, serializer.data, 600)
+    CacheService.set_tagged(cache_key, serializer.data, ['productos'], 600)
     
     return Response(serializer.data)
 
@@ -391,7 +396,7 @@ def estadisticas_productos(request):
     """
     # Intentar obtener de caché
     cache_key = "estadisticas_productos"
-    cached_data = CacheService.get(cache_key)
+    cached_data = CacheService.get_tagged(cache_key, ['productos'])
     
     if cached_data:
         return Response(cached_data)
@@ -421,7 +426,7 @@ def estadisticas_productos(request):
     }
     
     # Guardar en caché por 1 hora
-    CacheService.set(cache_key, data, 3600)
+    CacheService.set_tagged(cache_key, data, ['productos'], 3600)
     
     return Response(data)
 
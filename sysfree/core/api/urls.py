@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import UsuarioViewSet, EmpresaViewSet, SucursalViewSet
+from .views import UsuarioViewSet, EmpresaViewSet, SucursalViewSet, HistorialObjetoView
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet)
@@ -12,6 +12,8 @@ urlpatterns = [
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auditoria/historial/<str:modelo>/<str:objeto_id>/', HistorialObjetoView.as_view(),
+         name='auditoria_historial_objeto'),
     
     # Include other app APIs
     path('inventario/', include('inventario.api.urls')),
@@ -1,5 +1,8 @@
 from rest_framework import viewsets, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from core.models import Usuario, Empresa, Sucursal
+from core.services.auditoria_retencion_service import AuditoriaRetencionService
 from .serializers import UsuarioSerializer, EmpresaSerializer, SucursalSerializer
 
 
@@ -31,4 +34,25 @@ class SucursalViewSet(viewsets.ModelViewSet):
         empresa_id = self.request.query_params.get('empresa', None)
         if empresa_id:
             queryset = queryset.filter(empresa_id=empresa_id)
-        return queryset
\ No newline at end of file
+        return queryset
+
+
+class HistorialObjetoView(APIView):
+    """
+    Historial de auditoría de un objeto, combinando logs en línea y archivados.
+
+    Parámetros: ``limite`` (por defecto 100, máximo 1000) y ``archivo``
+    (``0`` para consultar solo los logs en línea).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, modelo, objeto_id):
+        try:
+            limite = min(max(int(request.query_params.get('limite', 100)), 1), 1000)
+        except ValueError:
+            limite = 100
+        incluir_archivo = request.query_params.get('archivo', '1') != '0'
+        resultados = AuditoriaRetencionService.historial_objeto(
+            modelo, objeto_id, limite=limite, incluir_archivo=incluir_archivo
+        )
+        return Response({'modelo': modelo, 'objeto_id': objeto_id, 'resultados': resultados})
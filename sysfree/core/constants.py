@@ -24,6 +24,7 @@ class AccionesAuditoria:
     PRODUCTO_ACTUALIZADO = "PRODUCTO_ACTUALIZADO"
     PRODUCTO_ELIMINADO = "PRODUCTO_ELIMINADO"
     STOCK_ACTUALIZADO = "STOCK_ACTUALIZADO"
+    STOCK_ACTUALIZADO_LOTE = "STOCK_ACTUALIZADO_LOTE"
     
     # Acciones de ventas
     VENTA_CREADA = "VENTA_CREADA"
@@ -46,6 +47,7 @@ class AccionesAuditoria:
     BACKUP_CREADO = "BACKUP_CREADO"
     BACKUP_RESTAURADO = "BACKUP_RESTAURADO"
     SISTEMA_ACTUALIZADO = "SISTEMA_ACTUALIZADO"
+    VERIFICACION_STOCK_BAJO = "VERIFICACION_STOCK_BAJO"
     
     # Acciones de seguridad
     ACCESO_DENEGADO = "ACCESO_DENEGADO"
@@ -0,0 +1,82 @@
+"""
+Comando para medir el costo de la auditoría automática por cada guardado.
+
+Compara tres escenarios sobre las mismas categorías, cada uno en una
+transacción confirmada:
+
+- sin auditoría (referencia),
+- esquema anterior: SELECT del estado previo + INSERT inmediato por guardado,
+- esquema actual: estado original de ``from_db`` + un bulk_create al confirmar.
+
+Crea categorías con el prefijo ``benchaudit`` y las elimina al terminar junto
+con sus registros de auditoría.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from core import signals
+from core.models import LogActividad
+from inventario.models import Categoria
+
+PREFIJO = 'benchaudit'
+
+
+class Command(BaseCommand):
+    help = 'Mide el sobrecosto de la auditoría por guardado: esquema anterior vs. lote por transacción'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guardados', type=int, default=500,
+                            help='Guardados por escenario (por defecto 500)')
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help='Repeticiones por escenario, se toma la mejor (por defecto 3)')
+
+    def handle(self, *args, **options):
+        guardados = options['guardados']
+        repeticiones = options['repeticiones']
+        auditados = signals._AUDITED_SET
+        ids = []
+        try:
+            signals._AUDITED_SET = frozenset()
+            ids = [c.pk for c in Categoria.objects.bulk_create(
+                Categoria(nombre=f'{PREFIJO} {i}') for i in range(guardados)
+            )]
+            base = self._medir(ids, repeticiones)
+            signals._AUDITED_SET = auditados
+            with override_settings(AUDITORIA_MODO='sync'):
+                anterior = self._medir(ids, repeticiones, releer_estado=True)
+            with override_settings(AUDITORIA_MODO='transaccion'):
+                actual = self._medir(ids, repeticiones)
+        finally:
+            signals._AUDITED_SET = frozenset()
+            Categoria.objects.filter(nombre__startswith=PREFIJO).delete()
+            signals._AUDITED_SET = auditados
+            LogActividad.objects.filter(modelo='Categoria', objeto_id__in=[str(i) for i in ids]).delete()
+
+        costo_anterior = (anterior - base) / guardados
+        costo_actual = (actual - base) / guardados
+        self.stdout.write(f"{'escenario':<26}{'total ms':>12}{'sobrecosto µs/guardado':>26}")
+        self.stdout.write(f"{'sin auditoría':<26}{base * 1000:>12.1f}{'-':>26}")
+        self.stdout.write(f"{'SELECT + INSERT inmediato':<26}{anterior * 1000:>12.1f}{costo_anterior * 1e6:>26.1f}")
+        self.stdout.write(f"{'from_db + lote al commit':<26}{actual * 1000:>12.1f}{costo_actual * 1e6:>26.1f}")
+        if costo_anterior > 0:
+            self.stdout.write(f'Reducción del sobrecosto: {(1 - costo_actual / costo_anterior) * 100:.1f}%')
+        self.stdout.write(self.style.SUCCESS('Benchmark completado (datos de prueba eliminados)'))
+
+    def _medir(self, ids, repeticiones, releer_estado=False):
+        """Mejor tiempo de cargar y guardar las categorías en una transacción confirmada."""
+        mejor = None
+        for repeticion in range(repeticiones):
+            inicio = time.perf_counter()
+            with transaction.atomic():
+                for categoria in Categoria.objects.filter(pk__in=ids):
+                    categoria.orden = repeticion + 1
+                    if releer_estado:
+                        # Equivale a no tener el estado de from_db: pre_save consulta la fila
+                        del categoria._estado_original
+                    categoria.save()
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor
@@ -0,0 +1,82 @@
+"""
+Comando para comparar el costo de invalidar caché con patrones comodín
+(SCAN sobre todo el espacio de claves) contra etiquetas versionadas (INCR).
+
+Puebla Redis con claves de relleno con el prefijo ``benchcache`` y las
+elimina al terminar.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from core.services.cache_service import CacheService
+
+PREFIJO = 'benchcache'
+
+
+class Command(BaseCommand):
+    help = 'Mide la invalidación de caché: delete_pattern (SCAN) vs. invalidate_tags (INCR)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='10000,100000,1000000',
+                            help='Cantidades de claves en Redis separadas por coma')
+        parser.add_argument('--repeticiones', type=int, default=5,
+                            help='Invalidaciones medidas por método (por defecto 5)')
+
+    def handle(self, *args, **options):
+        redis = get_redis_connection('default')
+        repeticiones = options['repeticiones']
+        self.stdout.write(f"{'claves':>10}{'delete_pattern ms':>20}{'invalidate_tags ms':>21}{'factor':>10}")
+        try:
+            poblado = 0
+            for tamano in sorted(int(t) for t in options['tamanos'].split(',') if t.strip()):
+                self._poblar(redis, poblado, tamano)
+                poblado = tamano
+                patron = self._medir_patron(repeticiones)
+                etiquetas = self._medir_etiquetas(repeticiones)
+                self.stdout.write(
+                    f'{tamano:>10}{patron * 1000:>20.3f}{etiquetas * 1000:>21.3f}{patron / etiquetas:>10.0f}'
+                )
+        finally:
+            self._limpiar(redis)
+        self.stdout.write(self.style.SUCCESS('Benchmark completado (claves de prueba eliminadas)'))
+
+    def _poblar(self, redis, desde, hasta, bloque=10000):
+        """Agrega claves de relleno (del mismo espacio que la caché) hasta ``hasta``."""
+        for inicio in range(desde, hasta, bloque):
+            pipe = redis.pipeline(transaction=False)
+            for i in range(inicio, min(inicio + bloque, hasta)):
+                pipe.set(cache.make_key(f'{PREFIJO}_relleno_{i}'), b'x', ex=3600)
+            pipe.execute()
+
+    def _medir_patron(self, repeticiones):
+        total = 0.0
+        for i in range(repeticiones):
+            # Las claves borradas se recrean en cada repetición
+            CacheService.set(f'{PREFIJO}_movimientos_producto_{i}_none_none', [], 600)
+            inicio = time.perf_counter()
+            CacheService.delete_pattern(f'*{PREFIJO}*producto*{i}*')
+            total += time.perf_counter() - inicio
+        return total / repeticiones
+
+    def _medir_etiquetas(self, repeticiones):
+        total = 0.0
+        for i in range(repeticiones):
+            etiqueta = f'{PREFIJO}:producto:{i}'
+            CacheService.set_tagged(f'{PREFIJO}_movimientos_producto_{i}_none_none', [], [etiqueta], 600)
+            inicio = time.perf_counter()
+            CacheService.invalidate_tags(etiqueta)
+            total += time.perf_counter() - inicio
+        return total / repeticiones
+
+    def _limpiar(self, redis):
+        claves = []
+        for clave in redis.scan_iter(match=f'*{PREFIJO}*', count=10000):
+            claves.append(clave)
+            if len(claves) >= 10000:
+                redis.delete(*claves)
+                claves = []
+        if claves:
+            redis.delete(*claves)
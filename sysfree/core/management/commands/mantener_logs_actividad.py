@@ -0,0 +1,35 @@
+"""
+Comando para el mantenimiento de la tabla particionada de logs de actividad:
+crea las particiones mensuales futuras y archiva en JSONL comprimido las
+particiones que superan el período de retención.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.auditoria_retencion_service import AuditoriaRetencionService
+
+
+class Command(BaseCommand):
+    help = 'Crea particiones futuras de LogActividad y archiva las particiones antiguas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-adelante', type=int, default=3,
+                            help='Meses futuros con partición creada (por defecto 3)')
+        parser.add_argument('--meses-retencion', type=int, default=None,
+                            help='Meses completos que se conservan en línea (por defecto AUDITORIA_RETENCION_MESES)')
+        parser.add_argument('--directorio', default=None,
+                            help='Directorio de los archivos (por defecto AUDITORIA_ARCHIVO_DIR)')
+        parser.add_argument('--solo-particiones', action='store_true',
+                            help='Solo crea particiones, sin archivar')
+
+    def handle(self, *args, **options):
+        creadas = AuditoriaRetencionService.asegurar_particiones(options['meses_adelante'])
+        for nombre in creadas:
+            self.stdout.write(f'Partición creada: {nombre}')
+        if not options['solo_particiones']:
+            meses = options['meses_retencion']
+            if meses is None:
+                meses = settings.AUDITORIA_RETENCION_MESES
+            for ruta in AuditoriaRetencionService.archivar(meses, options['directorio']):
+                self.stdout.write(f'Partición archivada: {ruta}')
+        self.stdout.write(self.style.SUCCESS('Mantenimiento de logs completado'))
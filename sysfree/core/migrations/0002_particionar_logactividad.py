@@ -0,0 +1,109 @@
+"""
+Convierte core_logactividad en una tabla particionada por rango mensual de
+``fecha`` (particionado declarativo de PostgreSQL).
+
+La clave primaria física pasa a ser (id, fecha), requisito de PostgreSQL para
+particionar; para Django ``id`` sigue siendo la clave primaria (el valor sale
+de una secuencia, por lo que es único). Se crean particiones mensuales desde
+el registro más antiguo hasta tres meses adelante, más una partición por
+defecto para valores fuera de rango. Las particiones siguientes las crea
+``AuditoriaRetencionService.asegurar_particiones``.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations
+
+TABLA = 'core_logactividad'
+MESES_ADELANTE = 3
+
+
+def _mes_siguiente(inicio):
+    return inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+
+
+def _inicio_mes(fecha):
+    return fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    zona = ZoneInfo(settings.TIME_ZONE)
+    with schema_editor.connection.cursor() as cursor:
+        # Sin escrituras hasta el commit de la migración: las filas insertadas
+        # después de la copia se perderían con el DROP y un id posterior a
+        # MAX(id) chocaría con la secuencia
+        cursor.execute(f'LOCK TABLE {TABLA} IN EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN(fecha), COALESCE(MAX(id), 0) FROM {TABLA}')
+        minima, max_id = cursor.fetchone()
+
+    ejecutar = schema_editor.execute
+    # La columna identidad se reemplaza por una secuencia propia compartida por las particiones
+    ejecutar(f'ALTER TABLE {TABLA} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    ejecutar(f'CREATE SEQUENCE {TABLA}_id_seq')
+    ejecutar(f"SELECT setval('{TABLA}_id_seq', {int(max_id) + 1}, false)")
+    ejecutar(
+        f'CREATE TABLE {TABLA}_particionada (LIKE {TABLA} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)'
+    )
+    ejecutar(f"ALTER TABLE {TABLA}_particionada ALTER COLUMN id SET DEFAULT nextval('{TABLA}_id_seq')")
+
+    ahora = _inicio_mes(datetime.now(zona))
+    inicio = _inicio_mes(minima.astimezone(zona)) if minima else ahora
+    fin = ahora
+    for _ in range(MESES_ADELANTE + 1):
+        fin = _mes_siguiente(fin)
+    while inicio < fin:
+        siguiente = _mes_siguiente(inicio)
+        ejecutar(
+            f"CREATE TABLE {TABLA}_p{inicio:%Y_%m} PARTITION OF {TABLA}_particionada "
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{siguiente.isoformat()}')"
+        )
+        inicio = siguiente
+    ejecutar(f'CREATE TABLE {TABLA}_pdefault PARTITION OF {TABLA}_particionada DEFAULT')
+
+    ejecutar(f'INSERT INTO {TABLA}_particionada SELECT * FROM {TABLA}')
+    ejecutar(f'DROP TABLE {TABLA}')
+    ejecutar(f'ALTER TABLE {TABLA}_particionada RENAME TO {TABLA}')
+    ejecutar(f'ALTER SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}.id')
+    ejecutar(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id, fecha)')
+    ejecutar(
+        f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_usuario_id_c04ce032_fk_core_usuario_id '
+        f'FOREIGN KEY (usuario_id) REFERENCES core_usuario (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    ejecutar(f'CREATE INDEX {TABLA}_usuario_id_c04ce032 ON {TABLA} (usuario_id)')
+
+
+def revertir(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ejecutar = schema_editor.execute
+    # Bloquea las particiones junto con la tabla hasta el commit (ver ``particionar``)
+    ejecutar(f'LOCK TABLE {TABLA} IN EXCLUSIVE MODE')
+    ejecutar(f'CREATE TABLE {TABLA}_simple (LIKE {TABLA})')
+    ejecutar(f'INSERT INTO {TABLA}_simple SELECT * FROM {TABLA}')
+    ejecutar(f'DROP TABLE {TABLA}')  # elimina también la secuencia y las particiones
+    ejecutar(f'ALTER TABLE {TABLA}_simple RENAME TO {TABLA}')
+    ejecutar(f'ALTER TABLE {TABLA} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+    ejecutar(
+        f"SELECT setval(pg_get_serial_sequence('{TABLA}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {TABLA}), false)"
+    )
+    ejecutar(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id)')
+    ejecutar(
+        f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_usuario_id_c04ce032_fk_core_usuario_id '
+        f'FOREIGN KEY (usuario_id) REFERENCES core_usuario (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    ejecutar(f'CREATE INDEX {TABLA}_usuario_id_c04ce032 ON {TABLA} (usuario_id)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, revertir),
+    ]
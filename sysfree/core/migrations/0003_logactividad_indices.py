@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 19:07
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_particionar_logactividad'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['modelo', 'objeto_id', '-fecha'], name='core_log_objeto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=models.Index(fields=['usuario', '-fecha'], name='core_log_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactividad',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['datos'], name='core_log_datos_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
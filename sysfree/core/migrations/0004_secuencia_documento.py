@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_logactividad_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='ESTABLECIMIENTO',
+            field=models.CharField(default='001', max_length=3, verbose_name='establecimiento'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='PREFIJO_NOTA_CREDITO',
+            field=models.CharField(default='NC-', max_length=10, verbose_name='prefijo nota de crédito'),
+        ),
+        migrations.AddField(
+            model_name='configuracionsistema',
+            name='PUNTO_EMISION',
+            field=models.CharField(default='001', max_length=3, verbose_name='punto de emisión'),
+        ),
+        migrations.CreateModel(
+            name='SecuenciaDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30, verbose_name='tipo de documento')),
+                ('establecimiento', models.CharField(default='001', max_length=3, verbose_name='establecimiento')),
+                ('punto_emision', models.CharField(default='001', max_length=3, verbose_name='punto de emisión')),
+                ('ultimo', models.PositiveBigIntegerField(default=0, verbose_name='último número asignado')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='fecha de modificación')),
+            ],
+            options={
+                'verbose_name': 'secuencia de documento',
+                'verbose_name_plural': 'secuencias de documentos',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'establecimiento', 'punto_emision'), name='core_secuencia_documento_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 00:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_secuencia_documento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logactividad',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='fecha'),
+        ),
+    ]
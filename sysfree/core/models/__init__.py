@@ -3,6 +3,7 @@ from .auditoria import ModeloBase, LogActividad
 from .empresa import Empresa, Sucursal
 from .configuracion import ConfiguracionSistema
 from .tipo_iva import TipoIVA
+from .secuencia import SecuenciaDocumento
 
 __all__ = [
     'Usuario',
@@ -13,4 +14,5 @@ __all__ = [
     'Sucursal',
     'ConfiguracionSistema',
     'TipoIVA',
+    'SecuenciaDocumento',
 ]
\ No newline at end of file
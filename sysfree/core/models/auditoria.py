@@ -1,9 +1,63 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
 
-class ModeloBase(models.Model):
+class EstadoOriginalMixin:
+    """
+    Conserva los valores leídos de la base de datos en ``_estado_original``
+    para que la auditoría compare cambios sin volver a consultar la fila.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # field_names contiene los attname de los campos cargados (p. ej. 'cliente_id')
+        instance._estado_original = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        estado = getattr(self, '_estado_original', None)
+        if estado is not None:
+            # Los valores recargados pasan a ser el estado original
+            for f in self._meta.concrete_fields:
+                if f.attname in self.__dict__ and (fields is None or f.name in fields or f.attname in fields):
+                    estado[f.attname] = self.__dict__[f.attname]
+
+
+class ModeloBaseQuerySet(models.QuerySet):
+    """
+    QuerySet de los modelos con auditoría.
+
+    ``update()`` (y con él ``bulk_update()``) actualiza ``fecha_modificacion``
+    como lo hace ``save()``. Las escrituras masivas invalidan la versión de
+    datos de la tabla al confirmarse la transacción; ``save()`` y ``delete()``
+    lo hacen desde las señales de core/signals.py.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('fecha_modificacion', timezone.now())
+        filas = super().update(**kwargs)
+        if filas:
+            self._tabla_modificada()
+        return filas
+
+    def bulk_create(self, objs, *args, **kwargs):
+        creados = super().bulk_create(objs, *args, **kwargs)
+        if creados:
+            self._tabla_modificada()
+        return creados
+
+    def _tabla_modificada(self):
+        from core.services.cache_service import CacheService
+
+        CacheService.tablas_modificadas(self.model._meta.db_table)
+
+
+class ModeloBase(EstadoOriginalMixin, models.Model):
     """Modelo base con campos de auditoría para ser heredado por otros modelos."""
     
     creado_por = models.ForeignKey(
@@ -25,6 +79,8 @@ class ModeloBase(models.Model):
     fecha_creacion = models.DateTimeField(_('fecha de creación'), auto_now_add=True)
     fecha_modificacion = models.DateTimeField(_('fecha de modificación'), auto_now=True)
     activo = models.BooleanField(_('activo'), default=True)
+
+    objects = ModeloBaseQuerySet.as_manager()
     
     class Meta:
         abstract = True
@@ -54,7 +110,8 @@ class LogActividad(models.Model):
         null=True,
         blank=True
     )
-    fecha = models.DateTimeField(_('fecha'), auto_now_add=True)
+    # Momento del evento, no de la escritura (diferida al commit o a Celery)
+    fecha = models.DateTimeField(_('fecha'), default=timezone.now, editable=False)
     ip = models.GenericIPAddressField(_('dirección IP'), null=True, blank=True)
     nivel = models.CharField(_('nivel'), max_length=10, choices=NIVEL_CHOICES, default='info')
     tipo = models.CharField(_('tipo'), max_length=10, choices=TIPO_CHOICES, default='sistema')
@@ -70,6 +127,12 @@ class LogActividad(models.Model):
         verbose_name = _('log de actividad')
         verbose_name_plural = _('logs de actividad')
         ordering = ['-fecha']
+        # La tabla está particionada por mes sobre ``fecha`` (migración 0002)
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id', '-fecha'], name='core_log_objeto_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha'], name='core_log_usuario_fecha_idx'),
+            GinIndex(fields=['datos'], opclasses=['jsonb_path_ops'], name='core_log_datos_gin'),
+        ]
     
     def __str__(self):
         return f"{self.fecha} - {self.get_nivel_display()}: {self.accion}"
\ No newline at end of file
@@ -12,12 +12,17 @@ class ConfiguracionSistema(ModeloBase):
     PREFIJO_PROFORMA = models.CharField(_('prefijo proforma'), max_length=10, default='PRO-')
     PREFIJO_NOTA_VENTA = models.CharField(_('prefijo nota de venta'), max_length=10, default='NV-')
     PREFIJO_TICKET = models.CharField(_('prefijo ticket'), max_length=10, default='TIK-')
+    PREFIJO_NOTA_CREDITO = models.CharField(_('prefijo nota de crédito'), max_length=10, default='NC-')
     
     INICIO_FACTURA = models.PositiveIntegerField(_('inicio numeración factura'), default=1)
     INICIO_PROFORMA = models.PositiveIntegerField(_('inicio numeración proforma'), default=1)
     INICIO_NOTA_VENTA = models.PositiveIntegerField(_('inicio numeración nota de venta'), default=1)
     INICIO_TICKET = models.PositiveIntegerField(_('inicio numeración ticket'), default=1)
     
+    # Serie de emisión: cada combinación lleva su propia secuencia de números
+    ESTABLECIMIENTO = models.CharField(_('establecimiento'), max_length=3, default='001')
+    PUNTO_EMISION = models.CharField(_('punto de emisión'), max_length=3, default='001')
+    
     # Configuración de impuestos
     tipo_iva_default = models.ForeignKey(
         'TipoIVA',
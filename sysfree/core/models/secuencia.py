@@ -0,0 +1,27 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SecuenciaDocumento(models.Model):
+    """
+    Contador de numeración por tipo de documento, establecimiento y punto de
+    emisión. Lo administra ``NumeracionService``; no se edita directamente.
+    """
+
+    tipo = models.CharField(_('tipo de documento'), max_length=30)
+    establecimiento = models.CharField(_('establecimiento'), max_length=3, default='001')
+    punto_emision = models.CharField(_('punto de emisión'), max_length=3, default='001')
+    ultimo = models.PositiveBigIntegerField(_('último número asignado'), default=0)
+    fecha_modificacion = models.DateTimeField(_('fecha de modificación'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('secuencia de documento')
+        verbose_name_plural = _('secuencias de documentos')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tipo', 'establecimiento', 'punto_emision'], name='core_secuencia_documento_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.establecimiento}-{self.punto_emision}: {self.ultimo}"
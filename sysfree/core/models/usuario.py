@@ -4,6 +4,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
+from .auditoria import EstadoOriginalMixin
+
 
 class UsuarioManager(BaseUserManager):
     """Manager personalizado para el modelo Usuario."""
@@ -33,7 +35,7 @@ class UsuarioManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class Usuario(AbstractUser):
+class Usuario(EstadoOriginalMixin, AbstractUser):
     """Modelo de usuario personalizado que utiliza email como identificador único."""
     
     username = None  # Eliminamos el campo username
@@ -4,6 +4,8 @@ from .auditoria_service import AuditoriaService
 from .cache_service import CacheService
 from .email_service import EmailService
 from .iva_service import IVAService
+from .referencia_service import ReferenciaService
+from .numeracion_service import NumeracionService
 
 __all__ = [
     'ConfiguracionService',
@@ -12,4 +14,6 @@ __all__ = [
     'CacheService',
     'EmailService',
     'IVAService',
+    'ReferenciaService',
+    'NumeracionService',
 ]
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+Mantenimiento de la tabla particionada de logs de actividad: creación de
+particiones mensuales, archivado de particiones antiguas a JSONL comprimido
+e historial de un objeto combinando datos en línea y archivados.
+
+Formato del archivo: ``<particion>.jsonl.gz`` es un gzip válido (legible con
+``zcat``) formado por varios miembros gzip independientes, con las filas
+ordenadas por (modelo, objeto_id, fecha). ``<particion>.indice.json`` guarda
+el desplazamiento y el rango de claves de cada miembro, de modo que el
+historial de un objeto solo descomprime los bloques que pueden contenerlo.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.functions import Collate
+from django.utils.dateparse import parse_datetime
+
+from ..models import LogActividad
+
+logger = logging.getLogger('sysfree')
+
+CAMPOS_ARCHIVO = (
+    'id', 'fecha', 'usuario_id', 'ip', 'nivel', 'tipo', 'accion', 'descripcion',
+    'modelo', 'objeto_id', 'datos', 'datos_anteriores', 'user_agent',
+)
+
+_PATRON_PARTICION = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def _inicio_mes(fecha):
+    return fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _sumar_meses(inicio, meses):
+    total = inicio.year * 12 + inicio.month - 1 + meses
+    return inicio.replace(year=total // 12, month=total % 12 + 1)
+
+
+class AuditoriaRetencionService:
+    """Servicio de particiones, archivado e historial de LogActividad."""
+
+    TABLA = LogActividad._meta.db_table
+    TAMANO_BLOQUE = 256 * 1024  # bytes sin comprimir por miembro gzip
+
+    @classmethod
+    def _zona(cls):
+        return ZoneInfo(settings.TIME_ZONE)
+
+    @classmethod
+    def directorio_archivo(cls):
+        return Path(getattr(settings, 'AUDITORIA_ARCHIVO_DIR', Path(settings.BASE_DIR) / 'archivo_auditoria'))
+
+    @classmethod
+    def es_particionada(cls):
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [cls.TABLA]
+            )
+            return cursor.fetchone() is not None
+
+    @classmethod
+    def particiones(cls):
+        """
+        Particiones mensuales existentes.
+
+        Returns:
+            list: Tuplas (nombre, desde, hasta) ordenadas por fecha
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                'WHERE i.inhparent = to_regclass(%s)', [cls.TABLA]
+            )
+            nombres = [fila[0] for fila in cursor.fetchall()]
+        zona = cls._zona()
+        resultado = []
+        for nombre in nombres:
+            coincidencia = _PATRON_PARTICION.search(nombre)
+            if coincidencia:
+                desde = datetime(int(coincidencia[1]), int(coincidencia[2]), 1, tzinfo=zona)
+                resultado.append((nombre, desde, _sumar_meses(desde, 1)))
+        return sorted(resultado, key=lambda p: p[1])
+
+    @classmethod
+    def asegurar_particiones(cls, meses_adelante=3):
+        """
+        Crea las particiones del mes actual y de los siguientes ``meses_adelante``.
+
+        Las filas que hubieran caído en la partición por defecto para ese rango
+        se trasladan a la nueva partición antes de adjuntarla.
+
+        Returns:
+            list: Nombres de las particiones creadas
+        """
+        if not cls.es_particionada():
+            logger.warning(f"{cls.TABLA} no es una tabla particionada; no se crean particiones")
+            return []
+        existentes = {nombre for nombre, _, _ in cls.particiones()}
+        actual = _inicio_mes(datetime.now(cls._zona()))
+        creadas = []
+        for i in range(meses_adelante + 1):
+            desde = _sumar_meses(actual, i)
+            nombre = f'{cls.TABLA}_p{desde:%Y_%m}'
+            if nombre not in existentes:
+                cls._crear_particion(nombre, desde, _sumar_meses(desde, 1))
+                creadas.append(nombre)
+        if creadas:
+            logger.info(f"Particiones de {cls.TABLA} creadas: {', '.join(creadas)}")
+        return creadas
+
+    @classmethod
+    def _crear_particion(cls, nombre, desde, hasta):
+        por_defecto = f'{cls.TABLA}_pdefault'
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {nombre} (LIKE {cls.TABLA} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH movidas AS (DELETE FROM {por_defecto} WHERE fecha >= %s AND fecha < %s RETURNING *) '
+                f'INSERT INTO {nombre} SELECT * FROM movidas', [desde, hasta]
+            )
+            cursor.execute(
+                f"ALTER TABLE {cls.TABLA} ATTACH PARTITION {nombre} "
+                f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+            )
+
+    @classmethod
+    def archivar(cls, meses_retencion=None, directorio=None):
+        """
+        Archiva y elimina las particiones anteriores al período de retención.
+
+        Cada partición se exporta (mientras sigue adjunta) a JSONL comprimido
+        con su índice; solo después de escribir y sincronizar los archivos se
+        separa (DETACH) y elimina en una transacción.
+
+        Args:
+            meses_retencion (int): Meses completos que se conservan en línea
+            directorio (str): Destino de los archivos
+
+        Returns:
+            list: Rutas de los archivos JSONL generados
+        """
+        if not cls.es_particionada():
+            logger.warning(f"{cls.TABLA} no es una tabla particionada; no se archiva")
+            return []
+        if meses_retencion is None:
+            meses_retencion = getattr(settings, 'AUDITORIA_RETENCION_MESES', 12)
+        directorio = Path(directorio) if directorio else cls.directorio_archivo()
+        directorio.mkdir(parents=True, exist_ok=True)
+        limite = _sumar_meses(_inicio_mes(datetime.now(cls._zona())), -meses_retencion)
+
+        archivos = []
+        for nombre, desde, hasta in cls.particiones():
+            if hasta > limite:
+                break
+            ruta = cls._exportar(nombre, desde, hasta, directorio)
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Verificaciones de FK diferidas pendientes impedirían eliminar la tabla
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                cursor.execute(f'ALTER TABLE {cls.TABLA} DETACH PARTITION {nombre}')
+                cursor.execute(f'DROP TABLE {nombre}')
+            logger.info(f"Partición {nombre} archivada en {ruta}")
+            archivos.append(ruta)
+        return archivos
+
+    @classmethod
+    def _exportar(cls, nombre, desde, hasta, directorio):
+        """Escribe la partición en miembros gzip ordenados por objeto y su índice."""
+        ruta = directorio / f'{nombre}.jsonl.gz'
+        ruta_indice = directorio / f'{nombre}.indice.json'
+        filas = (
+            LogActividad.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+            .order_by(Collate('modelo', 'C'), Collate('objeto_id', 'C'), 'fecha', 'id')
+            .values_list(*CAMPOS_ARCHIVO)
+            .iterator(chunk_size=2000)
+        )
+        bloques = []
+        total = 0
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'wb') as archivo:
+            lineas, tamano, primera, ultima = [], 0, None, None
+
+            def escribir_bloque():
+                datos = gzip.compress(b''.join(lineas), compresslevel=6)
+                bloques.append({
+                    'offset': archivo.tell(), 'bytes': len(datos), 'filas': len(lineas),
+                    'primera': primera, 'ultima': ultima,
+                })
+                archivo.write(datos)
+
+            for fila in filas:
+                registro = dict(zip(CAMPOS_ARCHIVO, fila))
+                linea = (json.dumps(registro, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode()
+                clave = [registro['modelo'], registro['objeto_id']]
+                if primera is None:
+                    primera = clave
+                lineas.append(linea)
+                ultima = clave
+                tamano += len(linea)
+                total += 1
+                if tamano >= cls.TAMANO_BLOQUE:
+                    escribir_bloque()
+                    lineas, tamano, primera = [], 0, None
+            if lineas:
+                escribir_bloque()
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+
+        indice = {
+            'particion': nombre, 'desde': desde.isoformat(), 'hasta': hasta.isoformat(),
+            'filas': total, 'archivo': ruta.name, 'bloques': bloques,
+        }
+        with open(ruta_indice, 'w', encoding='utf-8') as archivo:
+            json.dump(indice, archivo)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        return ruta
+
+    @classmethod
+    def historial_objeto(cls, modelo, objeto_id, limite=100, incluir_archivo=True, directorio=None):
+        """
+        Historial de auditoría de un objeto, del más reciente al más antiguo.
+
+        Lee primero la tabla en línea (índice modelo, objeto_id, fecha) y, si
+        faltan registros para completar ``limite``, los archivos comprimidos
+        desde el más reciente, descomprimiendo solo los bloques del objeto.
+
+        Args:
+            modelo (str): Nombre del modelo (p. ej. 'Producto')
+            objeto_id: Identificador del objeto
+            limite (int): Máximo de registros devueltos
+            incluir_archivo (bool): Si se consultan los datos archivados
+            directorio (str): Directorio de archivos (por defecto el configurado)
+
+        Returns:
+            list: Diccionarios con los campos del log y ``archivado``
+        """
+        objeto_id = str(objeto_id)
+        resultado = list(
+            LogActividad.objects.filter(modelo=modelo, objeto_id=objeto_id)
+            .order_by('-fecha', '-id').values(*CAMPOS_ARCHIVO)[:limite]
+        )
+        for registro in resultado:
+            registro['archivado'] = False
+        if not incluir_archivo or len(resultado) >= limite:
+            return resultado
+
+        directorio = Path(directorio) if directorio else cls.directorio_archivo()
+        if not directorio.is_dir():
+            return resultado
+        clave = [modelo, objeto_id]
+        for ruta_indice in sorted(directorio.glob('*.indice.json'), reverse=True):
+            archivados = cls._leer_archivo(ruta_indice, clave)
+            archivados.sort(key=lambda r: (r['fecha'], r['id']), reverse=True)
+            resultado.extend(archivados[:limite - len(resultado)])
+            if len(resultado) >= limite:
+                break
+        return resultado
+
+    @classmethod
+    def _leer_archivo(cls, ruta_indice, clave):
+        with open(ruta_indice, encoding='utf-8') as archivo:
+            indice = json.load(archivo)
+        candidatos = [b for b in indice['bloques'] if b['primera'] <= clave <= b['ultima']]
+        registros = []
+        if not candidatos:
+            return registros
+        with open(ruta_indice.parent / indice['archivo'], 'rb') as archivo:
+            for bloque in candidatos:
+                archivo.seek(bloque['offset'])
+                for linea in gzip.decompress(archivo.read(bloque['bytes'])).splitlines():
+                    registro = json.loads(linea)
+                    if [registro['modelo'], registro['objeto_id']] == clave:
+                        registro['fecha'] = parse_datetime(registro['fecha'])
+                        registro['archivado'] = True
+                        registros.append(registro)
+        return registros
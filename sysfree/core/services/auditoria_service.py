@@ -157,6 +157,38 @@ class AuditoriaService:
             user_agent=user_agent
         )
     
+    @classmethod
+    def stock_actualizado_lote(cls, movimientos, motivo=None):
+        """Registra en un solo evento las actualizaciones de stock de un lote de movimientos."""
+        usuario, ip, user_agent = cls._get_context_info()
+        
+        productos = {m.producto_id for m in movimientos}
+        descripcion = f"Actualización de stock en lote: {len(movimientos)} movimientos sobre {len(productos)} productos"
+        if motivo:
+            descripcion += f" - {motivo}"
+        
+        LogService.negocio(
+            accion=AccionesAuditoria.STOCK_ACTUALIZADO_LOTE,
+            descripcion=descripcion,
+            usuario=usuario,
+            modelo='MovimientoInventario',
+            datos={
+                'motivo': motivo,
+                'movimientos': [
+                    {
+                        'id': m.pk,
+                        'producto': m.producto_id,
+                        'almacen': m.almacen_id,
+                        'cantidad_anterior': float(m.stock_anterior),
+                        'cantidad_nueva': float(m.stock_nuevo),
+                    }
+                    for m in movimientos
+                ]
+            },
+            ip=ip,
+            user_agent=user_agent
+        )
+    
     # Métodos de configuración
     @classmethod
     def configuracion_actualizada(cls, seccion, cambios):
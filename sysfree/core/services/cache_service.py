@@ -1,39 +1,209 @@
+import logging
+import threading
+import time
+
 from django.core.cache import cache
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('sysfree')
 
 
 class CacheService:
     """Servicio para gestionar la caché Redis del sistema."""
-    
+
+    # Prefijo de los contadores de generación de cada etiqueta
+    TAG_VERSION_PREFIX = 'tagver'
+    # Vigencia de los contadores, renovada en cada invalidación. Debe superar el
+    # timeout más largo de las entradas etiquetadas (y REPORTES_CACHE_TTL para
+    # las versiones de tabla): un contador vencido se reinicia con un valor
+    # nuevo y las entradas anteriores solo dejan de ser alcanzables.
+    TAG_VERSION_TTL = 24 * 3600
+
+    # Tablas modificadas en la transacción en curso de cada hilo
+    _local = threading.local()
+
     @classmethod
     def get(cls, key, default=None):
         return cache.get(key, default)
-    
+
     @classmethod
     def set(cls, key, value, timeout=3600):
         cache.set(key, value, timeout)
-    
+
     @classmethod
     def delete(cls, key):
         cache.delete(key)
-    
+
     @classmethod
     def delete_pattern(cls, pattern):
-        """Elimina claves que coincidan con un patrón (Redis)."""
+        """
+        Elimina claves que coincidan con un patrón (Redis).
+
+        Recorre todo el espacio de claves con SCAN: usar solo en tareas de
+        mantenimiento. Para invalidar datos cacheados usar ``invalidate_tags``.
+        """
         cache.delete_pattern(pattern)
-    
+
     @classmethod
     def get_or_set(cls, key, default_func, timeout=3600):
         return cache.get_or_set(key, default_func, timeout)
-    
+
+    # Invalidación por etiquetas versionadas
+    #
+    # Cada etiqueta (p. ej. ``producto:15`` o ``productos``) tiene un contador de
+    # generación. Las claves etiquetadas incluyen la generación vigente de sus
+    # etiquetas, de modo que invalidar es un único INCR: las entradas anteriores
+    # dejan de ser alcanzables y expiran por su timeout.
+
+    @classmethod
+    def _tag_version_key(cls, tag):
+        return f"{cls.TAG_VERSION_PREFIX}:{tag}"
+
+    @staticmethod
+    def _nueva_version():
+        # Si el contador se pierde (expulsión de Redis) se reinicia con un valor
+        # que no puede coincidir con generaciones anteriores aún cacheadas
+        return time.time_ns() // 1000
+
+    @classmethod
+    def get_tag_versions(cls, tags):
+        """
+        Obtiene la generación vigente de varias etiquetas en una sola consulta.
+
+        Args:
+            tags (list): Nombres de las etiquetas
+
+        Returns:
+            dict: Generación por etiqueta
+        """
+        claves = {cls._tag_version_key(tag): tag for tag in tags}
+        versiones = cache.get_many(list(claves))
+        resultado = {}
+        for clave, tag in claves.items():
+            version = versiones.get(clave)
+            if version is None:
+                cache.add(clave, cls._nueva_version(), cls.TAG_VERSION_TTL)
+                version = cache.get(clave)
+            resultado[tag] = version
+        return resultado
+
+    @classmethod
+    def make_tagged_key(cls, key, tags):
+        """Construye la clave física de ``key`` con la generación de sus etiquetas."""
+        versiones = cls.get_tag_versions(tags)
+        return key + ''.join(f"|{tag}@{versiones[tag]}" for tag in tags)
+
+    @classmethod
+    def get_tagged(cls, key, tags, default=None):
+        return cache.get(cls.make_tagged_key(key, tags), default)
+
+    @classmethod
+    def set_tagged(cls, key, value, tags, timeout=3600):
+        cache.set(cls.make_tagged_key(key, tags), value, timeout)
+
+    @classmethod
+    def get_or_set_tagged(cls, key, default_func, tags, timeout=3600):
+        return cache.get_or_set(cls.make_tagged_key(key, tags), default_func, timeout)
+
+    @classmethod
+    def invalidate_tags(cls, *tags):
+        """
+        Invalida todas las entradas asociadas a las etiquetas indicadas.
+
+        Envía un INCR (y la renovación de su vigencia) por etiqueta en un
+        único pipeline: el costo no depende del número de claves almacenadas
+        en Redis.
+        """
+        claves = [cls._tag_version_key(tag) for tag in dict.fromkeys(tags)]
+        if not claves:
+            return
+        pipe = get_redis_connection('default').pipeline(transaction=False)
+        for clave in claves:
+            pipe.incr(cache.make_key(clave))
+            pipe.expire(cache.make_key(clave), cls.TAG_VERSION_TTL)
+        for clave, version in zip(claves, pipe.execute()[::2]):
+            # El contador no existía (o se perdió) y Redis lo creó en 1
+            if version == 1:
+                cache.set(clave, cls._nueva_version(), cls.TAG_VERSION_TTL)
+
+    # Versión de los datos de cada tabla
+    #
+    # Las escrituras en los modelos de ``ModeloBase`` (señales de ``save`` y
+    # ``delete`` y operaciones masivas de ``ModeloBaseQuerySet``) invalidan la
+    # etiqueta ``tabla:<db_table>`` al confirmarse la transacción, cuando el
+    # cambio ya es visible para las demás conexiones. Quien cachea resultados
+    # calculados a partir de una tabla incluye su generación en la clave.
+
+    @staticmethod
+    def _tabla_tag(tabla):
+        return f"tabla:{tabla}"
+
+    @classmethod
+    def tablas_modificadas(cls, *tablas):
+        """
+        Invalida la versión de datos de las tablas cuando se confirme la transacción en curso.
+
+        Las tablas de una transacción se acumulan y un único on_commit por
+        nivel de savepoint las invalida juntas en un pipeline, por muchas
+        escrituras que haga; el primero en ejecutarse las envía todas y los
+        demás no encuentran ninguna. Si la transacción se revierte, sus tablas
+        se invalidan con la siguiente (invalidar de más solo obliga a recalcular).
+        """
+        pendientes = cls._tablas_pendientes()
+        # Sin tablas pendientes el último callback ya se ejecutó; con ellas se
+        # busca el del savepoint actual, porque un rollback (también de un
+        # savepoint) lo descarta sin avisar
+        savepoints = set(connection.savepoint_ids)
+        programado = bool(pendientes) and any(
+            funcion == cls._confirmar_tablas and ids == savepoints for ids, funcion, _ in connection.run_on_commit
+        )
+        pendientes.update(cls._tabla_tag(tabla) for tabla in tablas)
+        if not programado:
+            transaction.on_commit(cls._confirmar_tablas)
+
+    @classmethod
+    def _tablas_pendientes(cls):
+        if not hasattr(cls._local, 'tablas'):
+            cls._local.tablas = set()
+        return cls._local.tablas
+
+    @classmethod
+    def _confirmar_tablas(cls):
+        pendientes = cls._tablas_pendientes()
+        if not pendientes:
+            return
+        tags = sorted(pendientes)
+        pendientes.clear()
+        try:
+            cls.invalidate_tags(*tags)
+        except Exception as e:
+            logger.error(f"Error al invalidar la versión de datos {tags}: {str(e)}")
+
+    @classmethod
+    def versiones_tablas(cls, tablas):
+        """
+        Obtiene la versión de datos vigente de varias tablas en una sola consulta.
+
+        Args:
+            tablas (list): Nombres de las tablas (``db_table``)
+
+        Returns:
+            dict: Versión por tabla
+        """
+        tags = {cls._tabla_tag(tabla): tabla for tabla in tablas}
+        versiones = cls.get_tag_versions(list(tags))
+        return {tabla: versiones[tag] for tag, tabla in tags.items()}
+
     # Métodos específicos para IVA
     @classmethod
     def get_iva(cls, key, default=None):
-        return cls.get(f"iva_{key}", default)
-    
+        return cls.get_tagged(f"iva_{key}", ['iva'], default)
+
     @classmethod
     def set_iva(cls, key, value, timeout=7200):
-        cls.set(f"iva_{key}", value, timeout)
-    
+        cls.set_tagged(f"iva_{key}", value, ['iva'], timeout)
+
     @classmethod
     def invalidate_iva(cls):
-        cls.delete_pattern("iva_*")
\ No newline at end of file
+        cls.invalidate_tags('iva')
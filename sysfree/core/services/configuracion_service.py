@@ -1,8 +1,8 @@
 """
 Servicio para gestionar la configuración del sistema.
 """
-from django.core.cache import cache
 from ..models import ConfiguracionSistema
+from .referencia_service import ReferenciaService
 from .iva_service import IVAService
 from .empresa_service import EmpresaService
 
@@ -10,9 +10,6 @@ from .empresa_service import EmpresaService
 class ConfiguracionService:
     """Servicio para gestionar la configuración del sistema."""
     
-    CACHE_KEY = 'configuracion_sistema'
-    CACHE_TIMEOUT = 3600  # 1 hora
-    
     @classmethod
     def get_configuracion(cls):
         """
@@ -21,22 +18,15 @@ class ConfiguracionService:
         Returns:
             ConfiguracionSistema: La configuración del sistema o None si no existe.
         """
-        # Intentar obtener del cache primero
-        configuracion = cache.get(cls.CACHE_KEY)
+        def cargar():
+            # Si no hay configuración, crear una por defecto
+            return ConfiguracionSistema.objects.select_related('tipo_iva_default').first() or \
+                ConfiguracionSistema.objects.create()
         
-        if configuracion is None:
-            try:
-                configuracion = ConfiguracionSistema.objects.first()
-                if configuracion is None:
-                    # Si no hay configuración, crear una por defecto
-                    configuracion = ConfiguracionSistema.objects.create()
-                
-                # Guardar en cache
-                cache.set(cls.CACHE_KEY, configuracion, cls.CACHE_TIMEOUT)
-            except Exception:
-                return None
-                
-        return configuracion
+        try:
+            return ReferenciaService.obtener('configuracion', 'sistema', cargar)
+        except Exception:
+            return None
     
     @classmethod
     def get_iva_default(cls):
@@ -81,5 +71,5 @@ class ConfiguracionService:
     @classmethod
     def invalidar_cache(cls):
         """Invalida la caché de configuración del sistema."""
-        cache.delete(cls.CACHE_KEY)
+        ReferenciaService.invalidar('configuracion')
         EmpresaService.invalidar_cache()
\ No newline at end of file
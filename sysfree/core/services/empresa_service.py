@@ -1,16 +1,13 @@
 """
 Servicio para gestionar la información de la empresa.
 """
-from django.core.cache import cache
 from ..models import Empresa
+from .referencia_service import ReferenciaService
 
 
 class EmpresaService:
     """Servicio para gestionar la información de la empresa."""
     
-    CACHE_KEY = 'empresa_principal'
-    CACHE_TIMEOUT = 3600  # 1 hora
-    
     @classmethod
     def get_empresa(cls):
         """
@@ -19,19 +16,10 @@ class EmpresaService:
         Returns:
             Empresa: La empresa principal o None si no existe.
         """
-        # Intentar obtener del cache primero
-        empresa = cache.get(cls.CACHE_KEY)
-        
-        if empresa is None:
-            try:
-                empresa = Empresa.objects.first()
-                if empresa:
-                    # Guardar en cache
-                    cache.set(cls.CACHE_KEY, empresa, cls.CACHE_TIMEOUT)
-            except Exception:
-                return None
-                
-        return empresa
+        try:
+            return ReferenciaService.obtener('empresa', 'principal', lambda: Empresa.objects.first())
+        except Exception:
+            return None
     
     @classmethod
     def get_nombre_empresa(cls):
@@ -95,4 +83,4 @@ class EmpresaService:
     @classmethod
     def invalidar_cache(cls):
         """Invalida la caché de la empresa."""
-        cache.delete(cls.CACHE_KEY)
\ No newline at end of file
+        ReferenciaService.invalidar('empresa')
\ No newline at end of file
@@ -6,6 +6,7 @@ sin necesidad de configuraciones en settings.
 from django.db.models import Q
 from ..models.tipo_iva import TipoIVA
 from .cache_service import CacheService
+from .referencia_service import ReferenciaService
 
 
 class IVAService:
@@ -21,21 +22,13 @@ class IVAService:
         Returns:
             TipoIVA: El tipo de IVA predeterminado o None si no existe.
         """
-        # Intentar obtener del cache primero
-        iva_default = CacheService.get_iva('default')
+        def cargar():
+            return TipoIVA.objects.filter(es_default=True).first() or TipoIVA.objects.first()
         
-        if iva_default is None:
-            try:
-                iva_default = TipoIVA.objects.filter(es_default=True).first()
-                if iva_default is None:
-                    iva_default = TipoIVA.objects.first()
-                
-                if iva_default:
-                    CacheService.set_iva('default', iva_default, cls.CACHE_TIMEOUT)
-            except Exception:
-                return None
-                
-        return iva_default
+        try:
+            return ReferenciaService.obtener('iva', 'default', cargar)
+        except Exception:
+            return None
     
     @classmethod
     def get_by_id(cls, id):
@@ -49,7 +42,9 @@ class IVAService:
             TipoIVA: El tipo de IVA correspondiente o None si no existe.
         """
         try:
-            return TipoIVA.objects.filter(id=id).first()
+            return ReferenciaService.obtener(
+                'iva', f'id_{id}', lambda: TipoIVA.objects.filter(id=id).first()
+            )
         except Exception:
             return None
     
@@ -65,7 +60,9 @@ class IVAService:
             TipoIVA: El tipo de IVA correspondiente o None si no existe.
         """
         try:
-            return TipoIVA.objects.filter(codigo=codigo).first()
+            return ReferenciaService.obtener(
+                'iva', f'codigo_{codigo}', lambda: TipoIVA.objects.filter(codigo=codigo).first()
+            )
         except Exception:
             return None
     
@@ -81,7 +78,9 @@ class IVAService:
             TipoIVA: El tipo de IVA correspondiente o None si no existe.
         """
         try:
-            return TipoIVA.objects.filter(porcentaje=porcentaje).first()
+            return ReferenciaService.obtener(
+                'iva', f'porcentaje_{porcentaje}', lambda: TipoIVA.objects.filter(porcentaje=porcentaje).first()
+            )
         except Exception:
             return None
     
@@ -93,17 +92,10 @@ class IVAService:
         Returns:
             QuerySet: QuerySet con todos los tipos de IVA.
         """
-        # Intentar obtener del cache primero
-        tipos_iva = CacheService.get_iva('all')
-        
-        if tipos_iva is None:
-            try:
-                tipos_iva = list(TipoIVA.objects.all())
-                CacheService.set_iva('all', tipos_iva, cls.CACHE_TIMEOUT)
-            except Exception:
-                return []
-                
-        return tipos_iva
+        try:
+            return ReferenciaService.obtener('iva', 'all', lambda: list(TipoIVA.objects.all()))
+        except Exception:
+            return []
     
     @classmethod
     def calcular_iva(cls, base_imponible, tipo_iva=None):
@@ -132,4 +124,5 @@ class IVAService:
     @classmethod
     def invalidar_cache(cls):
         """Invalida la caché de tipos de IVA."""
+        ReferenciaService.invalidar('iva', 'configuracion')
         CacheService.invalidate_iva()
\ No newline at end of file
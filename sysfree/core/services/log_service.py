@@ -1,9 +1,42 @@
+import logging
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
 from ..models import LogActividad
 from ..middleware import get_usuario_actual
 
+logger = logging.getLogger('sysfree')
+
+# Campos de LogActividad que viajan a la tarea asíncrona (``fecha`` como ISO 8601)
+CAMPOS_EVENTO = (
+    'usuario_id', 'fecha', 'nivel', 'tipo', 'accion', 'descripcion', 'modelo',
+    'objeto_id', 'datos', 'ip', 'datos_anteriores', 'user_agent',
+)
+
+# Eventos confirmados aún no escritos y último evento registrado, por hilo
+# (la conexión es por hilo)
+_local = threading.local()
+
 
 class LogService:
-    """Servicio para registrar actividades en el sistema."""
+    """
+    Servicio para registrar actividades en el sistema.
+
+    El modo de escritura se configura con ``AUDITORIA_MODO``:
+
+    - ``sync``: cada actividad se inserta de inmediato.
+    - ``transaccion`` (por defecto): dentro de una transacción las actividades
+      se acumulan y se insertan con un único ``bulk_create`` al confirmarla;
+      si la transacción (o el savepoint que las contiene) se revierte no se
+      registran.
+    - ``async``: como ``transaccion``, pero el lote se envía a una tarea de
+      Celery; si no se puede encolar se inserta directamente.
+
+    Fuera de una transacción las actividades se escriben al momento.
+    """
     
     @classmethod
     def registrar_actividad(cls, accion, descripcion, nivel='info', tipo='sistema', 
@@ -26,12 +59,12 @@ class LogService:
             user_agent (str): User agent del cliente
         
         Returns:
-            LogActividad: Instancia del log creado
+            LogActividad: Instancia del log (sin pk si su escritura quedó diferida)
         """
         if usuario is None:
             usuario = get_usuario_actual()
         
-        log = LogActividad.objects.create(
+        log = LogActividad(
             usuario=usuario,
             nivel=nivel,
             tipo=tipo,
@@ -44,8 +77,80 @@ class LogService:
             datos_anteriores=datos_anteriores,
             user_agent=user_agent
         )
-        
+        cls.encolar(log)
         return log
+
+    @classmethod
+    def modo(cls):
+        return getattr(settings, 'AUDITORIA_MODO', 'transaccion')
+
+    @classmethod
+    def encolar(cls, log):
+        """
+        Registra un log según el modo configurado.
+
+        Args:
+            log (LogActividad): Log aún no guardado
+        """
+        if cls.modo() == 'sync':
+            log.save()
+            return
+        conexion = transaction.get_connection()
+        if not conexion.in_atomic_block:
+            cls.escribir_lote([log])
+            return
+        savepoints = frozenset(conexion.savepoint_ids)
+        _local.ultimo = (log, savepoints)
+        transaction.on_commit(partial(cls._confirmar, log, savepoints))
+
+    @classmethod
+    def _confirmar(cls, log, savepoints):
+        """
+        Callback on_commit de cada evento: Django lo descarta si se revierte
+        alguno de sus savepoints, así que solo se acumulan los confirmados.
+
+        El lote se escribe en el callback del último evento registrado. Un
+        evento anterior solo escribe lo acumulado si el último pudo
+        descartarse sin descartarlo a él (tiene un savepoint que este no
+        tiene): así ningún evento confirmado queda sin escribir y, en el caso
+        habitual, la transacción hace un único INSERT.
+        """
+        confirmados = getattr(_local, 'confirmados', None)
+        if confirmados is None:
+            confirmados = _local.confirmados = []
+        confirmados.append(log)
+        ultimo, savepoints_ultimo = _local.ultimo
+        if ultimo is not log and savepoints_ultimo <= savepoints:
+            return
+        _local.confirmados = []
+        cls.escribir_lote(confirmados)
+
+    @classmethod
+    def escribir_lote(cls, logs):
+        """
+        Escribe un lote de logs con un único INSERT o lo envía a Celery.
+
+        Args:
+            logs (list): Instancias de LogActividad sin guardar
+        """
+        if cls.modo() == 'async':
+            from ..tasks import registrar_actividades_task
+            try:
+                registrar_actividades_task.delay([cls.serializar_evento(log) for log in logs])
+                return
+            except Exception as e:
+                logger.error(f"No se pudo encolar la auditoría, se escribe directamente: {str(e)}")
+        try:
+            LogActividad.objects.bulk_create(logs, batch_size=500)
+        except Exception as e:
+            # La auditoría nunca debe romper la operación ya confirmada
+            logger.error(f"Error al escribir {len(logs)} registros de auditoría: {str(e)}")
+
+    @staticmethod
+    def serializar_evento(log):
+        evento = {campo: getattr(log, campo) for campo in CAMPOS_EVENTO}
+        evento['fecha'] = log.fecha.isoformat()
+        return evento
     
     @classmethod
     def info(cls, accion, descripcion, **kwargs):
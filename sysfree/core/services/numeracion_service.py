@@ -0,0 +1,152 @@
+"""
+Numeración de documentos respaldada por un contador bloqueado en la base de
+datos (``SecuenciaDocumento``), por tipo, establecimiento y punto de emisión.
+
+Cada número se obtiene con un único ``UPDATE ... RETURNING`` que bloquea la
+fila del contador hasta el fin de la transacción: dos transacciones no pueden
+obtener el mismo número y, si una se revierte, su número se reutiliza (no hay
+saltos). Para documentos sin exigencia de correlatividad estricta se pueden
+preasignar bloques por proceso (``NUMERACION_BLOQUES``), que se reservan en
+una conexión aparte para no mantener el contador bloqueado.
+"""
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+
+from ..models import SecuenciaDocumento
+
+logger = logging.getLogger('sysfree')
+
+
+class NumeracionService:
+    """Servicio de numeración secuencial de documentos."""
+
+    _bloques = {}  # (tipo, establecimiento, punto_emision) -> [siguiente, ultimo]
+    _lock = threading.Lock()
+
+    @classmethod
+    def siguiente(cls, tipo, establecimiento='001', punto_emision='001', inicio=1, inicializar=None):
+        """
+        Obtiene el siguiente número de la secuencia.
+
+        Args:
+            tipo (str): Tipo de documento (p. ej. 'factura' o 'reparacion:202501')
+            establecimiento (str): Código de establecimiento
+            punto_emision (str): Código de punto de emisión
+            inicio (int): Primer número si la secuencia no existe
+            inicializar (callable): Devuelve el mayor número ya emitido; se usa
+                una sola vez, al crear la secuencia, para continuar la numeración
+                de documentos existentes
+
+        Returns:
+            int: Número asignado
+        """
+        tamano = cls.tamano_bloque(tipo)
+        if tamano > 1:
+            return cls._siguiente_de_bloque(tipo, establecimiento, punto_emision, tamano, inicio, inicializar)
+        return cls.reservar(tipo, 1, establecimiento, punto_emision, inicio, inicializar).start
+
+    @classmethod
+    def reservar(cls, tipo, cantidad=1, establecimiento='001', punto_emision='001', inicio=1,
+                 inicializar=None, using=None):
+        """
+        Reserva ``cantidad`` números consecutivos en la transacción actual.
+
+        Returns:
+            range: Números reservados
+        """
+        conexion = connections[using or DEFAULT_DB_ALIAS]
+        clave = (tipo, establecimiento, punto_emision)
+        ultimo = cls._incrementar(conexion, clave, cantidad)
+        if ultimo is None:
+            base = max(inicio - 1, (inicializar() if inicializar else 0) or 0)
+            SecuenciaDocumento.objects.using(conexion.alias).bulk_create(
+                [SecuenciaDocumento(tipo=tipo, establecimiento=establecimiento,
+                                    punto_emision=punto_emision, ultimo=base)],
+                ignore_conflicts=True,
+            )
+            ultimo = cls._incrementar(conexion, clave, cantidad)
+        return range(ultimo - cantidad + 1, ultimo + 1)
+
+    @classmethod
+    def _incrementar(cls, conexion, clave, cantidad):
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {SecuenciaDocumento._meta.db_table} '
+                'SET ultimo = ultimo + %s, fecha_modificacion = %s '
+                'WHERE tipo = %s AND establecimiento = %s AND punto_emision = %s '
+                'RETURNING ultimo',
+                [cantidad, timezone.now(), *clave],
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila else None
+
+    @classmethod
+    def tamano_bloque(cls, tipo):
+        """Tamaño de preasignación configurado para el tipo (1 = sin bloques)."""
+        bloques = getattr(settings, 'NUMERACION_BLOQUES', {})
+        return int(bloques.get(tipo, bloques.get(tipo.split(':', 1)[0], 1)))
+
+    @classmethod
+    def _siguiente_de_bloque(cls, tipo, establecimiento, punto_emision, tamano, inicio, inicializar):
+        clave = (tipo, establecimiento, punto_emision)
+        with cls._lock:
+            bloque = cls._bloques.get(clave)
+            if bloque is None or bloque[0] > bloque[1]:
+                rango = cls._reservar_autonomo(tipo, tamano, establecimiento, punto_emision, inicio, inicializar)
+                bloque = cls._bloques[clave] = [rango.start, rango.stop - 1]
+                logger.debug(f"Bloque de numeración {tipo} {rango.start}-{rango.stop - 1} reservado")
+            numero = bloque[0]
+            bloque[0] += 1
+        return numero
+
+    @classmethod
+    def _reservar_autonomo(cls, tipo, cantidad, establecimiento, punto_emision, inicio, inicializar):
+        """Reserva un bloque en una conexión propia que confirma de inmediato."""
+        conexion = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            clave = (tipo, establecimiento, punto_emision)
+            ultimo = cls._incrementar(conexion, clave, cantidad)
+            if ultimo is None:
+                base = max(inicio - 1, (inicializar() if inicializar else 0) or 0)
+                with conexion.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {SecuenciaDocumento._meta.db_table} '
+                        '(tipo, establecimiento, punto_emision, ultimo, fecha_modificacion) '
+                        'VALUES (%s, %s, %s, %s, %s) ON CONFLICT DO NOTHING',
+                        [*clave, base, timezone.now()],
+                    )
+                ultimo = cls._incrementar(conexion, clave, cantidad)
+            return range(ultimo - cantidad + 1, ultimo + 1)
+        finally:
+            conexion.close()
+
+    @classmethod
+    def descartar_bloques(cls):
+        """Olvida los bloques preasignados en este proceso (p. ej. tras un fork)."""
+        with cls._lock:
+            cls._bloques.clear()
+
+    @staticmethod
+    def maximo_existente(queryset, campo, prefijo, digitos=None):
+        """
+        Mayor número ya emitido con el formato ``<prefijo><dígitos>``.
+
+        Se usa como ``inicializar`` al crear una secuencia sobre documentos
+        numerados con el esquema anterior.
+
+        Returns:
+            int: Número máximo encontrado o 0
+        """
+        cuantificador = f'{{{digitos}}}' if digitos else '+'
+        resultado = (
+            queryset.filter(**{f'{campo}__regex': f'^{re.escape(prefijo)}[0-9]{cuantificador}$'})
+            .aggregate(maximo=Max(Cast(Substr(campo, len(prefijo) + 1), BigIntegerField())))
+        )
+        return resultado['maximo'] or 0
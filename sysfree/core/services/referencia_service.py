@@ -0,0 +1,158 @@
+"""
+Registro en dos niveles para datos de referencia pequeños y de cambio poco
+frecuente (tipos de IVA, empresa, configuración, almacén predeterminado).
+
+Nivel 1: LRU en memoria del proceso con TTL. Nivel 2: Redis, mediante claves
+etiquetadas de CacheService. Cada grupo de datos tiene una generación en
+Redis; las señales de core/signals.py la incrementan al guardar o eliminar,
+y cada proceso la consulta como máximo una vez por ``INTERVALO_GENERACION``,
+de modo que el camino habitual es una búsqueda en un diccionario local.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import connection, transaction
+
+from .cache_service import CacheService
+
+logger = logging.getLogger('sysfree')
+
+_AUSENTE = object()
+
+
+class ReferenciaService:
+    """Servicio de caché en memoria + Redis para datos de referencia."""
+
+    TTL_LOCAL = 300  # 5 minutos en memoria del proceso
+    TTL_REDIS = 3600  # 1 hora en Redis
+    INTERVALO_GENERACION = 1.0  # segundos entre verificaciones de generación
+    MAX_ENTRADAS = 512
+
+    _entradas = OrderedDict()  # (grupo, clave) -> (valor, generacion, expira)
+    _generaciones = {}  # grupo -> (generacion, verificada)
+    _lock = threading.Lock()
+    # Grupos modificados en la transacción abierta del hilo (la conexión es por hilo)
+    _local = threading.local()
+
+    @staticmethod
+    def _tag(grupo):
+        return f'referencia:{grupo}'
+
+    @classmethod
+    def obtener(cls, grupo, clave, cargar):
+        """
+        Obtiene un dato de referencia, cargándolo solo si no está en caché.
+
+        Los objetos devueltos se comparten entre llamadas: no deben modificarse.
+
+        Args:
+            grupo (str): Grupo de invalidación (p. ej. 'iva' o 'empresa')
+            clave (str): Identificador del dato dentro del grupo
+            cargar (callable): Función que obtiene el dato de la base de datos
+
+        Returns:
+            El valor cacheado o recién cargado (puede ser None)
+        """
+        pendientes = cls._pendientes()
+        if pendientes:
+            if not connection.in_atomic_block:
+                # La transacción terminó con rollback: descartar lo cargado durante ella
+                cls.limpiar_local(*pendientes)
+                pendientes.clear()
+            elif grupo in pendientes:
+                # Datos no confirmados: no se comparten con otros hilos ni procesos
+                return cargar()
+
+        ahora = time.monotonic()
+        try:
+            generacion = cls._generacion(grupo, ahora)
+        except Exception as e:
+            # Sin Redis no hay forma de saber si el nivel local sigue vigente
+            logger.error(f"Error al verificar la generación de {grupo}: {str(e)}")
+            return cargar()
+        entrada = cls._entradas.get((grupo, clave))
+        if entrada is not None and entrada[1] == generacion and entrada[2] > ahora:
+            with cls._lock:
+                if (grupo, clave) in cls._entradas:
+                    cls._entradas.move_to_end((grupo, clave))
+            return entrada[0]
+
+        clave_redis = f'referencia_{grupo}_{clave}'
+        try:
+            valor = CacheService.get_tagged(clave_redis, [cls._tag(grupo)], _AUSENTE)
+        except Exception as e:
+            logger.error(f"Error al leer {clave_redis} de la caché: {str(e)}")
+            return cargar()
+        if valor is _AUSENTE:
+            valor = cargar()
+            try:
+                CacheService.set_tagged(clave_redis, valor, [cls._tag(grupo)], cls.TTL_REDIS)
+            except Exception as e:
+                logger.error(f"Error al guardar {clave_redis} en la caché: {str(e)}")
+
+        with cls._lock:
+            cls._entradas[(grupo, clave)] = (valor, generacion, ahora + cls.TTL_LOCAL)
+            cls._entradas.move_to_end((grupo, clave))
+            while len(cls._entradas) > cls.MAX_ENTRADAS:
+                cls._entradas.popitem(last=False)
+        return valor
+
+    @classmethod
+    def _pendientes(cls):
+        if not hasattr(cls._local, 'pendientes'):
+            cls._local.pendientes = set()
+        return cls._local.pendientes
+
+    @classmethod
+    def _generacion(cls, grupo, ahora):
+        """Generación vigente del grupo, consultada en Redis como máximo una vez por intervalo."""
+        generacion, verificada = cls._generaciones.get(grupo, (None, 0.0))
+        if generacion is None or ahora - verificada >= cls.INTERVALO_GENERACION:
+            tag = cls._tag(grupo)
+            generacion = CacheService.get_tag_versions([tag])[tag]
+            cls._generaciones[grupo] = (generacion, ahora)
+        return generacion
+
+    @classmethod
+    def invalidar(cls, *grupos):
+        """
+        Invalida los grupos en este proceso de inmediato y en los demás vía Redis.
+
+        Dentro de una transacción los grupos no se cachean hasta que termine,
+        y al confirmar la generación se incrementa de nuevo para descartar lo
+        que otros procesos hayan cargado antes de que el cambio fuera visible.
+        """
+        tags = [cls._tag(grupo) for grupo in grupos]
+        try:
+            CacheService.invalidate_tags(*tags)
+        except Exception as e:
+            logger.error(f"Error al invalidar datos de referencia {grupos}: {str(e)}")
+        cls.limpiar_local(*grupos)
+
+        if connection.in_atomic_block:
+            cls._pendientes().update(grupos)
+            transaction.on_commit(lambda: cls._confirmar(grupos, tags))
+
+    @classmethod
+    def _confirmar(cls, grupos, tags):
+        cls._pendientes().difference_update(grupos)
+        cls.limpiar_local(*grupos)
+        try:
+            CacheService.invalidate_tags(*tags)
+        except Exception as e:
+            logger.error(f"Error al invalidar datos de referencia {grupos}: {str(e)}")
+
+    @classmethod
+    def limpiar_local(cls, *grupos):
+        """Descarta el nivel en memoria de los grupos indicados (o de todos)."""
+        with cls._lock:
+            if not grupos:
+                cls._entradas.clear()
+                cls._generaciones.clear()
+                return
+            for clave in [c for c in cls._entradas if c[0] in grupos]:
+                del cls._entradas[clave]
+            for grupo in grupos:
+                cls._generaciones.pop(grupo, None)
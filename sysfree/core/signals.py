@@ -1,3 +1,6 @@
+from functools import lru_cache
+
+from django.db import models
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
@@ -16,8 +19,10 @@ from ecommerce.models import (CategoriaEcommerce, ProductoEcommerce, ImagenProdu
                             Valoracion, ValoracionServicio, ListaDeseos, ItemListaDeseos, Comparacion, ReservaStock)
 from .middleware import get_usuario_actual, get_request_actual
 from .services.log_service import LogService
-from .services import IVAService
+from .services import CacheService, IVAService
+from .services.referencia_service import ReferenciaService
 from .constants import TiposActividad, MensajesAuditoria
+from .utils.auditoria import operacion_masiva_actual
 
 # Modelos que serán auditados automáticamente
 AUDITED_MODELS = [
@@ -55,45 +60,106 @@ def get_client_info(request):
     return ip, user_agent
 
 
+# Campos excluidos por seguridad y auditoría
+EXCLUDED_FIELDS = {
+    'creado_por', 'modificado_por', 'fecha_creacion', 'fecha_modificacion', 'activo',
+    'password', 'last_login', 'user_permissions', 'groups',  # Campos sensibles de Usuario
+    'clave_certificado', 'url_recepcion_pruebas', 'url_autorizacion_pruebas',  # Datos fiscales sensibles
+}
+
+# Para Usuario, solo incluir campos seguros
+USUARIO_SAFE_FIELDS = {'email', 'nombres', 'apellidos', 'telefono', 'is_active', 'is_staff', 'fecha_nacimiento'}
+
+_AUDITED_SET = frozenset(AUDITED_MODELS)
+
+
+@lru_cache(maxsize=None)
+def campos_auditables(model):
+    """Campos concretos que se serializan en la auditoría de un modelo."""
+    campos = [f for f in model._meta.concrete_fields if f.name not in EXCLUDED_FIELDS]
+    if model._meta.model_name == 'usuario':
+        campos = [f for f in campos if f.name in USUARIO_SAFE_FIELDS]
+    return tuple(campos)
+
+
+def _serializar_valor(field, value):
+    if hasattr(field, 'upload_to'):  # FileField/ImageField
+        return str(value) if value else None
+    if hasattr(value, 'isoformat'):  # DateField/DateTimeField
+        return value.isoformat()
+    if not isinstance(value, (str, int, float, bool, type(None))):
+        return str(value)
+    return value
+
+
 def serialize_instance(instance, fields=None):
     """Serializa una instancia de modelo a un diccionario excluyendo campos sensibles."""
-    # Campos excluidos por seguridad y auditoría
-    excluded_fields = {
-        'creado_por', 'modificado_por', 'fecha_creacion', 'fecha_modificacion', 'activo',
-        'password', 'last_login', 'user_permissions', 'groups',  # Campos sensibles de Usuario
-        'clave_certificado', 'url_recepcion_pruebas', 'url_autorizacion_pruebas',  # Datos fiscales sensibles
-    }
-    
-    opts = instance._meta
     data = {}
-    for f in opts.concrete_fields:
-        if f.name in excluded_fields:
-            continue
+    for f in campos_auditables(type(instance)):
         if fields and f.name not in fields:
             continue
-        
-        value = getattr(instance, f.name)
-        
-        # Manejar diferentes tipos de campos
-        if f.many_to_one and value is not None:
-            value = value.pk
-        elif hasattr(f, 'upload_to'):  # FileField/ImageField
-            value = str(value) if value else None
-        elif hasattr(value, 'isoformat'):  # DateField/DateTimeField
-            value = value.isoformat()
-        elif not isinstance(value, (str, int, float, bool, type(None))):
-            value = str(value)
-            
-        data[f.name] = value
-    
-    # Para Usuario, solo incluir campos seguros
-    if instance._meta.model_name == 'usuario':
-        safe_fields = {'email', 'nombres', 'apellidos', 'telefono', 'is_active', 'is_staff', 'fecha_nacimiento'}
-        data = {k: v for k, v in data.items() if k in safe_fields}
-    
+        # Las claves foráneas se leen por attname: el id, sin consultar el objeto relacionado
+        data[f.name] = _serializar_valor(f, getattr(instance, f.attname))
     return data
 
 
+def serialize_estado_original(model, estado):
+    """
+    Serializa los valores capturados por ``EstadoOriginalMixin.from_db``.
+
+    Returns:
+        dict: Datos serializados, o None si la instancia se cargó con campos
+        diferidos (``only``/``defer``) y falta alguno de los auditados
+    """
+    data = {}
+    for f in campos_auditables(model):
+        if f.attname not in estado:
+            return None
+        data[f.name] = _serializar_valor(f, estado[f.attname])
+    return data
+
+
+def cambios_desde_original(instance):
+    """
+    Campos auditados que difieren del estado original, con su nuevo valor.
+
+    Returns:
+        dict: Cambios (vacío si no hay), o None si no se conoce el estado original
+    """
+    estado = getattr(instance, '_estado_original', None)
+    if estado is None:
+        return None
+    cambios = {}
+    for f in campos_auditables(type(instance)):
+        if f.attname not in estado:
+            return None
+        value = getattr(instance, f.attname)
+        if value != estado[f.attname]:
+            cambios[f.name] = _serializar_valor(f, value)
+    return cambios
+
+
+def capturar_estado_original(instance, update_fields=None):
+    """Guarda los valores actuales como estado original tras escribirlos en la base de datos."""
+    campos = campos_auditables(type(instance))
+    estado = getattr(instance, '_estado_original', None)
+    if update_fields is not None:
+        # Solo se escribieron algunos campos: el resto conserva su estado conocido
+        if estado is None:
+            return
+        campos = [f for f in campos if f.name in update_fields or f.attname in update_fields]
+    else:
+        estado = {}
+    for f in campos:
+        value = getattr(instance, f.attname)
+        if hasattr(value, 'resolve_expression'):
+            # Expresión F(): el valor real solo está en la base de datos
+            instance.__dict__.pop('_estado_original', None)
+            return
+        estado[f.attname] = value
+    instance._estado_original = estado
+
+
 @receiver(pre_save)
 def pre_save_modelo_base(sender, instance, **kwargs):
     """
@@ -116,19 +182,37 @@ def pre_save_modelo_base(sender, instance, **kwargs):
 
 @receiver(pre_save)
 def auditar_cambios_pre_save(sender, instance, **kwargs):
-    """Antes de guardar, captura el estado anterior del objeto."""
-    if sender in AUDITED_MODELS and instance.pk:
-        try:
-            old_instance = sender.objects.get(pk=instance.pk)
-            instance._old_state = serialize_instance(old_instance)
-        except sender.DoesNotExist:
-            instance._old_state = None
+    """
+    Antes de guardar, captura el estado anterior del objeto.
+
+    Usa los valores leídos al cargar la instancia (``from_db``); solo consulta
+    la base de datos si la instancia se construyó a mano o con campos diferidos.
+    """
+    if sender not in _AUDITED_SET or not instance.pk or operacion_masiva_actual() is not None:
+        return
+    estado = getattr(instance, '_estado_original', None)
+    if estado is not None and not instance._state.adding:
+        instance._old_state = serialize_estado_original(sender, estado)
+        if instance._old_state is not None:
+            return
+    try:
+        old_instance = sender.objects.get(pk=instance.pk)
+        instance._old_state = serialize_instance(old_instance)
+    except sender.DoesNotExist:
+        instance._old_state = None
 
 
 @receiver(post_save)
-def auditar_cambios_post_save(sender, instance, created, **kwargs):
+def auditar_cambios_post_save(sender, instance, created, update_fields=None, **kwargs):
     """Después de guardar, registra la creación o actualización."""
-    if sender not in AUDITED_MODELS:
+    if sender not in _AUDITED_SET:
+        return
+
+    operacion = operacion_masiva_actual()
+    if operacion is not None:
+        # Operación masiva: solo se acumula para el evento de resumen
+        operacion.registrar_guardado(sender, instance, created, None if created else cambios_desde_original(instance))
+        capturar_estado_original(instance, update_fields)
         return
 
     usuario_actual = get_usuario_actual()
@@ -156,12 +240,19 @@ def auditar_cambios_post_save(sender, instance, created, **kwargs):
                 modelo=sender.__name__, objeto_id=instance.pk, datos=datos_actuales,
                 datos_anteriores=datos_anteriores, ip=ip, user_agent=user_agent, tipo=TiposActividad.NEGOCIO
             )
+    # Las siguientes modificaciones de la misma instancia parten de lo recién guardado
+    capturar_estado_original(instance, update_fields)
 
 
 @receiver(post_delete)
 def auditar_eliminaciones(sender, instance, **kwargs):
     """Después de eliminar, registra la eliminación."""
-    if sender not in AUDITED_MODELS:
+    if sender not in _AUDITED_SET:
+        return
+
+    operacion = operacion_masiva_actual()
+    if operacion is not None:
+        operacion.registrar_eliminacion(sender, instance)
         return
 
     usuario_actual = get_usuario_actual()
@@ -195,4 +286,54 @@ def invalidar_cache_iva_al_eliminar(sender, instance, **kwargs):
     """
     Signal para invalidar la caché de IVA cuando se elimina un TipoIVA.
     """
-    IVAService.invalidar_cache()
\ No newline at end of file
+    IVAService.invalidar_cache()
+
+# Grupos del registro de datos de referencia que invalida cada modelo
+GRUPOS_REFERENCIA = {
+    Empresa: ('empresa',),
+    ConfiguracionSistema: ('configuracion',),
+    Almacen: ('almacen',),
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_datos_referencia(sender, instance, **kwargs):
+    """
+    Incrementa la generación de los datos de referencia cacheados en memoria
+    (empresa, configuración, almacén predeterminado) al modificar sus modelos.
+    """
+    grupos = GRUPOS_REFERENCIA.get(sender)
+    if grupos:
+        ReferenciaService.invalidar(*grupos)
+
+
+@lru_cache(maxsize=None)
+def tablas_anuladas(model):
+    """
+    Tablas de ``ModeloBase`` cuyas claves foráneas a ``model`` se anulan o
+    reasignan al eliminarlo (SET_NULL, SET_DEFAULT, SET): Django las actualiza
+    sin enviar señales.
+    """
+    sin_cambios = (models.CASCADE, models.PROTECT, models.RESTRICT, models.DO_NOTHING)
+    return tuple(sorted({
+        campo.related_model._meta.db_table
+        for campo in model._meta.get_fields(include_hidden=True)
+        if campo.auto_created and (campo.one_to_many or campo.one_to_one) and campo.on_delete not in sin_cambios
+        and issubclass(campo.related_model, ModeloBase)
+    }))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_version_tabla(sender, instance, signal, **kwargs):
+    """
+    Invalida, al confirmarse la transacción, la versión de datos de las tablas
+    de ``ModeloBase`` modificadas (la usa la caché de resultados de reportes).
+    """
+    tablas = [sender._meta.db_table] if issubclass(sender, ModeloBase) else []
+    if signal is post_delete:
+        # Eliminación: también cambian las filas que lo referenciaban
+        tablas.extend(tablas_anuladas(sender))
+    if tablas:
+        CacheService.tablas_modificadas(*tablas)
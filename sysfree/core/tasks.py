@@ -1,4 +1,5 @@
 from celery import shared_task
+from django.utils.dateparse import parse_datetime
 from sysfree.monitoring import update_system_metrics, CELERY_TASK_LATENCY, CELERY_TASK_COUNT
 
 @shared_task
@@ -16,4 +17,33 @@ def update_system_metrics_task():
         CELERY_TASK_COUNT.labels(task_name="update_system_metrics_task", status="SUCCESS").inc()
     except Exception as e:
         CELERY_TASK_COUNT.labels(task_name="update_system_metrics_task", status="FAILURE").inc()
-        raise
\ No newline at end of file
+        raise
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def registrar_actividades_task(self, eventos):
+    """
+    Inserta con un único bulk_create los eventos de auditoría enviados por
+    LogService en modo asíncrono.
+    """
+    from core.models import LogActividad
+    logs = [LogActividad(**evento) for evento in eventos]
+    for log in logs:
+        # La fecha del evento viaja como texto; los mensajes sin ella toman la actual
+        if isinstance(log.fecha, str):
+            log.fecha = parse_datetime(log.fecha)
+    try:
+        LogActividad.objects.bulk_create(logs, batch_size=500)
+    except Exception as e:
+        raise self.retry(exc=e)
+
+
+@shared_task
+def mantener_logs_actividad_task():
+    """
+    Tarea periódica que crea las particiones mensuales futuras de LogActividad
+    y archiva en JSONL comprimido las que superan el período de retención.
+    """
+    from core.services.auditoria_retencion_service import AuditoriaRetencionService
+    creadas = AuditoriaRetencionService.asegurar_particiones()
+    archivos = AuditoriaRetencionService.archivar()
+    return {'particiones_creadas': creadas, 'archivos': [str(ruta) for ruta in archivos]}
@@ -0,0 +1,75 @@
+import threading
+
+from django.test import TestCase
+
+from core.models import LogActividad
+from core.utils.auditoria import auditoria_masiva, operacion_masiva_actual, rangos_ids
+from inventario.models import Categoria
+
+
+class AuditoriaMasivaTest(TestCase):
+    """Resumen único de auditoría para operaciones masivas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categorias = [Categoria.objects.create(nombre=f'Categoría {i}') for i in range(5)]
+
+    def _registrar(self, func):
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+        return LogActividad.objects.exclude(accion__startswith='CREACION_')
+
+    def test_un_solo_evento_con_resumen(self):
+        primero, ultimo = self.categorias[1].pk, self.categorias[4].pk
+
+        def operacion():
+            with auditoria_masiva(accion='REPRECIO', descripcion='Prueba'):
+                for categoria in Categoria.objects.order_by('pk'):
+                    categoria.orden = 7 if categoria.pk != self.categorias[0].pk else 0
+                    categoria.save()
+                Categoria.objects.create(nombre='Nueva')
+                self.categorias[4].delete()
+
+        logs = self._registrar(operacion)
+
+        self.assertEqual([log.accion for log in logs], ['REPRECIO'])
+        resumen = logs[0].datos['modelos']['Categoria']
+        self.assertEqual((resumen['creados'], resumen['actualizados'], resumen['eliminados']), (1, 4, 1))
+        self.assertEqual(resumen['sin_cambios'], 1)
+        self.assertEqual(logs[0].datos['total'], 7)
+        self.assertEqual(resumen['campos_modificados'], {'orden': 4})
+        self.assertEqual(resumen['ids']['actualizados'], [[primero, ultimo]])
+        self.assertEqual(len(resumen['digest']), 64)
+
+    def test_sin_consulta_previa_por_fila(self):
+        categorias = list(Categoria.objects.all())
+        with auditoria_masiva(accion='REPRECIO'):
+            with self.assertNumQueries(len(categorias)):
+                for categoria in categorias:
+                    categoria.orden = 3
+                    categoria.save()
+
+    def test_error_registra_el_resumen_y_propaga(self):
+        def operacion():
+            with self.assertRaises(ValueError):
+                with auditoria_masiva(accion='IMPORTACION'):
+                    Categoria.objects.create(nombre='Parcial')
+                    raise ValueError('fila inválida')
+
+        logs = self._registrar(operacion)
+        self.assertEqual(logs[0].nivel, 'error')
+        self.assertIn('fila inválida', logs[0].datos['error'])
+        self.assertIsNone(operacion_masiva_actual())
+
+    def test_otros_hilos_no_se_suspenden(self):
+        vistos = []
+        with auditoria_masiva(accion='REPRECIO'):
+            hilo = threading.Thread(target=lambda: vistos.append(operacion_masiva_actual()))
+            hilo.start()
+            hilo.join()
+            self.assertIsNotNone(operacion_masiva_actual())
+        self.assertEqual(vistos, [None])
+
+    def test_rangos_ids(self):
+        self.assertEqual(rangos_ids([5, 1, 2, 3, 9, 10]), ([[1, 3], [5, 5], [9, 10]], False))
+        self.assertEqual(rangos_ids([1, 3, 5], maximo=2), ([[1, 1], [3, 3]], True))
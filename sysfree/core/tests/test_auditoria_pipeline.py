@@ -0,0 +1,154 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import LogActividad
+from core.services.log_service import LogService
+from core.tasks import registrar_actividades_task
+from inventario.models import Categoria
+
+
+class EstadoOriginalTest(TestCase):
+    """Captura del estado anterior sin volver a consultar la fila."""
+
+    def setUp(self):
+        self.padre = Categoria.objects.create(nombre='Padre')
+        self.categoria = Categoria.objects.create(nombre='Original', categoria_padre=self.padre)
+
+    def _guardar_y_capturar_logs(self, instancia):
+        with mock.patch.object(LogService, 'encolar') as encolar:
+            with CaptureQueriesContext(connection) as ctx:
+                instancia.save()
+        return ctx, [c.args[0] for c in encolar.call_args_list]
+
+    def test_actualizacion_sin_select_previo(self):
+        categoria = Categoria.objects.get(pk=self.categoria.pk)
+        categoria.nombre = 'Renombrada'
+        ctx, logs = self._guardar_y_capturar_logs(categoria)
+
+        self.assertEqual(len(ctx.captured_queries), 1)  # solo el UPDATE
+        self.assertEqual(logs[0].datos_anteriores['nombre'], 'Original')
+        self.assertEqual(logs[0].datos_anteriores['categoria_padre'], self.padre.pk)
+        self.assertEqual(logs[0].datos['nombre'], 'Renombrada')
+
+    def test_guardados_sucesivos_parten_del_ultimo_estado(self):
+        categoria = Categoria.objects.get(pk=self.categoria.pk)
+        categoria.nombre = 'Primera'
+        categoria.save()
+        categoria.nombre = 'Segunda'
+        _, logs = self._guardar_y_capturar_logs(categoria)
+
+        self.assertEqual(logs[0].datos_anteriores['nombre'], 'Primera')
+
+    def test_campos_diferidos_consultan_la_base_de_datos(self):
+        categoria = Categoria.objects.only('id', 'nombre').get(pk=self.categoria.pk)
+        categoria.nombre = 'Diferida'
+        ctx, logs = self._guardar_y_capturar_logs(categoria)
+
+        self.assertTrue(any(q['sql'].startswith('SELECT') for q in ctx.captured_queries))
+        self.assertEqual(logs[0].datos_anteriores['nombre'], 'Original')
+
+    def test_refresh_actualiza_el_estado_original(self):
+        categoria = Categoria.objects.get(pk=self.categoria.pk)
+        Categoria.objects.filter(pk=categoria.pk).update(nombre='Externa')
+        categoria.refresh_from_db()
+        categoria.nombre = 'Local'
+        _, logs = self._guardar_y_capturar_logs(categoria)
+
+        self.assertEqual(logs[0].datos_anteriores['nombre'], 'Externa')
+
+
+class LoteAuditoriaTest(TestCase):
+    """Acumulación de la auditoría por transacción."""
+
+    def test_un_insert_al_confirmar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(5):
+                Categoria.objects.create(nombre=f'Categoría {i}')
+            self.assertFalse(LogActividad.objects.exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            for callback in callbacks:
+                callback()
+
+        inserts = [q for q in ctx.captured_queries if 'core_logactividad' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(LogActividad.objects.filter(accion='CREACION_CATEGORIA').count(), 5)
+
+    def test_savepoint_revertido_descarta_sus_eventos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Confirmada')
+            try:
+                with transaction.atomic():
+                    Categoria.objects.create(nombre='Revertida')
+                    raise ValueError
+            except ValueError:
+                pass
+            Categoria.objects.create(nombre='Posterior')
+
+        ids = LogActividad.objects.values_list('objeto_id', flat=True)
+        nombres = set(Categoria.objects.filter(pk__in=[int(i) for i in ids]).values_list('nombre', flat=True))
+        self.assertEqual(nombres, {'Confirmada', 'Posterior'})
+
+    def test_ultimo_evento_revertido_no_deja_pendientes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Confirmada')
+            try:
+                with transaction.atomic():
+                    Categoria.objects.create(nombre='Revertida')
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertEqual(LogActividad.objects.filter(accion='CREACION_CATEGORIA').count(), 1)
+
+    @override_settings(AUDITORIA_MODO='sync')
+    def test_modo_sync_inserta_de_inmediato(self):
+        Categoria.objects.create(nombre='Inmediata')
+        self.assertTrue(LogActividad.objects.filter(accion='CREACION_CATEGORIA').exists())
+
+    @override_settings(AUDITORIA_MODO='async')
+    def test_modo_async_envia_el_lote_a_celery(self):
+        with mock.patch('core.tasks.registrar_actividades_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                Categoria.objects.create(nombre='A')
+                Categoria.objects.create(nombre='B')
+
+        delay.assert_called_once()
+        eventos = delay.call_args.args[0]
+        self.assertEqual([e['accion'] for e in eventos], ['CREACION_CATEGORIA'] * 2)
+        self.assertFalse(LogActividad.objects.exists())
+
+    @override_settings(AUDITORIA_MODO='async')
+    def test_modo_async_conserva_la_fecha_del_evento(self):
+        with mock.patch('core.tasks.registrar_actividades_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                log = LogService.info('PRUEBA', 'Evento diferido')
+        evento = delay.call_args.args[0][0]
+
+        # El worker procesa el lote más tarde
+        with mock.patch('django.utils.timezone.now', return_value=log.fecha + timedelta(minutes=5)):
+            registrar_actividades_task.run([evento])
+
+        self.assertEqual(LogActividad.objects.get(accion='PRUEBA').fecha, log.fecha)
+        self.assertLess(log.fecha, timezone.now())
+
+
+class LoteAuditoriaRollbackTest(TransactionTestCase):
+    """Una transacción revertida no deja auditoría."""
+
+    def test_rollback_no_escribe(self):
+        try:
+            with transaction.atomic():
+                Categoria.objects.create(nombre='Revertida')
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            Categoria.objects.create(nombre='Confirmada')
+
+        self.assertEqual(LogActividad.objects.count(), 1)
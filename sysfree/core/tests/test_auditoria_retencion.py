@@ -0,0 +1,100 @@
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import LogActividad, Usuario
+from core.services.auditoria_retencion_service import AuditoriaRetencionService, _inicio_mes, _sumar_meses
+
+
+class AuditoriaRetencionServiceTest(TestCase):
+    """Particiones mensuales, archivado e historial de LogActividad."""
+
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.mes_actual = _inicio_mes(datetime.now(ZoneInfo(settings.TIME_ZONE)))
+
+    def _log(self, objeto_id, fecha=None, modelo='Producto'):
+        log = LogActividad.objects.create(
+            accion='ACTUALIZACION_PRODUCTO', descripcion='cambio', modelo=modelo,
+            objeto_id=str(objeto_id), datos={'precio': '1.00'}
+        )
+        if fecha is not None:
+            LogActividad.objects.filter(pk=log.pk).update(fecha=fecha)
+        return log
+
+    def _particion_de(self, log):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {AuditoriaRetencionService.TABLA} WHERE id = %s', [log.pk])
+            return cursor.fetchone()[0]
+
+    def test_tabla_particionada_con_particiones_futuras(self):
+        self.assertTrue(AuditoriaRetencionService.es_particionada())
+        self.assertEqual(AuditoriaRetencionService.asegurar_particiones(meses_adelante=3), [])
+        nombres = [nombre for nombre, _, _ in AuditoriaRetencionService.particiones()]
+        self.assertIn(f'core_logactividad_p{_sumar_meses(self.mes_actual, 3):%Y_%m}', nombres)
+        self.assertEqual(self._particion_de(self._log(1)), f'core_logactividad_p{self.mes_actual:%Y_%m}')
+
+    def test_nueva_particion_recoge_filas_de_la_particion_por_defecto(self):
+        futuro = _sumar_meses(self.mes_actual, 24)
+        log = self._log(1, fecha=futuro + timedelta(days=3))
+        self.assertEqual(self._particion_de(log), 'core_logactividad_pdefault')
+
+        nombre = f'core_logactividad_p{futuro:%Y_%m}'
+        AuditoriaRetencionService._crear_particion(nombre, futuro, _sumar_meses(futuro, 1))
+
+        self.assertEqual(self._particion_de(log), nombre)
+
+    def test_archivar_y_leer_historial(self):
+        antiguo = _sumar_meses(self.mes_actual, -14)
+        nombre = f'core_logactividad_p{antiguo:%Y_%m}'
+        AuditoriaRetencionService._crear_particion(nombre, antiguo, _sumar_meses(antiguo, 1))
+        for dia in range(1, 6):
+            for objeto_id in (7, 8, 9):
+                self._log(objeto_id, fecha=antiguo + timedelta(days=dia))
+        reciente = self._log(8)
+
+        with mock.patch.object(AuditoriaRetencionService, 'TAMANO_BLOQUE', 600):
+            archivos = AuditoriaRetencionService.archivar(meses_retencion=12, directorio=self.directorio)
+
+        self.assertEqual(archivos, [self.directorio / f'{nombre}.jsonl.gz'])
+        self.assertNotIn(nombre, [n for n, _, _ in AuditoriaRetencionService.particiones()])
+        self.assertEqual(LogActividad.objects.count(), 1)
+        with gzip.open(archivos[0], 'rt', encoding='utf-8') as archivo:
+            self.assertEqual(len(archivo.readlines()), 15)
+        indice = json.loads((self.directorio / f'{nombre}.indice.json').read_text())
+        self.assertGreater(len(indice['bloques']), 1)
+
+        historial = AuditoriaRetencionService.historial_objeto('Producto', 8, limite=4, directorio=self.directorio)
+        self.assertEqual([r['archivado'] for r in historial], [False, True, True, True])
+        self.assertEqual(historial[0]['id'], reciente.pk)
+        self.assertTrue(all(r['objeto_id'] == '8' for r in historial))
+        fechas = [r['fecha'] for r in historial]
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+        solo_linea = AuditoriaRetencionService.historial_objeto(
+            'Producto', 8, incluir_archivo=False, directorio=self.directorio
+        )
+        self.assertEqual(len(solo_linea), 1)
+
+    def test_endpoint_historial(self):
+        admin = Usuario.objects.create_superuser(email='admin@test.com', password='clave-segura-123')
+        self._log(5)
+        cliente = APIClient()
+        cliente.force_authenticate(admin)
+
+        respuesta = cliente.get(reverse('api:auditoria_historial_objeto', args=['Producto', '5']), {'archivo': '0'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['resultados']), 1)
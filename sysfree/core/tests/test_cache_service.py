@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from core.services.cache_service import CacheService
+from inventario.models import Categoria
+
+
+class CacheTagsTest(SimpleTestCase):
+    """Pruebas de la invalidación por etiquetas versionadas de CacheService."""
+
+    def setUp(self):
+        cache.delete_many([CacheService._tag_version_key(tag) for tag in ('producto:1', 'producto:2', 'productos')])
+
+    def test_invalidar_etiqueta_oculta_entradas(self):
+        CacheService.set_tagged('movimientos_producto_1', ['a'], ['producto:1'])
+        self.assertEqual(CacheService.get_tagged('movimientos_producto_1', ['producto:1']), ['a'])
+
+        CacheService.invalidate_tags('producto:1')
+        self.assertIsNone(CacheService.get_tagged('movimientos_producto_1', ['producto:1']))
+
+    def test_invalidacion_no_afecta_otras_etiquetas(self):
+        CacheService.set_tagged('movimientos_producto_2', ['b'], ['producto:2'])
+        CacheService.invalidate_tags('producto:1')
+        self.assertEqual(CacheService.get_tagged('movimientos_producto_2', ['producto:2']), ['b'])
+
+    def test_clave_con_varias_etiquetas(self):
+        CacheService.set_tagged('resumen', 1, ['productos', 'producto:2'])
+        CacheService.invalidate_tags('productos')
+        self.assertIsNone(CacheService.get_tagged('resumen', ['productos', 'producto:2']))
+
+    def test_get_or_set_tagged(self):
+        llamadas = []
+
+        def calcular():
+            llamadas.append(1)
+            return len(llamadas)
+
+        self.assertEqual(CacheService.get_or_set_tagged('conteo', calcular, ['productos']), 1)
+        self.assertEqual(CacheService.get_or_set_tagged('conteo', calcular, ['productos']), 1)
+        CacheService.invalidate_tags('productos')
+        self.assertEqual(CacheService.get_or_set_tagged('conteo', calcular, ['productos']), 2)
+
+    def test_contador_perdido_no_reutiliza_generaciones(self):
+        CacheService.set_tagged('movimientos_producto_1', ['a'], ['producto:1'])
+        cache.delete(CacheService._tag_version_key('producto:1'))
+        CacheService.invalidate_tags('producto:1')
+        self.assertIsNone(CacheService.get_tagged('movimientos_producto_1', ['producto:1']))
+
+    def test_contadores_con_vigencia(self):
+        clave = CacheService._tag_version_key('productos')
+        CacheService.get_tag_versions(['productos'])
+        self.assertGreater(cache.ttl(clave), 0)
+        self.assertLessEqual(cache.ttl(clave), CacheService.TAG_VERSION_TTL)
+
+        cache.persist(clave)
+        CacheService.invalidate_tags('productos')
+        self.assertGreater(cache.ttl(clave), CacheService.TAG_VERSION_TTL - 60)
+
+
+class TablasModificadasTest(TestCase):
+    """Pruebas de la invalidación por transacción de la versión de datos de las tablas."""
+
+    def setUp(self):
+        CacheService._tablas_pendientes().clear()
+
+    @staticmethod
+    def _invalidaciones(callbacks):
+        # La auditoría registra además un callback por evento
+        return [callback for callback in callbacks if callback == CacheService._confirmar_tablas]
+
+    def test_una_invalidacion_por_transaccion(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(50):
+                Categoria.objects.create(nombre=f'Categoría {i}')
+            Categoria.objects.filter(nombre__startswith='Categoría').update(descripcion='x')
+
+        invalidaciones = self._invalidaciones(callbacks)
+        self.assertEqual(len(invalidaciones), 1)
+        with mock.patch.object(CacheService, 'invalidate_tags') as invalidar:
+            invalidaciones[0]()
+        invalidar.assert_called_once_with('tabla:inventario_categoria')
+
+    def test_savepoint_revertido_vuelve_a_programar_la_invalidacion(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    Categoria.objects.create(nombre='Revertida')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            Categoria.objects.create(nombre='Confirmada')
+
+        invalidaciones = self._invalidaciones(callbacks)
+        self.assertEqual(len(invalidaciones), 1)
+        version = CacheService.versiones_tablas(['inventario_categoria'])['inventario_categoria']
+        invalidaciones[0]()
+        self.assertNotEqual(
+            CacheService.versiones_tablas(['inventario_categoria'])['inventario_categoria'], version
+        )
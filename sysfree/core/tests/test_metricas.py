@@ -0,0 +1,53 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from sysfree.metrics import registro_metricas
+
+# Un worker de Celery en modo multiproceso: escribe sus métricas en su directorio
+WORKER = """
+from sysfree.monitoring import REPORT_CACHE_REQUESTS, REPORT_CACHE_SIZE, SRI_AUTHORIZATION_POLLS
+SRI_AUTHORIZATION_POLLS.labels(result='autorizado').inc(3)
+REPORT_CACHE_REQUESTS.labels(result='hit').inc()
+REPORT_CACHE_SIZE.set(2048)
+"""
+
+
+class MetricasMultiprocesoTest(SimpleTestCase):
+    """Exposición en /metrics de las métricas de otros procesos (workers de Celery)."""
+
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.raiz, ignore_errors=True)
+
+    def _worker(self, servicio):
+        directorio = os.path.join(self.raiz, servicio)
+        os.makedirs(directorio)
+        subprocess.run(
+            [sys.executable, '-c', WORKER], cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directorio},
+        )
+
+    def test_suma_las_metricas_de_los_workers(self):
+        self._worker('celery')
+        self._worker('reportes')
+
+        with override_settings(PROMETHEUS_MULTIPROC_ROOT=self.raiz):
+            registro = registro_metricas()
+
+        self.assertEqual(registro.get_sample_value('sri_authorization_polls_total', {'result': 'autorizado'}), 6)
+        self.assertEqual(registro.get_sample_value('report_cache_requests_total', {'result': 'hit'}), 2)
+        self.assertEqual(registro.get_sample_value('report_cache_size_bytes'), 2048)
+
+    @override_settings(PROMETHEUS_MULTIPROC_ROOT='')
+    def test_sin_modo_multiproceso_usa_el_registro_del_proceso(self):
+        entorno = {clave: valor for clave, valor in os.environ.items() if clave != 'PROMETHEUS_MULTIPROC_DIR'}
+        with mock.patch.dict(os.environ, entorno, clear=True):
+            self.assertIs(registro_metricas(), REGISTRY)
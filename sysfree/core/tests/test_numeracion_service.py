@@ -0,0 +1,104 @@
+import threading
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.models import SecuenciaDocumento
+from core.services import NumeracionService
+
+
+class NumeracionServiceTest(TestCase):
+    """Numeración desde el contador SecuenciaDocumento."""
+
+    def test_secuencia_por_tipo_y_punto_de_emision(self):
+        self.assertEqual(NumeracionService.siguiente('factura'), 1)
+        self.assertEqual(NumeracionService.siguiente('factura'), 2)
+        self.assertEqual(NumeracionService.siguiente('factura', '001', '002'), 1)
+        self.assertEqual(NumeracionService.siguiente('proforma', inicio=100), 100)
+        self.assertEqual(
+            SecuenciaDocumento.objects.get(tipo='factura', punto_emision='001').ultimo, 2
+        )
+
+    def test_numero_de_transaccion_revertida_se_reutiliza(self):
+        NumeracionService.siguiente('factura')
+        try:
+            with transaction.atomic():
+                self.assertEqual(NumeracionService.siguiente('factura'), 2)
+                raise RuntimeError('rollback')
+        except RuntimeError:
+            pass
+        self.assertEqual(NumeracionService.siguiente('factura'), 2)
+
+    def test_inicializar_continua_numeracion_existente(self):
+        llamadas = []
+
+        def inicializar():
+            llamadas.append(1)
+            return 41
+
+        self.assertEqual(NumeracionService.siguiente('factura', inicializar=inicializar), 42)
+        self.assertEqual(NumeracionService.siguiente('factura', inicializar=inicializar), 43)
+        self.assertEqual(len(llamadas), 1)
+
+    def test_reservar_rango(self):
+        self.assertEqual(NumeracionService.reservar('ticket', 10), range(1, 11))
+        self.assertEqual(NumeracionService.reservar('ticket', 5), range(11, 16))
+
+    def test_maximo_existente(self):
+        SecuenciaDocumento.objects.bulk_create([
+            SecuenciaDocumento(tipo='F-000009'),
+            SecuenciaDocumento(tipo='F-000120'),
+            SecuenciaDocumento(tipo='F-ABC'),
+            SecuenciaDocumento(tipo='FX-999999'),
+        ])
+        maximo = NumeracionService.maximo_existente(SecuenciaDocumento.objects.all(), 'tipo', 'F-')
+        self.assertEqual(maximo, 120)
+        self.assertEqual(
+            NumeracionService.maximo_existente(SecuenciaDocumento.objects.all(), 'tipo', 'F-', 5), 0
+        )
+
+
+class NumeracionConcurrenteTest(TransactionTestCase):
+    """Numeración concurrente desde varios hilos con conexiones propias."""
+
+    HILOS = 20
+    POR_HILO = 500
+
+    def _emitir(self, tipo):
+        numeros, errores = [], []
+
+        def trabajador():
+            try:
+                propios = []
+                for _ in range(self.POR_HILO):
+                    with transaction.atomic():
+                        propios.append(NumeracionService.siguiente(tipo))
+                numeros.extend(propios)
+            except Exception as e:  # pragma: no cover - se reporta en la aserción
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        return numeros
+
+    def test_diez_mil_numeros_sin_duplicados_ni_saltos(self):
+        numeros = self._emitir('factura')
+
+        total = self.HILOS * self.POR_HILO
+        self.assertEqual(sorted(numeros), list(range(1, total + 1)))
+
+    @override_settings(NUMERACION_BLOQUES={'ticket': 50})
+    def test_bloques_preasignados_sin_duplicados(self):
+        NumeracionService.descartar_bloques()
+        self.addCleanup(NumeracionService.descartar_bloques)
+
+        numeros = self._emitir('ticket')
+
+        self.assertEqual(len(set(numeros)), self.HILOS * self.POR_HILO)
+        self.assertEqual(SecuenciaDocumento.objects.get(tipo='ticket').ultimo, max(numeros))
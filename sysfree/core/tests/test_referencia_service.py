@@ -0,0 +1,77 @@
+from decimal import Decimal
+from django.test import TestCase, TransactionTestCase
+from core.models import Empresa, TipoIVA
+from core.services import IVAService, ReferenciaService
+from core.services.cache_service import CacheService
+from core.services.empresa_service import EmpresaService
+from inventario.models import Almacen
+from inventario.services import InventarioService
+
+
+class ReferenciaServiceTest(TransactionTestCase):
+    """Pruebas del registro en memoria de datos de referencia (con datos confirmados)."""
+
+    def setUp(self):
+        self._invalidar_todo()
+        self.empresa = Empresa.objects.create(
+            nombre='Empresa Test',
+            ruc='1234567890001',
+            direccion='Dirección Test'
+        )
+        self.iva = TipoIVA.objects.create(
+            nombre='IVA 15%', codigo='4', porcentaje=Decimal('15.00'), es_default=True
+        )
+
+    def tearDown(self):
+        # El vaciado de la base de datos no emite señales: descartar lo cacheado
+        self._invalidar_todo()
+
+    def _invalidar_todo(self):
+        ReferenciaService.limpiar_local()
+        CacheService.invalidate_tags(
+            *[ReferenciaService._tag(g) for g in ('iva', 'empresa', 'configuracion', 'almacen')]
+        )
+
+    def test_lecturas_repetidas_sin_consultas(self):
+        self.assertEqual(EmpresaService.get_empresa(), self.empresa)
+        self.assertEqual(IVAService.get_default(), self.iva)
+        self.assertEqual(IVAService.get_by_codigo('4'), self.iva)
+        self.assertEqual(IVAService.get_by_id(self.iva.id), self.iva)
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                EmpresaService.get_empresa()
+                IVAService.get_default()
+                IVAService.get_by_codigo('4')
+                IVAService.get_by_id(self.iva.id)
+
+    def test_guardar_invalida_el_grupo(self):
+        self.assertEqual(EmpresaService.get_empresa().nombre, 'Empresa Test')
+        self.empresa.nombre = 'Empresa Renombrada'
+        self.empresa.save()
+        self.assertEqual(EmpresaService.get_empresa().nombre, 'Empresa Renombrada')
+
+    def test_generacion_de_otro_proceso(self):
+        """Una invalidación hecha en otro proceso se detecta al verificar la generación."""
+        IVAService.get_default()
+        TipoIVA.objects.filter(pk=self.iva.pk).update(porcentaje=Decimal('12.00'))
+        CacheService.invalidate_tags(ReferenciaService._tag('iva'))
+        ReferenciaService._generaciones.pop('iva', None)  # vence el intervalo de verificación
+        self.assertEqual(IVAService.get_default().porcentaje, Decimal('12.00'))
+
+    def test_almacen_predeterminado(self):
+        self.assertIsNone(InventarioService.obtener_almacen_predeterminado())
+        almacen = Almacen.objects.create(nombre='Bodega Principal')
+        self.assertEqual(InventarioService.obtener_almacen_predeterminado(), almacen)
+
+
+class ReferenciaTransaccionTest(TestCase):
+    """Los datos modificados en una transacción abierta no se cachean."""
+
+    def setUp(self):
+        ReferenciaService.limpiar_local()
+
+    def test_no_cachea_datos_no_confirmados(self):
+        almacen = Almacen.objects.create(nombre='Bodega Principal')
+        with self.assertNumQueries(2):
+            self.assertEqual(InventarioService.obtener_almacen_predeterminado(), almacen)
+            self.assertEqual(InventarioService.obtener_almacen_predeterminado(), almacen)
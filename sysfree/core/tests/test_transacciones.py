@@ -0,0 +1,82 @@
+from unittest import mock
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+from core.utils.transacciones import es_conflicto_concurrencia, reintentar_transaccion
+
+
+class _ErrorDriver(Exception):
+    """Error del driver con el SQLSTATE de PostgreSQL."""
+
+    def __init__(self, codigo):
+        super().__init__(codigo)
+        self.pgcode = self.sqlstate = codigo
+
+
+def _error_postgres(codigo):
+    """Construye un OperationalError como los que Django envuelve desde el driver."""
+    error = OperationalError('conflicto')
+    error.__cause__ = _ErrorDriver(codigo)
+    return error
+
+
+class ReintentarTransaccionTest(TransactionTestCase):
+    """Pruebas del decorador reintentar_transaccion fuera de una transacción."""
+
+    @mock.patch('core.utils.transacciones.time.sleep')
+    def test_reintenta_deadlock(self, sleep):
+        llamadas = []
+
+        @reintentar_transaccion(max_intentos=3)
+        def operacion():
+            llamadas.append(1)
+            if len(llamadas) < 3:
+                raise _error_postgres('40P01')
+            return 'ok'
+
+        self.assertEqual(operacion(), 'ok')
+        self.assertEqual(len(llamadas), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch('core.utils.transacciones.time.sleep')
+    def test_agota_intentos(self, sleep):
+        @reintentar_transaccion(max_intentos=2)
+        def operacion():
+            raise _error_postgres('55P03')
+
+        with self.assertRaises(OperationalError):
+            operacion()
+        self.assertEqual(sleep.call_count, 1)
+
+    @mock.patch('core.utils.transacciones.time.sleep')
+    def test_no_reintenta_otros_errores(self, sleep):
+        llamadas = []
+
+        @reintentar_transaccion()
+        def operacion():
+            llamadas.append(1)
+            raise _error_postgres('08006')
+
+        with self.assertRaises(OperationalError):
+            operacion()
+        self.assertEqual(len(llamadas), 1)
+        sleep.assert_not_called()
+
+
+class ReintentarDentroDeTransaccionTest(TestCase):
+    """Dentro de una transacción externa el error se propaga sin reintentar."""
+
+    def test_propaga_en_transaccion_externa(self):
+        llamadas = []
+
+        @reintentar_transaccion()
+        def operacion():
+            llamadas.append(1)
+            raise _error_postgres('40P01')
+
+        with self.assertRaises(OperationalError):
+            operacion()
+        self.assertEqual(len(llamadas), 1)
+
+    def test_es_conflicto_concurrencia(self):
+        self.assertTrue(es_conflicto_concurrencia(_error_postgres('40001')))
+        self.assertFalse(es_conflicto_concurrencia(OperationalError('sin causa')))
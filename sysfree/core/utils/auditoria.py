@@ -0,0 +1,167 @@
+"""
+Auditoría de operaciones masivas (importaciones, cambios de precios,
+conciliaciones): suspende la auditoría fila por fila de core/signals.py y
+registra un único evento de resumen al terminar.
+"""
+import contextvars
+import hashlib
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from ..constants import NivelesLog, TiposActividad
+
+_operacion_actual = contextvars.ContextVar('auditoria_masiva', default=None)
+
+# Tope de rangos de ids por modelo y evento incluidos en el resumen
+MAX_RANGOS = 50
+
+
+def operacion_masiva_actual():
+    """Operación masiva activa en el contexto (hilo o tarea asyncio), o None."""
+    return _operacion_actual.get()
+
+
+def rangos_ids(ids, maximo=MAX_RANGOS):
+    """
+    Compacta ids enteros en rangos consecutivos.
+
+    Returns:
+        tuple: (lista de [inicio, fin], True si se truncó al máximo)
+    """
+    rangos = []
+    for pk in sorted(set(ids)):
+        if rangos and pk == rangos[-1][1] + 1:
+            rangos[-1][1] = pk
+        else:
+            rangos.append([pk, pk])
+    return rangos[:maximo], len(rangos) > maximo
+
+
+class _ResumenModelo:
+    """Contadores, ids y digest de los cambios de un modelo."""
+
+    EVENTOS = ('creados', 'actualizados', 'eliminados')
+
+    def __init__(self):
+        self.ids = {evento: [] for evento in self.EVENTOS}
+        self.sin_cambios = 0
+        self.campos = Counter()
+        self.digest = hashlib.sha256()
+
+    def agregar(self, evento, pk, cambios=None):
+        self.ids[evento].append(pk)
+        if cambios:
+            self.campos.update(cambios.keys())
+        self.digest.update(json.dumps([evento, pk, cambios], sort_keys=True, default=str).encode())
+
+    def como_dict(self):
+        datos = {evento: len(ids) for evento, ids in self.ids.items()}
+        datos['sin_cambios'] = self.sin_cambios
+        rangos = {}
+        for evento, ids in self.ids.items():
+            if not ids:
+                continue
+            if all(isinstance(pk, int) for pk in ids):
+                rangos[evento], truncado = rangos_ids(ids)
+            else:
+                rangos[evento], truncado = [str(pk) for pk in ids[:MAX_RANGOS]], len(ids) > MAX_RANGOS
+            if truncado:
+                datos['ids_truncados'] = True
+        datos['ids'] = rangos
+        datos['campos_modificados'] = dict(self.campos.most_common())
+        datos['digest'] = self.digest.hexdigest()
+        return datos
+
+
+class OperacionMasiva:
+    """Acumula los cambios de modelos auditados durante una operación masiva."""
+
+    def __init__(self, accion, descripcion=''):
+        self.accion = accion
+        self.descripcion = descripcion
+        self.modelos = defaultdict(_ResumenModelo)
+
+    def registrar_guardado(self, sender, instance, created, cambios=None):
+        """
+        Args:
+            cambios (dict): Campos modificados con su nuevo valor; None si se desconocen
+        """
+        resumen = self.modelos[sender.__name__]
+        if created:
+            resumen.agregar('creados', instance.pk)
+        elif cambios == {}:
+            resumen.sin_cambios += 1
+        else:
+            resumen.agregar('actualizados', instance.pk, cambios)
+
+    def registrar_eliminacion(self, sender, instance):
+        self.modelos[sender.__name__].agregar('eliminados', instance.pk)
+
+    @property
+    def total(self):
+        return sum(
+            sum(len(ids) for ids in resumen.ids.values()) + resumen.sin_cambios
+            for resumen in self.modelos.values()
+        )
+
+    def resumen(self):
+        return {modelo: resumen.como_dict() for modelo, resumen in sorted(self.modelos.items())}
+
+
+@contextmanager
+def auditoria_masiva(accion, descripcion='', tipo=TiposActividad.NEGOCIO):
+    """
+    Suspende la auditoría por fila de los modelos auditados dentro del bloque
+    y registra un único evento con el resumen: cantidad por modelo, rangos de
+    ids afectados, campos modificados y un digest SHA-256 de los cambios.
+
+    El contexto es por hilo y por tarea asyncio (contextvars). Los registros
+    explícitos de LogService/AuditoriaService no se suspenden.
+
+    Ejemplo::
+
+        with auditoria_masiva(accion='IMPORTACION_PRODUCTOS', descripcion='Archivo precios.xlsx'):
+            for fila in filas:
+                ...
+
+    Args:
+        accion (str): Acción del evento de resumen
+        descripcion (str): Descripción de la operación
+        tipo (str): Tipo de actividad del evento de resumen
+
+    Yields:
+        OperacionMasiva: Operación en curso
+    """
+    from ..services.auditoria_service import AuditoriaService
+
+    operacion = OperacionMasiva(accion, descripcion)
+    token = _operacion_actual.set(operacion)
+    inicio = time.monotonic()
+    error = None
+    try:
+        yield operacion
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _operacion_actual.reset(token)
+        datos = {
+            'total': operacion.total,
+            'modelos': operacion.resumen(),
+            'duracion_ms': round((time.monotonic() - inicio) * 1000, 1),
+        }
+        if error is not None:
+            datos['error'] = f'{type(error).__name__}: {error}'
+        conteos = ', '.join(
+            f"{modelo}: {sum(len(ids) for ids in resumen.ids.values())}"
+            for modelo, resumen in sorted(operacion.modelos.items())
+        )
+        AuditoriaService.registrar_actividad_personalizada(
+            accion=accion,
+            descripcion=f"{descripcion or accion} ({conteos or 'sin cambios'})",
+            nivel=NivelesLog.ERROR if error is not None else NivelesLog.INFO,
+            tipo=tipo,
+            datos=datos,
+        )
@@ -0,0 +1,71 @@
+"""
+Utilidades para transacciones concurrentes: reintentos acotados ante
+conflictos de bloqueo y límite de espera de bloqueos.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger('sysfree')
+
+# deadlock_detected, serialization_failure, lock_not_available
+CODIGOS_CONFLICTO = {'40P01', '40001', '55P03'}
+
+
+def es_conflicto_concurrencia(error):
+    """Indica si un OperationalError se debe a un conflicto de concurrencia reintentable."""
+    causa = getattr(error, '__cause__', None)
+    codigo = getattr(causa, 'pgcode', None) or getattr(causa, 'sqlstate', None)
+    return codigo in CODIGOS_CONFLICTO
+
+
+def fijar_lock_timeout(milisegundos):
+    """
+    Limita la espera de bloqueos de fila en la transacción actual (PostgreSQL).
+
+    Superado el límite, la consulta falla con lock_not_available, que
+    ``reintentar_transaccion`` trata como conflicto reintentable.
+    """
+    if connection.vendor == 'postgresql' and connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL lock_timeout = %s', [f'{int(milisegundos)}ms'])
+
+
+def reintentar_transaccion(max_intentos=3, espera_base=0.05, espera_maxima=1.0):
+    """
+    Decorador que reintenta una función transaccional ante deadlocks,
+    fallos de serialización o lock timeouts, con backoff exponencial y jitter.
+
+    Solo reintenta cuando la llamada abre su propia transacción; si ya hay una
+    transacción externa en curso el error se propaga, porque la transacción
+    externa quedó abortada y debe reintentarse completa por quien la abrió.
+
+    Args:
+        max_intentos (int): Número máximo de ejecuciones
+        espera_base (float): Espera inicial en segundos antes del primer reintento
+        espera_maxima (float): Tope de espera en segundos entre reintentos
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if connection.in_atomic_block:
+                return func(*args, **kwargs)
+            for intento in range(1, max_intentos + 1):
+                try:
+                    with transaction.atomic():
+                        return func(*args, **kwargs)
+                except OperationalError as e:
+                    if intento == max_intentos or not es_conflicto_concurrencia(e):
+                        raise
+                    espera = min(espera_maxima, espera_base * 2 ** (intento - 1))
+                    espera = random.uniform(espera / 2, espera)
+                    logger.warning(
+                        f"Conflicto de concurrencia en {func.__name__} "
+                        f"(intento {intento}/{max_intentos}), reintentando en {espera:.3f}s: {e}"
+                    )
+                    time.sleep(espera)
+        return wrapper
+    return decorador
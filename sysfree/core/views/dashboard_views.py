@@ -2,8 +2,9 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.utils.translation import gettext_lazy as _
 from ..services.configuracion_service import ConfiguracionService
+from ..services.empresa_service import EmpresaService
 from ..log_utils import log_function_call, log_security_event
-from ..models import Empresa, Sucursal
+from ..models import Sucursal
 import logging
 
 # Configurar logger
@@ -22,7 +23,7 @@ def dashboard_view(request):
     nombre_usuario = request.user.nombres or request.user.email.split('@')[0]
 
     # Obtener información de la empresa
-    empresa = Empresa.objects.first()
+    empresa = EmpresaService.get_empresa()
     sistema_nombre = empresa.nombre if empresa else 'SysFree'
     sistema_version = '1.0.0'  # Valor fijo
 
@@ -4,7 +4,6 @@ from django.utils.translation import gettext_lazy as _
 from ..models import Carrito, ItemCarrito
 from inventario.models import Producto
 from reparaciones.models import ServicioReparacion
-from core.services.cache_service import CacheService
 from core.services.auditoria_service import AuditoriaService
 import logging
 
@@ -14,17 +13,6 @@ logger = logging.getLogger('sysfree')
 class CarritoService:
     """Servicio para gestionar el carrito de compras."""
     
-    @classmethod
-    def invalidar_cache_carrito(cls, carrito_id=None, cliente_id=None):
-        """Invalida el caché relacionado con carritos."""
-        try:
-            if carrito_id:
-                CacheService.delete_pattern(f'*carrito*{carrito_id}*')
-            if cliente_id:
-                CacheService.delete_pattern(f'*carrito*cliente*{cliente_id}*')
-        except Exception as e:
-            logger.error(f"Error al invalidar caché de carrito: {str(e)}")
-    
     @staticmethod
     def obtener_o_crear_carrito(request):
         """
@@ -117,11 +105,6 @@ class CarritoService:
                     datos={'servicio': servicio.nombre, 'cantidad': cantidad, 'precio': str(servicio.precio)}
                 )
                 
-                # Invalidar caché
-                CarritoService.invalidar_cache_carrito(carrito.id)
-                if carrito.cliente:
-                    CarritoService.invalidar_cache_carrito(cliente_id=carrito.cliente.id)
-                
             else:
                 # Es un producto
                 producto = Producto.objects.get(id=item_id)
@@ -169,11 +152,6 @@ class CarritoService:
                     datos={'producto': producto.nombre, 'cantidad': cantidad, 'precio': str(producto.precio_venta)}
                 )
                 
-                # Invalidar caché
-                CarritoService.invalidar_cache_carrito(carrito.id)
-                if carrito.cliente:
-                    CarritoService.invalidar_cache_carrito(cliente_id=carrito.cliente.id)
-            
             return item
             
         except (Producto.DoesNotExist, ServicioReparacion.DoesNotExist):
@@ -212,11 +190,6 @@ class CarritoService:
             # Actualizar totales del carrito
             carrito.actualizar_totales()
             
-            # Invalidar caché
-            CarritoService.invalidar_cache_carrito(carrito.id)
-            if carrito.cliente:
-                CarritoService.invalidar_cache_carrito(cliente_id=carrito.cliente.id)
-            
             logger.info(f"Item {item_id} actualizado en carrito {carrito.id}")
             return item
             
@@ -245,11 +218,6 @@ class CarritoService:
             # Actualizar totales del carrito
             carrito.actualizar_totales()
             
-            # Invalidar caché
-            CarritoService.invalidar_cache_carrito(carrito.id)
-            if carrito.cliente:
-                CarritoService.invalidar_cache_carrito(cliente_id=carrito.cliente.id)
-            
             logger.info(f"Item {item_id} eliminado del carrito {carrito.id}")
             return True
             
@@ -279,11 +247,6 @@ class CarritoService:
             carrito._total = 0
             carrito.save(update_fields=['_subtotal', '_total_impuestos', '_total'])
             
-            # Invalidar caché
-            CarritoService.invalidar_cache_carrito(carrito.id)
-            if carrito.cliente:
-                CarritoService.invalidar_cache_carrito(cliente_id=carrito.cliente.id)
-            
             logger.info(f"Carrito {carrito.id} vaciado")
             return True
             
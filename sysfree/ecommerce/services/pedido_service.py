@@ -6,8 +6,8 @@ from django.conf import settings
 from ..models import Pedido, DetallePedido
 from reparaciones.models import Reparacion, ServicioReparacion
 from inventario.models import Producto
-from core.services.cache_service import CacheService
 from core.services.auditoria_service import AuditoriaService
+from core.utils.transacciones import reintentar_transaccion
 import uuid
 import logging
 
@@ -17,17 +17,8 @@ logger = logging.getLogger('sysfree')
 class PedidoService:
     """Servicio para gestionar pedidos en la tienda online."""
     
-    @classmethod
-    def invalidar_cache_pedido(cls, pedido_id=None):
-        """Invalida el caché relacionado con pedidos."""
-        try:
-            CacheService.delete('pedidos_list')
-            if pedido_id:
-                CacheService.delete_pattern(f'*pedido*{pedido_id}*')
-        except Exception as e:
-            logger.error(f"Error al invalidar caché de pedido: {str(e)}")
-    
     @staticmethod
+    @reintentar_transaccion()
     @transaction.atomic
     def crear_pedido_desde_carrito(carrito, direccion_facturacion, direccion_envio, notas=''):
         """
@@ -45,9 +36,10 @@ class PedidoService:
         if not carrito.items.exists():
             raise ValueError(_("El carrito está vacío"))
         
-        # Validar stock
+        # Validar stock bajo bloqueo, descontando reservas de otros carritos
         from .stock_validation_service import StockValidationService
-        stock_valido, productos_sin_stock = StockValidationService.validar_stock_carrito(carrito)
+        from .stock_reservation_service import StockReservationService
+        stock_valido, productos_sin_stock = StockValidationService.validar_stock_carrito(carrito, bloquear=True)
         
         if not stock_valido:
             productos_str = ", ".join([f"{p['producto'].nombre} (solicitado: {p['cantidad_solicitada']}, disponible: {p['stock_actual']})" for p in productos_sin_stock])
@@ -99,6 +91,9 @@ class PedidoService:
             
             detalle.save()
         
+        # Reservar el stock hasta que el pedido se pague
+        StockReservationService.reservar_carrito(carrito)
+        
         # Marcar el carrito como convertido a pedido
         carrito.convertido_a_pedido = True
         carrito.save()
@@ -112,9 +107,6 @@ class PedidoService:
             datos={'numero': numero_pedido, 'cliente': str(carrito.cliente), 'total': str(pedido.total)}
         )
         
-        # Invalidar caché
-        PedidoService.invalidar_cache_pedido()
-        
         logger.info(f"Pedido {numero_pedido} creado para cliente {carrito.cliente}")
         return pedido
     
@@ -191,8 +183,5 @@ class PedidoService:
             datos={'estado_nuevo': nuevo_estado}
         )
         
-        # Invalidar caché
-        PedidoService.invalidar_cache_pedido(pedido.id)
-        
         logger.info(f"Pedido {pedido.numero} actualizado a estado {nuevo_estado}")
         return pedido
\ No newline at end of file
@@ -1,6 +1,7 @@
 """
 Servicio para reservar stock temporalmente cuando un usuario agrega un producto al carrito.
 """
+from django.db.models import Sum
 from django.utils import timezone
 from ..models import ReservaStock
 
@@ -77,4 +78,63 @@ class StockReservationService:
         # Calcular el stock disponible
         stock_disponible = max(0, producto.stock - cantidad_reservada)
         
-        return stock_disponible
\ No newline at end of file
+        return stock_disponible
+    
+    @staticmethod
+    def cantidades_reservadas(producto_ids, excluir_carrito=None):
+        """
+        Obtiene la cantidad reservada vigente por producto en una sola consulta.
+        
+        Args:
+            producto_ids: IDs de los productos a consultar
+            excluir_carrito: Carrito cuyas reservas no se descuentan (las propias)
+            
+        Returns:
+            dict: Cantidad reservada por producto_id
+        """
+        reservas = ReservaStock.objects.filter(
+            item_carrito__producto_id__in=producto_ids,
+            activa=True,
+            fecha_expiracion__gt=timezone.now()
+        )
+        if excluir_carrito is not None:
+            reservas = reservas.exclude(item_carrito__carrito=excluir_carrito)
+        return {
+            fila['item_carrito__producto_id']: fila['total']
+            for fila in reservas.values('item_carrito__producto_id').annotate(total=Sum('cantidad'))
+        }
+    
+    @staticmethod
+    def reservar_carrito(carrito):
+        """
+        Reserva el stock de todos los productos inventariables de un carrito.
+        
+        Debe llamarse con el stock ya validado bajo bloqueo (ver
+        ``StockValidationService.validar_stock_carrito(bloquear=True)``).
+        
+        Args:
+            carrito: Objeto Carrito
+            
+        Returns:
+            list: Objetos ReservaStock creados
+        """
+        items = [
+            item for item in carrito.items.select_related('producto')
+            if not item.es_servicio and item.producto and item.producto.es_inventariable
+        ]
+        ReservaStock.objects.filter(item_carrito__in=items).delete()
+        fecha_expiracion = timezone.now() + timezone.timedelta(minutes=StockReservationService.TIEMPO_EXPIRACION)
+        return ReservaStock.objects.bulk_create([
+            ReservaStock(item_carrito=item, cantidad=item.cantidad, fecha_expiracion=fecha_expiracion)
+            for item in items
+        ])
+    
+    @staticmethod
+    def liberar_reservas_carrito(carrito):
+        """
+        Libera todas las reservas de stock de un carrito.
+        
+        Args:
+            carrito: Objeto Carrito o su id
+        """
+        ReservaStock.objects.filter(item_carrito__carrito=carrito).delete()
@@ -2,32 +2,59 @@
 Servicio para validar el stock de productos antes de procesar un pedido.
 """
 from django.utils.translation import gettext_lazy as _
+from core.utils.transacciones import fijar_lock_timeout
+from inventario.services.stock_ledger_service import StockLedgerService
 from ..models import Carrito, ItemCarrito
 
 class StockValidationService:
     """Servicio para validar el stock de productos."""
     
     @staticmethod
-    def validar_stock_carrito(carrito):
+    def validar_stock_carrito(carrito, bloquear=False):
         """
         Valida que haya suficiente stock para todos los productos en el carrito.
         
+        Con ``bloquear=True`` (debe usarse dentro de una transacción) los
+        productos se bloquean en orden de id y se descuentan las reservas
+        vigentes de otros carritos, de modo que dos checkouts concurrentes no
+        pueden comprometer las mismas unidades.
+        
         Args:
             carrito: Objeto Carrito
+            bloquear: Bloquear los productos y considerar reservas ajenas
             
         Returns:
             tuple: (bool, list) - (stock_valido, productos_sin_stock)
         """
         productos_sin_stock = []
+        items = [
+            item for item in carrito.items.select_related('producto')
+            if not item.es_servicio and item.producto and item.producto.es_inventariable
+        ]
+        
+        stock_disponible = {item.producto.pk: item.producto.stock for item in items}
+        if bloquear and items:
+            from inventario.models import Producto
+            from .stock_reservation_service import StockReservationService
+            
+            fijar_lock_timeout(StockLedgerService.LOCK_TIMEOUT_MS)
+            bloqueados = Producto.objects.select_for_update(of=('self',)).filter(
+                pk__in=stock_disponible.keys()
+            ).order_by('pk').values_list('pk', 'stock')
+            reservado = StockReservationService.cantidades_reservadas(
+                stock_disponible.keys(), excluir_carrito=carrito
+            )
+            stock_disponible = {pk: stock - reservado.get(pk, 0) for pk, stock in bloqueados}
         
-        for item in carrito.items.all():
-            if not item.es_servicio and item.producto and item.producto.es_inventariable:
-                if item.producto.stock < item.cantidad:
-                    productos_sin_stock.append({
-                        'producto': item.producto,
-                        'stock_actual': item.producto.stock,
-                        'cantidad_solicitada': item.cantidad
-                    })
+        solicitado = {}
+        for item in items:
+            solicitado[item.producto.pk] = solicitado.get(item.producto.pk, 0) + item.cantidad
+            if stock_disponible[item.producto.pk] < solicitado[item.producto.pk]:
+                productos_sin_stock.append({
+                    'producto': item.producto,
+                    'stock_actual': stock_disponible[item.producto.pk],
+                    'cantidad_solicitada': item.cantidad
+                })
         
         return len(productos_sin_stock) == 0, productos_sin_stock
     
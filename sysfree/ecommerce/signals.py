@@ -61,14 +61,11 @@ def registrar_movimientos_inventario(sender, instance, **kwargs):
     """
     # Solo procesar si el pedido está pagado y no se han registrado movimientos
     if instance.estado == 'pagado' and not hasattr(instance, '_movimientos_registrados'):
+        almacen = InventarioService.obtener_almacen_predeterminado()
         for detalle in instance.detalles.all():
             # Verificar si es un producto (no un servicio) y es inventariable
             if not detalle.es_servicio and detalle.producto and detalle.producto.es_inventariable:
                 try:
-                    # Buscar un almacén activo para registrar la salida
-                    from inventario.models import Almacen
-                    almacen = Almacen.objects.filter(activo=True).first()
-                    
                     if not almacen:
                         import logging
                         logger = logging.getLogger('sysfree')
@@ -107,6 +104,11 @@ def registrar_movimientos_inventario(sender, instance, **kwargs):
                     logger = logging.getLogger('sysfree')
                     logger.error(f"Error inesperado al registrar salida de inventario para pedido {instance.numero}: {str(e)}")
         
+        # Las unidades ya salieron del inventario: liberar las reservas del checkout
+        if instance.carrito_id:
+            from .services.stock_reservation_service import StockReservationService
+            StockReservationService.liberar_reservas_carrito(instance.carrito_id)
+        
         # Marcar que ya se registraron los movimientos
         instance._movimientos_registrados = True
 
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from .models import (
     PeriodoFiscal, CuentaContable, AsientoContable, LineaAsiento, Comprobante,
-    Retencion, ComprobanteRetencion
+    Retencion, ComprobanteRetencion, ComprobanteElectronico
 )
 
 class LineaAsientoInline(admin.TabularInline):
@@ -105,4 +105,34 @@ class ComprobanteRetencionAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {'fields': ('numero', 'venta', 'fecha_emision', 'base_imponible', 'total_retenido')}),
         (_('Auditoría'), {'fields': ('activo', 'creado_por', 'fecha_creacion', 'modificado_por', 'fecha_modificacion')}),
-    )
\ No newline at end of file
+    )
+
+@admin.register(ComprobanteElectronico)
+class ComprobanteElectronicoAdmin(admin.ModelAdmin):
+    list_display = ('venta', 'estado', 'clave_acceso', 'intentos', 'fecha_estado')
+    list_filter = ('estado',)
+    search_fields = ('venta__numero', 'clave_acceso', 'numero_autorizacion')
+    readonly_fields = (
+        'venta', 'estado', 'clave_acceso', 'xml', 'xml_firmado', 'ride', 'numero_autorizacion',
+        'fecha_autorizacion', 'mensajes', 'intentos', 'ultimo_error', 'fecha_estado',
+        'fecha_creacion', 'fecha_modificacion', 'creado_por', 'modificado_por'
+    )
+    ordering = ('-fecha_estado',)
+    fieldsets = (
+        (None, {'fields': ('venta', 'estado', 'clave_acceso', 'fecha_estado')}),
+        (_('SRI'), {'fields': ('numero_autorizacion', 'fecha_autorizacion', 'mensajes', 'intentos', 'ultimo_error')}),
+        (_('Documentos'), {'fields': ('xml', 'xml_firmado', 'ride'), 'classes': ('collapse',)}),
+        (_('Auditoría'), {'fields': ('activo', 'creado_por', 'fecha_creacion', 'modificado_por', 'fecha_modificacion')}),
+    )
+
+    def reanudar(self, request, queryset):
+        """Encola la etapa pendiente de los comprobantes detenidos."""
+        from ventas.tasks import procesar_facturacion_electronica_task
+        venta_ids = list(queryset.exclude(estado__in=('notificado', 'devuelto', 'no_autorizado'))
+                         .values_list('venta_id', flat=True))
+        for venta_id in venta_ids:
+            procesar_facturacion_electronica_task.delay(venta_id)
+        self.message_user(request, _(f"{len(venta_ids)} comprobantes reanudados."))
+    reanudar.short_description = _('Reanudar facturación electrónica')
+
+    actions = ['reanudar']
@@ -0,0 +1,211 @@
+"""
+Comando para medir la consulta de autorizaciones de comprobantes recibidos
+contra el simulador local del SRI (``fiscal.utils.sri_simulado``).
+
+Crea ``--comprobantes`` comprobantes en estado ``recibido`` (registrados en
+el simulador, que responde EN PROCESO a la primera consulta de una fracción
+``--tasa-en-proceso``) y los lleva hasta autorizados de dos formas:
+
+- ``individual``: como la etapa de autorización reintentada por comprobante,
+  ``--paralelo`` workers (hilos) ejecutan la etapa de cada uno; los que
+  siguen EN PROCESO se vuelven a ejecutar tras la espera.
+- ``lotes``: ``FacturacionElectronicaService.consultar_autorizaciones`` cada
+  ``--espera`` segundos, con ``--paralelo`` consultas simultáneas.
+
+Se reportan los comprobantes autorizados por segundo, las consultas de
+base de datos del proceso y las llamadas al SRI. Los datos se confirman en
+la base de datos y se eliminan al terminar; la empresa recupera su
+configuración.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.models import Empresa
+from fiscal.models import ComprobanteElectronico
+from fiscal.services.facturacion_electronica_service import EtapaPendiente, FacturacionElectronicaService
+from fiscal.utils.sri_simulado import ServidorSRISimulado
+from ventas.models import Venta
+
+PREFIJO = 'BENCHAUT'
+SERIE = '997-001'
+CAMPOS_EMPRESA = ('ambiente_facturacion', 'url_autorizacion_pruebas')
+
+
+class _ContadorConsultas:
+    """``execute_wrapper`` que cuenta las consultas de todas las conexiones que lo usan."""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.total += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compara la autorización por comprobante con la consulta de autorizaciones por lotes contra un SRI simulado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comprobantes', type=int, default=1000,
+                            help='Comprobantes recibidos por cada forma (por defecto 1000)')
+        parser.add_argument('--latencia', type=float, default=0.05,
+                            help='Latencia de cada respuesta del SRI en segundos (por defecto 0.05)')
+        parser.add_argument('--variacion', type=float, default=0.02,
+                            help='Variación aleatoria máxima de la latencia (por defecto 0.02)')
+        parser.add_argument('--tasa-en-proceso', type=float, default=0.3,
+                            help='Fracción de comprobantes cuya primera consulta responde EN PROCESO '
+                                 '(por defecto 0.3)')
+        parser.add_argument('--espera', type=float, default=1.0,
+                            help='Segundos entre consultas de un comprobante EN PROCESO (por defecto 1)')
+        parser.add_argument('--paralelo', type=int, default=8,
+                            help='Consultas simultáneas al SRI en cada forma (por defecto 8)')
+        parser.add_argument('--lote', type=int, default=200,
+                            help='Comprobantes por lote de la consulta por lotes (por defecto 200)')
+
+    def handle(self, *args, **options):
+        if min(options['comprobantes'], options['paralelo'], options['lote']) <= 0:
+            raise CommandError('--comprobantes, --paralelo y --lote deben ser positivos')
+        if Venta.objects.filter(numero__startswith=f'{SERIE}-').exists():
+            raise CommandError(f'Ya existen ventas con la serie {SERIE}; elimínelas antes de medir')
+
+        empresa, original = self._configurar_empresa()
+        ajustes = override_settings(
+            FACTURACION_ESPERA_AUTORIZACION=options['espera'],
+            SRI_AUTORIZACION_PARALELO=options['paralelo'],
+            SRI_CIRCUITO={'umbral': 5, 'ventana': 10, 'apertura': 1, 'lentitud': None},
+        )
+        formas = ('individual', 'lotes')
+        resultados = []
+        creados = None
+        try:
+            ajustes.enable()
+            creados = self._generar_datos(options['comprobantes'] * len(formas))
+            for indice, forma in enumerate(formas):
+                lote = creados['comprobantes'][indice * options['comprobantes']:(indice + 1) * options['comprobantes']]
+                with ServidorSRISimulado(
+                    latencia=options['latencia'], variacion=options['variacion'], semilla=indice,
+                    tasa_en_proceso=options['tasa_en_proceso'],
+                ) as sri:
+                    sri.recibidos.update((clave, '<factura/>') for _, clave in lote)
+                    empresa.url_autorizacion_pruebas = sri.url_autorizacion
+                    empresa.save(update_fields=['url_autorizacion_pruebas'])
+                    FacturacionElectronicaService.circuito_sri().registrar_exito()
+                    self.stdout.write(f'Autorizando {len(lote)} comprobantes ({forma})...')
+                    contador = _ContadorConsultas()
+                    inicio = time.perf_counter()
+                    getattr(self, f'_medir_{forma}')([pk for pk, _ in lote], options, contador)
+                    resultados.append({
+                        'forma': forma, 'comprobantes': len(lote), 'segundos': time.perf_counter() - inicio,
+                        'consultas_bd': contador.total, 'llamadas_sri': sri.solicitudes['autorizacion'],
+                        'estados': dict(
+                            ComprobanteElectronico.objects.filter(pk__in=[pk for pk, _ in lote])
+                            .values_list('estado').annotate(n=Count('id')).order_by()
+                        ),
+                    })
+        finally:
+            ajustes.disable()
+            self._limpiar(creados, empresa, original)
+
+        self._reportar(resultados)
+
+    def _configurar_empresa(self):
+        """Empresa en ambiente de pruebas; devuelve también sus valores originales (None si se creó)."""
+        empresa = Empresa.objects.first()
+        original = {campo: getattr(empresa, campo) for campo in CAMPOS_EMPRESA} if empresa else None
+        if empresa is None:
+            empresa = Empresa(nombre='Empresa benchmark', ruc='1790000000001', direccion='Quito')
+        empresa.ambiente_facturacion = '1'
+        empresa.save()
+        return empresa, original
+
+    def _generar_datos(self, cantidad):
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion=PREFIJO, nombres='Cliente', apellidos='Benchmark'
+        )
+        ventas = Venta.objects.bulk_create([
+            Venta(numero=f'{SERIE}-{i:09d}', cliente=cliente, tipo='factura', estado='pagada',
+                  subtotal=Decimal('10.00'), total=Decimal('11.50'))
+            for i in range(1, cantidad + 1)
+        ])
+        comprobantes = ComprobanteElectronico.objects.bulk_create([
+            ComprobanteElectronico(venta=venta, estado='recibido', clave_acceso=f'{venta.pk:049d}')
+            for venta in ventas
+        ])
+        # Recibidos hace rato: la primera consulta por lotes los toma
+        ComprobanteElectronico.objects.filter(pk__in=[c.pk for c in comprobantes]).update(
+            fecha_estado=timezone.now() - timedelta(minutes=5)
+        )
+        return {
+            'ventas': [venta.pk for venta in ventas], 'cliente': cliente,
+            'comprobantes': [(c.pk, c.clave_acceso) for c in comprobantes],
+        }
+
+    def _limpiar(self, creados, empresa, original):
+        if creados:
+            ComprobanteElectronico.objects.filter(venta_id__in=creados['ventas'])._raw_delete(connection.alias)
+            Venta.objects.filter(pk__in=creados['ventas'])._raw_delete(connection.alias)
+            creados['cliente'].delete()
+        if original is None:
+            empresa.delete()
+        else:
+            for campo, valor in original.items():
+                setattr(empresa, campo, valor)
+            empresa.save()
+
+    # Formas de consulta
+
+    def _medir_individual(self, pendientes, options, contador):
+        def autorizar(comprobante_id):
+            with connections['default'].execute_wrapper(contador):
+                try:
+                    FacturacionElectronicaService.ejecutar_etapa(comprobante_id, 'autorizacion')
+                    return None
+                except (EtapaPendiente, OSError):
+                    return comprobante_id
+
+        with ThreadPoolExecutor(options['paralelo']) as workers:
+            while pendientes:
+                pendientes = [pk for pk in workers.map(autorizar, pendientes) if pk is not None]
+                if pendientes:
+                    time.sleep(options['espera'])
+            for _ in range(options['paralelo']):
+                workers.submit(connection.close)
+
+    def _medir_lotes(self, comprobantes, options, contador):
+        pendientes = ComprobanteElectronico.objects.filter(pk__in=comprobantes, estado='recibido')
+        with connection.execute_wrapper(contador):
+            while True:
+                FacturacionElectronicaService.consultar_autorizaciones(options['lote'])
+                if not pendientes.exists():
+                    break
+                time.sleep(options['espera'])
+
+    def _reportar(self, resultados):
+        self.stdout.write(
+            f"{'forma':<12}{'comprobantes':>13}{'segundos':>10}{'aut/s':>8}{'consultas BD':>14}"
+            f"{'llamadas SRI':>14}  estados"
+        )
+        for r in resultados:
+            estados = ', '.join(f'{estado}={n}' for estado, n in sorted(r['estados'].items()))
+            self.stdout.write(
+                f"{r['forma']:<12}{r['comprobantes']:>13}{r['segundos']:>10.1f}"
+                f"{r['comprobantes'] / r['segundos']:>8.0f}{r['consultas_bd']:>14}{r['llamadas_sri']:>14}  {estados}"
+            )
+        if len(resultados) == 2:
+            self.stdout.write(
+                f"Por lotes: {resultados[0]['segundos'] / resultados[1]['segundos']:.1f}x comprobantes por segundo "
+                f"y {resultados[0]['consultas_bd'] / max(resultados[1]['consultas_bd'], 1):.0f}x menos consultas "
+                f"a la base de datos que por comprobante"
+            )
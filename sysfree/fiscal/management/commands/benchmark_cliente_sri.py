@@ -0,0 +1,155 @@
+"""
+Comando para medir la latencia de las llamadas al SRI con y sin conexiones
+persistentes, contra el simulador local del SRI sobre HTTPS
+(``fiscal.utils.sri_simulado``).
+
+Envía ``--documentos`` comprobantes de ``--lineas`` líneas y consulta su
+autorización de dos formas:
+
+- ``por_llamada``: como antes de ``ClienteSRI``, cada llamada usa
+  ``requests.post``, que abre una conexión TCP y negocia TLS de nuevo, y la
+  respuesta se lee completa antes de interpretarla.
+- ``persistente``: ``ClienteSRI`` reutiliza las conexiones del pool de su
+  sesión e interpreta la respuesta por bloques.
+
+El simulador añade ``--latencia-conexion`` segundos a cada conexión nueva
+(el tiempo de ida y vuelta del TCP y del TLS hasta el SRI) y ``--latencia``
+segundos a cada respuesta. Al final se compara también la consulta de
+autorización de todos los comprobantes una por una frente a
+``ClienteSRI.autorizar_lote``. No usa la base de datos.
+"""
+import base64
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from fiscal.services.cliente_sri import _AUTORIZACION, _RECEPCION, CABECERAS, ClienteSRI
+from fiscal.utils.sri_simulado import ServidorSRISimulado
+
+
+def _comprobante(clave, lineas):
+    """Factura sintética con ``lineas`` detalles."""
+    detalle = (
+        '<detalle><codigoPrincipal>P{0}</codigoPrincipal><descripcion>Producto {0}</descripcion>'
+        '<cantidad>1.00</cantidad><precioUnitario>5.00</precioUnitario><descuento>0.00</descuento>'
+        '<precioTotalSinImpuesto>5.00</precioTotalSinImpuesto><impuestos><impuesto><codigo>2</codigo>'
+        '<codigoPorcentaje>4</codigoPorcentaje><tarifa>15</tarifa><baseImponible>5.00</baseImponible>'
+        '<valor>0.75</valor></impuesto></impuestos></detalle>'
+    )
+    return (
+        f'<factura id="comprobante" version="1.1.0"><infoTributaria><claveAcceso>{clave}</claveAcceso>'
+        f'</infoTributaria><detalles>{"".join(detalle.format(i) for i in range(lineas))}</detalles></factura>'
+    ).encode('utf-8')
+
+
+class _ClientePorLlamada:
+    """Llamadas como las hacía ``ComprobanteService``: una conexión por llamada."""
+
+    def __init__(self, verificar):
+        self.verificar = verificar
+
+    def _llamar(self, url, cuerpo):
+        respuesta = requests.post(
+            url, data=cuerpo, headers=CABECERAS, timeout=ClienteSRI.timeout(), verify=self.verificar
+        )
+        respuesta.raise_for_status()
+        return ClienteSRI.interpretar(respuesta.content)
+
+    def enviar(self, url, xml):
+        return self._llamar(url, _RECEPCION % base64.b64encode(xml))
+
+    def autorizar(self, url, clave_acceso):
+        return self._llamar(url, _AUTORIZACION % clave_acceso.encode('ascii'))
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de las llamadas al SRI con y sin conexiones persistentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=200,
+                            help='Comprobantes enviados por cada forma (por defecto 200)')
+        parser.add_argument('--lineas', type=int, default=20, help='Líneas por comprobante (por defecto 20)')
+        parser.add_argument('--latencia', type=float, default=0.02,
+                            help='Latencia de cada respuesta del SRI en segundos (por defecto 0.02)')
+        parser.add_argument('--latencia-conexion', type=float, default=0.05,
+                            help='Latencia de cada conexión nueva (TCP y TLS) en segundos (por defecto 0.05)')
+        parser.add_argument('--paralelo', type=int, default=8,
+                            help='Consultas simultáneas de la autorización por lotes (por defecto 8)')
+
+    def handle(self, *args, **options):
+        if min(options['documentos'], options['lineas'], options['paralelo']) <= 0:
+            raise CommandError('--documentos, --lineas y --paralelo deben ser positivos')
+
+        resultados = []
+        for indice, forma in enumerate(('por_llamada', 'persistente')):
+            with ServidorSRISimulado(
+                latencia=options['latencia'], latencia_conexion=options['latencia_conexion'], tls=True
+            ) as sri:
+                if forma == 'persistente':
+                    cliente = ClienteSRI(verificar=sri.certificado_tls)
+                else:
+                    cliente = _ClientePorLlamada(sri.certificado_tls)
+                claves = [f'{indice}{i:048d}' for i in range(options['documentos'])]
+                documentos = [_comprobante(clave, options['lineas']) for clave in claves]
+                self.stdout.write(f'Enviando {len(documentos)} comprobantes ({forma})...')
+                resultado = self._medir(cliente, sri, claves, documentos)
+                resultado.update(forma=forma, conexiones=sri.conexiones)
+                resultados.append(resultado)
+
+                if forma == 'persistente':
+                    lote = self._medir_lote(cliente, sri, claves, options['paralelo'])
+
+        self._reportar(resultados, lote, options)
+
+    def _medir(self, cliente, sri, claves, documentos):
+        latencias = []
+        for clave, documento in zip(claves, documentos):
+            inicio = time.perf_counter()
+            if cliente.enviar(sri.url_recepcion, documento)['estado'] != 'RECIBIDA':
+                raise CommandError(f'El simulador no recibió el comprobante {clave}')
+            if cliente.autorizar(sri.url_autorizacion, clave)['estado'] != 'AUTORIZADO':
+                raise CommandError(f'El simulador no autorizó el comprobante {clave}')
+            latencias.append(time.perf_counter() - inicio)
+        latencias.sort()
+        return {
+            'documentos': len(latencias),
+            'segundos': sum(latencias),
+            'media': statistics.mean(latencias),
+            'p50': statistics.median(latencias),
+            'p95': latencias[int(len(latencias) * 0.95) - 1],
+        }
+
+    def _medir_lote(self, cliente, sri, claves, paralelo):
+        inicio = time.perf_counter()
+        for clave in claves:
+            cliente.autorizar(sri.url_autorizacion, clave)
+        secuencial = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        respuestas = cliente.autorizar_lote(sri.url_autorizacion, claves, paralelo)
+        por_lotes = time.perf_counter() - inicio
+        autorizados = sum(respuesta['estado'] == 'AUTORIZADO' for respuesta in respuestas.values())
+        return {'secuencial': secuencial, 'por_lotes': por_lotes, 'autorizados': autorizados}
+
+    def _reportar(self, resultados, lote, options):
+        self.stdout.write(
+            f"{'forma':<13}{'documentos':>11}{'segundos':>10}{'media ms':>10}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'conexiones':>12}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['forma']:<13}{r['documentos']:>11}{r['segundos']:>10.2f}{r['media'] * 1000:>10.1f}"
+                f"{r['p50'] * 1000:>9.1f}{r['p95'] * 1000:>9.1f}{r['conexiones']:>12}"
+            )
+        if resultados[1]['media']:
+            self.stdout.write(
+                f"Conexiones persistentes: {resultados[0]['media'] / resultados[1]['media']:.1f}x "
+                f"menos latencia por comprobante (envío y autorización)"
+            )
+        self.stdout.write(
+            f"Autorización de {resultados[1]['documentos']} comprobantes: "
+            f"{lote['secuencial']:.2f} s uno por uno, {lote['por_lotes']:.2f} s por lotes "
+            f"({options['paralelo']} simultáneas, {lote['autorizados']} autorizados)"
+        )
@@ -0,0 +1,314 @@
+"""
+Comando para medir el rendimiento de la facturación electrónica contra el
+simulador local del SRI (``fiscal.utils.sri_simulado``).
+
+Crea ventas de prueba con un certificado autofirmado, apunta la empresa al
+simulador (con latencia, fallos HTTP 500 y respuestas EN PROCESO
+configurables) y procesa las facturas de dos formas:
+
+- ``monolitica``: como la tarea única anterior, ``--workers`` workers (hilos)
+  llevan cada uno una factura de principio a fin; si una etapa falla la
+  factura se procesa de nuevo desde el XML y, mientras el SRI responde EN
+  PROCESO, el worker espera sin atender otras facturas.
+- ``etapas``: cada etapa tiene su propio grupo de workers, como las colas de
+  ``FACTURACION_COLAS``: ``--workers`` en las que usan CPU (XML, firma y
+  RIDE) y ``--workers-red`` en las que esperan la red (recepción,
+  autorización y correo), que en producción son workers livianos de mucha
+  concurrencia. Un fallo reintenta solo su etapa y una factura EN PROCESO se
+  reprograma sin ocupar un worker.
+
+Se reportan las facturas por minuto y la latencia (desde el inicio hasta que
+la factura termina) de cada forma. Las esperas de reintento y del circuito
+están escaladas a segundos para que la medición sea corta.
+
+Los workers son hilos con su propia conexión, así que los datos se confirman
+en la base de datos; se eliminan al terminar y la empresa recupera su
+configuración.
+"""
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from clientes.models import Cliente
+from core.models import Empresa, TipoIVA
+from fiscal.models import ComprobanteElectronico
+from fiscal.services.facturacion_electronica_service import EtapaPendiente, FacturacionElectronicaService
+from fiscal.utils.sri_simulado import ServidorSRISimulado, crear_certificado_prueba
+from inventario.models import Categoria, Producto
+from ventas.models import DetalleVenta, Venta
+
+PREFIJO = 'BENCHFE'
+SERIE = '999-001'
+ETAPAS_RED = ('recepcion', 'autorizacion', 'correo')
+MAX_REINTENTOS = 8
+CAMPOS_EMPRESA = (
+    'ambiente_facturacion', 'ruta_certificado', 'clave_certificado', 'url_recepcion_pruebas',
+    'url_autorizacion_pruebas',
+)
+
+
+def _espera(intento):
+    """Espera exponencial del reintento, escalada a décimas de segundo."""
+    return min(0.2 * 2 ** intento, 3.0)
+
+
+class Command(BaseCommand):
+    help = 'Compara la facturación electrónica monolítica y por etapas contra un SRI simulado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facturas', type=int, default=200,
+                            help='Facturas procesadas por cada forma (por defecto 200)')
+        parser.add_argument('--lineas', type=int, default=10, help='Líneas por factura (por defecto 10)')
+        parser.add_argument('--latencia', type=float, default=0.3,
+                            help='Latencia de cada respuesta del SRI en segundos (por defecto 0.3)')
+        parser.add_argument('--variacion', type=float, default=0.2,
+                            help='Variación aleatoria máxima de la latencia (por defecto 0.2)')
+        parser.add_argument('--tasa-fallos', type=float, default=0.03,
+                            help='Fracción de llamadas al SRI que responden HTTP 500 (por defecto 0.03)')
+        parser.add_argument('--tasa-en-proceso', type=float, default=0.3,
+                            help='Fracción de facturas cuya primera consulta responde EN PROCESO (por defecto 0.3)')
+        parser.add_argument('--espera-autorizacion', type=float, default=1.0,
+                            help='Segundos entre consultas de una factura EN PROCESO (por defecto 1)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Workers de la forma monolítica y de cada etapa de CPU (por defecto 4)')
+        parser.add_argument('--workers-red', type=int, default=16,
+                            help='Workers de cada etapa que espera la red en la forma por etapas (por defecto 16)')
+        parser.add_argument('--sin-ride', action='store_true', help='No genera el RIDE (PDF) de las facturas')
+        parser.add_argument('--solo', choices=('monolitica', 'etapas'), help='Mide solo una de las formas')
+
+    def handle(self, *args, **options):
+        if min(options['facturas'], options['lineas'], options['workers'], options['workers_red']) <= 0:
+            raise CommandError('--facturas, --lineas, --workers y --workers-red deben ser positivos')
+        if not options['sin_ride']:
+            try:
+                from reportes.services.ride_generator_service import RIDEGeneratorService  # noqa: F401
+            except OSError as e:
+                raise CommandError(f'No se puede generar el RIDE ({e}); use --sin-ride')
+        if Venta.objects.filter(numero__startswith=f'{SERIE}-').exists():
+            raise CommandError(f'Ya existen ventas con la serie {SERIE}; elimínelas antes de medir')
+
+        formas = [options['solo']] if options['solo'] else ['monolitica', 'etapas']
+        directorio = tempfile.mkdtemp()
+        certificado = os.path.join(directorio, 'benchmark.p12')
+        crear_certificado_prueba(certificado, PREFIJO)
+        empresa, original = self._configurar_empresa(certificado)
+        ajustes = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            FACTURACION_GENERAR_RIDE=not options['sin_ride'],
+            FACTURACION_ESPERA_AUTORIZACION=options['espera_autorizacion'],
+            SRI_CIRCUITO={'umbral': 5, 'ventana': 10, 'apertura': 1, 'lentitud': None},
+        )
+        resultados = []
+        try:
+            ajustes.enable()
+            creados = self._generar_datos(options['facturas'] * len(formas), options['lineas'])
+            ventas = creados['ventas']
+            for indice, forma in enumerate(formas):
+                lote = ventas[indice * options['facturas']:(indice + 1) * options['facturas']]
+                with ServidorSRISimulado(
+                    latencia=options['latencia'], variacion=options['variacion'], semilla=indice,
+                    tasa_fallos=options['tasa_fallos'], tasa_en_proceso=options['tasa_en_proceso'],
+                ) as sri:
+                    empresa.url_recepcion_pruebas = sri.url_recepcion
+                    empresa.url_autorizacion_pruebas = sri.url_autorizacion
+                    empresa.save(update_fields=['url_recepcion_pruebas', 'url_autorizacion_pruebas'])
+                    FacturacionElectronicaService.circuito_sri().registrar_exito()
+                    self.stdout.write(f'Procesando {len(lote)} facturas ({forma})...')
+                    resultado = getattr(self, f'_medir_{forma}')(lote, options)
+                    resultado.update(forma=forma, solicitudes=dict(sri.solicitudes))
+                    resultados.append(resultado)
+        finally:
+            ajustes.disable()
+            self._limpiar(locals().get('creados'), empresa, original)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self._reportar(resultados)
+
+    def _configurar_empresa(self, certificado):
+        """Empresa apuntando al simulador; devuelve también sus valores originales (None si se creó)."""
+        empresa = Empresa.objects.first()
+        original = {campo: getattr(empresa, campo) for campo in CAMPOS_EMPRESA} if empresa else None
+        if empresa is None:
+            empresa = Empresa(nombre='Empresa benchmark', ruc='1790000000001', direccion='Quito')
+        empresa.ambiente_facturacion = '1'
+        empresa.ruta_certificado = certificado
+        empresa.clave_certificado = PREFIJO
+        empresa.save()
+        return empresa, original
+
+    def _generar_datos(self, facturas, lineas):
+        categoria = Categoria.objects.create(nombre=f'{PREFIJO} categoría')
+        iva = TipoIVA.objects.filter(porcentaje__gt=0).first()
+        iva_creado = iva is None
+        if iva_creado:
+            iva = TipoIVA.objects.create(nombre=f'{PREFIJO} IVA 15%', codigo='4', porcentaje=15)
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion=PREFIJO, nombres='Cliente', apellidos='Benchmark',
+            email='benchmark-facturacion@sysfree.local'
+        )
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'{PREFIJO}-{i}', nombre=f'Producto {i}', categoria=categoria,
+                     precio_compra=Decimal('3.00'), precio_venta=Decimal('5.00'), stock=Decimal('100.00'))
+            for i in range(lineas)
+        ])
+        subtotal = Decimal('5.00') * lineas
+        impuesto = (subtotal * iva.porcentaje / 100).quantize(Decimal('0.01'))
+        ventas = Venta.objects.bulk_create([
+            Venta(numero=f'{SERIE}-{i:09d}', cliente=cliente, tipo='factura', estado='pagada',
+                  subtotal=subtotal, total=subtotal + impuesto)
+            for i in range(1, facturas + 1)
+        ])
+        iva_linea = (Decimal('5.00') * iva.porcentaje / 100).quantize(Decimal('0.01'))
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=venta, producto=producto, cantidad=Decimal('1.00'), precio_unitario=Decimal('5.00'),
+                         tipo_iva=iva, subtotal=Decimal('5.00'), iva=iva_linea, total=Decimal('5.00') + iva_linea)
+            for venta in ventas for producto in productos
+        ], batch_size=5000)
+        return {
+            'ventas': [venta.pk for venta in ventas], 'cliente': cliente, 'categoria': categoria,
+            'iva': iva if iva_creado else None,
+        }
+
+    def _limpiar(self, creados, empresa, original):
+        if creados:
+            ComprobanteElectronico.objects.filter(venta_id__in=creados['ventas']).delete()
+            DetalleVenta.objects.filter(venta_id__in=creados['ventas'])._raw_delete(connection.alias)
+            Venta.objects.filter(pk__in=creados['ventas'])._raw_delete(connection.alias)
+            Producto.objects.filter(codigo__startswith=f'{PREFIJO}-').delete()
+            creados['categoria'].delete()
+            creados['cliente'].delete()
+            if creados['iva']:
+                creados['iva'].delete()
+        if original is None:
+            empresa.delete()
+        else:
+            for campo, valor in original.items():
+                setattr(empresa, campo, valor)
+            empresa.save()
+
+    # Formas de procesamiento
+
+    def _medir_monolitica(self, venta_ids, options):
+        def procesar(venta_id):
+            try:
+                comprobante, etapa = FacturacionElectronicaService.iniciar(venta_id)
+                intento = 0
+                while etapa:
+                    try:
+                        etapa = FacturacionElectronicaService.ejecutar_etapa(comprobante.id, etapa)
+                    except EtapaPendiente as e:
+                        time.sleep(e.espera)
+                    except (OSError, OperationalError):
+                        if intento >= MAX_REINTENTOS:
+                            break
+                        time.sleep(_espera(intento))
+                        intento += 1
+                        # La tarea única reintentaba el proceso completo
+                        ComprobanteElectronico.objects.filter(pk=comprobante.id).update(estado='pendiente')
+                        etapa = 'xml'
+                return time.perf_counter()
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(options['workers']) as workers:
+            fines = list(workers.map(procesar, venta_ids))
+        return self._resultado(venta_ids, inicio, fines)
+
+    def _medir_etapas(self, venta_ids, options):
+        grupos = {
+            etapa: ThreadPoolExecutor(options['workers_red'] if etapa in ETAPAS_RED else options['workers'])
+            for etapa in FacturacionElectronicaService.ETAPAS
+        }
+        restantes = [len(venta_ids)]
+        fines, terminado, candado = [], threading.Event(), threading.Lock()
+
+        def terminar():
+            with candado:
+                fines.append(time.perf_counter())
+                restantes[0] -= 1
+                if not restantes[0]:
+                    terminado.set()
+
+        def encolar(comprobante_id, etapa, intento=0, espera=0):
+            if espera:
+                temporizador = threading.Timer(espera, encolar, (comprobante_id, etapa, intento))
+                temporizador.daemon = True
+                temporizador.start()
+            else:
+                grupos[etapa].submit(ejecutar, comprobante_id, etapa, intento)
+
+        def ejecutar(comprobante_id, etapa, intento):
+            try:
+                siguiente = FacturacionElectronicaService.ejecutar_etapa(comprobante_id, etapa)
+            except EtapaPendiente as e:
+                encolar(comprobante_id, etapa, intento, e.espera)
+                return
+            except (OSError, OperationalError):
+                if intento < MAX_REINTENTOS:
+                    encolar(comprobante_id, etapa, intento + 1, _espera(intento))
+                else:
+                    terminar()
+                return
+            except Exception:
+                terminar()
+                return
+            if siguiente:
+                encolar(comprobante_id, siguiente)
+            else:
+                terminar()
+
+        inicio = time.perf_counter()
+        for venta_id in venta_ids:
+            comprobante, etapa = FacturacionElectronicaService.iniciar(venta_id)
+            encolar(comprobante.id, etapa)
+        terminado.wait()
+        for grupo in grupos.values():
+            # Cierra la conexión de cada hilo antes de terminar el grupo
+            for _ in range(grupo._max_workers):
+                grupo.submit(connection.close)
+            grupo.shutdown()
+        return self._resultado(venta_ids, inicio, fines)
+
+    def _resultado(self, venta_ids, inicio, fines):
+        latencias = sorted(fin - inicio for fin in fines)
+        estados = dict(
+            ComprobanteElectronico.objects.filter(venta_id__in=venta_ids)
+            .values_list('estado').annotate(n=Count('id')).order_by()
+        )
+        return {
+            'facturas': len(venta_ids),
+            'segundos': max(latencias) if latencias else 0,
+            'p50': statistics.median(latencias) if latencias else 0,
+            'p95': latencias[int(len(latencias) * 0.95) - 1] if latencias else 0,
+            'estados': estados,
+        }
+
+    def _reportar(self, resultados):
+        self.stdout.write(
+            f"{'forma':<12}{'facturas':>9}{'segundos':>10}{'fact/min':>10}{'p50 s':>8}{'p95 s':>8}"
+            f"{'llamadas SRI':>14}  estados"
+        )
+        for r in resultados:
+            llamadas = r['solicitudes']['recepcion'] + r['solicitudes']['autorizacion']
+            estados = ', '.join(f'{estado}={n}' for estado, n in sorted(r['estados'].items()))
+            self.stdout.write(
+                f"{r['forma']:<12}{r['facturas']:>9}{r['segundos']:>10.1f}"
+                f"{r['facturas'] / r['segundos'] * 60 if r['segundos'] else 0:>10.0f}"
+                f"{r['p50']:>8.1f}{r['p95']:>8.1f}{llamadas:>14}  {estados}"
+            )
+        if len(resultados) == 2 and resultados[1]['segundos']:
+            self.stdout.write(
+                f"Por etapas: {resultados[0]['segundos'] / resultados[1]['segundos']:.1f}x "
+                f"facturas por minuto frente a la forma monolítica"
+            )
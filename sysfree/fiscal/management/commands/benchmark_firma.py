@@ -0,0 +1,125 @@
+"""
+Comando para medir la firma XAdES-BES de comprobantes con un certificado
+autofirmado generado localmente (``crear_certificado_prueba``).
+
+Firma ``--facturas`` facturas sintéticas de ``--lineas`` líneas de tres formas:
+
+- ``sin_cache``: como antes, el archivo P12 se lee y se descifra para cada
+  comprobante.
+- ``cache``: el certificado se descifra una vez (``firma_xades.credencial``)
+  y los comprobantes se firman en el proceso actual.
+- ``procesos``: ``firma_xades.firmar_lote`` reparte los comprobantes entre
+  ``--procesos`` procesos.
+
+Se reporta el tiempo total, las firmas por segundo y la latencia por
+comprobante (p50/p95) de las formas secuenciales. No usa la base de datos.
+"""
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fiscal.utils import firma_xades
+from fiscal.utils.sri_simulado import crear_certificado_prueba
+
+CLAVE = 'BENCHFIRMA'
+
+
+def _factura(numero, lineas):
+    """Factura sintética con el formato de ``ComprobanteService.generar_xml_factura``."""
+    detalles = ''.join(
+        f'    <detalle>\n      <codigoPrincipal>P{i}</codigoPrincipal>\n'
+        f'      <descripcion>Producto {i}</descripcion>\n      <cantidad>1.00</cantidad>\n'
+        f'      <precioUnitario>5.00</precioUnitario>\n      <descuento>0.00</descuento>\n'
+        f'      <precioTotalSinImpuesto>5.00</precioTotalSinImpuesto>\n      <impuestos>\n'
+        f'        <impuesto>\n          <codigo>2</codigo>\n          <codigoPorcentaje>4</codigoPorcentaje>\n'
+        f'          <tarifa>15</tarifa>\n          <baseImponible>5.00</baseImponible>\n'
+        f'          <valor>0.75</valor>\n        </impuesto>\n      </impuestos>\n    </detalle>\n'
+        for i in range(lineas)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<factura id="comprobante" version="1.1.0">\n'
+        f'  <infoTributaria>\n    <ambiente>1</ambiente>\n    <ruc>1790000000001</ruc>\n'
+        f'    <claveAcceso>{numero:049d}</claveAcceso>\n    <secuencial>{numero:09d}</secuencial>\n'
+        f'  </infoTributaria>\n  <detalles>\n{detalles}  </detalles>\n</factura>\n'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Mide la firma XAdES-BES de comprobantes con y sin caché del certificado y por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facturas', type=int, default=1000, help='Facturas firmadas por forma (por defecto 1000)')
+        parser.add_argument('--lineas', type=int, default=10, help='Líneas por factura (por defecto 10)')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help='Procesos de la firma por lotes (por defecto, uno por CPU)')
+
+    def handle(self, *args, **options):
+        if min(options['facturas'], options['lineas'], options['procesos']) <= 0:
+            raise CommandError('--facturas, --lineas y --procesos deben ser positivos')
+
+        directorio = tempfile.mkdtemp()
+        ruta = os.path.join(directorio, 'benchmark.p12')
+        try:
+            crear_certificado_prueba(ruta, CLAVE)
+            xmls = [_factura(numero, options['lineas']) for numero in range(1, options['facturas'] + 1)]
+            resultados = []
+            for forma in ('sin_cache', 'cache', 'procesos'):
+                firma_xades.invalidar()
+                self.stdout.write(f'Firmando {len(xmls)} facturas ({forma})...')
+                resultado = getattr(self, f'_medir_{forma}')(xmls, ruta, options)
+                resultado['forma'] = forma
+                resultados.append(resultado)
+        finally:
+            firma_xades.invalidar()
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self._reportar(resultados, options)
+
+    def _secuencial(self, xmls, firmar):
+        latencias = []
+        inicio = time.perf_counter()
+        for xml in xmls:
+            antes = time.perf_counter()
+            firmar(xml)
+            latencias.append(time.perf_counter() - antes)
+        latencias.sort()
+        return {
+            'segundos': time.perf_counter() - inicio,
+            'p50': statistics.median(latencias),
+            'p95': latencias[int(len(latencias) * 0.95) - 1],
+        }
+
+    def _medir_sin_cache(self, xmls, ruta, options):
+        return self._secuencial(
+            xmls, lambda xml: firma_xades.firmar(xml, firma_xades.CredencialFirma.cargar(ruta, CLAVE))
+        )
+
+    def _medir_cache(self, xmls, ruta, options):
+        return self._secuencial(xmls, lambda xml: firma_xades.firmar(xml, firma_xades.credencial(ruta, CLAVE)))
+
+    def _medir_procesos(self, xmls, ruta, options):
+        inicio = time.perf_counter()
+        firmados = firma_xades.firmar_lote(xmls, ruta, CLAVE, procesos=options['procesos'])
+        if len(firmados) != len(xmls):
+            raise CommandError('La firma por lotes no devolvió todos los comprobantes')
+        return {'segundos': time.perf_counter() - inicio, 'p50': None, 'p95': None}
+
+    def _reportar(self, resultados, options):
+        self.stdout.write(f"{'forma':<11}{'segundos':>10}{'firmas/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for r in resultados:
+            latencias = ''.join(
+                f'{r[campo] * 1000:>9.2f}' if r[campo] is not None else f"{'-':>9}" for campo in ('p50', 'p95')
+            )
+            self.stdout.write(
+                f"{r['forma']:<11}{r['segundos']:>10.2f}{options['facturas'] / r['segundos']:>10.0f}{latencias}"
+            )
+        base = resultados[0]['segundos']
+        self.stdout.write(
+            f"Certificado en caché: {base / resultados[1]['segundos']:.1f}x; por lotes con "
+            f"{options['procesos']} procesos ({os.cpu_count()} CPU): {base / resultados[2]['segundos']:.1f}x "
+            f"frente a descifrar el certificado por comprobante"
+        )
@@ -0,0 +1,203 @@
+"""
+Comando para medir la generación del XML de facturas de 5, 100 y 1.000
+líneas (``--lineas``).
+
+Compara, para cada tamaño, el generador anterior (árbol ``ElementTree``
+serializado y vuelto a leer con ``minidom.toprettyxml`` para indentarlo)
+con ``XMLComprobanteService.factura``, que escribe el documento por partes.
+Ambos leen los detalles de la base de datos en cada llamada. Se reporta
+también la validación contra el XSD de la factura.
+
+Crea las ventas de prueba y las elimina al terminar; si no hay empresa
+configurada crea una temporal.
+"""
+import statistics
+import time
+import xml.etree.ElementTree as ET
+from decimal import Decimal
+from xml.dom import minidom
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from clientes.models import Cliente
+from core.models import Empresa, TipoIVA
+from core.services.empresa_service import EmpresaService
+from fiscal.services import XMLComprobanteService
+from inventario.models import Categoria, Producto
+from ventas.models import DetalleVenta, Venta
+
+PREFIJO = 'BENCHXML'
+SERIE = '998-001'
+CLAVE = '1' * 49
+
+
+def _xml_anterior(venta, empresa, clave_acceso):
+    """Generador de ``ComprobanteService.generar_xml_factura`` antes del escritor por partes."""
+    estab, pto_emi, secuencial = venta.numero.split('-')
+    xml_factura = ET.Element('factura', id='comprobante', version='1.1.0')
+    info_tributaria = ET.SubElement(xml_factura, 'infoTributaria')
+    for etiqueta, valor in (
+        ('ambiente', empresa.ambiente_facturacion), ('tipoEmision', '1'), ('razonSocial', empresa.nombre),
+        ('nombreComercial', empresa.nombre_comercial or empresa.nombre), ('ruc', empresa.ruc),
+        ('claveAcceso', clave_acceso), ('codDoc', '01'), ('estab', estab), ('ptoEmi', pto_emi),
+        ('secuencial', secuencial), ('dirMatriz', empresa.direccion),
+    ):
+        ET.SubElement(info_tributaria, etiqueta).text = valor
+    info_factura = ET.SubElement(xml_factura, 'infoFactura')
+    ET.SubElement(info_factura, 'fechaEmision').text = venta.fecha.strftime('%d/%m/%Y')
+    ET.SubElement(info_factura, 'dirEstablecimiento').text = empresa.direccion
+    ET.SubElement(info_factura, 'obligadoContabilidad').text = 'SI'
+    ET.SubElement(info_factura, 'tipoIdentificacionComprador').text = venta.cliente.get_tipo_identificacion_sri()
+    ET.SubElement(info_factura, 'razonSocialComprador').text = venta.cliente.nombre_completo
+    ET.SubElement(info_factura, 'identificacionComprador').text = venta.cliente.identificacion
+    ET.SubElement(info_factura, 'totalSinImpuestos').text = f"{venta.subtotal:.2f}"
+    ET.SubElement(info_factura, 'totalDescuento').text = f"{venta.descuento:.2f}"
+    total_con_impuestos = ET.SubElement(info_factura, 'totalConImpuestos')
+    lineas = list(venta.detalles.select_related('producto', 'tipo_iva'))
+    detalles_por_iva = {}
+    for detalle in lineas:
+        valores = detalles_por_iva.setdefault(detalle.tipo_iva.codigo, {'baseImponible': 0, 'valor': 0})
+        valores['baseImponible'] += detalle.subtotal
+        valores['valor'] += detalle.iva
+    for codigo_iva, valores in detalles_por_iva.items():
+        total_impuesto = ET.SubElement(total_con_impuestos, 'totalImpuesto')
+        ET.SubElement(total_impuesto, 'codigo').text = '2'
+        ET.SubElement(total_impuesto, 'codigoPorcentaje').text = codigo_iva
+        ET.SubElement(total_impuesto, 'baseImponible').text = f"{valores['baseImponible']:.2f}"
+        ET.SubElement(total_impuesto, 'valor').text = f"{valores['valor']:.2f}"
+    ET.SubElement(info_factura, 'propina').text = '0.00'
+    ET.SubElement(info_factura, 'importeTotal').text = f"{venta.total:.2f}"
+    ET.SubElement(info_factura, 'moneda').text = 'DOLAR'
+    detalles = ET.SubElement(xml_factura, 'detalles')
+    for detalle in lineas:
+        detalle_xml = ET.SubElement(detalles, 'detalle')
+        ET.SubElement(detalle_xml, 'codigoPrincipal').text = detalle.producto.codigo
+        ET.SubElement(detalle_xml, 'descripcion').text = detalle.producto.nombre
+        ET.SubElement(detalle_xml, 'cantidad').text = f"{detalle.cantidad:.2f}"
+        ET.SubElement(detalle_xml, 'precioUnitario').text = f"{detalle.precio_unitario:.2f}"
+        ET.SubElement(detalle_xml, 'descuento').text = f"{detalle.descuento:.2f}"
+        ET.SubElement(detalle_xml, 'precioTotalSinImpuesto').text = f"{detalle.subtotal:.2f}"
+        impuesto = ET.SubElement(ET.SubElement(detalle_xml, 'impuestos'), 'impuesto')
+        ET.SubElement(impuesto, 'codigo').text = '2'
+        ET.SubElement(impuesto, 'codigoPorcentaje').text = detalle.tipo_iva.codigo
+        ET.SubElement(impuesto, 'tarifa').text = f"{detalle.tipo_iva.porcentaje:.2f}"
+        ET.SubElement(impuesto, 'baseImponible').text = f"{detalle.subtotal:.2f}"
+        ET.SubElement(impuesto, 'valor').text = f"{detalle.iva:.2f}"
+    info_adicional = ET.SubElement(xml_factura, 'infoAdicional')
+    ET.SubElement(info_adicional, 'campoAdicional', nombre='Email').text = venta.cliente.email
+    dom = minidom.parseString(ET.tostring(xml_factura, encoding='utf-8'))
+    return dom.toprettyxml(indent="  ", encoding='utf-8').decode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Compara la generación del XML de facturas con árbol y minidom frente al escritor por partes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, nargs='+', default=[5, 100, 1000],
+                            help='Líneas de cada factura medida (por defecto 5 100 1000)')
+        parser.add_argument('--repeticiones', type=int, default=20,
+                            help='Veces que se genera cada factura con cada forma (por defecto 20)')
+
+    def handle(self, *args, **options):
+        if min(options['lineas']) <= 0 or options['repeticiones'] <= 0:
+            raise CommandError('--lineas y --repeticiones deben ser positivos')
+        if Venta.objects.filter(numero__startswith=f'{SERIE}-').exists():
+            raise CommandError(f'Ya existen ventas con la serie {SERIE}; elimínelas antes de medir')
+
+        empresa = EmpresaService.get_empresa()
+        empresa_temporal = None
+        if empresa is None:
+            empresa = empresa_temporal = Empresa.objects.create(
+                nombre='Empresa benchmark', ruc='1790000000001', direccion='Quito', ambiente_facturacion='1'
+            )
+        resultados = []
+        creados = None
+        try:
+            creados = self._generar_datos(options['lineas'])
+            for lineas, venta_id in zip(options['lineas'], creados['ventas']):
+                self.stdout.write(f'Factura de {lineas} líneas...')
+                resultados.append(self._medir(lineas, venta_id, empresa, options['repeticiones']))
+        finally:
+            self._limpiar(creados)
+            if empresa_temporal is not None:
+                empresa_temporal.delete()
+
+        self._reportar(resultados)
+
+    def _generar_datos(self, tamanos):
+        categoria = Categoria.objects.create(nombre=f'{PREFIJO} categoría')
+        iva = TipoIVA.objects.filter(porcentaje__gt=0).first()
+        iva_creado = iva is None
+        if iva_creado:
+            iva = TipoIVA.objects.create(nombre=f'{PREFIJO} IVA 15%', codigo='4', porcentaje=15)
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion=PREFIJO, nombres='Cliente', apellidos='Benchmark',
+            email='benchmark-xml@sysfree.local'
+        )
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'{PREFIJO}-{i}', nombre=f'Producto {i} & accesorios', categoria=categoria,
+                     precio_compra=Decimal('3.00'), precio_venta=Decimal('5.00'), stock=Decimal('100.00'))
+            for i in range(max(tamanos))
+        ])
+        iva_linea = (Decimal('5.00') * iva.porcentaje / 100).quantize(Decimal('0.01'))
+        ventas = Venta.objects.bulk_create([
+            Venta(numero=f'{SERIE}-{i:09d}', cliente=cliente, tipo='factura', estado='pagada',
+                  subtotal=Decimal('5.00') * lineas, total=(Decimal('5.00') + iva_linea) * lineas)
+            for i, lineas in enumerate(tamanos, start=1)
+        ])
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=venta, producto=producto, cantidad=Decimal('1.00'), precio_unitario=Decimal('5.00'),
+                         tipo_iva=iva, subtotal=Decimal('5.00'), iva=iva_linea, total=Decimal('5.00') + iva_linea)
+            for venta, lineas in zip(ventas, tamanos) for producto in productos[:lineas]
+        ], batch_size=5000)
+        return {
+            'ventas': [venta.pk for venta in ventas], 'cliente': cliente, 'categoria': categoria,
+            'iva': iva if iva_creado else None,
+        }
+
+    def _limpiar(self, creados):
+        if not creados:
+            return
+        DetalleVenta.objects.filter(venta_id__in=creados['ventas'])._raw_delete(connection.alias)
+        Venta.objects.filter(pk__in=creados['ventas'])._raw_delete(connection.alias)
+        Producto.objects.filter(codigo__startswith=f'{PREFIJO}-').delete()
+        creados['categoria'].delete()
+        creados['cliente'].delete()
+        if creados['iva']:
+            creados['iva'].delete()
+
+    def _medir(self, lineas, venta_id, empresa, repeticiones):
+        venta = Venta.objects.select_related('cliente').get(pk=venta_id)
+        formas = {
+            'anterior': lambda: _xml_anterior(venta, empresa, CLAVE),
+            'por_partes': lambda: XMLComprobanteService.factura(venta, CLAVE),
+        }
+        tiempos = {}
+        for forma, generar in formas.items():
+            muestras = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                xml = generar()
+                muestras.append(time.perf_counter() - inicio)
+            tiempos[forma] = statistics.median(muestras)
+
+        errores = XMLComprobanteService.validar(xml)
+        if errores:
+            raise CommandError(f'El XML de {lineas} líneas no cumple el esquema: {errores[:3]}')
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            XMLComprobanteService.validar(xml)
+        validacion = (time.perf_counter() - inicio) / repeticiones
+        return {'lineas': lineas, 'bytes': len(xml.encode('utf-8')), 'validacion': validacion, **tiempos}
+
+    def _reportar(self, resultados):
+        self.stdout.write(
+            f"{'líneas':>7}{'KB':>8}{'anterior ms':>13}{'por partes ms':>15}{'mejora':>8}{'validar XSD ms':>16}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['lineas']:>7}{r['bytes'] / 1024:>8.1f}{r['anterior'] * 1000:>13.2f}"
+                f"{r['por_partes'] * 1000:>15.2f}{r['anterior'] / r['por_partes']:>7.1f}x"
+                f"{r['validacion'] * 1000:>16.2f}"
+            )
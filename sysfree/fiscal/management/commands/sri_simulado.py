@@ -0,0 +1,67 @@
+"""
+Comando que ejecuta el simulador local de los web services del SRI
+(``fiscal.utils.sri_simulado``) hasta que se interrumpe con Ctrl+C.
+
+Para facturar contra él, las URLs de recepción y autorización de la empresa
+deben apuntar a las que imprime al iniciar (``--configurar-empresa`` las
+guarda en el ambiente de pruebas).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.empresa_service import EmpresaService
+from fiscal.utils.sri_simulado import ServidorSRISimulado
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta un simulador local de los web services de recepción y autorización del SRI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--puerto', type=int, default=8089, help='Puerto de escucha (por defecto 8089)')
+        parser.add_argument('--latencia', type=float, default=0.2,
+                            help='Segundos de espera de cada respuesta (por defecto 0.2)')
+        parser.add_argument('--variacion', type=float, default=0.1,
+                            help='Variación aleatoria máxima sumada a la latencia (por defecto 0.1)')
+        parser.add_argument('--tasa-fallos', type=float, default=0.0,
+                            help='Fracción de solicitudes que responden HTTP 500')
+        parser.add_argument('--tasa-devueltas', type=float, default=0.0,
+                            help='Fracción de comprobantes devueltos en la recepción')
+        parser.add_argument('--tasa-en-proceso', type=float, default=0.0,
+                            help='Fracción de comprobantes cuya primera consulta de autorización responde EN PROCESO')
+        parser.add_argument('--configurar-empresa', action='store_true',
+                            help='Apunta las URLs de pruebas de la empresa al simulador')
+
+    def handle(self, *args, **options):
+        for opcion in ('tasa_fallos', 'tasa_devueltas', 'tasa_en_proceso'):
+            if not 0 <= options[opcion] <= 1:
+                raise CommandError(f"--{opcion.replace('_', '-')} debe estar entre 0 y 1")
+
+        simulador = ServidorSRISimulado(
+            puerto=options['puerto'], latencia=options['latencia'], variacion=options['variacion'],
+            tasa_fallos=options['tasa_fallos'], tasa_devueltas=options['tasa_devueltas'],
+            tasa_en_proceso=options['tasa_en_proceso'],
+        )
+        if options['configurar_empresa']:
+            empresa = EmpresaService.get_empresa()
+            if not empresa:
+                raise CommandError('No se ha configurado una empresa en el sistema.')
+            empresa.ambiente_facturacion = '1'
+            empresa.url_recepcion_pruebas = simulador.url_recepcion
+            empresa.url_autorizacion_pruebas = simulador.url_autorizacion
+            empresa.save(update_fields=['ambiente_facturacion', 'url_recepcion_pruebas', 'url_autorizacion_pruebas'])
+
+        self.stdout.write(f'Recepción:    {simulador.url_recepcion}')
+        self.stdout.write(f'Autorización: {simulador.url_autorizacion}')
+        simulador.iniciar()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulador.detener()
+            self.stdout.write(
+                f"Solicitudes: {simulador.solicitudes['recepcion']} de recepción, "
+                f"{simulador.solicitudes['autorizacion']} de autorización, {simulador.solicitudes['fallos']} fallidas"
+            )
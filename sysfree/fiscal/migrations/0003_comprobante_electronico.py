@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-17 22:40
+
+import core.models.auditoria
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0002_initial'),
+        ('ventas', '0002_indices_fecha_reportes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComprobanteElectronico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='fecha de creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='fecha de modificación')),
+                ('activo', models.BooleanField(default=True, verbose_name='activo')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('generado', 'XML generado'), ('firmado', 'Firmado'), ('recibido', 'Recibido por el SRI'), ('autorizado', 'Autorizado'), ('ride_generado', 'RIDE generado'), ('notificado', 'Notificado'), ('devuelto', 'Devuelto por el SRI'), ('no_autorizado', 'No autorizado')], default='pendiente', max_length=15, verbose_name='estado')),
+                ('clave_acceso', models.CharField(blank=True, max_length=49, verbose_name='clave de acceso')),
+                ('xml', models.TextField(blank=True, verbose_name='XML')),
+                ('xml_firmado', models.TextField(blank=True, verbose_name='XML firmado')),
+                ('ride', models.FileField(blank=True, upload_to='fiscal/ride/%Y/%m/', verbose_name='RIDE')),
+                ('numero_autorizacion', models.CharField(blank=True, max_length=49, verbose_name='número de autorización')),
+                ('fecha_autorizacion', models.DateTimeField(blank=True, null=True, verbose_name='fecha de autorización')),
+                ('mensajes', models.JSONField(blank=True, default=list, verbose_name='mensajes del SRI')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='intentos')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='último error')),
+                ('fecha_estado', models.DateTimeField(auto_now_add=True, verbose_name='fecha del estado')),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_creados', to=settings.AUTH_USER_MODEL, verbose_name='creado por')),
+                ('modificado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_modificados', to=settings.AUTH_USER_MODEL, verbose_name='modificado por')),
+                ('venta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='comprobante_electronico', to='ventas.venta', verbose_name='venta')),
+            ],
+            options={
+                'verbose_name': 'comprobante electrónico',
+                'verbose_name_plural': 'comprobantes electrónicos',
+                'ordering': ['-fecha_estado'],
+                'indexes': [models.Index(fields=['estado', 'fecha_estado'], name='fiscal_comp_estado_8b0313_idx')],
+            },
+            bases=(core.models.auditoria.EstadoOriginalMixin, models.Model),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0003_comprobante_electronico'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comprobanteelectronico',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('generado', 'XML generado'), ('firmado', 'Firmado'), ('enviando', 'Enviando al SRI'), ('recibido', 'Recibido por el SRI'), ('autorizado', 'Autorizado'), ('ride_generado', 'RIDE generado'), ('notificando', 'Enviando correo'), ('notificado', 'Notificado'), ('devuelto', 'Devuelto por el SRI'), ('no_autorizado', 'No autorizado')], default='pendiente', max_length=15, verbose_name='estado'),
+        ),
+    ]
@@ -6,6 +6,7 @@ from .comprobante import Comprobante
 from .impuesto import Impuesto  # Ahora es un alias para TipoIVA
 from .retencion import Retencion
 from .comprobante_retencion import ComprobanteRetencion, DetalleRetencion
+from .comprobante_electronico import ComprobanteElectronico
 
 __all__ = [
     'PeriodoFiscal',
@@ -17,4 +18,5 @@ __all__ = [
     'Retencion',
     'ComprobanteRetencion',
     'DetalleRetencion',
+    'ComprobanteElectronico',
 ]
\ No newline at end of file
@@ -0,0 +1,58 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from core.models import ModeloBase
+
+
+class ComprobanteElectronico(ModeloBase):
+    """
+    Estado de la facturación electrónica de una venta.
+
+    Cada etapa (XML, firma, recepción, autorización, RIDE y correo) guarda su
+    resultado antes de avanzar el estado, de modo que un reintento o una
+    reanudación continúa desde la última etapa completada sin repetir las
+    anteriores (ver ``FacturacionElectronicaService``).
+    """
+
+    ESTADO_CHOICES = (
+        ('pendiente', _('Pendiente')),
+        ('generado', _('XML generado')),
+        ('firmado', _('Firmado')),
+        ('enviando', _('Enviando al SRI')),
+        ('recibido', _('Recibido por el SRI')),
+        ('autorizado', _('Autorizado')),
+        ('ride_generado', _('RIDE generado')),
+        ('notificando', _('Enviando correo')),
+        ('notificado', _('Notificado')),
+        ('devuelto', _('Devuelto por el SRI')),
+        ('no_autorizado', _('No autorizado')),
+    )
+
+    venta = models.OneToOneField(
+        'ventas.Venta',
+        verbose_name=_('venta'),
+        on_delete=models.CASCADE,
+        related_name='comprobante_electronico'
+    )
+    estado = models.CharField(_('estado'), max_length=15, choices=ESTADO_CHOICES, default='pendiente')
+    clave_acceso = models.CharField(_('clave de acceso'), max_length=49, blank=True)
+    xml = models.TextField(_('XML'), blank=True)
+    xml_firmado = models.TextField(_('XML firmado'), blank=True)
+    ride = models.FileField(_('RIDE'), upload_to='fiscal/ride/%Y/%m/', blank=True)
+    numero_autorizacion = models.CharField(_('número de autorización'), max_length=49, blank=True)
+    fecha_autorizacion = models.DateTimeField(_('fecha de autorización'), null=True, blank=True)
+    mensajes = models.JSONField(_('mensajes del SRI'), default=list, blank=True)
+    # Intentos fallidos de la etapa en curso y último error (se limpian al avanzar)
+    intentos = models.PositiveIntegerField(_('intentos'), default=0)
+    ultimo_error = models.TextField(_('último error'), blank=True)
+    fecha_estado = models.DateTimeField(_('fecha del estado'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('comprobante electrónico')
+        verbose_name_plural = _('comprobantes electrónicos')
+        ordering = ['-fecha_estado']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_estado']),
+        ]
+
+    def __str__(self):
+        return f"{self.venta_id} - {self.get_estado_display()}"
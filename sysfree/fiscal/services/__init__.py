@@ -1,7 +1,11 @@
 from .contabilidad_service import ContabilidadService
 from .comprobante_service import ComprobanteService
+from .facturacion_electronica_service import FacturacionElectronicaService
+from .xml_comprobante_service import XMLComprobanteService
 
 __all__ = [
     'ContabilidadService',
     'ComprobanteService',
+    'FacturacionElectronicaService',
+    'XMLComprobanteService',
 ]
\ No newline at end of file
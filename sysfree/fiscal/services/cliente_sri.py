@@ -0,0 +1,254 @@
+"""
+Cliente SOAP de los web services de recepción y autorización del SRI.
+
+Cada proceso usa una única instancia (``ClienteSRI.compartido()``) con una
+``requests.Session``, cuyo pool mantiene abiertas las conexiones (TCP y TLS)
+con el SRI entre documentos en lugar de abrir una por llamada. Los errores de
+conexión y las respuestas 5xx se reintentan en el adaptador con espera
+exponencial y variación aleatoria; reenviar un comprobante es seguro porque
+el SRI responde CLAVE ACCESO REGISTRADA.
+
+Las respuestas se interpretan a medida que llegan (``XMLPullParser``) y se
+descarta el comprobante autorizado que el SRI devuelve embebido, que es la
+mayor parte del cuerpo.
+"""
+import base64
+import os
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TAMANO_BLOQUE = 16 * 1024
+ESTADOS_REINTENTABLES = (500, 502, 503, 504)
+CABECERAS = {'Content-Type': 'application/soap+xml;charset=UTF-8'}
+
+_RECEPCION = (
+    b'<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+    b'xmlns:ec="http://ec.gob.sri.ws.recepcion"><soapenv:Header/><soapenv:Body>'
+    b'<ec:validarComprobante><xml>%s</xml></ec:validarComprobante></soapenv:Body></soapenv:Envelope>'
+)
+_AUTORIZACION = (
+    b'<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+    b'xmlns:ec="http://ec.gob.sri.ws.autorizacion"><soapenv:Header/><soapenv:Body>'
+    b'<ec:autorizacionComprobante><claveAccesoComprobante>%s</claveAccesoComprobante>'
+    b'</ec:autorizacionComprobante></soapenv:Body></soapenv:Envelope>'
+)
+
+
+def _nombre(tag):
+    """Nombre local de una etiqueta (sin espacio de nombres)."""
+    return tag.rpartition('}')[2]
+
+
+def _mensaje(elemento):
+    return {
+        'identificador': elemento.findtext('identificador', ''),
+        'mensaje': elemento.findtext('mensaje', ''),
+        'tipo': elemento.findtext('tipo', ''),
+        'informacionAdicional': elemento.findtext('informacionAdicional', ''),
+    }
+
+
+class _LectorRespuesta:
+    """Interpreta una respuesta SOAP del SRI por bloques, a medida que llega."""
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._ruta = []
+        self.estado = None
+        self.numero_comprobantes = None
+        self.mensajes = []
+        self.autorizaciones = []
+
+    def alimentar(self, datos):
+        self._parser.feed(datos)
+        for evento, elemento in self._parser.read_events():
+            nombre = _nombre(elemento.tag)
+            if evento == 'start':
+                self._ruta.append(nombre)
+                continue
+            self._ruta.pop()
+            if 'autorizacion' in self._ruta:
+                if nombre == 'comprobante':
+                    elemento.clear()  # Comprobante autorizado embebido: no se usa
+            elif nombre == 'autorizacion':
+                self.autorizaciones.append({
+                    'estado': elemento.findtext('estado', ''),
+                    'numeroAutorizacion': elemento.findtext('numeroAutorizacion', ''),
+                    'fechaAutorizacion': elemento.findtext('fechaAutorizacion', ''),
+                    'mensajes': [_mensaje(mensaje) for mensaje in elemento.iterfind('mensajes/mensaje')],
+                })
+                elemento.clear()
+            elif nombre == 'estado' and self.estado is None:
+                self.estado = elemento.text
+            elif nombre == 'numeroComprobantes':
+                self.numero_comprobantes = elemento.text
+            elif nombre == 'mensaje' and elemento.find('identificador') is not None:
+                self.mensajes.append(_mensaje(elemento))
+
+    def resultado(self):
+        self._parser.close()
+        if self.autorizaciones:
+            # El SRI puede devolver varios intentos de un comprobante; cuenta el autorizado
+            autorizacion = next(
+                (a for a in self.autorizaciones if a['estado'] == 'AUTORIZADO'), self.autorizaciones[0]
+            )
+            return dict(autorizacion)
+        if self.estado is None:
+            if self.numero_comprobantes is not None:
+                # Autorización sin comprobantes: el SRI aún no termina de procesarlo
+                return {'estado': 'EN PROCESO', 'mensajes': []}
+            raise ValueError('La respuesta del SRI no contiene un estado')
+        return {'estado': self.estado, 'mensajes': self.mensajes}
+
+
+class ClienteSRI:
+    """
+    Cliente de los web services del SRI con conexiones persistentes.
+
+    Args:
+        conexiones (int): Conexiones que el pool mantiene abiertas por host
+        reintentos (int): Reintentos ante errores de conexión y respuestas 5xx
+        factor_espera (float): Factor de la espera exponencial entre reintentos
+            (segundos); se le suma una variación aleatoria de hasta el mismo valor
+        verificar: Verificación TLS de ``requests`` (True, False o ruta de un CA)
+    """
+
+    _compartido = None
+    _pid = None
+    _candado = threading.Lock()
+
+    def __init__(self, conexiones=None, reintentos=None, factor_espera=None, verificar=True):
+        conexiones = conexiones or getattr(settings, 'SRI_CONEXIONES', 20)
+        reintentos = getattr(settings, 'SRI_REINTENTOS', 2) if reintentos is None else reintentos
+        factor_espera = getattr(settings, 'SRI_REINTENTO_FACTOR', 0.5) if factor_espera is None else factor_espera
+        reintento = Retry(
+            total=reintentos, status_forcelist=ESTADOS_REINTENTABLES, allowed_methods=frozenset({'POST'}),
+            backoff_factor=factor_espera, backoff_jitter=factor_espera, raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=conexiones, max_retries=reintento)
+        self.sesion = requests.Session()
+        self.sesion.mount('https://', adaptador)
+        self.sesion.mount('http://', adaptador)
+        self.sesion.headers.update(CABECERAS)
+        # Por solicitud: REQUESTS_CA_BUNDLE tendría prioridad sobre Session.verify
+        self.verificar = verificar
+
+    @classmethod
+    def compartido(cls):
+        """Instancia del proceso (se crea de nuevo en cada proceso hijo de un fork)."""
+        pid = os.getpid()
+        if cls._compartido is None or cls._pid != pid:
+            with cls._candado:
+                if cls._compartido is None or cls._pid != pid:
+                    cls._compartido, cls._pid = cls(), pid
+        return cls._compartido
+
+    @staticmethod
+    def timeout():
+        """Timeouts (conexión, lectura) en segundos de las llamadas al SRI."""
+        return (getattr(settings, 'SRI_TIMEOUT_CONEXION', 5), getattr(settings, 'SRI_TIMEOUT_LECTURA', 20))
+
+    def enviar(self, url, xml):
+        """
+        Envía un comprobante firmado al web service de recepción.
+
+        Args:
+            url (str): URL del servicio de recepción
+            xml (str | bytes): Comprobante firmado
+
+        Returns:
+            dict: ``estado`` (RECIBIDA, DEVUELTA o ERROR_PARSE) y ``mensajes``
+        """
+        if isinstance(xml, str):
+            xml = xml.encode('utf-8')
+        return self._llamar(url, _RECEPCION % base64.b64encode(xml))
+
+    def autorizar(self, url, clave_acceso):
+        """
+        Consulta la autorización de un comprobante.
+
+        Returns:
+            dict: ``estado`` (AUTORIZADO, NO AUTORIZADO, EN PROCESO o ERROR_PARSE),
+            ``mensajes`` y, si el SRI devolvió el comprobante,
+            ``numeroAutorizacion`` y ``fechaAutorizacion``
+        """
+        return self._llamar(url, _AUTORIZACION % clave_acceso.encode('ascii'))
+
+    def autorizar_lote(self, url, claves, paralelo=None):
+        """
+        Consulta la autorización de varios comprobantes en paralelo sobre el
+        mismo pool de conexiones.
+
+        Args:
+            url (str): URL del servicio de autorización
+            claves (list): Claves de acceso
+            paralelo (int): Consultas simultáneas (por defecto ``SRI_AUTORIZACION_PARALELO``)
+
+        Returns:
+            dict: Respuesta de ``autorizar`` por clave; las consultas que fallan
+            tienen estado ``ERROR_CONEXION``
+        """
+        claves = list(dict.fromkeys(claves))
+        if not claves:
+            return {}
+        paralelo = min(paralelo or getattr(settings, 'SRI_AUTORIZACION_PARALELO', 8), len(claves))
+
+        def consultar(clave):
+            try:
+                return self.autorizar(url, clave)
+            except ConnectionError as e:
+                return {'estado': 'ERROR_CONEXION', 'mensajes': [{'mensaje': str(e)}]}
+
+        with ThreadPoolExecutor(paralelo) as consultas:
+            return dict(zip(claves, consultas.map(consultar, claves)))
+
+    def _llamar(self, url, cuerpo):
+        try:
+            with self.sesion.post(
+                url, data=cuerpo, timeout=self.timeout(), verify=self.verificar, stream=True
+            ) as respuesta:
+                respuesta.raise_for_status()
+                lector = _LectorRespuesta()
+                try:
+                    for bloque in respuesta.iter_content(TAMANO_BLOQUE):
+                        lector.alimentar(bloque)
+                    return lector.resultado()
+                except (ET.ParseError, ValueError) as e:
+                    return {'estado': 'ERROR_PARSE', 'mensajes': [{'mensaje': str(e)}]}
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"Error de conexión con el SRI: {e}")
+
+    @staticmethod
+    def interpretar(respuesta):
+        """
+        Interpreta una respuesta SOAP completa del SRI.
+
+        Args:
+            respuesta (str | bytes): Cuerpo de la respuesta
+
+        Returns:
+            dict: Igual que ``enviar`` o ``autorizar``
+        """
+        if isinstance(respuesta, str):
+            respuesta = respuesta.encode('utf-8')
+        lector = _LectorRespuesta()
+        try:
+            lector.alimentar(respuesta)
+            return lector.resultado()
+        except (ET.ParseError, ValueError) as e:
+            return {'estado': 'ERROR_PARSE', 'mensajes': [{'mensaje': str(e)}]}
+
+
+@receiver(setting_changed)
+def _reiniciar_cliente_compartido(setting, **kwargs):
+    """Descarta la instancia del proceso si cambia su configuración (p. ej. en pruebas)."""
+    if setting.startswith('SRI_'):
+        ClienteSRI._compartido = None
@@ -1,8 +1,12 @@
+import logging
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from ..models import AsientoContable, LineaAsiento, PeriodoFiscal, CuentaContable
 from core.services.auditoria_service import AuditoriaService
 
+logger = logging.getLogger('sysfree')
+
 
 class ContabilidadService:
     """Servicio para gestionar operaciones contables."""
@@ -79,6 +83,59 @@ class ContabilidadService:
         
         return asiento
     
+    @classmethod
+    @transaction.atomic
+    def crear_asiento_venta(cls, venta, usuario=None):
+        """
+        Crea el asiento de una venta cobrada: debe a la cuenta de cobro por el
+        total, haber a ingresos por el subtotal y a IVA por pagar por el IVA.
+
+        Las cuentas se toman de ``settings.CUENTAS_ASIENTO_VENTA`` (códigos
+        ``cobro``, ``ingreso`` e ``iva``); si no están configuradas no se crea
+        asiento. Si la venta ya tiene asiento se devuelve el existente.
+
+        Args:
+            venta: Venta cobrada
+            usuario: Usuario que registra el asiento
+
+        Returns:
+            AsientoContable: Asiento de la venta o None si no hay cuentas configuradas
+        """
+        codigos = getattr(settings, 'CUENTAS_ASIENTO_VENTA', {})
+        if not all(codigos.get(clave) for clave in ('cobro', 'ingreso', 'iva')):
+            return None
+
+        existente = AsientoContable.objects.filter(
+            tipo='venta', referencia_tipo='Venta', referencia_id=venta.id
+        ).first()
+        if existente:
+            return existente
+
+        cuentas = dict(
+            CuentaContable.objects.filter(codigo__in=codigos.values()).values_list('codigo', 'id')
+        )
+        faltantes = [codigo for codigo in codigos.values() if codigo not in cuentas]
+        if faltantes:
+            raise ValueError(f"Cuentas contables no encontradas: {', '.join(faltantes)}")
+
+        iva = venta.total - venta.subtotal
+        lineas = [
+            {'cuenta_id': cuentas[codigos['cobro']], 'descripcion': f'Cobro {venta.numero}', 'debe': venta.total},
+            {'cuenta_id': cuentas[codigos['ingreso']], 'descripcion': f'Venta {venta.numero}', 'haber': venta.subtotal},
+        ]
+        if iva:
+            lineas.append({'cuenta_id': cuentas[codigos['iva']], 'descripcion': f'IVA {venta.numero}', 'haber': iva})
+
+        return cls.crear_asiento(
+            fecha=timezone.localdate(venta.fecha),
+            concepto=f'Venta {venta.numero}',
+            lineas=lineas,
+            tipo='venta',
+            referencia_id=venta.id,
+            referencia_tipo='Venta',
+            usuario=usuario
+        )
+
     @classmethod
     def validar_asiento(cls, asiento, usuario=None):
         """
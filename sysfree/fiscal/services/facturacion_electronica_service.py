@@ -0,0 +1,436 @@
+"""
+Servicio de facturación electrónica por etapas.
+
+El proceso de una factura (XML, firma, recepción y autorización en el SRI,
+RIDE y correo) se divide en etapas independientes que se encolan por
+separado (``fiscal.tasks.ejecutar_etapa_facturacion_task``), cada una en la
+cola de ``FACTURACION_COLAS``. El resultado de cada etapa se guarda en
+``ComprobanteElectronico`` junto con el nuevo estado, así que:
+
+- un fallo solo reintenta su etapa: la firma o el XML ya guardados no se
+  repiten porque el SRI tarde en responder;
+- un worker de CPU nunca queda esperando al SRI, ni uno de red ocupado
+  firmando;
+- ejecutar dos veces la misma etapa no tiene efecto: el estado solo avanza si
+  sigue siendo el de origen de la etapa (actualización condicional). Las
+  etapas con efecto externo (envío al SRI y correo) toman antes la transición
+  pasando a un estado de reserva (``RESERVAS``), así que una tarea repetida no
+  vuelve a enviar; una reserva abandonada (worker muerto) se puede volver a
+  tomar tras ``FACTURACION_RESERVA_VIGENCIA`` y un reenvío al SRI que responde
+  CLAVE ACCESO REGISTRADA se toma como recibido.
+
+Las llamadas al SRI pasan por un interruptor de circuito compartido
+(``SRI_CIRCUITO``): con el SRI caído las tareas se reprograman sin llamarlo.
+
+La etapa de autorización consulta una vez, justo tras la recepción; los
+comprobantes que quedan EN PROCESO los retoma la consulta periódica por lotes
+(``consultar_autorizaciones``) en lugar de reintentar cada uno su tarea.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.services.empresa_service import EmpresaService
+from sysfree.monitoring import (
+    SRI_AUTHORIZATION_POLL_DURATION, SRI_AUTHORIZATION_POLL_THROUGHPUT, SRI_AUTHORIZATION_POLLS,
+)
+from ventas.models import Venta
+from ..models import ComprobanteElectronico
+from ..utils.circuito import CircuitoAbierto, InterruptorCircuito
+from .comprobante_service import ComprobanteService
+from .xml_comprobante_service import XMLComprobanteService
+
+logger = logging.getLogger('sysfree')
+
+# Identificador del mensaje de recepción "CLAVE ACCESO REGISTRADA"
+SRI_CLAVE_REGISTRADA = '43'
+# Resultados de la consulta de autorizaciones por lotes
+RESULTADOS_AUTORIZACION = ('autorizado', 'no_autorizado', 'en_proceso', 'error')
+
+
+class EtapaPendiente(Exception):
+    """La etapa todavía no puede completarse (SRI no disponible o EN PROCESO); reintentar tras ``espera`` segundos."""
+
+    def __init__(self, mensaje, espera):
+        self.espera = espera
+        super().__init__(mensaje)
+
+
+class FacturacionElectronicaService:
+    """Servicio que ejecuta las etapas de la facturación electrónica de una venta."""
+
+    ETAPAS = ('xml', 'firma', 'recepcion', 'autorizacion', 'ride', 'correo')
+    # Estado desde el que se ejecuta cada etapa y estado al que lleva
+    TRANSICIONES = {
+        'xml': ('pendiente', 'generado'),
+        'firma': ('generado', 'firmado'),
+        'recepcion': ('firmado', 'recibido'),
+        'autorizacion': ('recibido', 'autorizado'),
+        'ride': ('autorizado', 'ride_generado'),
+        'correo': ('ride_generado', 'notificado'),
+    }
+    # Estado que ocupa el comprobante mientras se ejecuta una etapa con efecto externo
+    RESERVAS = {'recepcion': 'enviando', 'correo': 'notificando'}
+    ESTADOS_FINALES = ('notificado', 'devuelto', 'no_autorizado')
+
+    @classmethod
+    def circuito_sri(cls):
+        """Interruptor de circuito de los web services del SRI."""
+        return InterruptorCircuito('sri', **getattr(settings, 'SRI_CIRCUITO', {}))
+
+    @classmethod
+    def iniciar(cls, venta_id):
+        """
+        Crea (o recupera) el comprobante electrónico de una venta.
+
+        Args:
+            venta_id: ID de la venta
+
+        Returns:
+            tuple: (ComprobanteElectronico, primera etapa pendiente o None si terminó)
+        """
+        comprobante, _ = ComprobanteElectronico.objects.get_or_create(venta_id=venta_id)
+        return comprobante, cls.siguiente_etapa(comprobante)
+
+    @classmethod
+    def siguiente_etapa(cls, comprobante):
+        """
+        Etapa que corresponde al estado actual del comprobante.
+
+        Returns:
+            str: Nombre de la etapa, o None si el comprobante está en un estado final
+        """
+        for etapa in cls.ETAPAS:
+            if comprobante.estado in (cls.TRANSICIONES[etapa][0], cls.RESERVAS.get(etapa)):
+                return etapa
+        return None
+
+    @classmethod
+    def ejecutar_etapa(cls, comprobante_id, etapa):
+        """
+        Ejecuta una etapa y guarda su resultado avanzando el estado.
+
+        Si el comprobante ya no está en el estado de origen de la etapa (otra
+        ejecución la completó) no hace nada. Las etapas de ``RESERVAS`` pasan
+        primero al estado de reserva y solo entonces ejecutan su efecto; si no
+        lo consiguen (otra ejecución la tiene en curso) tampoco hacen nada.
+
+        Args:
+            comprobante_id: ID del comprobante electrónico
+            etapa (str): Una de ``ETAPAS``
+
+        Returns:
+            str: Siguiente etapa a encolar, o None si no hay que continuar
+
+        Raises:
+            EtapaPendiente: La etapa debe reintentarse más tarde
+            Exception: Error de la etapa (queda en ``ultimo_error``)
+        """
+        origen, destino = cls.TRANSICIONES[etapa]
+        reserva = cls.RESERVAS.get(etapa)
+        comprobante = ComprobanteElectronico.objects.select_related('venta__cliente').get(pk=comprobante_id)
+        if comprobante.estado not in (origen, reserva):
+            logger.info(
+                f"Etapa '{etapa}' omitida para el comprobante {comprobante_id}: estado {comprobante.estado}"
+            )
+            return cls.siguiente_etapa(comprobante)
+        if reserva and not cls._reservar(comprobante_id, origen, reserva):
+            logger.info(f"Etapa '{etapa}' omitida para el comprobante {comprobante_id}: en curso en otra ejecución")
+            return None
+        actual = reserva or origen
+
+        try:
+            cambios = getattr(cls, f'_etapa_{etapa}')(comprobante)
+        except Exception as e:
+            # La reserva se libera: el reintento vuelve a tomar la etapa
+            ComprobanteElectronico.objects.filter(pk=comprobante_id, estado=actual).update(
+                estado=origen, intentos=comprobante.intentos + 1, ultimo_error=f'{etapa}: {e}'
+            )
+            raise
+
+        cambios.setdefault('estado', destino)
+        cambios.update(fecha_estado=timezone.now(), intentos=0, ultimo_error='')
+        with transaction.atomic():
+            avanzado = ComprobanteElectronico.objects.filter(pk=comprobante_id, estado=actual).update(**cambios)
+            if avanzado and cambios['estado'] == 'autorizado':
+                Venta.objects.filter(pk=comprobante.venta_id).update(
+                    numero_autorizacion=cambios['numero_autorizacion'],
+                    fecha_autorizacion=cambios['fecha_autorizacion'],
+                )
+        if not avanzado:
+            comprobante.refresh_from_db(fields=['estado'])
+            return cls.siguiente_etapa(comprobante)
+
+        nivel = logging.WARNING if cambios['estado'] in ('devuelto', 'no_autorizado') else logging.INFO
+        logger.log(nivel, f"Comprobante de la venta {comprobante.venta.numero}: {cambios['estado']}")
+        comprobante.estado = cambios['estado']
+        return cls.siguiente_etapa(comprobante)
+
+    @classmethod
+    def _reservar(cls, comprobante_id, origen, reserva):
+        """
+        Pasa el comprobante del estado de origen de la etapa a su estado de
+        reserva, o toma una reserva más antigua que ``FACTURACION_RESERVA_VIGENCIA``.
+
+        Returns:
+            bool: True si esta ejecución tomó la etapa
+        """
+        ahora = timezone.now()
+        vencida = ahora - timedelta(seconds=getattr(settings, 'FACTURACION_RESERVA_VIGENCIA', 600))
+        return bool(
+            ComprobanteElectronico.objects.filter(
+                Q(estado=origen) | Q(estado=reserva, fecha_estado__lt=vencida), pk=comprobante_id
+            ).update(estado=reserva, fecha_estado=ahora)
+        )
+
+    @classmethod
+    def consultar_autorizaciones(cls, tamano_lote=None):
+        """
+        Consulta por lotes la autorización de los comprobantes recibidos por el SRI.
+
+        Recorre, por el índice (estado, fecha_estado), los comprobantes en
+        estado ``recibido`` consultados por última vez hace más de
+        ``FACTURACION_ESPERA_AUTORIZACION`` segundos. Cada lote se reserva
+        moviendo su ``fecha_estado`` al momento de la consulta, así que varios
+        procesos pueden ejecutarla a la vez sin consultar dos veces el mismo
+        comprobante; las claves se consultan en paralelo con el cliente
+        compartido del SRI y los resultados se guardan con actualizaciones
+        masivas. Los que siguen EN PROCESO (o cuya consulta falló) se
+        retoman en una ejecución posterior.
+
+        Args:
+            tamano_lote (int): Comprobantes por lote (por defecto ``FACTURACION_AUTORIZACION_LOTE``)
+
+        Returns:
+            dict: Comprobantes consultados por resultado ('autorizado',
+                'no_autorizado', 'en_proceso', 'error') y, en 'autorizados',
+                los IDs de los que esta ejecución autorizó
+        """
+        tamano_lote = tamano_lote or getattr(settings, 'FACTURACION_AUTORIZACION_LOTE', 200)
+        corte = timezone.now() - timedelta(seconds=getattr(settings, 'FACTURACION_ESPERA_AUTORIZACION', 15))
+        circuito = cls.circuito_sri()
+        resultado = dict.fromkeys(RESULTADOS_AUTORIZACION, 0)
+        resultado['autorizados'] = []
+        while True:
+            lote = cls._reservar_lote_autorizacion(corte, tamano_lote)
+            if not lote:
+                break
+            try:
+                circuito.permitir()
+            except CircuitoAbierto as e:
+                logger.warning(f"Consulta de autorizaciones interrumpida: {e}")
+                break
+
+            inicio = time.monotonic()
+            respuestas = ComprobanteService.autorizar_comprobantes([clave for _, clave in lote])
+            duracion = time.monotonic() - inicio
+            resueltos, conteo = {}, dict.fromkeys(RESULTADOS_AUTORIZACION, 0)
+            for comprobante_id, clave in lote:
+                respuesta = respuestas[clave]
+                if respuesta['estado'] == 'EN PROCESO':
+                    conteo['en_proceso'] += 1
+                elif respuesta['estado'] in ('ERROR_CONEXION', 'ERROR_PARSE'):
+                    conteo['error'] += 1
+                else:
+                    resueltos[comprobante_id] = cls._cambios_autorizacion(respuesta, clave)
+                    conteo[resueltos[comprobante_id].get('estado', 'autorizado')] += 1
+
+            SRI_AUTHORIZATION_POLL_DURATION.observe(duracion)
+            SRI_AUTHORIZATION_POLL_THROUGHPUT.set(len(lote) / duracion if duracion else 0)
+            for clave, cantidad in conteo.items():
+                SRI_AUTHORIZATION_POLLS.labels(result=clave).inc(cantidad)
+                resultado[clave] += cantidad
+            if conteo['error'] == len(lote):
+                # Cada consulta ya agotó los reintentos del cliente: el SRI no responde
+                circuito.registrar_fallo(f"{len(lote)} consultas de autorización fallidas")
+                break
+            circuito.registrar_exito()
+            resultado['autorizados'] += cls._guardar_autorizaciones(resueltos)
+            if len(lote) < tamano_lote:
+                break
+
+        consultados = sum(resultado[clave] for clave in RESULTADOS_AUTORIZACION)
+        if consultados:
+            logger.info(
+                f"Consulta de autorizaciones: {consultados} comprobantes, "
+                + ', '.join(f'{clave}={resultado[clave]}' for clave in RESULTADOS_AUTORIZACION)
+            )
+        return resultado
+
+    @classmethod
+    def _reservar_lote_autorizacion(cls, corte, tamano_lote):
+        """Toma los comprobantes recibidos más antiguos que ``corte`` y mueve su ``fecha_estado`` a ahora."""
+        with transaction.atomic():
+            lote = list(
+                ComprobanteElectronico.objects.select_for_update(skip_locked=True)
+                .filter(estado='recibido', fecha_estado__lte=corte)
+                .order_by('fecha_estado')
+                .values_list('pk', 'clave_acceso')[:tamano_lote]
+            )
+            if lote:
+                ComprobanteElectronico.objects.filter(pk__in=[pk for pk, _ in lote]).update(
+                    fecha_estado=timezone.now()
+                )
+        return lote
+
+    @classmethod
+    def _guardar_autorizaciones(cls, resueltos):
+        """
+        Guarda las respuestas definitivas de un lote de consultas de autorización.
+
+        Solo se actualizan los comprobantes que siguen en estado ``recibido``
+        (la etapa de autorización pudo completarlos mientras tanto).
+
+        Args:
+            resueltos (dict): Campos a guardar (``_cambios_autorizacion``) por ID de comprobante
+
+        Returns:
+            list: IDs de los comprobantes autorizados
+        """
+        if not resueltos:
+            return []
+        ahora = timezone.now()
+        with transaction.atomic():
+            comprobantes = list(
+                ComprobanteElectronico.objects.select_for_update()
+                .filter(pk__in=list(resueltos), estado='recibido')
+                .only('pk', 'venta_id', 'estado')
+            )
+            ventas = []
+            for comprobante in comprobantes:
+                cambios = dict(resueltos[comprobante.pk], fecha_estado=ahora, intentos=0, ultimo_error='')
+                cambios.setdefault('estado', 'autorizado')
+                for campo, valor in cambios.items():
+                    setattr(comprobante, campo, valor)
+                if comprobante.estado == 'autorizado':
+                    ventas.append(Venta(
+                        pk=comprobante.venta_id, numero_autorizacion=comprobante.numero_autorizacion,
+                        fecha_autorizacion=comprobante.fecha_autorizacion,
+                    ))
+                else:
+                    logger.warning(f"Comprobante {comprobante.pk} de la venta {comprobante.venta_id}: no_autorizado")
+            ComprobanteElectronico.objects.bulk_update(comprobantes, [
+                'estado', 'numero_autorizacion', 'fecha_autorizacion', 'mensajes', 'fecha_estado', 'intentos',
+                'ultimo_error',
+            ])
+            Venta.objects.bulk_update(ventas, ['numero_autorizacion', 'fecha_autorizacion'])
+        return [comprobante.pk for comprobante in comprobantes if comprobante.estado == 'autorizado']
+
+    # Etapas: cada una devuelve los campos a guardar con el nuevo estado
+
+    @classmethod
+    def _etapa_xml(cls, comprobante):
+        venta = comprobante.venta
+        xml = ComprobanteService.generar_xml_factura(venta)
+        if getattr(settings, 'FACTURACION_VALIDAR_XSD', False):
+            # Los esquemas no son los oficiales: un error se registra, pero la factura continúa y el SRI decide
+            errores = XMLComprobanteService.validar(xml, 'factura')
+            if errores:
+                logger.warning(
+                    f"El XML de la venta {venta.numero} no cumple el esquema de fiscal/xsd: {'; '.join(errores[:5])}"
+                )
+        return {'xml': xml, 'clave_acceso': venta.clave_acceso}
+
+    @classmethod
+    def _etapa_firma(cls, comprobante):
+        empresa = EmpresaService.get_empresa()
+        if not empresa or not empresa.ruta_certificado or not empresa.clave_certificado:
+            raise ValueError("Facturación electrónica no configurada: falta el certificado de la empresa.")
+        xml_firmado = ComprobanteService.firmar_comprobante(
+            comprobante.xml, empresa.ruta_certificado, empresa.clave_certificado
+        )
+        return {'xml_firmado': xml_firmado}
+
+    @classmethod
+    def _etapa_recepcion(cls, comprobante):
+        respuesta = cls._llamar_sri(ComprobanteService.enviar_comprobante, comprobante.xml_firmado)
+        mensajes = respuesta.get('mensajes', [])
+        if respuesta['estado'] == 'RECIBIDA':
+            return {'mensajes': mensajes}
+        if any(mensaje.get('identificador') == SRI_CLAVE_REGISTRADA for mensaje in mensajes):
+            # Un envío anterior llegó al SRI aunque no se registró su respuesta
+            return {'mensajes': mensajes}
+        return {'estado': 'devuelto', 'mensajes': mensajes}
+
+    @classmethod
+    def _etapa_autorizacion(cls, comprobante):
+        respuesta = cls._llamar_sri(ComprobanteService.autorizar_comprobante, comprobante.clave_acceso)
+        if respuesta['estado'] == 'EN PROCESO':
+            raise EtapaPendiente(
+                f"Comprobante {comprobante.clave_acceso} en proceso de autorización",
+                getattr(settings, 'FACTURACION_ESPERA_AUTORIZACION', 15)
+            )
+        return cls._cambios_autorizacion(respuesta, comprobante.clave_acceso)
+
+    @staticmethod
+    def _cambios_autorizacion(respuesta, clave_acceso):
+        """Campos a guardar según la respuesta de autorización del SRI (que no está EN PROCESO)."""
+        mensajes = respuesta.get('mensajes', [])
+        if respuesta['estado'] != 'AUTORIZADO':
+            return {'estado': 'no_autorizado', 'mensajes': mensajes}
+        return {
+            'numero_autorizacion': respuesta.get('numeroAutorizacion') or clave_acceso,
+            'fecha_autorizacion': parse_datetime(respuesta.get('fechaAutorizacion') or '') or timezone.now(),
+            'mensajes': mensajes,
+        }
+
+    @classmethod
+    def _etapa_ride(cls, comprobante):
+        if not getattr(settings, 'FACTURACION_GENERAR_RIDE', True):
+            return {}
+        from reportes.services.ride_generator_service import RIDEGeneratorService
+
+        venta = comprobante.venta
+        venta.refresh_from_db(fields=['numero_autorizacion', 'fecha_autorizacion'])
+        pdf = RIDEGeneratorService.generar_ride_factura(venta)
+        ride = comprobante._meta.get_field('ride')
+        nombre = ride.storage.save(
+            ride.generate_filename(comprobante, f'{comprobante.clave_acceso}.pdf'), ContentFile(pdf)
+        )
+        return {'ride': nombre}
+
+    @classmethod
+    def _etapa_correo(cls, comprobante):
+        venta = comprobante.venta
+        if not venta.cliente.email:
+            return {}
+        empresa = EmpresaService.get_empresa()
+        email = EmailMessage(
+            subject=f"Factura Electrónica {venta.numero}",
+            body=(
+                f"Estimado/a {venta.cliente.nombre_completo},\n\n"
+                f"Adjuntamos su factura electrónica.\n\nGracias por su compra."
+            ),
+            from_email=(empresa.email if empresa else None) or None,
+            to=[venta.cliente.email],
+        )
+        email.attach(f'factura-{venta.numero}.xml', comprobante.xml_firmado, 'application/xml')
+        if comprobante.ride:
+            with comprobante.ride.open('rb') as ride:
+                email.attach(f'factura-{venta.numero}.pdf', ride.read(), 'application/pdf')
+        email.send()
+        return {}
+
+    @classmethod
+    def _llamar_sri(cls, metodo, argumento):
+        """
+        Llama a un web service del SRI a través del interruptor de circuito.
+
+        Las respuestas que no se pueden interpretar cuentan como fallo del servicio.
+        """
+        try:
+            with cls.circuito_sri().llamada():
+                respuesta = metodo(argumento)
+                if respuesta['estado'] == 'ERROR_PARSE':
+                    raise ConnectionError(f"Respuesta inválida del SRI: {respuesta['mensajes']}")
+        except CircuitoAbierto as e:
+            raise EtapaPendiente(str(e), e.espera)
+        return respuesta
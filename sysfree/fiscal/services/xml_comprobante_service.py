@@ -0,0 +1,450 @@
+"""
+Servicio que genera los XML de los comprobantes electrónicos del SRI:
+factura, nota de crédito, nota de débito, guía de remisión y comprobante de
+retención.
+
+Los detalles se leen con una sola consulta (o del ``prefetch_related`` del
+documento, si lo tiene) y se recorren una sola vez: en el mismo recorrido se
+escribe cada línea con su plantilla y se acumulan los totales por impuesto,
+que en el XML van antes de los detalles. El documento se escribe por partes
+ya indentado (``fiscal.utils.escritor_xml``), sin árbol intermedio ni
+formateo posterior.
+
+``validar`` comprueba un comprobante, con ``lxml``, contra los esquemas XSD
+de ``fiscal/xsd``, sin conexión. Esos esquemas son transcripciones de la
+ficha técnica, no los archivos oficiales del SRI (ver su cabecera).
+"""
+import os
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.utils import timezone
+from lxml import etree
+
+from core.services import IVAService
+from core.services.empresa_service import EmpresaService
+from ..utils.escritor_xml import EscritorXML, plantilla, texto
+from ..utils.sri_utils import generar_clave_acceso
+
+DIRECTORIO_XSD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'xsd')
+
+# Elemento raíz -> (código de documento, versión, esquema)
+COMPROBANTES = {
+    'factura': ('01', '1.1.0', 'factura_V1.1.0.xsd'),
+    'notaCredito': ('04', '1.1.0', 'notaCredito_V1.1.0.xsd'),
+    'notaDebito': ('05', '1.0.0', 'notaDebito_V1.0.0.xsd'),
+    'guiaRemision': ('06', '1.0.0', 'guiaRemision_V1.0.0.xsd'),
+    'comprobanteRetencion': ('07', '1.0.0', 'comprobanteRetencion_V1.0.0.xsd'),
+}
+CODIGO_IVA = '2'
+CODIGO_FACTURA = '01'
+# Tipo de retención -> código de impuesto del SRI (1 = renta, 2 = IVA, 6 = ISD)
+CODIGOS_RETENCION = {'renta': '1', 'iva': '2', 'otro': '6'}
+
+_IMPUESTO = ('impuestos', [('impuesto', ['codigo', 'codigoPorcentaje', 'tarifa', 'baseImponible', 'valor'])])
+_DETALLE_FACTURA = plantilla('detalle', [
+    'codigoPrincipal', 'descripcion', 'cantidad', 'precioUnitario', 'descuento', 'precioTotalSinImpuesto', _IMPUESTO,
+], nivel=2)
+_DETALLE_NOTA_CREDITO = plantilla('detalle', [
+    'codigoInterno', 'descripcion', 'cantidad', 'precioUnitario', 'descuento', 'precioTotalSinImpuesto', _IMPUESTO,
+], nivel=2)
+_TOTAL_IMPUESTO = plantilla('totalImpuesto', ['codigo', 'codigoPorcentaje', 'baseImponible', 'valor'], nivel=3)
+_IMPUESTO_NOTA_DEBITO = plantilla(
+    'impuesto', ['codigo', 'codigoPorcentaje', 'tarifa', 'baseImponible', 'valor'], nivel=3
+)
+_MOTIVO = plantilla('motivo', ['razon', 'valor'], nivel=2)
+_DETALLE_GUIA = plantilla('detalle', ['codigoInterno', 'descripcion', 'cantidad'], nivel=4)
+_IMPUESTO_RETENCION = plantilla('impuesto', [
+    'codigo', 'codigoRetencion', 'baseImponible', 'porcentajeRetener', 'valorRetenido', 'codDocSustento',
+    'numDocSustento', 'fechaEmisionDocSustento',
+], nivel=2)
+
+
+def _fecha(valor):
+    """Fecha dd/mm/aaaa (en la zona horaria local si es un datetime con zona)."""
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        valor = timezone.localtime(valor)
+    return valor.strftime('%d/%m/%Y')
+
+
+class XMLComprobanteService:
+    """Servicio que genera y valida los XML de los comprobantes electrónicos."""
+
+    _esquemas = {}
+
+    @staticmethod
+    def _empresa():
+        empresa = EmpresaService.get_empresa()
+        if not empresa:
+            raise ValueError("No se ha configurado una empresa en el sistema.")
+        return empresa
+
+    @staticmethod
+    def _partes_numero(numero):
+        partes = numero.split('-')
+        if len(partes) != 3:
+            raise ValueError(f"El número {numero} no tiene el formato correcto (ej. 001-001-000000123)")
+        return partes
+
+    @staticmethod
+    def _lineas(documento):
+        """Detalles del documento con producto y tipo de IVA, en una consulta."""
+        if 'detalles' in getattr(documento, '_prefetched_objects_cache', {}):
+            return documento.detalles.all()
+        return documento.detalles.select_related('producto', 'tipo_iva')
+
+    @classmethod
+    def clave_acceso(cls, tipo, numero, fecha, empresa=None):
+        """
+        Genera la clave de acceso de un comprobante.
+
+        Args:
+            tipo (str): Elemento raíz del comprobante (una de ``COMPROBANTES``)
+            numero (str): Número con formato 001-001-000000123
+            fecha (date | datetime): Fecha de emisión
+            empresa: Empresa emisora (por defecto, la configurada)
+
+        Returns:
+            str: Clave de acceso de 49 dígitos
+        """
+        empresa = empresa or cls._empresa()
+        establecimiento, punto_emision, secuencial = cls._partes_numero(numero)
+        if isinstance(fecha, datetime) and timezone.is_aware(fecha):
+            fecha = timezone.localtime(fecha)
+        elif not isinstance(fecha, datetime):
+            fecha = datetime.combine(fecha, time())
+        return generar_clave_acceso(
+            fecha_emision=fecha,
+            tipo_comprobante=COMPROBANTES[tipo][0],
+            ruc=empresa.ruc,
+            ambiente=empresa.ambiente_facturacion,
+            serie=f"{establecimiento}{punto_emision}",
+            numero_comprobante=secuencial,
+            tipo_emision='1'
+        )
+
+    @classmethod
+    def _documento(cls, tipo, empresa, numero, fecha, clave_acceso):
+        """Escritor del comprobante con ``infoTributaria`` ya escrita."""
+        cod_doc, version, _ = COMPROBANTES[tipo]
+        establecimiento, punto_emision, secuencial = cls._partes_numero(numero)
+        escritor = EscritorXML(tipo, id='comprobante', version=version)
+        escritor.abrir('infoTributaria').campos(
+            ('ambiente', empresa.ambiente_facturacion),
+            ('tipoEmision', '1'),
+            ('razonSocial', empresa.nombre),
+            ('nombreComercial', empresa.nombre_comercial or empresa.nombre),
+            ('ruc', empresa.ruc),
+            ('claveAcceso', clave_acceso or cls.clave_acceso(tipo, numero, fecha, empresa)),
+            ('codDoc', cod_doc),
+            ('estab', establecimiento),
+            ('ptoEmi', punto_emision),
+            ('secuencial', secuencial),
+            ('dirMatriz', empresa.direccion),
+        ).cerrar()
+        return escritor
+
+    @staticmethod
+    def _detalles(lineas, plantilla_detalle, campo_codigo, tipo_iva=None):
+        """
+        Escribe los detalles y acumula los totales por tipo de IVA en un solo recorrido.
+
+        Returns:
+            tuple: (bloques de los detalles, {codigo: [base imponible, valor]})
+        """
+        bloques, totales = [], {}
+        for detalle in lineas:
+            iva = detalle.tipo_iva or tipo_iva
+            if iva is None:
+                raise ValueError(f"El detalle {detalle} no tiene tipo de IVA.")
+            bloques.append(plantilla_detalle.format(**{
+                campo_codigo: texto(detalle.producto.codigo),
+                'descripcion': texto(detalle.producto.nombre),
+                'cantidad': f"{detalle.cantidad:.2f}",
+                'precioUnitario': f"{detalle.precio_unitario:.2f}",
+                'descuento': f"{getattr(detalle, 'descuento', 0):.2f}",
+                'precioTotalSinImpuesto': f"{detalle.subtotal:.2f}",
+                'codigo': CODIGO_IVA,
+                'codigoPorcentaje': texto(iva.codigo),
+                'tarifa': f"{iva.porcentaje:.2f}",
+                'baseImponible': f"{detalle.subtotal:.2f}",
+                'valor': f"{detalle.iva:.2f}",
+            }))
+            total = totales.get(iva.codigo)
+            if total is None:
+                totales[iva.codigo] = [detalle.subtotal, detalle.iva]
+            else:
+                total[0] += detalle.subtotal
+                total[1] += detalle.iva
+        return bloques, totales
+
+    @staticmethod
+    def _total_con_impuestos(escritor, totales):
+        escritor.abrir('totalConImpuestos').bloques(
+            _TOTAL_IMPUESTO.format(
+                codigo=CODIGO_IVA, codigoPorcentaje=texto(codigo), baseImponible=f"{base:.2f}", valor=f"{valor:.2f}"
+            )
+            for codigo, (base, valor) in totales.items()
+        ).cerrar()
+
+    @staticmethod
+    def _info_adicional(escritor, cliente):
+        if cliente.email:
+            escritor.abrir('infoAdicional').campo('campoAdicional', cliente.email, nombre='Email').cerrar()
+
+    @classmethod
+    def factura(cls, venta, clave_acceso=None):
+        """
+        Genera el XML de una factura.
+
+        Args:
+            venta (Venta): Venta facturada
+            clave_acceso (str): Clave de acceso (por defecto se genera una nueva)
+
+        Returns:
+            str: XML del comprobante
+        """
+        empresa = cls._empresa()
+        cliente = venta.cliente
+        detalles, totales = cls._detalles(cls._lineas(venta), _DETALLE_FACTURA, 'codigoPrincipal')
+
+        escritor = cls._documento('factura', empresa, venta.numero, venta.fecha, clave_acceso)
+        escritor.abrir('infoFactura').campos(
+            ('fechaEmision', _fecha(venta.fecha)),
+            ('dirEstablecimiento', empresa.direccion),
+            ('obligadoContabilidad', 'SI'),
+            ('tipoIdentificacionComprador', cliente.get_tipo_identificacion_sri()),
+            ('razonSocialComprador', cliente.nombre_completo),
+            ('identificacionComprador', cliente.identificacion),
+            ('totalSinImpuestos', f"{venta.subtotal:.2f}"),
+            ('totalDescuento', f"{venta.descuento:.2f}"),
+        )
+        cls._total_con_impuestos(escritor, totales)
+        escritor.campos(
+            ('propina', '0.00'),
+            ('importeTotal', f"{venta.total:.2f}"),
+            ('moneda', 'DOLAR'),
+        ).cerrar()
+        escritor.abrir('detalles').bloques(detalles).cerrar()
+        cls._info_adicional(escritor, cliente)
+        return escritor.resultado()
+
+    @classmethod
+    def nota_credito(cls, nota, clave_acceso=None):
+        """
+        Genera el XML de una nota de crédito sobre la factura de su venta.
+
+        Args:
+            nota (NotaCredito): Nota de crédito
+            clave_acceso (str): Clave de acceso (por defecto se genera una nueva)
+
+        Returns:
+            str: XML del comprobante
+        """
+        empresa = cls._empresa()
+        cliente, venta = nota.cliente, nota.venta
+        detalles, totales = cls._detalles(
+            cls._lineas(nota), _DETALLE_NOTA_CREDITO, 'codigoInterno', nota.tipo_iva or IVAService.get_default()
+        )
+
+        escritor = cls._documento('notaCredito', empresa, nota.numero, nota.fecha, clave_acceso)
+        escritor.abrir('infoNotaCredito').campos(
+            ('fechaEmision', _fecha(nota.fecha)),
+            ('dirEstablecimiento', empresa.direccion),
+            ('tipoIdentificacionComprador', cliente.get_tipo_identificacion_sri()),
+            ('razonSocialComprador', cliente.nombre_completo),
+            ('identificacionComprador', cliente.identificacion),
+            ('obligadoContabilidad', 'SI'),
+            ('codDocModificado', CODIGO_FACTURA),
+            ('numDocModificado', venta.numero),
+            ('fechaEmisionDocSustento', _fecha(venta.fecha)),
+            ('totalSinImpuestos', f"{nota.subtotal:.2f}"),
+            ('valorModificacion', f"{nota.total:.2f}"),
+            ('moneda', 'DOLAR'),
+        )
+        cls._total_con_impuestos(escritor, totales)
+        escritor.campo('motivo', nota.motivo).cerrar()
+        escritor.abrir('detalles').bloques(detalles).cerrar()
+        cls._info_adicional(escritor, cliente)
+        return escritor.resultado()
+
+    @classmethod
+    def nota_debito(cls, venta, numero, motivos, tipo_iva=None, fecha=None, clave_acceso=None):
+        """
+        Genera el XML de una nota de débito sobre la factura de una venta.
+
+        Args:
+            venta (Venta): Venta cuya factura se modifica
+            numero (str): Número de la nota de débito (001-001-000000123)
+            motivos (list): Pares (razón, valor sin impuestos)
+            tipo_iva (TipoIVA): IVA de los motivos (por defecto, el predeterminado)
+            fecha (datetime): Fecha de emisión (por defecto, ahora)
+            clave_acceso (str): Clave de acceso (por defecto se genera una nueva)
+
+        Returns:
+            str: XML del comprobante
+        """
+        empresa = cls._empresa()
+        cliente = venta.cliente
+        fecha = fecha or timezone.now()
+        tipo_iva = tipo_iva or IVAService.get_default()
+        subtotal = sum((Decimal(valor) for _, valor in motivos), Decimal('0'))
+        iva, total = IVAService.calcular_iva(subtotal, tipo_iva)
+
+        escritor = cls._documento('notaDebito', empresa, numero, fecha, clave_acceso)
+        escritor.abrir('infoNotaDebito').campos(
+            ('fechaEmision', _fecha(fecha)),
+            ('dirEstablecimiento', empresa.direccion),
+            ('tipoIdentificacionComprador', cliente.get_tipo_identificacion_sri()),
+            ('razonSocialComprador', cliente.nombre_completo),
+            ('identificacionComprador', cliente.identificacion),
+            ('obligadoContabilidad', 'SI'),
+            ('codDocModificado', CODIGO_FACTURA),
+            ('numDocModificado', venta.numero),
+            ('fechaEmisionDocSustento', _fecha(venta.fecha)),
+            ('totalSinImpuestos', f"{subtotal:.2f}"),
+        )
+        escritor.abrir('impuestos').bloques([_IMPUESTO_NOTA_DEBITO.format(
+            codigo=CODIGO_IVA, codigoPorcentaje=texto(tipo_iva.codigo), tarifa=f"{tipo_iva.porcentaje:.2f}",
+            baseImponible=f"{subtotal:.2f}", valor=f"{iva:.2f}",
+        )]).cerrar()
+        escritor.campo('valorTotal', f"{total:.2f}").cerrar()
+        escritor.abrir('motivos').bloques(
+            _MOTIVO.format(razon=texto(razon), valor=f"{Decimal(valor):.2f}") for razon, valor in motivos
+        ).cerrar()
+        cls._info_adicional(escritor, cliente)
+        return escritor.resultado()
+
+    @classmethod
+    def guia_remision(cls, envio, numero, ruc_transportista, placa, tipo_identificacion_transportista='04',
+                      dir_partida=None, clave_acceso=None):
+        """
+        Genera el XML de la guía de remisión de un envío.
+
+        Args:
+            envio (Envio): Envío de una venta; los productos son los detalles de la venta
+            numero (str): Número de la guía (001-001-000000123)
+            ruc_transportista (str): Identificación del transportista
+            placa (str): Placa del vehículo
+            tipo_identificacion_transportista (str): Código del SRI (04 = RUC)
+            dir_partida (str): Dirección de partida (por defecto, la de la empresa)
+            clave_acceso (str): Clave de acceso (por defecto se genera una nueva)
+
+        Returns:
+            str: XML del comprobante
+        """
+        empresa = cls._empresa()
+        venta = envio.venta
+        cliente = venta.cliente
+        inicio = envio.fecha_envio or timezone.now()
+        fin = envio.fecha_entrega or inicio
+        direccion = venta.direccion_envio.direccion if venta.direccion_envio_id else cliente.direccion
+        detalles = [
+            _DETALLE_GUIA.format(
+                codigoInterno=texto(detalle.producto.codigo), descripcion=texto(detalle.producto.nombre),
+                cantidad=f"{detalle.cantidad:.2f}",
+            )
+            for detalle in cls._lineas(venta)
+        ]
+
+        escritor = cls._documento('guiaRemision', empresa, numero, inicio, clave_acceso)
+        escritor.abrir('infoGuiaRemision').campos(
+            ('dirEstablecimiento', empresa.direccion),
+            ('dirPartida', dir_partida or empresa.direccion),
+            ('razonSocialTransportista', envio.transportista),
+            ('tipoIdentificacionTransportista', tipo_identificacion_transportista),
+            ('rucTransportista', ruc_transportista),
+            ('obligadoContabilidad', 'SI'),
+            ('fechaIniTransporte', _fecha(inicio)),
+            ('fechaFinTransporte', _fecha(fin)),
+            ('placa', placa),
+        ).cerrar()
+        escritor.abrir('destinatarios').abrir('destinatario').campos(
+            ('identificacionDestinatario', cliente.identificacion),
+            ('razonSocialDestinatario', cliente.nombre_completo),
+            ('dirDestinatario', direccion or empresa.direccion),
+            ('motivoTraslado', 'Venta'),
+            ('codDocSustento', CODIGO_FACTURA),
+            ('numDocSustento', venta.numero),
+            ('numAutDocSustento', venta.numero_autorizacion),
+            ('fechaEmisionDocSustento', _fecha(venta.fecha)),
+        )
+        escritor.abrir('detalles').bloques(detalles).cerrar().cerrar().cerrar()
+        cls._info_adicional(escritor, cliente)
+        return escritor.resultado()
+
+    @classmethod
+    def retencion(cls, comprobante, clave_acceso=None):
+        """
+        Genera el XML de un comprobante de retención.
+
+        Args:
+            comprobante (ComprobanteRetencion): Retención con sus detalles
+            clave_acceso (str): Clave de acceso (por defecto se genera una nueva)
+
+        Returns:
+            str: XML del comprobante
+        """
+        empresa = cls._empresa()
+        venta = comprobante.venta
+        cliente = venta.cliente
+        if 'detalles' in getattr(comprobante, '_prefetched_objects_cache', {}):
+            detalles = comprobante.detalles.all()
+        else:
+            detalles = comprobante.detalles.select_related('retencion')
+        num_doc_sustento = venta.numero.replace('-', '')
+        fecha_sustento = _fecha(venta.fecha)
+
+        escritor = cls._documento('comprobanteRetencion', empresa, comprobante.numero, comprobante.fecha_emision,
+                                  clave_acceso)
+        escritor.abrir('infoCompRetencion').campos(
+            ('fechaEmision', _fecha(comprobante.fecha_emision)),
+            ('dirEstablecimiento', empresa.direccion),
+            ('obligadoContabilidad', 'SI'),
+            ('tipoIdentificacionSujetoRetenido', cliente.get_tipo_identificacion_sri()),
+            ('razonSocialSujetoRetenido', cliente.nombre_completo),
+            ('identificacionSujetoRetenido', cliente.identificacion),
+            ('periodoFiscal', comprobante.fecha_emision.strftime('%m/%Y')),
+        ).cerrar()
+        escritor.abrir('impuestos').bloques(
+            _IMPUESTO_RETENCION.format(
+                codigo=CODIGOS_RETENCION[detalle.retencion.tipo], codigoRetencion=texto(detalle.retencion.codigo),
+                baseImponible=f"{detalle.base_imponible:.2f}", porcentajeRetener=f"{detalle.retencion.porcentaje:.2f}",
+                valorRetenido=f"{detalle.valor:.2f}", codDocSustento=CODIGO_FACTURA,
+                numDocSustento=num_doc_sustento, fechaEmisionDocSustento=fecha_sustento,
+            )
+            for detalle in detalles
+        ).cerrar()
+        cls._info_adicional(escritor, cliente)
+        return escritor.resultado()
+
+    @classmethod
+    def esquema(cls, tipo):
+        """Esquema XSD (``lxml.etree.XMLSchema``) del tipo de comprobante, cargado una vez por proceso."""
+        if tipo not in cls._esquemas:
+            if tipo not in COMPROBANTES:
+                raise ValueError(f"Tipo de comprobante desconocido: {tipo}")
+            ruta = os.path.join(DIRECTORIO_XSD, COMPROBANTES[tipo][2])
+            cls._esquemas[tipo] = etree.XMLSchema(etree.parse(ruta))
+        return cls._esquemas[tipo]
+
+    @classmethod
+    def validar(cls, xml, tipo=None):
+        """
+        Valida un comprobante contra su esquema XSD.
+
+        Args:
+            xml (str): XML del comprobante
+            tipo (str): Elemento raíz (por defecto se toma del documento)
+
+        Returns:
+            list: Errores de validación (``ruta: mensaje``); vacía si el comprobante es válido
+        """
+        try:
+            documento = etree.fromstring(xml.encode('utf-8'))
+        except etree.XMLSyntaxError as e:
+            return [f"XML mal formado: {e}"]
+        esquema = cls.esquema(tipo or documento.tag)
+        if esquema.validate(documento):
+            return []
+        return [f"{error.path}: {error.message}" for error in esquema.error_log]
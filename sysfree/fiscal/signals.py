@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
+from core.services.numeracion_service import NumeracionService
 from .models import AsientoContable, LineaAsiento, Comprobante
 
 # Las señales de auditoría están en core.signals
@@ -12,25 +13,13 @@ def generar_numero_asiento(sender, instance, **kwargs):
     Genera un número único para el asiento contable si no tiene uno.
     """
     if not instance.numero:
-        year = timezone.now().year
-        month = timezone.now().month
-        
-        # Obtener el último número de este año/mes
-        ultimo = AsientoContable.objects.filter(
-            numero__startswith=f'A{year}{month:02d}'
-        ).order_by('-numero').first()
-        
-        if ultimo:
-            # Extraer el número secuencial y aumentarlo en 1
-            try:
-                secuencial = int(ultimo.numero[-5:]) + 1
-            except ValueError:
-                secuencial = 1
-        else:
-            secuencial = 1
-        
-        # Formatear el número
-        instance.numero = f'A{year}{month:02d}{secuencial:05d}'
+        ahora = timezone.now()
+        prefijo = f'A{ahora.year}{ahora.month:02d}'
+        secuencial = NumeracionService.siguiente(
+            f'asiento:{ahora.year}{ahora.month:02d}',
+            inicializar=lambda: NumeracionService.maximo_existente(AsientoContable.objects.all(), 'numero', prefijo, 5),
+        )
+        instance.numero = f'{prefijo}{secuencial:05d}'
 
 
 @receiver(post_save, sender=LineaAsiento)
@@ -0,0 +1,77 @@
+import logging
+import random
+
+from celery import shared_task
+from django.conf import settings
+from django.db import OperationalError
+
+logger = logging.getLogger('sysfree')
+
+# Errores transitorios que justifican reintentar la etapa: red/SRI (ConnectionError,
+# timeouts), SMTP (OSError) y caídas de la base de datos
+ERRORES_TRANSITORIOS = (OSError, OperationalError)
+
+
+def encolar_etapa_facturacion(comprobante_id, etapa, countdown=None):
+    """Encola una etapa de la facturación electrónica en su cola (``FACTURACION_COLAS``)."""
+    ejecutar_etapa_facturacion_task.apply_async(
+        (comprobante_id, etapa), countdown=countdown, queue=settings.FACTURACION_COLAS.get(etapa)
+    )
+
+
+def espera_reintento(intento):
+    """Segundos antes del reintento ``intento`` (0, 1, ...): exponencial con variación aleatoria."""
+    espera = min(settings.FACTURACION_REINTENTO_BASE * 2 ** intento, settings.FACTURACION_REINTENTO_MAXIMO)
+    return espera / 2 + random.uniform(0, espera / 2)
+
+
+@shared_task(bind=True, max_retries=None)
+def ejecutar_etapa_facturacion_task(self, comprobante_id, etapa):
+    """
+    Ejecuta una etapa de la facturación electrónica y encola la siguiente.
+
+    Si falla de forma transitoria se reintenta solo esta etapa (hasta
+    ``FACTURACION_MAX_REINTENTOS`` veces), salvo la autorización, que con
+    ``FACTURACION_CONSULTA_AUTORIZACIONES`` queda para
+    ``consultar_autorizaciones_task``; los demás errores quedan en el
+    comprobante, que conserva su estado, y el proceso se reanuda con
+    ``procesar_facturacion_electronica_task``.
+    """
+    from fiscal.services.facturacion_electronica_service import EtapaPendiente, FacturacionElectronicaService
+    try:
+        siguiente = FacturacionElectronicaService.ejecutar_etapa(comprobante_id, etapa)
+    except (EtapaPendiente,) + ERRORES_TRANSITORIOS as e:
+        if etapa == 'autorizacion' and settings.FACTURACION_CONSULTA_AUTORIZACIONES:
+            # EN PROCESO o SRI no disponible: el comprobante sigue recibido y lo retoma la consulta por lotes
+            logger.info(f"Autorización del comprobante {comprobante_id} pendiente para la consulta por lotes: {e}")
+            return None
+        if self.request.retries >= settings.FACTURACION_MAX_REINTENTOS:
+            # El comprobante conserva su estado y el error; se reanuda más tarde
+            logger.error(f"Etapa '{etapa}' del comprobante {comprobante_id} agotó los reintentos: {e}")
+            return None
+        # SRI no disponible o EN PROCESO: se espera lo indicado; otros errores, espera exponencial
+        espera = e.espera if isinstance(e, EtapaPendiente) else espera_reintento(self.request.retries)
+        raise self.retry(exc=e, countdown=espera)
+    except Exception as e:
+        logger.error(f"Error en la etapa '{etapa}' del comprobante {comprobante_id}: {e}")
+        return None
+
+    if siguiente:
+        encolar_etapa_facturacion(comprobante_id, siguiente)
+    return siguiente
+
+
+@shared_task
+def consultar_autorizaciones_task():
+    """
+    Tarea periódica que consulta por lotes la autorización de los comprobantes
+    recibidos y encola el RIDE (y luego el correo) de los recién autorizados.
+    Puede ejecutarse a la vez en varios nodos: cada lote se reserva.
+    """
+    if not settings.FACTURACION_CONSULTA_AUTORIZACIONES:
+        return None
+    from fiscal.services.facturacion_electronica_service import FacturacionElectronicaService
+    resultado = FacturacionElectronicaService.consultar_autorizaciones()
+    for comprobante_id in resultado.pop('autorizados'):
+        encolar_etapa_facturacion(comprobante_id, 'ride')
+    return resultado
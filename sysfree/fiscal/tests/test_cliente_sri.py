@@ -0,0 +1,75 @@
+from django.test import SimpleTestCase
+
+from fiscal.services.cliente_sri import ClienteSRI
+from fiscal.utils.sri_simulado import ServidorSRISimulado
+
+CLAVES = [f'{i:049d}' for i in range(1, 6)]
+
+
+def _comprobante(clave):
+    return f'<factura id="comprobante"><infoTributaria><claveAcceso>{clave}</claveAcceso></infoTributaria></factura>'
+
+
+class ClienteSRITest(SimpleTestCase):
+    """Cliente SOAP del SRI con conexiones persistentes."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sri = ServidorSRISimulado(tls=True).iniciar()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sri.detener()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.sri.tasa_fallos = 0.0
+        self.cliente = ClienteSRI(reintentos=2, factor_espera=0, verificar=self.sri.certificado_tls)
+
+    def test_reutiliza_la_conexion(self):
+        conexiones = self.sri.conexiones
+        for clave in CLAVES:
+            self.assertEqual(self.cliente.enviar(self.sri.url_recepcion, _comprobante(clave))['estado'], 'RECIBIDA')
+        self.assertEqual(self.sri.conexiones - conexiones, 1)
+
+        respuesta = self.cliente.enviar(self.sri.url_recepcion, _comprobante(CLAVES[0]))
+        self.assertEqual(respuesta['estado'], 'DEVUELTA')
+        self.assertEqual(respuesta['mensajes'][0]['identificador'], '43')
+
+    def test_autorizacion_por_lotes(self):
+        recibida, pendiente = '8' * 49, '9' * 49
+        self.cliente.enviar(self.sri.url_recepcion, _comprobante(recibida))
+
+        respuestas = self.cliente.autorizar_lote(self.sri.url_autorizacion, [recibida, pendiente, recibida])
+        self.assertEqual(list(respuestas), [recibida, pendiente])
+        self.assertEqual(respuestas[recibida]['estado'], 'AUTORIZADO')
+        self.assertEqual(respuestas[recibida]['numeroAutorizacion'], recibida)
+        self.assertEqual(respuestas[pendiente]['estado'], 'EN PROCESO')
+
+    def test_reintenta_errores_del_servidor(self):
+        self.sri.tasa_fallos = 1.0
+        fallos = self.sri.solicitudes['fallos']
+        with self.assertRaises(ConnectionError):
+            self.cliente.autorizar(self.sri.url_autorizacion, CLAVES[0])
+        self.assertEqual(self.sri.solicitudes['fallos'] - fallos, 3)
+
+    def test_interpreta_varias_autorizaciones(self):
+        respuesta = ClienteSRI.interpretar(
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            '<ns2:autorizacionComprobanteResponse xmlns:ns2="http://ec.gob.sri.ws.autorizacion">'
+            '<RespuestaAutorizacionComprobante><numeroComprobantes>2</numeroComprobantes><autorizaciones>'
+            '<autorizacion><estado>NO AUTORIZADO</estado><comprobante>&lt;factura/&gt;</comprobante><mensajes>'
+            '<mensaje><identificador>56</identificador><mensaje>ERROR</mensaje><tipo>ERROR</tipo></mensaje>'
+            '</mensajes></autorizacion>'
+            '<autorizacion><estado>AUTORIZADO</estado><numeroAutorizacion>123</numeroAutorizacion>'
+            '<fechaAutorizacion>2025-01-02T10:00:00-05:00</fechaAutorizacion>'
+            '<comprobante>&lt;factura/&gt;</comprobante><mensajes/></autorizacion>'
+            '</autorizaciones></RespuestaAutorizacionComprobante></ns2:autorizacionComprobanteResponse>'
+            '</soap:Body></soap:Envelope>'
+        )
+        self.assertEqual(respuesta, {
+            'estado': 'AUTORIZADO', 'numeroAutorizacion': '123',
+            'fechaAutorizacion': '2025-01-02T10:00:00-05:00', 'mensajes': [],
+        })
+        self.assertEqual(ClienteSRI.interpretar('<no cerrado')['estado'], 'ERROR_PARSE')
@@ -0,0 +1,239 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.models import Empresa, TipoIVA
+from fiscal.models import ComprobanteElectronico
+from fiscal.services import XMLComprobanteService
+from fiscal.services.facturacion_electronica_service import EtapaPendiente, FacturacionElectronicaService
+from fiscal.tasks import consultar_autorizaciones_task, ejecutar_etapa_facturacion_task
+from fiscal.utils.sri_simulado import ServidorSRISimulado, crear_certificado_prueba
+from inventario.models import Categoria, Producto
+from ventas.models import DetalleVenta, Venta
+
+
+@override_settings(
+    FACTURACION_GENERAR_RIDE=False,
+    SRI_CIRCUITO={'umbral': 2, 'ventana': 60, 'apertura': 30, 'lentitud': None},
+)
+class FacturacionElectronicaServiceTest(TestCase):
+    """Facturación electrónica por etapas contra el simulador del SRI."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directorio = tempfile.mkdtemp()
+        cls.certificado = os.path.join(cls.directorio, 'firma.p12')
+        crear_certificado_prueba(cls.certificado, 'clave')
+        cls.sri = ServidorSRISimulado().iniciar()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sri.detener()
+        shutil.rmtree(cls.directorio, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        Empresa.objects.all().delete()
+        Empresa.objects.create(
+            nombre='Empresa de prueba', ruc='1790000000001', direccion='Quito', email='facturas@example.com',
+            ambiente_facturacion='1', ruta_certificado=self.certificado, clave_certificado='clave',
+            url_recepcion_pruebas=self.sri.url_recepcion, url_autorizacion_pruebas=self.sri.url_autorizacion,
+        )
+        iva, _ = TipoIVA.objects.get_or_create(codigo='4', defaults={'nombre': 'IVA 15%', 'porcentaje': 15})
+        cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='1710034065', nombres='Ana', apellidos='Pérez',
+            email='ana@example.com'
+        )
+        producto = Producto.objects.create(
+            codigo='FE-001', nombre='Teclado', precio_compra=10, precio_venta=20, stock=5,
+            categoria=Categoria.objects.create(nombre='Periféricos')
+        )
+        self.venta = Venta.objects.create(
+            numero='001-001-000000123', cliente=cliente, tipo='factura', estado='pagada',
+            subtotal=Decimal('40.00'), total=Decimal('46.00')
+        )
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=self.venta, producto=producto, cantidad=2, precio_unitario=20, tipo_iva=iva,
+                         subtotal=Decimal('40.00'), iva=Decimal('6.00'), total=Decimal('46.00'))
+        ])
+        for atributo in ('tasa_fallos', 'tasa_devueltas', 'tasa_en_proceso'):
+            setattr(self.sri, atributo, 0.0)
+        FacturacionElectronicaService.circuito_sri().registrar_exito()
+        self.comprobante, _ = FacturacionElectronicaService.iniciar(self.venta.id)
+
+    def _ejecutar(self, hasta=None):
+        etapa = FacturacionElectronicaService.siguiente_etapa(self.comprobante)
+        while etapa and etapa != hasta:
+            etapa = FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, etapa)
+        self.comprobante.refresh_from_db()
+        return etapa
+
+    def test_facturacion_completa(self):
+        self.assertIsNone(self._ejecutar())
+
+        self.assertEqual(self.comprobante.estado, 'notificado')
+        self.venta.refresh_from_db()
+        self.assertEqual(self.comprobante.clave_acceso, self.venta.clave_acceso)
+        self.assertEqual(self.venta.numero_autorizacion, self.venta.clave_acceso)
+        self.assertIsNotNone(self.venta.fecha_autorizacion)
+        self.assertIn('<ds:SignatureValue', self.comprobante.xml_firmado)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        self.assertEqual(mail.outbox[0].attachments[0][0], 'factura-001-001-000000123.xml')
+
+    @override_settings(FACTURACION_VALIDAR_XSD=True)
+    def test_xml_fuera_del_esquema_solo_se_advierte(self):
+        with mock.patch.object(XMLComprobanteService, 'validar', return_value=['/factura/x: error']), \
+                self.assertLogs('sysfree', 'WARNING') as registros:
+            self.assertEqual(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'xml'), 'firma')
+        self.assertIn('/factura/x: error', registros.output[0])
+
+    def test_fallo_reintenta_solo_su_etapa(self):
+        self._ejecutar(hasta='recepcion')
+        xml_firmado = self.comprobante.xml_firmado
+
+        self.sri.tasa_fallos = 1.0
+        with self.assertRaises(ConnectionError):
+            FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'recepcion')
+        self.comprobante.refresh_from_db()
+        self.assertEqual((self.comprobante.estado, self.comprobante.intentos), ('firmado', 1))
+        self.assertIn('recepcion', self.comprobante.ultimo_error)
+
+        # Una etapa ya completada no se repite
+        self.assertEqual(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'firma'), 'recepcion')
+
+        self.sri.tasa_fallos = 0.0
+        self.assertEqual(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'recepcion'), 'autorizacion')
+        self.comprobante.refresh_from_db()
+        self.assertEqual((self.comprobante.estado, self.comprobante.intentos), ('recibido', 0))
+        self.assertEqual(self.comprobante.xml_firmado, xml_firmado)
+
+    def test_reenvio_de_clave_registrada_cuenta_como_recibido(self):
+        self._ejecutar(hasta='autorizacion')
+        ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(estado='firmado')
+
+        self.assertEqual(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'recepcion'), 'autorizacion')
+        self.comprobante.refresh_from_db()
+        self.assertEqual(self.comprobante.estado, 'recibido')
+        self.assertEqual(self.comprobante.mensajes[0]['mensaje'], 'CLAVE ACCESO REGISTRADA')
+
+    def test_etapa_reservada_por_otra_ejecucion_no_repite_su_efecto(self):
+        self._ejecutar(hasta='recepcion')
+        ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(estado='enviando')
+        solicitudes = self.sri.solicitudes['recepcion']
+
+        # Tarea repetida mientras la primera envía al SRI
+        self.assertIsNone(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'recepcion'))
+        self.assertEqual(self.sri.solicitudes['recepcion'], solicitudes)
+
+        ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(estado='firmado')
+        self._ejecutar(hasta='correo')
+        ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(estado='notificando')
+        self.assertIsNone(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'correo'))
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Una reserva abandonada (worker muerto) se retoma tras su vigencia
+        anterior = timezone.now() - timedelta(minutes=11)
+        ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(fecha_estado=anterior)
+        self.assertIsNone(self._ejecutar())
+        self.assertEqual(self.comprobante.estado, 'notificado')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertGreater(self.comprobante.fecha_modificacion, anterior)
+
+    def test_fallo_del_correo_libera_la_reserva(self):
+        self._ejecutar(hasta='correo')
+
+        with mock.patch('fiscal.services.facturacion_electronica_service.EmailMessage.send',
+                        side_effect=OSError('SMTP caído')), self.assertRaises(OSError):
+            FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'correo')
+        self.comprobante.refresh_from_db()
+        self.assertEqual((self.comprobante.estado, self.comprobante.intentos), ('ride_generado', 1))
+
+        self.assertIsNone(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'correo'))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_comprobante_devuelto_termina_el_proceso(self):
+        self.sri.tasa_devueltas = 1.0
+        self.assertIsNone(self._ejecutar())
+        self.assertEqual(self.comprobante.estado, 'devuelto')
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_autorizacion_en_proceso_se_reintenta(self):
+        self.sri.tasa_en_proceso = 1.0
+        self._ejecutar(hasta='autorizacion')
+        with self.assertRaises(EtapaPendiente):
+            FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'autorizacion')
+        self.assertEqual(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'autorizacion'), 'ride')
+
+    def test_circuito_abierto_no_llama_al_sri(self):
+        self._ejecutar(hasta='recepcion')
+        self.sri.tasa_fallos = 1.0
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'recepcion')
+        solicitudes = self.sri.solicitudes['recepcion']
+
+        with self.assertRaises(EtapaPendiente) as contexto:
+            FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'recepcion')
+        self.assertGreater(contexto.exception.espera, 0)
+        self.assertEqual(self.sri.solicitudes['recepcion'], solicitudes)
+
+    def _recibido_hace(self, segundos=60):
+        """Deja el comprobante recibido, con su última consulta hace ``segundos``."""
+        self._ejecutar(hasta='autorizacion')
+        ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(
+            fecha_estado=timezone.now() - timedelta(seconds=segundos)
+        )
+
+    def test_consulta_por_lotes_autoriza_los_recibidos(self):
+        self.sri.tasa_en_proceso = 1.0
+        self._recibido_hace()
+        resultado = FacturacionElectronicaService.consultar_autorizaciones()
+        self.assertEqual((resultado['en_proceso'], resultado['autorizados']), (1, []))
+        self.comprobante.refresh_from_db()
+        self.assertEqual(self.comprobante.estado, 'recibido')
+        # Recién consultado: no se vuelve a consultar hasta que pase la espera
+        self.assertEqual(FacturacionElectronicaService.consultar_autorizaciones()['en_proceso'], 0)
+
+        self._recibido_hace()
+        resultado = FacturacionElectronicaService.consultar_autorizaciones()
+        self.assertEqual((resultado['autorizado'], resultado['autorizados']), (1, [self.comprobante.pk]))
+        self.comprobante.refresh_from_db()
+        self.venta.refresh_from_db()
+        self.assertEqual(self.comprobante.estado, 'autorizado')
+        self.assertEqual(self.venta.numero_autorizacion, self.venta.clave_acceso)
+        self.assertEqual(self.venta.fecha_autorizacion, self.comprobante.fecha_autorizacion)
+        self.assertEqual(FacturacionElectronicaService.ejecutar_etapa(self.comprobante.id, 'autorizacion'), 'ride')
+
+    @override_settings(SRI_REINTENTOS=0)
+    def test_consulta_por_lotes_con_el_sri_caido_conserva_el_estado(self):
+        self._recibido_hace()
+        self.sri.tasa_fallos = 1.0
+        resultado = FacturacionElectronicaService.consultar_autorizaciones()
+        self.assertEqual((resultado['error'], resultado['autorizados']), (1, []))
+        self.comprobante.refresh_from_db()
+        self.assertEqual(self.comprobante.estado, 'recibido')
+
+    @override_settings(FACTURACION_CONSULTA_AUTORIZACIONES=True)
+    def test_autorizacion_en_proceso_queda_para_la_consulta_por_lotes(self):
+        self.sri.tasa_en_proceso = 1.0
+        self._ejecutar(hasta='autorizacion')
+        with mock.patch('fiscal.tasks.encolar_etapa_facturacion') as encolar:
+            self.assertIsNone(ejecutar_etapa_facturacion_task.apply(args=(self.comprobante.id, 'autorizacion')).get())
+            encolar.assert_not_called()
+
+            ComprobanteElectronico.objects.filter(pk=self.comprobante.pk).update(
+                fecha_estado=timezone.now() - timedelta(seconds=60)
+            )
+            resultado = consultar_autorizaciones_task.apply().get()
+            self.assertEqual(resultado['autorizado'], 1)
+            encolar.assert_called_once_with(self.comprobante.pk, 'ride')
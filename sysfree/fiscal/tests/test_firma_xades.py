@@ -0,0 +1,113 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from copy import deepcopy
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from django.test import SimpleTestCase
+from lxml import etree
+
+from fiscal.utils import firma_xades
+from fiscal.utils.sri_simulado import crear_certificado_prueba
+
+DS = '{http://www.w3.org/2000/09/xmldsig#}'
+NS = {'ds': 'http://www.w3.org/2000/09/xmldsig#', 'etsi': 'http://uri.etsi.org/01903/v1.3.2#'}
+
+
+def _factura(clave):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<factura id="comprobante" version="1.1.0">\n'
+        f'  <infoTributaria>\n    <claveAcceso>{clave}</claveAcceso>\n  </infoTributaria>\n'
+        '  <detalles><detalle><descripcion>Café &amp; pan</descripcion><descuento/></detalle></detalles>\n'
+        '</factura>\n'
+    )
+
+
+def _canonico(elemento):
+    """C14N 1.0 inclusivo de libxml2 del subárbol, con los espacios de nombres heredados de sus ancestros."""
+    return etree.tostring(elemento, method='c14n')
+
+
+def _digest(datos):
+    return base64.b64encode(hashlib.sha1(datos).digest()).decode()
+
+
+class FirmaXadesTest(SimpleTestCase):
+    """Firma XAdES-BES y caché del certificado."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directorio = tempfile.mkdtemp()
+        cls.ruta = os.path.join(cls.directorio, 'firma.p12')
+        crear_certificado_prueba(cls.ruta, 'clave')
+
+    @classmethod
+    def tearDownClass(cls):
+        firma_xades.invalidar()
+        shutil.rmtree(cls.directorio, ignore_errors=True)
+        super().tearDownClass()
+
+    def _verificar(self, firmado):
+        """
+        Comprueba los digests y el valor de la firma como lo haría el SRI: cada
+        referencia se resuelve por su atributo Id y se canonicaliza con libxml2,
+        independiente del serializador de la firma.
+        """
+        documento = etree.fromstring(firmado.encode('utf-8'))
+        firma = documento.find(f'{DS}Signature')
+        for referencia in firma.iterfind('ds:SignedInfo/ds:Reference', NS):
+            uri = referencia.get('URI')
+            if uri == '#comprobante':
+                # Transformación de firma envuelta: el documento sin ds:Signature
+                datos = deepcopy(documento)
+                datos.remove(datos.find(f'{DS}Signature'))
+            else:
+                datos, = documento.xpath('//*[@Id=$id]', id=uri[1:])
+            self.assertEqual(referencia.findtext(f'{DS}DigestValue'), _digest(_canonico(datos)), uri)
+        self.assertEqual(len(firma.findall('ds:SignedInfo/ds:Reference', NS)), 3)
+
+        der = base64.b64decode(firma.findtext('ds:KeyInfo/ds:X509Data/ds:X509Certificate', namespaces=NS))
+        x509.load_der_x509_certificate(der).public_key().verify(
+            base64.b64decode(firma.findtext(f'{DS}SignatureValue')),
+            _canonico(firma.find(f'{DS}SignedInfo')), padding.PKCS1v15(), hashes.SHA1()
+        )
+        documento.remove(firma)
+        return documento
+
+    def test_firma_verificable(self):
+        firmado = firma_xades.firmar(_factura('1' * 49), firma_xades.credencial(self.ruta, 'clave'))
+
+        raiz = self._verificar(firmado)
+        self.assertTrue(firmado.startswith('<?xml version="1.0" encoding="UTF-8"?>'))
+        self.assertEqual(raiz.findtext('infoTributaria/claveAcceso'), '1' * 49)
+        self.assertEqual(raiz.findtext('detalles/detalle/descripcion'), 'Café & pan')
+
+    def test_certificado_se_descifra_una_vez_y_se_renueva(self):
+        credencial = firma_xades.credencial(self.ruta, 'clave')
+        self.assertIs(firma_xades.credencial(self.ruta, 'clave'), credencial)
+
+        ruta = os.path.join(self.directorio, 'renovado.p12')
+        crear_certificado_prueba(ruta, 'clave')
+        anterior = firma_xades.credencial(ruta, 'clave')
+        crear_certificado_prueba(ruta, 'clave')
+        estado = os.stat(ruta)
+        os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10 ** 9))
+        renovado = firma_xades.credencial(ruta, 'clave')
+        self.assertIsNot(renovado, anterior)
+        self.assertNotEqual(renovado.certificado.serial_number, anterior.certificado.serial_number)
+
+        with self.assertRaises(ValueError):
+            firma_xades.credencial(os.path.join(self.directorio, 'no-existe.p12'), 'clave')
+
+    def test_firma_por_lotes(self):
+        claves = [f'{i:049d}' for i in range(6)]
+        firmados = firma_xades.firmar_lote([_factura(clave) for clave in claves], self.ruta, 'clave', procesos=2)
+
+        self.assertEqual(len(firmados), len(claves))
+        for clave, firmado in zip(claves, firmados):
+            self.assertEqual(self._verificar(firmado).findtext('infoTributaria/claveAcceso'), clave)
@@ -0,0 +1,158 @@
+import xml.etree.ElementTree as ET
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from clientes.models import Cliente
+from core.models import Empresa, TipoIVA
+from fiscal.models import ComprobanteRetencion, Retencion
+from fiscal.models.comprobante_retencion import DetalleRetencion
+from fiscal.services import XMLComprobanteService
+from inventario.models import Categoria, Producto
+from ventas.models import DetalleVenta, Envio, NotaCredito, Venta
+from ventas.models.nota_credito import DetalleNotaCredito
+
+
+class XMLComprobanteServiceTest(TestCase):
+    """XML de los comprobantes electrónicos y su validación contra los XSD."""
+
+    def setUp(self):
+        Empresa.objects.all().delete()
+        Empresa.objects.create(
+            nombre='Empresa de prueba', ruc='1790000000001', direccion='Quito', ambiente_facturacion='1'
+        )
+        self.iva15, _ = TipoIVA.objects.get_or_create(
+            codigo='4', defaults={'nombre': 'IVA 15%', 'porcentaje': Decimal('15')}
+        )
+        self.iva0, _ = TipoIVA.objects.get_or_create(
+            codigo='0', defaults={'nombre': 'IVA 0%', 'porcentaje': Decimal('0')}
+        )
+        self.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='1710034065', nombres='Ana', apellidos='Pérez',
+            email='ana@example.com'
+        )
+        categoria = Categoria.objects.create(nombre='Varios')
+        self.productos = [
+            Producto.objects.create(codigo=f'XML-{i}', nombre=nombre, precio_compra=1, precio_venta=10, stock=5,
+                                    categoria=categoria)
+            for i, nombre in enumerate(['Café & té', 'Pan <integral>', 'Leche'])
+        ]
+        self.venta = Venta.objects.create(
+            numero='001-001-000000045', cliente=self.cliente, tipo='factura', estado='pagada',
+            subtotal=Decimal('30.00'), total=Decimal('33.00')
+        )
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(venta=self.venta, producto=producto, cantidad=1, precio_unitario=10, tipo_iva=iva,
+                         subtotal=Decimal('10.00'), iva=iva_linea, total=Decimal('10.00') + iva_linea)
+            for producto, iva, iva_linea in zip(
+                self.productos, [self.iva15, self.iva0, self.iva15],
+                [Decimal('1.50'), Decimal('0.00'), Decimal('1.50')]
+            )
+        ])
+
+    def _validar(self, xml):
+        self.assertEqual(XMLComprobanteService.validar(xml), [])
+        return ET.fromstring(xml.encode('utf-8'))
+
+    def test_factura(self):
+        raiz = self._validar(XMLComprobanteService.factura(self.venta))
+
+        self.assertEqual(raiz.findtext('infoTributaria/codDoc'), '01')
+        self.assertEqual(len(raiz.findtext('infoTributaria/claveAcceso')), 49)
+        totales = {
+            total.findtext('codigoPorcentaje'): (total.findtext('baseImponible'), total.findtext('valor'))
+            for total in raiz.iterfind('infoFactura/totalConImpuestos/totalImpuesto')
+        }
+        self.assertEqual(totales, {'4': ('20.00', '3.00'), '0': ('10.00', '0.00')})
+        self.assertEqual(
+            [detalle.findtext('descripcion') for detalle in raiz.iterfind('detalles/detalle')],
+            ['Café & té', 'Pan <integral>', 'Leche']
+        )
+        self.assertEqual(raiz.find('infoAdicional/campoAdicional').get('nombre'), 'Email')
+
+    def test_factura_con_detalles_precargados_solo_consulta_la_empresa(self):
+        venta = Venta.objects.select_related('cliente').prefetch_related(
+            'detalles__producto', 'detalles__tipo_iva'
+        ).get(pk=self.venta.pk)
+        with self.assertNumQueries(1):
+            xml = XMLComprobanteService.factura(venta, '1' * 49)
+        self._validar(xml)
+
+    def test_nota_credito(self):
+        nota = NotaCredito.objects.create(
+            numero='001-001-000000007', venta=self.venta, cliente=self.cliente, motivo='Devolución',
+            subtotal=Decimal('10.00'), total=Decimal('11.50')
+        )
+        DetalleNotaCredito.objects.bulk_create([DetalleNotaCredito(
+            nota_credito=nota, producto=self.productos[0], cantidad=1, precio_unitario=10, tipo_iva=self.iva15,
+            subtotal=Decimal('10.00'), iva=Decimal('1.50'), total=Decimal('11.50')
+        )])
+
+        raiz = self._validar(XMLComprobanteService.nota_credito(nota))
+        self.assertEqual(raiz.findtext('infoNotaCredito/numDocModificado'), '001-001-000000045')
+        self.assertEqual(raiz.findtext('infoNotaCredito/valorModificacion'), '11.50')
+        self.assertEqual(raiz.findtext('detalles/detalle/codigoInterno'), 'XML-0')
+
+    def test_nota_debito(self):
+        raiz = self._validar(XMLComprobanteService.nota_debito(
+            self.venta, '001-001-000000003', [('Interés por mora', '4.00'), ('Gastos de envío', '6.00')],
+            tipo_iva=self.iva15
+        ))
+        self.assertEqual(raiz.findtext('infoNotaDebito/totalSinImpuestos'), '10.00')
+        self.assertEqual(raiz.findtext('infoNotaDebito/impuestos/impuesto/valor'), '1.50')
+        self.assertEqual(raiz.findtext('infoNotaDebito/valorTotal'), '11.50')
+        self.assertEqual(len(raiz.findall('motivos/motivo')), 2)
+
+    def test_guia_remision(self):
+        envio = Envio.objects.create(venta=self.venta, transportista='Transportes Andinos')
+
+        raiz = self._validar(
+            XMLComprobanteService.guia_remision(envio, '001-001-000000010', '1790011223001', 'PBA-1234')
+        )
+        destinatario = raiz.find('destinatarios/destinatario')
+        self.assertEqual(destinatario.findtext('numDocSustento'), '001-001-000000045')
+        self.assertEqual(len(destinatario.findall('detalles/detalle')), 3)
+
+    def test_retencion(self):
+        comprobante = ComprobanteRetencion.objects.create(
+            numero='001-001-000000021', venta=self.venta, fecha_emision=date(2025, 3, 4),
+            base_imponible=Decimal('30.00'), total_retenido=Decimal('1.45')
+        )
+        for codigo, tipo, porcentaje, base, valor in (
+            ('312', 'renta', 1, '30.00', '0.30'), ('725', 'iva', 30, '3.00', '0.90'),
+        ):
+            DetalleRetencion.objects.create(
+                comprobante=comprobante, base_imponible=Decimal(base), valor=Decimal(valor),
+                retencion=Retencion.objects.create(codigo=codigo, nombre=codigo, porcentaje=porcentaje, tipo=tipo)
+            )
+
+        raiz = self._validar(XMLComprobanteService.retencion(comprobante))
+        self.assertEqual(raiz.findtext('infoCompRetencion/periodoFiscal'), '03/2025')
+        self.assertEqual([i.findtext('codigo') for i in raiz.iterfind('impuestos/impuesto')], ['1', '2'])
+        self.assertEqual(raiz.findtext('impuestos/impuesto/numDocSustento'), '001001000000045')
+
+    def test_validacion_detecta_errores(self):
+        xml = XMLComprobanteService.factura(self.venta, '1' * 49)
+        firma = '<ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#"></ds:Signature>\n</factura>'
+        self.assertEqual(XMLComprobanteService.validar(xml.replace('</factura>', firma)), [])
+
+        errores = XMLComprobanteService.validar(
+            xml.replace('<claveAcceso>' + '1' * 49, '<claveAcceso>123').replace('<propina>0.00</propina>', '')
+        )
+        self.assertEqual(len(errores), 2)
+        self.assertIn('/factura/infoTributaria/claveAcceso', errores[0])
+        self.assertIn('propina', errores[1])
+        self.assertIn('detalles', XMLComprobanteService.validar(xml[:xml.index('  <detalles>')] + '</factura>')[0])
+        self.assertIn('mal formado', XMLComprobanteService.validar(xml[:-20])[0])
+
+    def test_validacion_acepta_elementos_opcionales_del_sri(self):
+        xml = XMLComprobanteService.factura(self.venta, '1' * 49)
+        for campo, extra in (
+            ('</dirMatriz>', '<contribuyenteRimpe>CONTRIBUYENTE RÉGIMEN RIMPE</contribuyenteRimpe>'),
+            ('</dirEstablecimiento>', '<contribuyenteEspecial>5368</contribuyenteEspecial>'),
+            ('</precioTotalSinImpuesto>', '<detallesAdicionales><detAdicional nombre="Lote" valor="A1"/>'
+                                          '</detallesAdicionales>'),
+        ):
+            xml = xml.replace(campo, campo + extra, 1)
+        self.assertEqual(XMLComprobanteService.validar(xml), [])
@@ -0,0 +1,112 @@
+"""
+Interruptor de circuito (circuit breaker) compartido entre procesos.
+
+El estado vive en la caché (Redis), de modo que todos los workers ven el
+mismo circuito: tras ``umbral`` fallos dentro de ``ventana`` segundos el
+circuito se abre durante ``apertura`` segundos y las llamadas fallan de
+inmediato con ``CircuitoAbierto`` (sin ocupar un worker esperando al
+servicio). Al vencer la apertura se deja pasar una única llamada de prueba
+(semiabierto): si funciona el circuito se cierra y si falla vuelve a abrirse.
+
+Una llamada que termina bien pero tarda más que ``lentitud`` segundos cuenta
+como fallo: un servicio lento acumula workers ocupados igual que uno caído.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+logger = logging.getLogger('sysfree')
+
+
+class CircuitoAbierto(Exception):
+    """El circuito está abierto: el servicio no se llama hasta que venza la apertura."""
+
+    def __init__(self, nombre, espera):
+        self.espera = espera
+        super().__init__(f"Circuito '{nombre}' abierto; reintentar en {espera:.0f} s")
+
+
+class InterruptorCircuito:
+    """
+    Interruptor de circuito con estado en la caché.
+
+    Args:
+        nombre (str): Identificador del servicio protegido
+        umbral (int): Fallos dentro de la ventana que abren el circuito
+        ventana (int): Segundos durante los que se cuentan los fallos
+        apertura (int): Segundos que el circuito permanece abierto
+        lentitud (float): Duración (segundos) a partir de la cual una llamada
+            correcta cuenta como fallo; None = no se considera
+    """
+
+    def __init__(self, nombre, umbral=5, ventana=60, apertura=30, lentitud=None):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.ventana = ventana
+        self.apertura = apertura
+        self.lentitud = lentitud
+
+    def _clave(self, parte):
+        return f'circuito:{self.nombre}:{parte}'
+
+    @property
+    def abierto_hasta(self):
+        """Instante (epoch) en que vence la apertura, o None si el circuito está cerrado."""
+        return cache.get(self._clave('abierto_hasta'))
+
+    def permitir(self):
+        """
+        Comprueba si se puede llamar al servicio.
+
+        Raises:
+            CircuitoAbierto: El circuito está abierto, o semiabierto con la
+                llamada de prueba ya en curso en otro proceso
+        """
+        abierto_hasta = self.abierto_hasta
+        if abierto_hasta is None:
+            return
+        ahora = time.time()
+        if ahora < abierto_hasta:
+            raise CircuitoAbierto(self.nombre, abierto_hasta - ahora)
+        # Semiabierto: solo un proceso hace la llamada de prueba
+        if not cache.add(self._clave('prueba'), 1, self.apertura):
+            raise CircuitoAbierto(self.nombre, self.apertura)
+
+    def registrar_exito(self, duracion=0):
+        if self.lentitud is not None and duracion > self.lentitud:
+            self.registrar_fallo(f'llamada lenta ({duracion:.1f} s)')
+            return
+        if self.abierto_hasta is not None:
+            logger.info(f"Circuito '{self.nombre}' cerrado")
+        cache.delete_many([self._clave('fallos'), self._clave('abierto_hasta'), self._clave('prueba')])
+
+    def registrar_fallo(self, motivo=''):
+        clave = self._clave('fallos')
+        cache.add(clave, 0, self.ventana)
+        try:
+            fallos = cache.incr(clave)
+        except (ValueError, TypeError):
+            # La clave expiró (u otro proceso abrió el circuito y la borró) entre add e incr
+            cache.set(clave, 1, self.ventana)
+            fallos = 1
+        if fallos >= self.umbral or cache.get(self._clave('prueba')):
+            cache.set(self._clave('abierto_hasta'), time.time() + self.apertura, self.apertura + self.ventana)
+            cache.delete_many([clave, self._clave('prueba')])
+            logger.warning(f"Circuito '{self.nombre}' abierto por {self.apertura} s tras {fallos} fallos: {motivo}")
+
+    @contextmanager
+    def llamada(self):
+        """
+        Protege una llamada al servicio: la rechaza si el circuito está abierto
+        y registra su resultado. Cualquier excepción cuenta como fallo.
+        """
+        self.permitir()
+        inicio = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.registrar_fallo(str(e) or e.__class__.__name__)
+            raise
+        self.registrar_exito(time.monotonic() - inicio)
@@ -0,0 +1,98 @@
+"""
+Escritura incremental de XML indentado, sin construir un árbol ni volver a
+formatear el resultado.
+
+``EscritorXML`` escribe las partes fijas de un comprobante campo a campo;
+los bloques que se repiten por línea (detalles, impuestos) se escriben con
+plantillas de texto creadas una vez con ``plantilla``.
+"""
+from xml.sax.saxutils import escape, quoteattr
+
+DECLARACION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SANGRIA = '  '
+
+
+def texto(valor):
+    """Valor escapado para el contenido de un elemento."""
+    return escape(str(valor))
+
+
+def plantilla(etiqueta, campos, nivel):
+    """
+    Plantilla ``str.format`` de un bloque indentado.
+
+    Args:
+        etiqueta (str): Elemento del bloque
+        campos (list): Nombres de los elementos hijos, o tuplas
+            ``(etiqueta, campos)`` para hijos con elementos; cada nombre es
+            también el nombre de su marcador, así que no deben repetirse
+        nivel (int): Nivel de indentación del bloque
+
+    Returns:
+        str: Plantilla; los valores se pasan ya escapados
+    """
+    sangria = SANGRIA * nivel
+    partes = [f'{sangria}<{etiqueta}>\n']
+    for campo in campos:
+        if isinstance(campo, tuple):
+            partes.append(plantilla(*campo, nivel + 1))
+        else:
+            partes.append(f'{sangria}{SANGRIA}<{campo}>{{{campo}}}</{campo}>\n')
+    partes.append(f'{sangria}</{etiqueta}>\n')
+    return ''.join(partes)
+
+
+class EscritorXML:
+    """
+    Documento XML escrito por partes.
+
+    Args:
+        raiz (str): Elemento raíz
+        **atributos: Atributos del elemento raíz
+    """
+
+    def __init__(self, raiz, **atributos):
+        self._partes = [DECLARACION]
+        self._abiertos = []
+        self.abrir(raiz, **atributos)
+
+    @property
+    def nivel(self):
+        """Nivel de indentación de los elementos que se escriben a continuación."""
+        return len(self._abiertos)
+
+    def abrir(self, etiqueta, **atributos):
+        atributos = ''.join(f' {nombre}={quoteattr(str(dato))}' for nombre, dato in atributos.items())
+        self._partes.append(f'{SANGRIA * self.nivel}<{etiqueta}{atributos}>\n')
+        self._abiertos.append(etiqueta)
+        return self
+
+    def cerrar(self):
+        etiqueta = self._abiertos.pop()
+        self._partes.append(f'{SANGRIA * self.nivel}</{etiqueta}>\n')
+        return self
+
+    def campo(self, etiqueta, valor, **atributos):
+        """Elemento con texto; si ``valor`` es None o vacío no se escribe."""
+        if valor is None or valor == '':
+            return self
+        atributos = ''.join(f' {nombre}={quoteattr(str(dato))}' for nombre, dato in atributos.items())
+        self._partes.append(f'{SANGRIA * self.nivel}<{etiqueta}{atributos}>{texto(valor)}</{etiqueta}>\n')
+        return self
+
+    def campos(self, *pares):
+        """Varios elementos con texto: pares ``(etiqueta, valor)``."""
+        for etiqueta, valor in pares:
+            self.campo(etiqueta, valor)
+        return self
+
+    def bloques(self, partes):
+        """Bloques ya escritos (p. ej. con una plantilla) al nivel actual."""
+        self._partes.extend(partes)
+        return self
+
+    def resultado(self):
+        """Cierra los elementos abiertos y devuelve el documento."""
+        while self._abiertos:
+            self.cerrar()
+        return ''.join(self._partes)
@@ -0,0 +1,238 @@
+"""
+Firma XAdES-BES de comprobantes electrónicos según la ficha técnica del SRI
+(RSA-SHA1, canonicalización C14N 1.0 inclusiva y firma envuelta).
+
+La llave privada y el certificado se descifran del archivo P12 una sola vez
+por proceso (``credencial``) y se vuelven a cargar si el archivo cambia; el
+bloque ``KeyInfo`` y su digest, que solo dependen del certificado, se
+calculan al cargarlo. Por comprobante solo se canonicaliza el documento, se
+arman las propiedades firmadas y se firma ``SignedInfo``.
+
+Las partes de la firma se escriben directamente en su forma canónica: al
+canonicalizar un elemento de la firma, C14N inclusivo le agrega las
+declaraciones ``xmlns:ds`` y ``xmlns:etsi`` heredadas de ``ds:Signature``,
+que se quitan al insertarlo en el documento. El documento firmado es el
+comprobante canonicalizado con la firma antes de su etiqueta de cierre; no
+se debe volver a formatear, porque cambiaría su digest.
+
+``firmar_lote`` firma muchos comprobantes en un grupo de procesos. Este
+módulo no depende de Django para que los procesos hijos no lo necesiten.
+"""
+import base64
+import hashlib
+import multiprocessing
+import os
+import random
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+DS = 'http://www.w3.org/2000/09/xmldsig#'
+ETSI = 'http://uri.etsi.org/01903/v1.3.2#'
+C14N = 'http://www.w3.org/TR/2001/REC-xml-c14n-20010315'
+RSA_SHA1 = 'http://www.w3.org/2000/09/xmldsig#rsa-sha1'
+SHA1 = 'http://www.w3.org/2000/09/xmldsig#sha1'
+ENVUELTA = 'http://www.w3.org/2000/09/xmldsig#enveloped-signature'
+DECLARACION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+# Declaraciones heredadas de ds:Signature en la forma canónica de sus elementos
+_NS = f' xmlns:ds="{DS}" xmlns:etsi="{ETSI}"'
+_DIGEST = f'<ds:DigestMethod Algorithm="{SHA1}"></ds:DigestMethod>'
+
+
+def _texto(valor):
+    """Escapa un texto como lo hace la canonicalización."""
+    return valor.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\r', '&#xD;')
+
+
+def _digest(datos):
+    if isinstance(datos, str):
+        datos = datos.encode('utf-8')
+    return base64.b64encode(hashlib.sha1(datos).digest()).decode('ascii')
+
+
+def _entero_base64(numero):
+    return base64.b64encode(numero.to_bytes((numero.bit_length() + 7) // 8, 'big')).decode('ascii')
+
+
+class CredencialFirma:
+    """
+    Llave privada y certificado descifrados de un archivo P12, con las partes
+    de la firma que solo dependen del certificado.
+
+    Args:
+        llave: Llave privada RSA
+        certificado: Certificado X.509 de la llave
+    """
+
+    def __init__(self, llave, certificado):
+        if not isinstance(llave, rsa.RSAPrivateKey) or certificado is None:
+            raise ValueError("El certificado no contiene una llave RSA con su certificado.")
+        self.llave = llave
+        self.certificado = certificado
+        self.id = random.randint(100000, 999999)
+        der = certificado.public_bytes(serialization.Encoding.DER)
+        numeros = llave.public_key().public_numbers()
+        self.key_info = (
+            f'<ds:KeyInfo{_NS} Id="Certificate{self.id}"><ds:X509Data><ds:X509Certificate>'
+            f'{base64.b64encode(der).decode("ascii")}</ds:X509Certificate></ds:X509Data><ds:KeyValue>'
+            f'<ds:RSAKeyValue><ds:Modulus>{_entero_base64(numeros.n)}</ds:Modulus>'
+            f'<ds:Exponent>{_entero_base64(numeros.e)}</ds:Exponent></ds:RSAKeyValue></ds:KeyValue></ds:KeyInfo>'
+        )
+        self.digest_key_info = _digest(self.key_info)
+        self.certificado_firmante = (
+            f'<etsi:SigningCertificate><etsi:Cert><etsi:CertDigest>{_DIGEST}<ds:DigestValue>{_digest(der)}'
+            f'</ds:DigestValue></etsi:CertDigest><etsi:IssuerSerial><ds:X509IssuerName>'
+            f'{_texto(certificado.issuer.rfc4514_string())}</ds:X509IssuerName><ds:X509SerialNumber>'
+            f'{certificado.serial_number}</ds:X509SerialNumber></etsi:IssuerSerial></etsi:Cert>'
+            f'</etsi:SigningCertificate>'
+        )
+
+    @classmethod
+    def cargar(cls, ruta, clave):
+        """Descifra el archivo P12 ``ruta`` con ``clave``."""
+        try:
+            with open(ruta, 'rb') as archivo:
+                datos = archivo.read()
+        except FileNotFoundError:
+            raise ValueError(f"No se encontró el archivo del certificado en: {ruta}")
+        llave, certificado, _ = pkcs12.load_key_and_certificates(datos, clave.encode())
+        return cls(llave, certificado)
+
+
+_credenciales = {}  # ruta -> (versión del archivo y de la clave, CredencialFirma)
+_candado = threading.Lock()
+
+
+def credencial(ruta, clave):
+    """
+    Credencial del certificado ``ruta``, descifrada una vez por proceso.
+
+    Se vuelve a descifrar si cambia el archivo (fecha de modificación, tamaño
+    o inodo) o la clave, p. ej. cuando la empresa renueva su certificado.
+    """
+    if not ruta or not clave:
+        raise ValueError("La ruta del certificado y la clave no pueden estar vacías.")
+    ruta = os.path.abspath(ruta)
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        raise ValueError(f"No se encontró el archivo del certificado en: {ruta}")
+    version = (estado.st_mtime_ns, estado.st_size, estado.st_ino, hashlib.sha256(clave.encode()).digest())
+    entrada = _credenciales.get(ruta)
+    if entrada is None or entrada[0] != version:
+        with _candado:
+            entrada = _credenciales.get(ruta)
+            if entrada is None or entrada[0] != version:
+                entrada = _credenciales[ruta] = (version, CredencialFirma.cargar(ruta, clave))
+    return entrada[1]
+
+
+def invalidar(ruta=None):
+    """Descarta la credencial de ``ruta`` (o todas) del proceso."""
+    with _candado:
+        if ruta is None:
+            _credenciales.clear()
+        else:
+            _credenciales.pop(os.path.abspath(ruta), None)
+
+
+def firmar(xml, credencial_firma, fecha_firma=None):
+    """
+    Firma un comprobante con XAdES-BES.
+
+    Args:
+        xml (str | bytes): Comprobante; su elemento raíz tiene ``id="comprobante"``
+        credencial_firma (CredencialFirma): Llave y certificado del emisor
+        fecha_firma (datetime): Fecha de la firma (por defecto, la hora local actual)
+
+    Returns:
+        str: Comprobante firmado, con la declaración XML
+    """
+    documento = ET.canonicalize(xml_data=xml)
+    cierre = documento.rindex('</')
+    i = credencial_firma.id
+    fecha = (fecha_firma or datetime.now().astimezone()).isoformat(timespec='seconds')
+
+    propiedades = (
+        f'<etsi:SignedProperties{_NS} Id="Signature{i}-SignedProperties{i}"><etsi:SignedSignatureProperties>'
+        f'<etsi:SigningTime>{fecha}</etsi:SigningTime>{credencial_firma.certificado_firmante}'
+        f'</etsi:SignedSignatureProperties><etsi:SignedDataObjectProperties>'
+        f'<etsi:DataObjectFormat ObjectReference="#Reference-ID-{i}"><etsi:Description>contenido comprobante'
+        f'</etsi:Description><etsi:MimeType>text/xml</etsi:MimeType></etsi:DataObjectFormat>'
+        f'</etsi:SignedDataObjectProperties></etsi:SignedProperties>'
+    )
+    signed_info = (
+        f'<ds:SignedInfo{_NS} Id="Signature-SignedInfo{i}">'
+        f'<ds:CanonicalizationMethod Algorithm="{C14N}"></ds:CanonicalizationMethod>'
+        f'<ds:SignatureMethod Algorithm="{RSA_SHA1}"></ds:SignatureMethod>'
+        f'<ds:Reference Id="SignedPropertiesID{i}" Type="http://uri.etsi.org/01903#SignedProperties" '
+        f'URI="#Signature{i}-SignedProperties{i}">{_DIGEST}<ds:DigestValue>{_digest(propiedades)}'
+        f'</ds:DigestValue></ds:Reference>'
+        f'<ds:Reference URI="#Certificate{i}">{_DIGEST}<ds:DigestValue>{credencial_firma.digest_key_info}'
+        f'</ds:DigestValue></ds:Reference>'
+        f'<ds:Reference Id="Reference-ID-{i}" URI="#comprobante"><ds:Transforms>'
+        f'<ds:Transform Algorithm="{ENVUELTA}"></ds:Transform></ds:Transforms>{_DIGEST}'
+        f'<ds:DigestValue>{_digest(documento)}</ds:DigestValue></ds:Reference></ds:SignedInfo>'
+    )
+    valor = credencial_firma.llave.sign(signed_info.encode('utf-8'), padding.PKCS1v15(), hashes.SHA1())
+
+    firma = (
+        f'<ds:Signature{_NS} Id="Signature{i}">{signed_info.replace(_NS, "", 1)}'
+        f'<ds:SignatureValue Id="SignatureValue{i}">{base64.b64encode(valor).decode("ascii")}</ds:SignatureValue>'
+        f'{credencial_firma.key_info.replace(_NS, "", 1)}<ds:Object Id="Signature{i}-Object{i}">'
+        f'<etsi:QualifyingProperties Target="#Signature{i}">{propiedades.replace(_NS, "", 1)}'
+        f'</etsi:QualifyingProperties></ds:Object></ds:Signature>'
+    )
+    return f'{DECLARACION}{documento[:cierre]}{firma}{documento[cierre:]}'
+
+
+# Firma por lotes en un grupo de procesos
+
+_credencial_proceso = None
+
+
+def _iniciar_proceso(ruta, clave):
+    global _credencial_proceso
+    _credencial_proceso = credencial(ruta, clave)
+
+
+def _firmar_en_proceso(xml, fecha_firma):
+    return firmar(xml, _credencial_proceso, fecha_firma)
+
+
+def firmar_lote(xmls, ruta, clave, procesos=None, fecha_firma=None):
+    """
+    Firma varios comprobantes repartiéndolos entre ``procesos`` procesos.
+
+    Cada proceso descifra el certificado una vez (con ``fork`` lo hereda ya
+    descifrado). Dentro de un proceso daemon, como los workers de Celery, que
+    no pueden crear procesos hijos, o con un solo proceso, firma en el
+    proceso actual.
+
+    Args:
+        xmls (iterable): Comprobantes a firmar
+        ruta (str): Archivo P12 del emisor
+        clave (str): Clave del archivo
+        procesos (int): Procesos del grupo (por defecto, los CPU disponibles)
+        fecha_firma (datetime): Fecha de las firmas (por defecto, la hora local actual)
+
+    Returns:
+        list: Comprobantes firmados, en el mismo orden
+    """
+    xmls = list(xmls)
+    credencial_firma = credencial(ruta, clave)
+    procesos = min(procesos or os.cpu_count() or 1, len(xmls))
+    fecha_firma = fecha_firma or datetime.now().astimezone()
+    if procesos <= 1 or multiprocessing.current_process().daemon:
+        return [firmar(xml, credencial_firma, fecha_firma) for xml in xmls]
+
+    with ProcessPoolExecutor(procesos, initializer=_iniciar_proceso, initargs=(ruta, clave)) as grupo:
+        bloque = max(1, len(xmls) // (procesos * 4))
+        return list(grupo.map(_firmar_en_proceso, xmls, repeat(fecha_firma), chunksize=bloque))
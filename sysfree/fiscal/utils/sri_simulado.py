@@ -0,0 +1,313 @@
+"""
+Servidor HTTP local que simula los web services SOAP de recepción y
+autorización de comprobantes del SRI (pruebas y benchmarks).
+
+Responde con sobres SOAP de la misma forma que los servicios
+``RecepcionComprobantesOffline`` y ``AutorizacionComprobantesOffline``:
+
+- Recepción (rutas que contienen ``Recepcion``): RECIBIDA, o DEVUELTA con el
+  error 43 (CLAVE ACCESO REGISTRADA) si la clave ya se había recibido, o con
+  el error 35 (documento inválido) según ``tasa_devueltas``.
+- Autorización (rutas que contienen ``Autorizacion``): AUTORIZADO para las
+  claves recibidas (la primera consulta de una clave puede devolver EN
+  PROCESO según ``tasa_en_proceso``); sin comprobantes si la clave no se
+  recibió.
+
+Cada solicitud espera ``latencia`` segundos (más una variación aleatoria de
+hasta ``variacion``) y con probabilidad ``tasa_fallos`` responde HTTP 500.
+Con ``tls=True`` atiende por HTTPS con un certificado autofirmado y
+``latencia_conexion`` se espera una vez por conexión nueva (simula los viajes
+de ida y vuelta del establecimiento TCP y TLS con un servidor remoto).
+Se ejecuta en un hilo con ``iniciar()``/``detener()`` o con el comando
+``sri_simulado``. ``crear_certificado_prueba`` genera un certificado P12
+autofirmado para firmar los comprobantes enviados al simulador.
+"""
+import base64
+import ipaddress
+import os
+import random
+import re
+import shutil
+import ssl
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, pkcs12
+from cryptography.x509.oid import NameOID
+
+_CLAVE_ACCESO = re.compile(rb'<claveAcceso>(\d{49})</claveAcceso>')
+_XML_BASE64 = re.compile(rb'<xml>\s*([A-Za-z0-9+/=\s]+?)\s*</xml>')
+_CLAVE_CONSULTADA = re.compile(rb'<claveAccesoComprobante>\s*(\d+)\s*</claveAccesoComprobante>')
+
+_SOBRE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>{}</soap:Body></soap:Envelope>'
+)
+
+
+def crear_certificado_prueba(ruta, clave, nombre='SYSFREE PRUEBAS'):
+    """
+    Crea un certificado P12 autofirmado (RSA 2048, un año de vigencia).
+
+    Args:
+        ruta (str): Archivo .p12 que se escribe
+        clave (str): Clave del archivo
+        nombre (str): Nombre común del titular
+    """
+    llave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    titular = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, nombre)])
+    ahora = datetime.now(timezone.utc)
+    certificado = (
+        x509.CertificateBuilder()
+        .subject_name(titular)
+        .issuer_name(titular)
+        .public_key(llave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(ahora - timedelta(days=1))
+        .not_valid_after(ahora + timedelta(days=365))
+        .sign(llave, hashes.SHA256())
+    )
+    with open(ruta, 'wb') as archivo:
+        archivo.write(pkcs12.serialize_key_and_certificates(
+            nombre.encode(), llave, certificado, None, BestAvailableEncryption(clave.encode())
+        ))
+
+
+def _crear_certificado_tls(directorio, host):
+    """Certificado y llave PEM autofirmados para ``host``; devuelve sus rutas."""
+    llave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    titular = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    ahora = datetime.now(timezone.utc)
+    certificado = (
+        x509.CertificateBuilder()
+        .subject_name(titular)
+        .issuer_name(titular)
+        .public_key(llave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(ahora - timedelta(days=1))
+        .not_valid_after(ahora + timedelta(days=30))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(host))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(llave, hashes.SHA256())
+    )
+    ruta_certificado = os.path.join(directorio, 'sri.pem')
+    ruta_llave = os.path.join(directorio, 'sri.key')
+    with open(ruta_certificado, 'wb') as archivo:
+        archivo.write(certificado.public_bytes(serialization.Encoding.PEM))
+    with open(ruta_llave, 'wb') as archivo:
+        archivo.write(llave.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return ruta_certificado, ruta_llave
+
+
+def _mensaje(identificador, texto, tipo='ERROR'):
+    return (
+        f'<mensajes><mensaje><identificador>{identificador}</identificador>'
+        f'<mensaje>{escape(texto)}</mensaje><tipo>{tipo}</tipo></mensaje></mensajes>'
+    )
+
+
+class ServidorSRISimulado:
+    """
+    Simulador de los servicios del SRI.
+
+    Args:
+        puerto (int): Puerto de escucha; 0 = uno libre
+        latencia (float): Segundos de espera de cada respuesta
+        variacion (float): Variación aleatoria máxima sumada a la latencia
+        tasa_fallos (float): Probabilidad de responder HTTP 500
+        tasa_devueltas (float): Probabilidad de devolver un comprobante nuevo en la recepción
+        tasa_en_proceso (float): Probabilidad de que la primera consulta de
+            autorización de una clave responda EN PROCESO
+        semilla (int): Semilla de los sorteos (resultados reproducibles)
+        latencia_conexion (float): Segundos de espera al aceptar cada conexión nueva
+        tls (bool): Atender por HTTPS; ``certificado_tls`` es el certificado
+            que deben aceptar los clientes
+    """
+
+    def __init__(self, puerto=0, latencia=0.0, variacion=0.0, tasa_fallos=0.0, tasa_devueltas=0.0,
+                 tasa_en_proceso=0.0, semilla=None, host='127.0.0.1', latencia_conexion=0.0, tls=False):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_fallos = tasa_fallos
+        self.tasa_devueltas = tasa_devueltas
+        self.tasa_en_proceso = tasa_en_proceso
+        self.recibidos = {}  # clave de acceso -> XML del comprobante
+        self.consultados = set()
+        self.latencia_conexion = latencia_conexion
+        self.solicitudes = {'recepcion': 0, 'autorizacion': 0, 'fallos': 0}
+        self.conexiones = 0
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._hilo = None
+
+        simulador = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Cabeceras y cuerpo van en escrituras separadas; sin esto, Nagle y el
+            # ACK diferido añaden ~40 ms a cada respuesta de una conexión persistente
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with simulador._lock:
+                    simulador.conexiones += 1
+                if simulador.latencia_conexion:
+                    time.sleep(simulador.latencia_conexion)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionError, ssl.SSLError):
+                    pass  # El cliente cerró una conexión persistente
+
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                estado, respuesta = simulador.responder(self.path, cuerpo)
+                datos = respuesta.encode('utf-8')
+                self.send_response(estado)
+                self.send_header('Content-Type', 'text/xml;charset=UTF-8')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self.servidor.daemon_threads = True
+        self._directorio = None
+        self.certificado_tls = None
+        if tls:
+            self._directorio = tempfile.mkdtemp()
+            self.certificado_tls, llave = _crear_certificado_tls(self._directorio, host)
+            contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            contexto.load_cert_chain(self.certificado_tls, llave)
+            # El handshake se hace en el hilo de cada conexión, no en el que acepta
+            self.servidor.socket = contexto.wrap_socket(
+                self.servidor.socket, server_side=True, do_handshake_on_connect=False
+            )
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"{'https' if self.certificado_tls else 'http'}://{host}:{puerto}"
+
+    @property
+    def url_recepcion(self):
+        return f'{self.url}/comprobantes-electronicos-ws/RecepcionComprobantesOffline'
+
+    @property
+    def url_autorizacion(self):
+        return f'{self.url}/comprobantes-electronicos-ws/AutorizacionComprobantesOffline'
+
+    def iniciar(self):
+        """Atiende solicitudes en un hilo en segundo plano."""
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        if self._hilo:
+            self._hilo.join()
+        if self._directorio:
+            shutil.rmtree(self._directorio, ignore_errors=True)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def _sortear(self, probabilidad):
+        with self._lock:
+            return self._azar.random() < probabilidad
+
+    def responder(self, ruta, cuerpo):
+        """
+        Respuesta a una solicitud SOAP.
+
+        Returns:
+            tuple: (código HTTP, cuerpo de la respuesta)
+        """
+        with self._lock:
+            espera = self.latencia + self._azar.uniform(0, self.variacion) if self.variacion else self.latencia
+        if espera:
+            time.sleep(espera)
+        recepcion = 'recepcion' in ruta.lower()
+        with self._lock:
+            self.solicitudes['recepcion' if recepcion else 'autorizacion'] += 1
+        if self._sortear(self.tasa_fallos):
+            with self._lock:
+                self.solicitudes['fallos'] += 1
+            return 500, 'Error interno simulado'
+        if recepcion:
+            return 200, self._recepcion(cuerpo)
+        return 200, self._autorizacion(cuerpo)
+
+    def _recepcion(self, cuerpo):
+        coincidencia = _XML_BASE64.search(cuerpo)
+        xml = base64.b64decode(coincidencia.group(1)) if coincidencia else b''
+        clave = _CLAVE_ACCESO.search(xml)
+        clave = clave.group(1).decode() if clave else ''
+        with self._lock:
+            registrada = clave in self.recibidos
+        if not clave:
+            estado, detalle = 'DEVUELTA', _mensaje('35', 'ARCHIVO NO CUMPLE ESTRUCTURA XML')
+        elif registrada:
+            estado, detalle = 'DEVUELTA', _mensaje('43', 'CLAVE ACCESO REGISTRADA')
+        elif self._sortear(self.tasa_devueltas):
+            estado, detalle = 'DEVUELTA', _mensaje('35', 'DOCUMENTO INVALIDO (simulado)')
+        else:
+            with self._lock:
+                self.recibidos[clave] = xml.decode('utf-8')
+            estado, detalle = 'RECIBIDA', ''
+        comprobantes = (
+            f'<comprobantes><comprobante><claveAcceso>{clave}</claveAcceso>{detalle}</comprobante></comprobantes>'
+            if detalle else '<comprobantes/>'
+        )
+        return _SOBRE.format(
+            '<ns2:validarComprobanteResponse xmlns:ns2="http://ec.gob.sri.ws.recepcion">'
+            f'<RespuestaRecepcionComprobante><estado>{estado}</estado>{comprobantes}</RespuestaRecepcionComprobante>'
+            '</ns2:validarComprobanteResponse>'
+        )
+
+    def _autorizacion(self, cuerpo):
+        coincidencia = _CLAVE_CONSULTADA.search(cuerpo)
+        clave = coincidencia.group(1).decode() if coincidencia else ''
+        with self._lock:
+            xml = self.recibidos.get(clave)
+            primera = clave not in self.consultados
+            self.consultados.add(clave)
+        if xml is None:
+            autorizaciones = '<numeroComprobantes>0</numeroComprobantes><autorizaciones/>'
+        else:
+            if primera and self._sortear(self.tasa_en_proceso):
+                estado, numero, fecha = 'EN PROCESO', '', ''
+            else:
+                estado, numero = 'AUTORIZADO', clave
+                fecha = datetime.now().astimezone().isoformat(timespec='seconds')
+            autorizaciones = (
+                '<numeroComprobantes>1</numeroComprobantes><autorizaciones><autorizacion>'
+                f'<estado>{estado}</estado><numeroAutorizacion>{numero}</numeroAutorizacion>'
+                f'<fechaAutorizacion>{fecha}</fechaAutorizacion><ambiente>PRUEBAS</ambiente>'
+                f'<comprobante>{escape(xml)}</comprobante><mensajes/>'
+                '</autorizacion></autorizaciones>'
+            )
+        return _SOBRE.format(
+            '<ns2:autorizacionComprobanteResponse xmlns:ns2="http://ec.gob.sri.ws.autorizacion">'
+            f'<RespuestaAutorizacionComprobante><claveAccesoConsultada>{clave}</claveAccesoConsultada>'
+            f'{autorizaciones}</RespuestaAutorizacionComprobante>'
+            '</ns2:autorizacionComprobanteResponse>'
+        )
@@ -0,0 +1,115 @@
+"""
+Comando para comparar el costo por movimiento de la cascada de guardados
+previa contra StockLedgerService, uno a uno y en lote (consultas, escrituras
+a Producto y latencia).
+
+Todo se ejecuta dentro de una transacción que se revierte al final.
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventario.models import Almacen, Categoria, MovimientoInventario, Producto, StockAlmacen
+from inventario.services import InventarioService
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y latencia por movimiento: cascada anterior vs. StockLedgerService y lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movimientos', type=int, default=200,
+                            help='Movimientos a registrar por escenario (por defecto 200)')
+
+    def handle(self, *args, **options):
+        total = options['movimientos']
+        with transaction.atomic():
+            categoria, producto, almacen = self._crear_datos()
+            lote = self._crear_lote(categoria, almacen, total)
+            resultados = [
+                ('cascada anterior', self._medir(total, lambda: self._movimiento_cascada(producto, almacen))),
+                ('StockLedgerService', self._medir(total, lambda: self._movimiento_ledger(producto, almacen))),
+                # El lote se registra en una sola llamada; sus métricas se reparten entre las líneas
+                ('lote', self._medir(1, lambda: InventarioService.registrar_movimientos_lote(
+                    lote, tipo='entrada', origen='compra'
+                ))),
+            ]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Movimientos por escenario: {total}')
+        self.stdout.write(f"{'escenario':<22}{'consultas/mov':>15}{'UPDATE producto/mov':>22}{'ms/mov':>10}")
+        for nombre, (consultas, updates_producto, segundos) in resultados:
+            self.stdout.write(
+                f'{nombre:<22}{consultas / total:>15.2f}{updates_producto / total:>22.2f}'
+                f'{segundos * 1000 / total:>10.3f}'
+            )
+        self.stdout.write(self.style.SUCCESS('Benchmark completado (cambios revertidos)'))
+
+    def _crear_datos(self):
+        categoria = Categoria.objects.create(nombre='Benchmark stock')
+        producto = Producto.objects.create(
+            codigo=f'BENCH-STOCK-{timezone.now().timestamp()}',
+            nombre='Producto benchmark stock',
+            categoria=categoria,
+            precio_venta=Decimal('1.00'),
+        )
+        almacen = Almacen.objects.create(nombre='Almacén benchmark stock')
+        return categoria, producto, almacen
+
+    def _medir(self, total, registrar):
+        tabla_producto = f'UPDATE "{Producto._meta.db_table}"'
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            for _ in range(total):
+                registrar()
+            segundos = time.perf_counter() - inicio
+        updates_producto = sum(1 for q in ctx.captured_queries if q['sql'].startswith(tabla_producto))
+        return len(ctx.captured_queries), updates_producto, segundos
+
+    def _movimiento_ledger(self, producto, almacen):
+        MovimientoInventario.objects.create(
+            tipo='entrada', origen='compra', producto=producto, almacen=almacen,
+            cantidad=Decimal('1.00'), costo_unitario=Decimal('1.00'),
+        )
+
+    def _crear_lote(self, categoria, almacen, total):
+        """Prepara ``total`` líneas de productos distintos para registrar_movimientos_lote."""
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'BENCH-LOTE-{i}-{timezone.now().timestamp()}', nombre=f'Lote {i}',
+                     categoria=categoria, precio_venta=Decimal('1.00'))
+            for i in range(total)
+        ])
+        return [(producto, almacen, Decimal('1.00'), Decimal('1.00')) for producto in productos]
+
+    def _movimiento_cascada(self, producto, almacen):
+        """Reproduce la cascada previa de MovimientoInventario.save() y sus señales."""
+        # Señal pre_save calcular_stock_nuevo
+        stock_almacen = StockAlmacen.objects.filter(producto=producto, almacen=almacen).first()
+        stock_anterior = stock_almacen.cantidad if stock_almacen else Decimal('0.00')
+        movimiento = MovimientoInventario(
+            tipo='entrada', origen='compra', producto=producto, almacen=almacen,
+            cantidad=Decimal('1.00'), costo_unitario=Decimal('1.00'),
+            stock_anterior=stock_anterior, stock_nuevo=stock_anterior + Decimal('1.00'),
+        )
+        # Inserción sin pasar por StockLedgerService
+        models.Model.save(movimiento)
+        stock_almacen, _ = StockAlmacen.objects.get_or_create(
+            producto=producto, almacen=almacen, defaults={'cantidad': Decimal('0.00')}
+        )
+        stock_almacen.cantidad = movimiento.stock_nuevo
+        stock_almacen.save()  # update_producto_stock(): re-suma y guarda Producto
+        total_stock = StockAlmacen.objects.filter(producto=producto).aggregate(
+            total=Sum('cantidad')
+        )['total'] or Decimal('0.00')
+        if producto.variaciones.exists():
+            total_stock = producto.variaciones.aggregate(total=Sum('stock'))['total'] or Decimal('0.00')
+        producto.stock = total_stock
+        producto.save(update_fields=['stock'])
+        # Señal post_save actualizar_stock_producto
+        producto.fecha_ultimo_movimiento = timezone.now()
+        producto.fecha_ultima_compra = timezone.now().date()
+        producto.save(update_fields=['fecha_ultimo_movimiento', 'fecha_ultima_compra'])
@@ -2,6 +2,8 @@
 Comando para verificar productos con stock bajo.
 """
 from django.core.management.base import BaseCommand
+from core.constants import AccionesAuditoria
+from core.utils.auditoria import auditoria_masiva
 from inventario.services.stock_notification_service import StockNotificationService
 
 class Command(BaseCommand):
@@ -10,7 +12,9 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write('Verificando productos con stock bajo...')
         
-        # Verificar productos con stock bajo
-        StockNotificationService.verificar_productos_stock_bajo()
+        # Verificar productos con stock bajo (las alertas se auditan en un solo resumen)
+        with auditoria_masiva(accion=AccionesAuditoria.VERIFICACION_STOCK_BAJO,
+                              descripcion='Verificación de productos con stock bajo'):
+            StockNotificationService.verificar_productos_stock_bajo()
         
         self.stdout.write(self.style.SUCCESS('Verificación completada'))
\ No newline at end of file
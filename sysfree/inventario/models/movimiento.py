@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from core.models import ModeloBase
@@ -7,8 +7,6 @@ from .proveedor import Proveedor
 from .almacen import Almacen
 from .lote import Lote
 from .stock_almacen import StockAlmacen
-from decimal import Decimal
-from django.db.models import Sum
 
 class MovimientoInventario(ModeloBase):
     TIPO_CHOICES = (
@@ -74,6 +72,10 @@ class MovimientoInventario(ModeloBase):
         verbose_name = _('movimiento de inventario')
         verbose_name_plural = _('movimientos de inventario')
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['-fecha'], name='inv_movimiento_fecha_idx'),
+            models.Index(fields=['producto', '-fecha'], name='inv_movimiento_prod_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.producto} - {self.cantidad:.2f}"
@@ -104,20 +106,12 @@ class MovimientoInventario(ModeloBase):
             raise ValidationError(_('El lote debe corresponder al producto seleccionado.'))
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        stock_almacen, _ = StockAlmacen.objects.get_or_create(
-            producto=self.producto,
-            almacen=self.almacen,
-            defaults={'cantidad': Decimal('0.00')}
-        )
-        stock_almacen.cantidad = self.stock_nuevo
-        stock_almacen.save()
-        total_stock = StockAlmacen.objects.filter(producto=self.producto).aggregate(
-            total=Sum('cantidad')
-        )['total'] or Decimal('0.00')
-        if self.producto.variaciones.exists():
-            total_stock = self.producto.variaciones.aggregate(
-                total=Sum('stock')
-            )['total'] or Decimal('0.00')
-        self.producto.stock = total_stock
-        self.producto.save(update_fields=['stock'])
\ No newline at end of file
+        if not self._state.adding:
+            # El libro de movimientos es de solo inserción: editar no recalcula stock
+            super().save(*args, **kwargs)
+            return
+        from ..services.stock_ledger_service import StockLedgerService
+        with transaction.atomic():
+            stock = StockLedgerService.preparar_movimiento(self)
+            super().save(*args, **kwargs)
+            StockLedgerService.aplicar_movimiento(self, stock)
@@ -1,7 +1,10 @@
 from .inventario_service import InventarioService
 from .stock_notification_service import StockNotificationService
+from .stock_ledger_service import StockLedgerService, StockInsuficienteError
 
 __all__ = [
     'InventarioService',
     'StockNotificationService',
+    'StockLedgerService',
+    'StockInsuficienteError',
 ]
\ No newline at end of file
@@ -1,9 +1,11 @@
 from django.utils import timezone
 from django.db.models import Sum, F, Q
 from django.db import transaction
-from ..models import Producto, MovimientoInventario, StockAlmacen, Almacen
+from ..models import Producto, MovimientoInventario, Almacen
 from core.services.cache_service import CacheService
+from core.services.referencia_service import ReferenciaService
 from core.services.auditoria_service import AuditoriaService
+from .stock_ledger_service import StockLedgerService
 from decimal import Decimal
 import logging
 
@@ -16,9 +18,29 @@ class InventarioService:
     def invalidar_cache_producto(cls, producto_id):
         """Invalida el caché relacionado con un producto específico."""
         try:
-            CacheService.delete('productos_bajo_stock')
-            CacheService.delete_pattern(f'*movimientos_producto_{producto_id}_*')
-            CacheService.delete_pattern(f'*producto*{producto_id}*')
+            CacheService.invalidate_tags('productos', f'producto:{producto_id}')
+        except Exception as e:
+            logger.error(f"Error al invalidar caché: {str(e)}")
+    
+    @classmethod
+    def obtener_almacen_predeterminado(cls):
+        """
+        Obtiene el almacén usado por defecto para los movimientos (el primer almacén activo).
+        
+        Returns:
+            Almacen: El almacén predeterminado o None si no hay almacenes activos
+        """
+        return ReferenciaService.obtener(
+            'almacen', 'predeterminado', lambda: Almacen.objects.filter(activo=True).first()
+        )
+    
+    @classmethod
+    def invalidar_cache_productos(cls, producto_ids):
+        """Invalida el caché de varios productos (un INCR por etiqueta)."""
+        if not producto_ids:
+            return
+        try:
+            CacheService.invalidate_tags('productos', *[f'producto:{producto_id}' for producto_id in producto_ids])
         except Exception as e:
             logger.error(f"Error al invalidar caché: {str(e)}")
     
@@ -60,20 +82,12 @@ class InventarioService:
             logger.error("El costo unitario debe ser mayor que cero")
             raise ValueError("El costo unitario debe ser mayor que cero")
             
-        # Crear o actualizar stock en almacén
-        stock_almacen, _ = StockAlmacen.objects.get_or_create(
-            producto=producto,
-            almacen=almacen,
-            defaults={'cantidad': Decimal('0.00')}
-        )
-        
+        # stock_anterior/stock_nuevo los calcula StockLedgerService bajo bloqueo
         movimiento = MovimientoInventario(
             tipo='entrada',
             origen=origen,
             producto=producto,
             cantidad=Decimal(cantidad),
-            stock_anterior=stock_almacen.cantidad,
-            stock_nuevo=stock_almacen.cantidad + Decimal(cantidad),
             costo_unitario=Decimal(costo_unitario),
             proveedor=proveedor,
             documento=documento,
@@ -87,7 +101,6 @@ class InventarioService:
             movimiento.creado_por = usuario
         
         try:
-            movimiento.clean()
             movimiento.save()
             logger.info(f"Movimiento de entrada creado: {movimiento}")
             
@@ -139,19 +152,13 @@ class InventarioService:
             logger.error("La cantidad debe ser mayor que cero")
             raise ValueError("La cantidad debe ser mayor que cero")
             
-        # Verificar stock disponible
-        stock_almacen = StockAlmacen.objects.filter(producto=producto, almacen=almacen).first()
-        if not stock_almacen or stock_almacen.cantidad < cantidad:
-            logger.error(f"Stock insuficiente para producto {producto} en almacén {almacen}")
-            raise ValueError(f"Stock insuficiente para el producto {producto.nombre} en el almacén {almacen.nombre}")
-            
+        # El stock disponible se verifica sobre la fila bloqueada al guardar
+        # (StockInsuficienteError es un ValueError)
         movimiento = MovimientoInventario(
             tipo='salida',
             origen=origen,
             producto=producto,
             cantidad=Decimal(cantidad),
-            stock_anterior=stock_almacen.cantidad,
-            stock_nuevo=stock_almacen.cantidad - Decimal(cantidad),
             documento=documento,
             notas=notas,
             referencia_id=referencia_id,
@@ -163,7 +170,6 @@ class InventarioService:
             movimiento.creado_por = usuario
         
         try:
-            movimiento.clean()
             movimiento.save()
             logger.info(f"Movimiento de salida creado: {movimiento}")
             
@@ -182,6 +188,88 @@ class InventarioService:
         
         return movimiento
     
+    @classmethod
+    @transaction.atomic
+    def registrar_movimientos_lote(cls, items, tipo='entrada', origen='compra', proveedor=None,
+                                   documento='', notas='', usuario=None,
+                                   referencia_id=None, referencia_tipo=''):
+        """
+        Registra en bloque entradas o salidas de inventario.
+        
+        Bloquea todas las filas de stock afectadas en una sola consulta, inserta
+        los movimientos con bulk_create, registra un único evento de auditoría
+        resumido e invalida el caché una sola vez.
+        
+        Args:
+            items (list): Tuplas (producto, almacen, cantidad, costo_unitario);
+                el costo puede ser None en salidas
+            tipo (str): Tipo de movimiento ('entrada' o 'salida')
+            origen (str): Origen de los movimientos (compra, venta, etc.)
+            proveedor (Proveedor): Proveedor de las entradas
+            documento (str): Número de documento relacionado
+            notas (str): Notas adicionales
+            usuario (Usuario): Usuario que realiza la operación
+            referencia_id (int): ID de la referencia (ej. ID de la compra)
+            referencia_tipo (str): Tipo de referencia (ej. 'orden_compra')
+            
+        Returns:
+            list: Movimientos creados (se omiten productos no inventariables)
+        """
+        if tipo not in ('entrada', 'salida'):
+            raise ValueError(f"Tipo de movimiento no válido para lote: {tipo}")
+        logger.info(f"Registrando lote de {len(items)} movimientos de {tipo}, origen {origen}")
+        
+        movimientos = []
+        for producto, almacen, cantidad, costo_unitario in items:
+            if not producto.es_inventariable:
+                logger.warning(f"Producto {producto} no es inventariable")
+                continue
+            if not almacen:
+                logger.error("El almacén es obligatorio")
+                raise ValueError("El almacén es obligatorio")
+            if cantidad <= 0:
+                logger.error("La cantidad debe ser mayor que cero")
+                raise ValueError("La cantidad debe ser mayor que cero")
+            if tipo == 'entrada' and (costo_unitario is None or costo_unitario <= 0):
+                logger.error("El costo unitario debe ser mayor que cero")
+                raise ValueError("El costo unitario debe ser mayor que cero")
+            
+            movimientos.append(MovimientoInventario(
+                tipo=tipo,
+                origen=origen,
+                producto=producto,
+                cantidad=Decimal(cantidad),
+                costo_unitario=Decimal(costo_unitario) if costo_unitario is not None else None,
+                proveedor=proveedor if tipo == 'entrada' else None,
+                documento=documento,
+                notas=notas,
+                referencia_id=referencia_id,
+                referencia_tipo=referencia_tipo,
+                almacen=almacen,
+                creado_por=usuario,
+                modificado_por=usuario
+            ))
+        
+        if not movimientos:
+            return []
+        
+        try:
+            movimientos = StockLedgerService.registrar_lote(movimientos)
+            logger.info(f"Lote de {len(movimientos)} movimientos de {tipo} creado")
+            
+            # Registrar auditoría resumida del lote
+            AuditoriaService.stock_actualizado_lote(
+                movimientos,
+                motivo=f"{tipo.capitalize()} en lote - {origen}"
+            )
+            
+            cls.invalidar_cache_productos({m.producto_id for m in movimientos})
+        except Exception as e:
+            logger.error(f"Error al registrar lote de movimientos: {str(e)}")
+            raise
+        
+        return movimientos
+    
     @classmethod
     @transaction.atomic
     def ajustar_inventario(cls, producto, cantidad_nueva, notas='', usuario=None, almacen=None):
@@ -209,16 +297,12 @@ class InventarioService:
             logger.error("La cantidad nueva no puede ser negativa")
             raise ValueError("La cantidad nueva no puede ser negativa")
             
-        stock_almacen = StockAlmacen.objects.filter(producto=producto, almacen=almacen).first()
-        stock_anterior = stock_almacen.cantidad if stock_almacen else Decimal('0.00')
-        
+        # Un ajuste fija el stock del almacén en la cantidad indicada
         movimiento = MovimientoInventario(
             tipo='ajuste',
             origen='ajuste_manual',
             producto=producto,
-            cantidad=Decimal(cantidad_nueva) - stock_anterior,
-            stock_anterior=stock_anterior,
-            stock_nuevo=Decimal(cantidad_nueva),
+            cantidad=Decimal(cantidad_nueva),
             notas=notas,
             almacen=almacen
         )
@@ -227,7 +311,6 @@ class InventarioService:
             movimiento.creado_por = usuario
         
         try:
-            movimiento.clean()  # Ejecutar validaciones del modelo
             movimiento.save()
             logger.info(f"Movimiento de ajuste creado: {movimiento}")
             
@@ -254,7 +337,7 @@ class InventarioService:
                 stock__lt=F('stock_minimo')
             ).order_by('nombre'))
         
-        return CacheService.get_or_set('productos_bajo_stock', consulta_productos, 900)
+        return CacheService.get_or_set_tagged('productos_bajo_stock', consulta_productos, ['productos'], 900)
     
     @classmethod
     def obtener_movimientos_producto(cls, producto, fecha_inicio=None, fecha_fin=None):
@@ -281,4 +364,4 @@ class InventarioService:
                 query &= Q(fecha__lte=fecha_fin)
             return list(MovimientoInventario.objects.filter(query).order_by('-fecha'))
         
-        return CacheService.get_or_set(cache_key, consulta_movimientos, 600)
\ No newline at end of file
+        return CacheService.get_or_set_tagged(cache_key, consulta_movimientos, [f'producto:{producto.id}'], 600)
\ No newline at end of file
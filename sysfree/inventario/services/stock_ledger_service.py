@@ -0,0 +1,314 @@
+from django.utils import timezone
+from django.db.models import F, Q, Case, When, Exists, OuterRef
+from core.utils.transacciones import fijar_lock_timeout
+from ..models import Producto, MovimientoInventario, StockAlmacen, Variacion
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StockInsuficienteError(ValueError):
+    """Se lanza cuando una salida dejaría el stock del almacén en negativo."""
+
+
+class StockLedgerService:
+    """
+    Motor de libro mayor de stock.
+
+    Aplica cada movimiento como un único delta atómico (``F()``) sobre la fila
+    bloqueada de ``StockAlmacen`` y mantiene ``Producto.stock`` con un delta
+    incremental, en lugar de re-sumar todos los almacenes en cada guardado.
+    """
+
+    # Espera máxima por bloqueos de stock antes de fallar (y reintentar)
+    LOCK_TIMEOUT_MS = 2000
+
+    @staticmethod
+    def calcular_delta(tipo, cantidad, stock_anterior):
+        """
+        Calcula la variación de stock que produce un movimiento.
+
+        Args:
+            tipo (str): Tipo de movimiento (entrada, salida, ajuste, ...)
+            cantidad (Decimal): Cantidad del movimiento
+            stock_anterior (Decimal): Stock del almacén antes del movimiento
+
+        Returns:
+            Decimal: Delta a aplicar sobre el stock del almacén
+        """
+        cantidad = Decimal(cantidad)
+        if tipo == 'entrada':
+            return cantidad
+        if tipo == 'salida':
+            return -cantidad
+        if tipo == 'ajuste':
+            # Los ajustes fijan el stock del almacén en la cantidad indicada
+            return cantidad - stock_anterior
+        return Decimal('0.00')
+
+    @classmethod
+    def _bloquear_stock(cls, producto_id, almacen_id):
+        """Obtiene y bloquea la fila de stock del almacén junto con su producto."""
+        return StockAlmacen.objects.select_for_update(
+            of=('self', 'producto')
+        ).select_related('producto').annotate(
+            tiene_variaciones=Exists(Variacion.objects.filter(producto=OuterRef('producto_id')))
+        ).filter(producto_id=producto_id, almacen_id=almacen_id).first()
+
+    @classmethod
+    def preparar_movimiento(cls, movimiento):
+        """
+        Bloquea el stock afectado y calcula ``stock_anterior``/``stock_nuevo``.
+
+        Debe llamarse dentro de una transacción, antes de insertar el movimiento.
+
+        Args:
+            movimiento (MovimientoInventario): Movimiento aún no guardado
+
+        Returns:
+            StockAlmacen: Fila bloqueada, anotada con ``tiene_variaciones``
+
+        Raises:
+            StockInsuficienteError: Si una salida excede el stock disponible
+        """
+        stock = cls._bloquear_stock(movimiento.producto_id, movimiento.almacen_id)
+        if stock is None:
+            if movimiento.tipo == 'salida' and movimiento.producto.es_inventariable:
+                cls._validar_disponible(movimiento, Decimal('0.00'))
+            StockAlmacen.objects.bulk_create([
+                StockAlmacen(
+                    producto_id=movimiento.producto_id,
+                    almacen_id=movimiento.almacen_id,
+                    cantidad=Decimal('0.00'),
+                    creado_por=movimiento.creado_por,
+                )
+            ], ignore_conflicts=True)
+            stock = cls._bloquear_stock(movimiento.producto_id, movimiento.almacen_id)
+
+        delta = cls.calcular_delta(movimiento.tipo, movimiento.cantidad, stock.cantidad)
+        if movimiento.tipo == 'salida' and stock.producto.es_inventariable:
+            cls._validar_disponible(movimiento, stock.cantidad)
+
+        movimiento.stock_anterior = stock.cantidad
+        movimiento.stock_nuevo = stock.cantidad + delta
+        stock.delta = delta
+        return stock
+
+    @classmethod
+    def aplicar_movimiento(cls, movimiento, stock):
+        """
+        Aplica el delta del movimiento sobre ``StockAlmacen`` y ``Producto``.
+
+        Args:
+            movimiento (MovimientoInventario): Movimiento ya insertado
+            stock (StockAlmacen): Fila devuelta por ``preparar_movimiento``
+        """
+        ahora = timezone.now()
+        delta = stock.delta
+        if delta:
+            StockAlmacen.objects.filter(pk=stock.pk).update(
+                cantidad=F('cantidad') + delta,
+                fecha_modificacion=ahora
+            )
+
+        # Las fechas que antes actualizaba la señal post_save viajan en el mismo UPDATE
+        campos = {'fecha_ultimo_movimiento': ahora}
+        if movimiento.tipo == 'entrada' and movimiento.origen == 'compra':
+            campos['fecha_ultima_compra'] = ahora.date()
+        # Con variaciones, el stock del producto es la suma de las variaciones
+        if delta and not stock.tiene_variaciones:
+            campos['stock'] = F('stock') + delta
+        Producto.objects.filter(pk=movimiento.producto_id).update(**campos)
+
+        # Mantener sincronizada la instancia en memoria del llamador
+        if movimiento._meta.get_field('producto').is_cached(movimiento):
+            producto = movimiento.producto
+            producto.fecha_ultimo_movimiento = campos['fecha_ultimo_movimiento']
+            if 'fecha_ultima_compra' in campos:
+                producto.fecha_ultima_compra = campos['fecha_ultima_compra']
+            if 'stock' in campos:
+                producto.stock = stock.producto.stock + delta
+        logger.debug(
+            f"Delta {delta} aplicado a producto {movimiento.producto_id} "
+            f"en almacén {movimiento.almacen_id}"
+        )
+
+    @classmethod
+    def registrar_lote(cls, movimientos):
+        """
+        Registra en bloque movimientos nuevos con un único bloqueo de stock.
+
+        Bloquea todas las filas de ``StockAlmacen`` afectadas en un solo
+        ``SELECT ... FOR UPDATE ORDER BY id`` (y luego los productos, también
+        ordenados por id), inserta los movimientos con ``bulk_create`` y aplica
+        los deltas acumulados con un ``UPDATE`` por tabla. Debe llamarse dentro
+        de una transacción. No dispara las señales por fila de los movimientos.
+
+        Args:
+            movimientos (list): Instancias de MovimientoInventario sin guardar
+
+        Returns:
+            list: Movimientos creados, con stock_anterior/stock_nuevo calculados
+
+        Raises:
+            StockInsuficienteError: Si alguna salida excede el stock disponible
+        """
+        if not movimientos:
+            return []
+
+        pares = {(m.producto_id, m.almacen_id) for m in movimientos}
+        stocks = cls._bloquear_stocks(pares)
+        faltantes = pares - stocks.keys()
+        if faltantes:
+            StockAlmacen.objects.bulk_create([
+                StockAlmacen(producto_id=producto_id, almacen_id=almacen_id, cantidad=Decimal('0.00'))
+                for producto_id, almacen_id in sorted(faltantes)
+            ], ignore_conflicts=True)
+            stocks.update(cls._bloquear_stocks(faltantes))
+
+        productos = cls._bloquear_productos({producto_id for producto_id, _ in pares})
+
+        saldos = {par: stock.cantidad for par, stock in stocks.items()}
+        deltas_stock = {}
+        deltas_producto = {}
+        hay_compra = False
+        for movimiento in movimientos:
+            par = (movimiento.producto_id, movimiento.almacen_id)
+            producto = productos[movimiento.producto_id]
+            stock_anterior = saldos[par]
+            delta = cls.calcular_delta(movimiento.tipo, movimiento.cantidad, stock_anterior)
+            if movimiento.tipo == 'salida' and producto.es_inventariable:
+                cls._validar_disponible(movimiento, stock_anterior)
+            movimiento.stock_anterior = stock_anterior
+            movimiento.stock_nuevo = stock_anterior + delta
+            saldos[par] = movimiento.stock_nuevo
+            deltas_stock[stocks[par].pk] = deltas_stock.get(stocks[par].pk, Decimal('0.00')) + delta
+            if not producto.tiene_variaciones:
+                deltas_producto[producto.pk] = deltas_producto.get(producto.pk, Decimal('0.00')) + delta
+            hay_compra = hay_compra or (movimiento.tipo == 'entrada' and movimiento.origen == 'compra')
+
+        creados = MovimientoInventario.objects.bulk_create(movimientos)
+
+        ahora = timezone.now()
+        deltas_stock = {pk: delta for pk, delta in deltas_stock.items() if delta}
+        if deltas_stock:
+            StockAlmacen.objects.filter(pk__in=deltas_stock).update(
+                cantidad=Case(
+                    *[When(pk=pk, then=F('cantidad') + delta) for pk, delta in deltas_stock.items()],
+                    default=F('cantidad')
+                ),
+                fecha_modificacion=ahora
+            )
+
+        campos = {'fecha_ultimo_movimiento': ahora}
+        if hay_compra:
+            campos['fecha_ultima_compra'] = ahora.date()
+        deltas_producto = {pk: delta for pk, delta in deltas_producto.items() if delta}
+        if deltas_producto:
+            campos['stock'] = Case(
+                *[When(pk=pk, then=F('stock') + delta) for pk, delta in deltas_producto.items()],
+                default=F('stock')
+            )
+        Producto.objects.filter(pk__in=productos).update(**campos)
+
+        # Mantener sincronizadas las instancias en memoria de los llamadores
+        for movimiento in movimientos:
+            if movimiento._meta.get_field('producto').is_cached(movimiento):
+                producto = movimiento.producto
+                producto.fecha_ultimo_movimiento = ahora
+                if producto.pk in deltas_producto:
+                    producto.stock = productos[producto.pk].stock + deltas_producto[producto.pk]
+
+        logger.debug(f"Lote de {len(creados)} movimientos aplicado sobre {len(stocks)} filas de stock")
+        return creados
+
+    @classmethod
+    def reservar_salidas(cls, lineas):
+        """
+        Bloquea y valida el stock de un conjunto de salidas antes de escribir nada.
+
+        Las filas se bloquean siempre en el mismo orden (``StockAlmacen`` por id y
+        luego ``Producto`` por id), de modo que dos documentos con líneas comunes
+        esperan uno al otro en lugar de bloquearse mutuamente. La espera está
+        acotada por ``LOCK_TIMEOUT_MS``. Los bloqueos se mantienen hasta el fin
+        de la transacción, por lo que las salidas registradas después en la
+        misma transacción ya no pueden fallar por stock.
+
+        Args:
+            lineas (list): Tuplas (producto, almacen, cantidad)
+
+        Returns:
+            dict: Stock disponible por (producto_id, almacen_id) tras las salidas
+
+        Raises:
+            StockInsuficienteError: Si alguna línea excede el stock disponible
+        """
+        solicitado = {}
+        for producto, almacen, cantidad in lineas:
+            if producto.es_inventariable:
+                par = (producto.pk, almacen.pk)
+                solicitado[par] = solicitado.get(par, Decimal('0.00')) + Decimal(cantidad)
+        if not solicitado:
+            return {}
+
+        fijar_lock_timeout(cls.LOCK_TIMEOUT_MS)
+        stocks = cls._bloquear_stocks(solicitado.keys())
+        cls._bloquear_productos({producto_id for producto_id, _ in solicitado})
+
+        disponible = {}
+        for producto, almacen, cantidad in lineas:
+            par = (producto.pk, almacen.pk)
+            if par in disponible or par not in solicitado:
+                continue
+            actual = stocks[par].cantidad if par in stocks else Decimal('0.00')
+            if solicitado[par] > actual:
+                logger.warning(
+                    f"Reserva rechazada: producto {producto.pk} en almacén {almacen.pk}, "
+                    f"solicitado {solicitado[par]}, disponible {actual}"
+                )
+                raise StockInsuficienteError(
+                    f"Stock insuficiente para el producto {producto.nombre} en el almacén {almacen.nombre}"
+                )
+            disponible[par] = actual - solicitado[par]
+        return disponible
+
+    @classmethod
+    def _bloquear_productos(cls, producto_ids):
+        """Bloquea los productos en orden de id, anotados con ``tiene_variaciones``."""
+        return {
+            producto.pk: producto
+            for producto in Producto.objects.select_for_update(of=('self',)).filter(
+                pk__in=producto_ids
+            ).annotate(
+                tiene_variaciones=Exists(Variacion.objects.filter(producto=OuterRef('pk')))
+            ).order_by('pk').only('pk', 'stock', 'es_inventariable')
+        }
+
+    @classmethod
+    def _bloquear_stocks(cls, pares):
+        """Bloquea las filas de stock de los pares (producto, almacén) en orden de id."""
+        # Un IN por almacén: construir un Q por par domina el costo con decenas de líneas
+        por_almacen = {}
+        for producto_id, almacen_id in pares:
+            por_almacen.setdefault(almacen_id, set()).add(producto_id)
+        filtro = Q()
+        for almacen_id, producto_ids in por_almacen.items():
+            filtro |= Q(almacen_id=almacen_id, producto_id__in=producto_ids)
+        return {
+            (stock.producto_id, stock.almacen_id): stock
+            for stock in StockAlmacen.objects.select_for_update().filter(filtro).order_by('id').only(
+                'id', 'producto_id', 'almacen_id', 'cantidad'
+            )
+            if (stock.producto_id, stock.almacen_id) in pares
+        }
+
+    @staticmethod
+    def _validar_disponible(movimiento, disponible):
+        if Decimal(movimiento.cantidad) > disponible:
+            producto = movimiento.producto
+            almacen = movimiento.almacen
+            logger.error(f"Stock insuficiente para producto {producto} en almacén {almacen}")
+            raise StockInsuficienteError(
+                f"Stock insuficiente para el producto {producto.nombre} en el almacén {almacen.nombre}"
+            )
@@ -1,7 +1,9 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.db import connection
 from django.db.utils import IntegrityError
+from django.test.utils import CaptureQueriesContext
 from datetime import date, timedelta
 from decimal import Decimal
 
@@ -18,6 +20,7 @@ from inventario.models.contacto_proveedor import ContactoProveedor
 from inventario.models.movimiento import MovimientoInventario
 from inventario.models.valor_atributo import ValorAtributo
 from inventario.models.atributo import Atributo  # Importar Atributo
+from inventario.services.stock_ledger_service import StockInsuficienteError
 
 
 class BaseModelTest(TestCase):
@@ -1430,4 +1433,91 @@ class MovimientoInventarioModelTest(BaseModelTest):
             almacen=almacen2
         )
         self.producto.refresh_from_db()
-        self.assertEqual(self.producto.stock, Decimal('23.00'))
\ No newline at end of file
+        self.assertEqual(self.producto.stock, Decimal('23.00'))
+
+
+class StockLedgerServiceTest(BaseModelTest):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.producto = Producto.objects.create(
+            codigo="TV001",
+            nombre="Smart TV 55\"",
+            categoria=self.categoria,
+            precio_venta=Decimal('600.00'),
+            stock=Decimal('0.00')
+        )
+        self.almacen = Almacen.objects.create(nombre="Bodega Principal")
+        self.stock_almacen = StockAlmacen.objects.create(
+            producto=self.producto,
+            almacen=self.almacen,
+            cantidad=Decimal('10.00')
+        )
+        self.producto.refresh_from_db()
+
+    def _movimiento(self, tipo, cantidad, almacen=None, **kwargs):
+        return MovimientoInventario.objects.create(
+            tipo=tipo,
+            origen=kwargs.pop('origen', 'compra' if tipo == 'entrada' else 'venta'),
+            producto=self.producto,
+            cantidad=Decimal(cantidad),
+            almacen=almacen or self.almacen,
+            **kwargs
+        )
+
+    def test_entrada_aplica_delta_con_una_escritura_de_producto(self):
+        with CaptureQueriesContext(connection) as ctx:
+            movimiento = self._movimiento('entrada', '5.00', costo_unitario=Decimal('400.00'))
+        updates_producto = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith(f'UPDATE "{Producto._meta.db_table}"')
+        ]
+        self.assertEqual(len(updates_producto), 1)
+        self.assertEqual(movimiento.stock_anterior, Decimal('10.00'))
+        self.assertEqual(movimiento.stock_nuevo, Decimal('15.00'))
+        self.stock_almacen.refresh_from_db()
+        self.assertEqual(self.stock_almacen.cantidad, Decimal('15.00'))
+        # La instancia en memoria queda sincronizada sin recargar
+        self.assertEqual(self.producto.stock, Decimal('15.00'))
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, Decimal('15.00'))
+        self.assertIsNotNone(self.producto.fecha_ultimo_movimiento)
+        self.assertIsNotNone(self.producto.fecha_ultima_compra)
+
+    def test_salida_insuficiente_no_modifica_stock(self):
+        with self.assertRaises(StockInsuficienteError):
+            self._movimiento('salida', '11.00')
+        self.assertFalse(MovimientoInventario.objects.filter(producto=self.producto).exists())
+        self.stock_almacen.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.stock_almacen.cantidad, Decimal('10.00'))
+        self.assertEqual(self.producto.stock, Decimal('10.00'))
+
+    def test_ajuste_fija_stock_del_almacen(self):
+        movimiento = self._movimiento('ajuste', '4.00', origen='ajuste_manual')
+        self.assertEqual(movimiento.stock_nuevo, Decimal('4.00'))
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, Decimal('4.00'))
+
+    def test_crea_stock_almacen_inexistente(self):
+        almacen2 = Almacen.objects.create(nombre="Bodega Secundaria")
+        self._movimiento('entrada', '3.00', almacen=almacen2, costo_unitario=Decimal('400.00'))
+        stock = StockAlmacen.objects.get(producto=self.producto, almacen=almacen2)
+        self.assertEqual(stock.cantidad, Decimal('3.00'))
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, Decimal('13.00'))
+
+    def test_producto_con_variaciones_conserva_stock(self):
+        atributo = Atributo.objects.create(nombre="Color")
+        valor = ValorAtributo.objects.create(atributo=atributo, valor="Negro")
+        Variacion.objects.create(
+            producto=self.producto,
+            valor_atributo=valor,
+            codigo="TV001-NEGRO",
+            stock=Decimal('2.00'),
+            precio_venta=Decimal('600.00')
+        )
+        self._movimiento('entrada', '5.00', costo_unitario=Decimal('400.00'))
+        self.stock_almacen.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.stock_almacen.cantidad, Decimal('15.00'))
+        self.assertEqual(self.producto.stock, Decimal('2.00'))
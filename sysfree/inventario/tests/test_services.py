@@ -0,0 +1,116 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from decimal import Decimal
+from core.models import LogActividad
+from core.constants import AccionesAuditoria
+from inventario.models import Producto, Categoria, Almacen, StockAlmacen, MovimientoInventario
+from inventario.services import InventarioService, StockLedgerService, StockInsuficienteError
+
+
+class RegistrarMovimientosLoteTest(TestCase):
+    """Pruebas para InventarioService.registrar_movimientos_lote."""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Electrónica')
+        self.almacen = Almacen.objects.create(nombre='Bodega Principal')
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'P{i:03d}',
+                nombre=f'Producto {i}',
+                categoria=self.categoria,
+                precio_venta=Decimal('10.00'),
+                stock=Decimal('0.00')
+            )
+            for i in range(5)
+        ]
+        for producto in self.productos[:3]:
+            StockAlmacen.objects.create(producto=producto, almacen=self.almacen, cantidad=Decimal('10.00'))
+
+    def test_entrada_lote_actualiza_stock(self):
+        items = [(p, self.almacen, Decimal('2.00'), Decimal('5.00')) for p in self.productos]
+        movimientos = InventarioService.registrar_movimientos_lote(items, tipo='entrada', origen='compra')
+
+        self.assertEqual(len(movimientos), 5)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='entrada').count(), 5)
+        for producto, esperado in zip(self.productos, ['12.00'] * 3 + ['2.00'] * 2):
+            stock = StockAlmacen.objects.get(producto=producto, almacen=self.almacen)
+            self.assertEqual(stock.cantidad, Decimal(esperado))
+            producto.refresh_from_db()
+            self.assertEqual(producto.stock, Decimal(esperado))
+            self.assertIsNotNone(producto.fecha_ultima_compra)
+
+    def test_lineas_repetidas_encadenan_stock(self):
+        producto = self.productos[0]
+        items = [(producto, self.almacen, Decimal('3.00'), None), (producto, self.almacen, Decimal('4.00'), None)]
+        primero, segundo = InventarioService.registrar_movimientos_lote(items, tipo='salida', origen='venta')
+
+        self.assertEqual((primero.stock_anterior, primero.stock_nuevo), (Decimal('10.00'), Decimal('7.00')))
+        self.assertEqual((segundo.stock_anterior, segundo.stock_nuevo), (Decimal('7.00'), Decimal('3.00')))
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock, Decimal('3.00'))
+
+    def test_un_bloqueo_y_una_auditoria_por_lote(self):
+        items = [(p, self.almacen, Decimal('1.00'), None) for p in self.productos[:3]]
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                InventarioService.registrar_movimientos_lote(items, tipo='salida', origen='venta')
+
+        bloqueos = [q for q in ctx.captured_queries if 'FOR UPDATE' in q['sql']]
+        self.assertEqual(len(bloqueos), 2)  # StockAlmacen y Producto, ordenados por id
+        self.assertEqual(
+            LogActividad.objects.filter(accion=AccionesAuditoria.STOCK_ACTUALIZADO_LOTE).count(), 1
+        )
+
+    def test_salida_insuficiente_revierte_lote(self):
+        items = [
+            (self.productos[0], self.almacen, Decimal('1.00'), None),
+            (self.productos[1], self.almacen, Decimal('50.00'), None),
+        ]
+        with self.assertRaises(StockInsuficienteError):
+            InventarioService.registrar_movimientos_lote(items, tipo='salida', origen='venta')
+
+        self.assertFalse(MovimientoInventario.objects.exists())
+        self.assertEqual(
+            StockAlmacen.objects.get(producto=self.productos[0], almacen=self.almacen).cantidad,
+            Decimal('10.00')
+        )
+
+    def test_entrada_requiere_costo(self):
+        with self.assertRaisesMessage(ValueError, 'El costo unitario debe ser mayor que cero'):
+            InventarioService.registrar_movimientos_lote(
+                [(self.productos[0], self.almacen, Decimal('1.00'), None)], tipo='entrada'
+            )
+
+
+class ReservarSalidasTest(TestCase):
+    """Pruebas para StockLedgerService.reservar_salidas."""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Electrónica')
+        self.almacen = Almacen.objects.create(nombre='Bodega Principal')
+        self.producto = Producto.objects.create(
+            codigo='R001',
+            nombre='Producto reservado',
+            categoria=self.categoria,
+            precio_venta=Decimal('10.00')
+        )
+        StockAlmacen.objects.create(producto=self.producto, almacen=self.almacen, cantidad=Decimal('5.00'))
+
+    def test_suma_lineas_del_mismo_producto(self):
+        lineas = [(self.producto, self.almacen, Decimal('2.00')), (self.producto, self.almacen, Decimal('3.00'))]
+        disponible = StockLedgerService.reservar_salidas(lineas)
+        self.assertEqual(disponible[(self.producto.pk, self.almacen.pk)], Decimal('0.00'))
+
+        lineas.append((self.producto, self.almacen, Decimal('1.00')))
+        with self.assertRaises(StockInsuficienteError):
+            StockLedgerService.reservar_salidas(lineas)
+
+    def test_bloquea_con_lock_timeout(self):
+        with CaptureQueriesContext(connection) as ctx:
+            StockLedgerService.reservar_salidas([(self.producto, self.almacen, Decimal('1.00'))])
+
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertIn('lock_timeout', sql[0])
+        self.assertEqual(sum('FOR UPDATE' in q for q in sql), 2)
+        self.assertFalse(MovimientoInventario.objects.exists())
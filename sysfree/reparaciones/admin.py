@@ -8,7 +8,6 @@ from .services.venta_service import ReparacionVentaService
 import logging
 from haystack.query import SearchQuerySet
 from inventario.services.inventario_service import InventarioService
-from inventario.models import Almacen
 
 # Configurar logger
 logger = logging.getLogger('sysfree')
@@ -209,7 +208,7 @@ class RepuestoReparacionAdmin(admin.ModelAdmin):
     def registrar_salida_inventario(self, request, queryset):
         """Registra una salida de inventario para los repuestos seleccionados."""
         try:
-            almacen = Almacen.objects.filter(activo=True).first()
+            almacen = InventarioService.obtener_almacen_predeterminado()
             if not almacen:
                 raise ValueError(_("No hay almacenes activos disponibles"))
             for repuesto in queryset.filter(producto__es_inventariable=True):
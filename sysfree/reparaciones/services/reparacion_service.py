@@ -4,6 +4,7 @@ from django.db.models import Q
 from ..models import Reparacion, SeguimientoReparacion, RepuestoReparacion
 from inventario.models import Producto
 from core.services.auditoria_service import AuditoriaService
+from core.services.numeracion_service import NumeracionService
 
 
 class ReparacionService:
@@ -221,28 +222,19 @@ class ReparacionService:
         """
         Genera un número único para la reparación.
         
+        La secuencia se reinicia cada mes (R<año><mes><secuencial>) y la
+        asigna NumeracionService, sin duplicados entre reparaciones concurrentes.
+        
         Returns:
             str: Número de reparación
         """
-        year = timezone.now().year
-        month = timezone.now().month
-        
-        # Obtener el último número de este año/mes
-        ultimo = Reparacion.objects.filter(
-            numero__startswith=f'R{year}{month:02d}'
-        ).order_by('-numero').first()
-        
-        if ultimo:
-            # Extraer el número secuencial y aumentarlo en 1
-            try:
-                secuencial = int(ultimo.numero[-5:]) + 1
-            except ValueError:
-                secuencial = 1
-        else:
-            secuencial = 1
-        
-        # Formatear el número
-        return f'R{year}{month:02d}{secuencial:05d}'
+        ahora = timezone.now()
+        prefijo = f'R{ahora.year}{ahora.month:02d}'
+        secuencial = NumeracionService.siguiente(
+            f'reparacion:{ahora.year}{ahora.month:02d}',
+            inicializar=lambda: NumeracionService.maximo_existente(Reparacion.objects.all(), 'numero', prefijo, 5),
+        )
+        return f'{prefijo}{secuencial:05d}'
     
     @classmethod
     def _notificar_cliente(cls, reparacion, seguimiento):
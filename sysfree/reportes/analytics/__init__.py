@@ -0,0 +1,24 @@
+"""
+Analítica de ventas e inventario con pandas y NumPy.
+
+- ``carga``: lee columnas de ``DetalleVenta`` y ``MovimientoInventario`` con
+  ``values_list`` por bloques y las guarda en DataFrames de columnas tipadas
+  (importes en centésimas ``int64``, días ``datetime64[D]``, textos
+  ``category``).
+- ``analisis``: tabla dinámica, retención por cohortes, clasificación ABC y
+  margen por categoría, calculados con agrupaciones vectorizadas.
+
+``AnaliticaService`` les da formato y los expone como reportes de tipo
+``analitico`` y en ``/api/reportes/analitica/<analisis>/``.
+"""
+from .analisis import clasificacion_abc, margen_por_categoria, retencion_cohortes, tabla_dinamica
+from .carga import cargar_detalles_venta, cargar_movimientos_inventario
+
+__all__ = [
+    'cargar_detalles_venta',
+    'cargar_movimientos_inventario',
+    'tabla_dinamica',
+    'retencion_cohortes',
+    'clasificacion_abc',
+    'margen_por_categoria',
+]
@@ -0,0 +1,170 @@
+"""
+Análisis vectorizados sobre los DataFrames de ``carga``.
+
+Las funciones reciben y devuelven DataFrames (importes y cantidades en
+centésimas enteras); no consultan la base de datos ni dan formato a los
+resultados, de eso se encarga ``AnaliticaService``.
+"""
+import numpy as np
+import pandas as pd
+
+# Dimensiones derivadas del día y su unidad de NumPy
+DIMENSIONES_FECHA = {'dia': 'D', 'mes': 'M', 'anio': 'Y'}
+# Dimensiones que se agrupan por la clave ajena correspondiente
+DIMENSIONES_CLAVE = ('venta', 'cliente', 'producto', 'categoria')
+AGREGACIONES = ('suma', 'conteo', 'promedio')
+UMBRALES_ABC = (0.8, 0.95)
+
+
+def dimensiones(df):
+    """Dimensiones por las que se puede agrupar ``df``."""
+    columnas = set(df.columns)
+    return (
+        [d for d in DIMENSIONES_FECHA if 'dia' in columnas]
+        + [d for d in DIMENSIONES_CLAVE if f'{d}_id' in columnas]
+        + [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    )
+
+
+def medidas(df):
+    """Columnas numéricas de ``df`` (más ``margen`` si hay subtotal y costo) que se pueden agregar."""
+    resultado = [c for c in df.columns if c not in ('dia',) and not c.endswith('_id')
+                 and pd.api.types.is_integer_dtype(df[c].dtype)]
+    if {'subtotal', 'costo'} <= set(df.columns):
+        resultado.append('margen')
+    return resultado
+
+
+def tabla_dinamica(df, filas, columnas, valor, agregacion='suma'):
+    """
+    Tabla dinámica de ``valor`` por dos dimensiones.
+
+    Args:
+        df (DataFrame): Datos de ``carga``
+        filas (str): Dimensión de las filas (ver ``dimensiones``)
+        columnas (str): Dimensión de las columnas
+        valor (str): Medida agregada (ver ``medidas``)
+        agregacion (str): suma, conteo (filas) o promedio
+
+    Returns:
+        DataFrame: Índice con los valores de ``filas``, una columna por valor
+            de ``columnas`` y 0 en las combinaciones sin datos
+
+    Raises:
+        ValueError: Dimensión, medida o agregación no válida
+    """
+    disponibles = dimensiones(df)
+    for dimension in (filas, columnas):
+        if dimension not in disponibles:
+            raise ValueError(f"Dimensión no válida: {dimension}. Opciones: {', '.join(disponibles)}")
+    if filas == columnas:
+        raise ValueError('Las filas y las columnas deben ser dimensiones distintas')
+    if valor not in medidas(df):
+        raise ValueError(f"Medida no válida: {valor}. Opciones: {', '.join(medidas(df))}")
+    if agregacion not in AGREGACIONES:
+        raise ValueError(f"Agregación no válida: {agregacion}. Opciones: {', '.join(AGREGACIONES)}")
+
+    grupos = _serie(df, valor).groupby([_dimension(df, filas), _dimension(df, columnas)], observed=True)
+    if agregacion == 'suma':
+        resultado = grupos.sum()
+    elif agregacion == 'conteo':
+        resultado = grupos.size()
+    else:
+        resultado = grupos.mean()
+    return resultado.unstack(fill_value=0).rename_axis(index=filas, columns=columnas)
+
+
+def retencion_cohortes(df):
+    """
+    Retención mensual de clientes por cohorte (mes de su primera compra en ``df``).
+
+    Returns:
+        DataFrame: Índice con el primer día del mes de la cohorte, columna
+            ``clientes`` (tamaño de la cohorte) y columnas 0, 1, 2... con la
+            fracción de la cohorte que compró ese número de meses después
+    """
+    meses = df['dia'].to_numpy().astype('datetime64[M]').astype(np.int64)
+    compras = pd.DataFrame({'cliente': df['cliente_id'].to_numpy(), 'mes': meses}).drop_duplicates()
+    if compras.empty:
+        return pd.DataFrame(columns=['clientes'], index=pd.DatetimeIndex([], name='cohorte'))
+
+    cohorte = compras.groupby('cliente')['mes'].transform('min').to_numpy()
+    conteo = pd.Series(1, index=compras.index).groupby(
+        [cohorte, compras['mes'].to_numpy() - cohorte]
+    ).sum().unstack(fill_value=0)
+    tamanos = conteo[0]
+    resultado = conteo.div(tamanos, axis=0)
+    resultado.insert(0, 'clientes', tamanos)
+    resultado.index = pd.DatetimeIndex(resultado.index.to_numpy().astype('datetime64[M]'), name='cohorte')
+    return resultado
+
+
+def clasificacion_abc(df, medida='subtotal', umbrales=UMBRALES_ABC):
+    """
+    Clasificación ABC de productos por su aporte a ``medida``.
+
+    Los productos se ordenan de mayor a menor aporte; son A mientras el
+    acumulado anterior a ellos no alcanza el primer umbral, B hasta el
+    segundo y C el resto. Los umbrales se comparan con importes enteros para
+    que el resultado no dependa del redondeo.
+
+    Args:
+        df (DataFrame): Datos de ``carga`` con producto_id
+        medida (str): Medida que define el aporte
+        umbrales (tuple): Fracciones acumuladas que cierran las clases A y B
+
+    Returns:
+        DataFrame: Índice producto_id en orden de aporte y columnas valor,
+            participacion, acumulado y clase
+    """
+    if medida not in medidas(df):
+        raise ValueError(f"Medida no válida: {medida}. Opciones: {', '.join(medidas(df))}")
+    umbral_a, umbral_b = umbrales
+    if not 0 < umbral_a <= umbral_b <= 1:
+        raise ValueError('Los umbrales deben cumplir 0 < A <= B <= 1')
+
+    valores = _serie(df, medida).groupby(df['producto_id'].to_numpy()).sum()
+    # Orden estable: a igual aporte, por producto_id
+    valores = valores.sort_values(ascending=False, kind='stable').rename_axis('producto_id')
+    total = valores.sum()
+    acumulado = valores.cumsum()
+    anterior = (acumulado - valores).to_numpy()
+    clase = np.array(['A', 'B', 'C'])[np.searchsorted([umbral_a * total, umbral_b * total], anterior, side='right')]
+    return pd.DataFrame({
+        'valor': valores,
+        'participacion': valores / total if total else 0.0,
+        'acumulado': acumulado / total if total else 0.0,
+        'clase': clase,
+    })
+
+
+def margen_por_categoria(df):
+    """
+    Ventas, costo y margen por categoría de producto.
+
+    Returns:
+        DataFrame: Índice categoria_id (de mayor a menor margen) y columnas
+            cantidad, ventas, costo, margen y margen_porcentaje (fracción de
+            las ventas; NaN si no hubo ventas)
+    """
+    resultado = df.groupby('categoria_id')[['cantidad', 'subtotal', 'costo']].sum().rename(
+        columns={'subtotal': 'ventas'}
+    )
+    resultado['margen'] = resultado['ventas'] - resultado['costo']
+    resultado['margen_porcentaje'] = resultado['margen'] / resultado['ventas'].where(resultado['ventas'] != 0)
+    return resultado.sort_values('margen', ascending=False, kind='stable')
+
+
+def _serie(df, valor):
+    if valor == 'margen' and 'margen' not in df.columns:
+        return df['subtotal'] - df['costo']
+    return df[valor]
+
+
+def _dimension(df, dimension):
+    """Clave de agrupación de ``dimension`` (un arreglo o columna alineada con ``df``)."""
+    if dimension in DIMENSIONES_FECHA:
+        return df['dia'].to_numpy().astype(f'datetime64[{DIMENSIONES_FECHA[dimension]}]')
+    if dimension in DIMENSIONES_CLAVE:
+        return df[f'{dimension}_id'].to_numpy()
+    return df[dimension]
@@ -0,0 +1,149 @@
+"""
+Carga de columnas de ventas e inventario en DataFrames tipados.
+
+Las columnas se leen con ``values_list`` desde un cursor del servidor
+(``iterator``) en bloques de ``TAMANO_BLOQUE`` filas; cada bloque se convierte
+en un arreglo de NumPy por columna y al final se concatenan, sin crear
+instancias de modelos ni un diccionario por fila.
+
+La conversión de tipos se hace en la consulta: los importes y cantidades
+llegan como centésimas enteras (``int64``, sin ``Decimal``) y las fechas como
+el día local. Los textos con pocos valores (tipo, estado, origen) se guardan
+como ``category`` con las opciones del modelo como categorías.
+"""
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.utils import timezone
+
+from inventario.models import MovimientoInventario
+from ventas.models import DetalleVenta, Venta
+
+TAMANO_BLOQUE = 20_000
+# Estados de venta que cuentan como vendidos (excluye borradores, anuladas y proformas)
+ESTADOS_VENTA = ('emitida', 'pagada')
+
+
+def cargar_detalles_venta(desde=None, hasta=None, estados=ESTADOS_VENTA, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Líneas de venta con los datos de su venta y producto.
+
+    Args:
+        desde (date): Primer día local incluido (None = sin límite)
+        hasta (date): Último día local incluido (None = sin límite)
+        estados (tuple): Estados de venta incluidos (None = todos)
+        tamano_bloque (int): Filas por bloque leído del cursor
+
+    Returns:
+        DataFrame: Columnas venta_id, dia, cliente_id, producto_id,
+            categoria_id, tipo, estado y, en centésimas, cantidad, subtotal,
+            costo (cantidad por el precio de compra actual del producto) y total
+    """
+    detalles = DetalleVenta.objects.filter(**_rango('venta__fecha', desde, hasta))
+    if estados is not None:
+        detalles = detalles.filter(venta__estado__in=estados)
+    return _cargar(detalles, {
+        'venta_id': ('venta_id', np.int64),
+        'dia': (TruncDate('venta__fecha'), 'datetime64[D]'),
+        'cliente_id': ('venta__cliente_id', np.int64),
+        'producto_id': ('producto_id', np.int64),
+        'categoria_id': ('producto__categoria_id', np.int64),
+        'tipo': ('venta__tipo', _opciones(Venta.TIPO_CHOICES)),
+        'estado': ('venta__estado', _opciones(Venta.ESTADO_CHOICES)),
+        'cantidad': (_centesimas(F('cantidad')), np.int64),
+        'subtotal': (_centesimas(F('subtotal')), np.int64),
+        'costo': (_centesimas(F('cantidad') * F('producto__precio_compra')), np.int64),
+        'total': (_centesimas(F('total')), np.int64),
+    }, tamano_bloque)
+
+
+def cargar_movimientos_inventario(desde=None, hasta=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Movimientos de inventario con la categoría de su producto.
+
+    Args:
+        desde (date): Primer día local incluido (None = sin límite)
+        hasta (date): Último día local incluido (None = sin límite)
+        tamano_bloque (int): Filas por bloque leído del cursor
+
+    Returns:
+        DataFrame: Columnas dia, producto_id, categoria_id, tipo, origen y, en
+            centésimas, cantidad y valor (al costo unitario del movimiento o,
+            si no lo tiene, al precio de compra del producto)
+    """
+    movimientos = MovimientoInventario.objects.filter(**_rango('fecha', desde, hasta))
+    costo = Coalesce('costo_unitario', 'producto__precio_compra')
+    return _cargar(movimientos, {
+        'dia': (TruncDate('fecha'), 'datetime64[D]'),
+        'producto_id': ('producto_id', np.int64),
+        'categoria_id': ('producto__categoria_id', np.int64),
+        'tipo': ('tipo', _opciones(MovimientoInventario.TIPO_CHOICES)),
+        'origen': ('origen', _opciones(MovimientoInventario.ORIGEN_CHOICES)),
+        'cantidad': (_centesimas(F('cantidad')), np.int64),
+        'valor': (_centesimas(F('cantidad') * costo), np.int64),
+    }, tamano_bloque)
+
+
+def _cargar(queryset, columnas, tamano_bloque):
+    """
+    Lee las columnas de ``queryset`` por bloques en un DataFrame.
+
+    Args:
+        queryset: QuerySet ya filtrado
+        columnas (dict): Nombre -> (campo o expresión, tipo); el tipo es un
+            dtype de NumPy o una lista de categorías
+        tamano_bloque (int): Filas por bloque
+
+    Returns:
+        DataFrame: Una columna por entrada de ``columnas``, en ese orden
+    """
+    nombres = list(columnas)
+    filas = queryset.values_list(*(expresion for expresion, _ in columnas.values())).iterator(
+        chunk_size=tamano_bloque
+    )
+    partes = [[] for _ in nombres]
+    while True:
+        bloque = list(islice(filas, tamano_bloque))
+        if not bloque:
+            break
+        for parte, (_, tipo), valores in zip(partes, columnas.values(), zip(*bloque)):
+            if isinstance(tipo, list):
+                # Los textos se guardan como códigos de categoría desde el primer bloque
+                parte.append(pd.Categorical(valores, categories=tipo).codes)
+            else:
+                parte.append(np.array(valores, dtype=tipo))
+        del bloque
+
+    datos = {}
+    for nombre, (_, tipo), parte in zip(nombres, columnas.values(), partes):
+        if isinstance(tipo, list):
+            codigos = np.concatenate(parte) if parte else np.empty(0, dtype=np.int8)
+            datos[nombre] = pd.Categorical.from_codes(codigos, categories=tipo)
+        else:
+            datos[nombre] = np.concatenate(parte) if parte else np.empty(0, dtype=tipo)
+    # Sin copia: los arreglos concatenados ya pertenecen al DataFrame
+    return pd.DataFrame(datos, copy=False)
+
+
+def _centesimas(expresion):
+    """Valor decimal en centésimas enteras (PostgreSQL redondea al convertir numeric a bigint)."""
+    return Cast(expresion * Value(100), BigIntegerField())
+
+
+def _opciones(choices):
+    return [valor for valor, _ in choices]
+
+
+def _rango(campo, desde, hasta):
+    """Filtro de un DateTimeField por días locales, comparando con límites para usar su índice."""
+    zona = timezone.get_current_timezone()
+    filtros = {}
+    if desde:
+        filtros[f'{campo}__gte'] = datetime.combine(desde, time.min, tzinfo=zona)
+    if hasta:
+        filtros[f'{campo}__lt'] = datetime.combine(hasta + timedelta(days=1), time.min, tzinfo=zona)
+    return filtros
@@ -1,10 +1,90 @@
 from rest_framework import views, permissions, status
 from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
 from django.utils import timezone
-from datetime import timedelta
-from ventas.models import Venta, DetalleVenta
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from ventas.models import Venta
 from clientes.models import Cliente
 from inventario.models import Producto, MovimientoInventario
+from api.pagination import LargeResultsSetPagination
+from reportes.services.analitica_service import AnaliticaService
+from reportes.services.hechos_ventas_service import HechosVentasService
+
+LIMITE_RANKING = 10
+LIMITE_RANKING_MAXIMO = 100
+
+
+def _leer_fechas(request, requeridas=False):
+    """
+    Lee los parámetros fecha_inicio y fecha_fin (AAAA-MM-DD).
+
+    Returns:
+        tuple: (desde, hasta, error); desde y hasta son None si no se indicaron
+            y error es el mensaje para la respuesta 400, o None
+    """
+    fecha_inicio = request.query_params.get('fecha_inicio')
+    fecha_fin = request.query_params.get('fecha_fin')
+    if not fecha_inicio or not fecha_fin:
+        if requeridas:
+            return None, None, 'Se requieren los parámetros fecha_inicio y fecha_fin'
+        return None, None, None
+    try:
+        desde, hasta = parse_date(fecha_inicio), parse_date(fecha_fin)
+    except ValueError:
+        desde = hasta = None
+    if not desde or not hasta:
+        return None, None, 'Las fechas deben tener el formato AAAA-MM-DD'
+    return desde, hasta, None
+
+
+def _filtro_fechas(desde, hasta):
+    """
+    Filtro de ``fecha`` (DateTimeField) para los días locales [desde, hasta].
+
+    Compara la columna con límites en lugar de ``fecha__date``, que convierte
+    cada fila de zona horaria e impide usar el índice de fecha.
+    """
+    zona = timezone.get_current_timezone()
+    return {
+        'fecha__gte': datetime.combine(desde, time.min, tzinfo=zona),
+        'fecha__lt': datetime.combine(hasta + timedelta(days=1), time.min, tzinfo=zona),
+    }
+
+
+def _leer_limite(request):
+    """Lee el parámetro limite de los rankings (por defecto 10, máximo 100)."""
+    try:
+        limite = int(request.query_params.get('limite', LIMITE_RANKING))
+    except ValueError:
+        return LIMITE_RANKING
+    return min(max(limite, 1), LIMITE_RANKING_MAXIMO)
+
+
+class PaginacionReporteMixin:
+    """
+    Paginación obligatoria de los reportes por fila.
+
+    Devuelve count, next y previous junto con las filas de la página bajo la
+    clave propia del reporte (``ventas``, ``productos``, ``movimientos``), de
+    modo que la respuesta conserva su forma. Solo se leen de la base de datos
+    las filas de la página solicitada (``page`` y ``page_size``, hasta 500).
+    """
+    pagination_class = LargeResultsSetPagination
+
+    def paginar(self, request, queryset, clave, convertir=None, **extra):
+        paginador = self.pagination_class()
+        filas = paginador.paginate_queryset(queryset, request, view=self)
+        if convertir:
+            filas = [convertir(fila) for fila in filas]
+        return Response({
+            'count': paginador.page.paginator.count,
+            'next': paginador.get_next_link(),
+            'previous': paginador.get_previous_link(),
+            **extra,
+            clave: filas,
+        })
 
 
 class ReporteVentasView(views.APIView):
@@ -12,59 +92,48 @@ class ReporteVentasView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # Obtener ventas del último año
-        fecha_inicio = timezone.now() - timedelta(days=365)
-        ventas = Venta.objects.filter(fecha__gte=fecha_inicio)
-        
-        # Calcular total de ventas
-        total_ventas = sum(venta.total for venta in ventas)
-        
-        # Calcular ventas por mes
-        ventas_por_mes = {}
-        for venta in ventas:
-            mes = venta.fecha.strftime('%Y-%m')
-            if mes not in ventas_por_mes:
-                ventas_por_mes[mes] = 0
-            ventas_por_mes[mes] += venta.total
+        # Ventas del último año desde los acumulados mensuales (y diarios en los extremos)
+        hoy = timezone.localdate()
+        resumen = HechosVentasService.resumen(hoy - timedelta(days=365), hoy, agrupar='mes')
         
         return Response({
-            'total_ventas': total_ventas,
-            'ventas_por_mes': ventas_por_mes
+            'total_ventas': sum((fila['total'] for fila in resumen), 0),
+            'ventas_por_mes': {fila['periodo'].strftime('%Y-%m'): fila['total'] for fila in resumen}
         })
 
 
-class ReporteVentasPorPeriodoView(views.APIView):
+class ReporteVentasPorPeriodoView(PaginacionReporteMixin, views.APIView):
     """Vista para el reporte de ventas por periodo."""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        fecha_inicio = request.query_params.get('fecha_inicio')
-        fecha_fin = request.query_params.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            return Response(
-                {'error': 'Se requieren los parámetros fecha_inicio y fecha_fin'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        desde, hasta, error = _leer_fechas(request, requeridas=True)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         
-        ventas = Venta.objects.filter(fecha__range=[fecha_inicio, fecha_fin])
+        # Totales por día desde los acumulados: O(días), no O(ventas)
+        resumen = HechosVentasService.resumen(desde, hasta, agrupar='dia')
+        # El listado de ventas se pagina: solo se leen las filas de la página
+        ventas = Venta.objects.filter(**_filtro_fechas(desde, hasta)).select_related('cliente').only(
+            'id', 'numero', 'fecha', 'total',
+            'cliente__tipo_cliente', 'cliente__nombre_comercial', 'cliente__nombres', 'cliente__apellidos'
+        ).order_by('-fecha', '-id')
         
-        # Calcular total de ventas
-        total_ventas = sum(venta.total for venta in ventas)
-        
-        return Response({
-            'total_ventas': total_ventas,
-            'ventas': [
-                {
-                    'id': venta.id,
-                    'numero': venta.numero,
-                    'cliente': venta.cliente.nombre_completo if venta.cliente else 'Consumidor Final',
-                    'fecha': venta.fecha,
-                    'total': venta.total
-                }
-                for venta in ventas
+        return self.paginar(
+            request, ventas, 'ventas',
+            convertir=lambda venta: {
+                'id': venta.id,
+                'numero': venta.numero,
+                'cliente': venta.cliente.nombre_completo if venta.cliente else 'Consumidor Final',
+                'fecha': venta.fecha,
+                'total': venta.total
+            },
+            total_ventas=sum((fila['total'] for fila in resumen), 0),
+            ventas_por_dia=[
+                {'fecha': fila['periodo'], 'num_ventas': fila['num_ventas'], 'total': fila['total']}
+                for fila in resumen
             ]
-        })
+        )
 
 
 class ReporteProductosMasVendidosView(views.APIView):
@@ -72,27 +141,12 @@ class ReporteProductosMasVendidosView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # Obtener detalles de ventas
-        detalles = DetalleVenta.objects.all()
-        
-        # Calcular cantidad vendida por producto
-        productos_vendidos = {}
-        for detalle in detalles:
-            if detalle.producto_id not in productos_vendidos:
-                productos_vendidos[detalle.producto_id] = {
-                    'producto': detalle.producto,
-                    'cantidad': 0,
-                    'total': 0
-                }
-            productos_vendidos[detalle.producto_id]['cantidad'] += detalle.cantidad
-            productos_vendidos[detalle.producto_id]['total'] += detalle.total
-        
-        # Ordenar por cantidad vendida
-        productos = sorted(
-            productos_vendidos.values(),
-            key=lambda x: x['cantidad'],
-            reverse=True
-        )
+        desde, hasta, error = _leer_fechas(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Cantidades por producto desde los acumulados mensuales; el top-N se resuelve en SQL
+        productos = HechosVentasService.productos_mas_vendidos(desde, hasta, limite=_leer_limite(request))
         
         return Response({
             'productos': [
@@ -103,7 +157,7 @@ class ReporteProductosMasVendidosView(views.APIView):
                     'cantidad_vendida': p['cantidad'],
                     'total_vendido': p['total']
                 }
-                for p in productos[:10]  # Top 10
+                for p in productos
             ]
         })
 
@@ -113,101 +167,91 @@ class ReporteClientesFrecuentesView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # Obtener ventas
-        ventas = Venta.objects.all()
-        
-        # Calcular compras por cliente
-        clientes_compras = {}
-        for venta in ventas:
-            if not venta.cliente_id:
-                continue
-                
-            if venta.cliente_id not in clientes_compras:
-                clientes_compras[venta.cliente_id] = {
-                    'cliente': venta.cliente,
-                    'compras': 0,
-                    'total': 0
-                }
-            clientes_compras[venta.cliente_id]['compras'] += 1
-            clientes_compras[venta.cliente_id]['total'] += venta.total
-        
-        # Ordenar por número de compras
-        clientes = sorted(
-            clientes_compras.values(),
-            key=lambda x: x['compras'],
-            reverse=True
+        desde, hasta, error = _leer_fechas(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Compras por cliente agrupadas y ordenadas en la base de datos; solo viajan las N primeras
+        ventas = Venta.objects.filter(cliente__isnull=False)
+        if desde:
+            ventas = ventas.filter(**_filtro_fechas(desde, hasta))
+        ranking = list(
+            ventas.values('cliente_id')
+            .annotate(compras=Count('id'), total_comprado=Sum('total'))
+            .order_by('-compras', '-total_comprado', 'cliente_id')[:_leer_limite(request)]
         )
+        clientes = Cliente.objects.only(
+            'tipo_cliente', 'nombre_comercial', 'nombres', 'apellidos'
+        ).in_bulk([fila['cliente_id'] for fila in ranking])
         
         return Response({
             'clientes': [
                 {
-                    'id': c['cliente'].id,
-                    'nombre': c['cliente'].nombre_completo,
-                    'compras': c['compras'],
-                    'total_comprado': c['total']
+                    'id': fila['cliente_id'],
+                    'nombre': clientes[fila['cliente_id']].nombre_completo,
+                    'compras': fila['compras'],
+                    'total_comprado': fila['total_comprado']
                 }
-                for c in clientes[:10]  # Top 10
+                for fila in ranking
             ]
         })
 
 
-class ReporteInventarioView(views.APIView):
+class ReporteInventarioView(PaginacionReporteMixin, views.APIView):
     """Vista para el reporte de inventario."""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # Obtener productos inventariables
+        valor = ExpressionWrapper(
+            F('stock') * F('precio_compra'), output_field=DecimalField(max_digits=20, decimal_places=4)
+        )
         productos = Producto.objects.filter(es_inventariable=True)
+        totales = productos.aggregate(valor_total=Sum(valor))
         
-        return Response({
-            'productos': [
-                {
-                    'id': p.id,
-                    'codigo': p.codigo,
-                    'nombre': p.nombre,
-                    'stock': p.stock,
-                    'precio_compra': p.precio_compra,
-                    'precio_venta': p.precio_venta,
-                    'valor_inventario': p.stock * p.precio_compra
-                }
-                for p in productos
-            ]
-        })
+        return self.paginar(
+            request,
+            productos.values(
+                'id', 'codigo', 'nombre', 'stock', 'precio_compra', 'precio_venta'
+            ).annotate(valor_inventario=valor).order_by('nombre', 'id'),
+            'productos',
+            valor_total=totales['valor_total'] or 0
+        )
 
 
-class ReporteMovimientosInventarioView(views.APIView):
+class ReporteMovimientosInventarioView(PaginacionReporteMixin, views.APIView):
     """Vista para el reporte de movimientos de inventario."""
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         producto_id = request.query_params.get('producto_id')
-        fecha_inicio = request.query_params.get('fecha_inicio')
-        fecha_fin = request.query_params.get('fecha_fin')
+        desde, hasta, error = _leer_fechas(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         
         # Filtrar movimientos
-        movimientos = MovimientoInventario.objects.all()
+        movimientos = MovimientoInventario.objects.select_related('producto').only(
+            'id', 'tipo', 'origen', 'cantidad', 'stock_anterior', 'stock_nuevo', 'fecha', 'producto__nombre'
+        )
         
         if producto_id:
             movimientos = movimientos.filter(producto_id=producto_id)
             
-        if fecha_inicio and fecha_fin:
-            movimientos = movimientos.filter(fecha__range=[fecha_inicio, fecha_fin])
+        if desde:
+            movimientos = movimientos.filter(**_filtro_fechas(desde, hasta))
         
-        return Response({
-            'movimientos': [
-                {
-                    'id': m.id,
-                    'tipo': m.tipo,
-                    'origen': m.origen,
-                    'producto': m.producto.nombre,
-                    'cantidad': m.cantidad,
-                    'stock_anterior': m.stock_anterior,
-                    'stock_nuevo': m.stock_nuevo,
-                    'fecha': m.fecha
-                }
-                for m in movimientos
-            ]
-        })
+        return self.paginar(
+            request, movimientos.order_by('-fecha', '-id'), 'movimientos',
+            convertir=lambda m: {
+                'id': m.id,
+                'tipo': m.tipo,
+                'origen': m.origen,
+                'producto': m.producto.nombre,
+                'cantidad': m.cantidad,
+                'stock_anterior': m.stock_anterior,
+                'stock_nuevo': m.stock_nuevo,
+                'fecha': m.fecha
+            }
+        )
 
 
 class ReporteProductosBajoStockView(views.APIView):
@@ -230,4 +274,39 @@ class ReporteProductosBajoStockView(views.APIView):
         # Generar reporte
         reporte = StockBajoReportService.generar_reporte(umbral_personalizado=umbral)
         
-        return Response(reporte)
\ No newline at end of file
+        return Response(reporte)
+
+
+class ReporteAnaliticoView(views.APIView):
+    """
+    Vista de los análisis de ventas e inventario: tabla_dinamica, cohortes,
+    abc y margen_categoria (ver ``AnaliticaService.ejecutar`` para sus parámetros).
+
+    El análisis se calcula en la petición, así que exige fecha_inicio y
+    fecha_fin con un rango de hasta ``REPORTES_ANALITICA_MAX_DIAS`` días; los
+    periodos mayores se ejecutan como reporte de tipo ``analitico`` (asíncrono).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, analisis):
+        desde, hasta, error = _leer_fechas(request, requeridas=True)
+        maximo = settings.REPORTES_ANALITICA_MAX_DIAS
+        if not error and (hasta - desde).days >= maximo:
+            error = (
+                f'El rango de fechas no puede superar {maximo} días; '
+                'para periodos mayores ejecute un reporte de tipo analitico'
+            )
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        parametros = {**request.query_params.dict(), 'analisis': analisis, 'fecha_inicio': desde, 'fecha_fin': hasta}
+        try:
+            columnas, filas = AnaliticaService.ejecutar(parametros)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'analisis': analisis,
+            'columnas': columnas,
+            'resultados': [dict(zip(columnas, fila)) for fila in filas]
+        })
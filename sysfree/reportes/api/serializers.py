@@ -32,7 +32,7 @@ class HistorialReporteSerializer(serializers.ModelSerializer):
         model = HistorialReporte
         fields = [
             'id', 'reporte', 'reporte_nombre', 'programacion', 'programacion_nombre',
-            'fecha_ejecucion', 'duracion', 'estado', 'mensaje_error', 'parametros',
-            'archivo'
+            'fecha_ejecucion', 'fecha_inicio', 'duracion', 'estado', 'mensaje_error', 'parametros',
+            'archivo', 'desde_cache', 'tarea_id', 'filas'
         ]
-        read_only_fields = ['fecha_ejecucion']
\ No newline at end of file
+        read_only_fields = ['fecha_ejecucion', 'fecha_inicio', 'tarea_id', 'filas']
\ No newline at end of file
@@ -4,7 +4,7 @@ from .views import ReporteViewSet, ProgramacionReporteViewSet, HistorialReporteV
 from .reportes_views import (
     ReporteVentasView, ReporteVentasPorPeriodoView, ReporteProductosMasVendidosView,
     ReporteClientesFrecuentesView, ReporteInventarioView, ReporteMovimientosInventarioView,
-    ReporteProductosBajoStockView
+    ReporteProductosBajoStockView, ReporteAnaliticoView
 )
 
 router = DefaultRouter()
@@ -22,4 +22,5 @@ urlpatterns = [
     path('inventario/', ReporteInventarioView.as_view(), name='reportes-inventario'),
     path('movimientos-inventario/', ReporteMovimientosInventarioView.as_view(), name='reportes-movimientos-inventario'),
     path('productos-bajo-stock/', ReporteProductosBajoStockView.as_view(), name='reportes-productos-bajo-stock'),
+    path('analitica/<str:analisis>/', ReporteAnaliticoView.as_view(), name='reportes-analitica'),
 ]
\ No newline at end of file
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from reportes.models import Reporte, ProgramacionReporte, HistorialReporte
 from reportes.services.reporte_service import ReporteService
+from reportes.services.programacion_reporte_service import ProgramacionReporteService
 from .serializers import ReporteSerializer, ProgramacionReporteSerializer, HistorialReporteSerializer
 
 
@@ -19,16 +20,20 @@ class ReporteViewSet(viewsets.ModelViewSet):
     def ejecutar(self, request, pk=None):
         reporte = self.get_object()
         parametros = request.data.get('parametros', {})
+        # usar_cache=false fuerza una ejecución nueva aunque haya un resultado en caché
+        usar_cache = str(request.data.get('usar_cache', True)).lower() not in ('false', '0')
         
         try:
-            historial = ReporteService.ejecutar_reporte(
+            # Se devuelve el historial en cola; su estado se consulta en historial/<id>/estado/
+            historial = ReporteService.encolar_reporte(
                 reporte=reporte,
                 parametros=parametros,
-                usuario=request.user
+                usuario=request.user,
+                usar_cache=usar_cache
             )
             
             serializer = HistorialReporteSerializer(historial)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -41,12 +46,18 @@ class ProgramacionReporteViewSet(viewsets.ModelViewSet):
     search_fields = ['nombre', 'reporte__nombre', 'destinatarios']
     filterset_fields = ['frecuencia', 'reporte', 'activo']
     
+    def perform_create(self, serializer):
+        ProgramacionReporteService.reprogramar(serializer.save())
+    
+    def perform_update(self, serializer):
+        ProgramacionReporteService.reprogramar(serializer.save())
+    
     @action(detail=True, methods=['post'])
     def ejecutar_ahora(self, request, pk=None):
         programacion = self.get_object()
         
         try:
-            historial = ReporteService.ejecutar_reporte(
+            historial = ReporteService.encolar_reporte(
                 reporte=programacion.reporte,
                 parametros=programacion.parametros,
                 programacion=programacion,
@@ -54,7 +65,7 @@ class ProgramacionReporteViewSet(viewsets.ModelViewSet):
             )
             
             serializer = HistorialReporteSerializer(historial)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -66,4 +77,25 @@ class HistorialReporteViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['reporte', 'programacion', 'estado']
     ordering_fields = ['fecha_ejecucion', 'duracion']
-    ordering = ['-fecha_ejecucion']
\ No newline at end of file
+    ordering = ['-fecha_ejecucion']
+    
+    @action(detail=True, methods=['get'])
+    def estado(self, request, pk=None):
+        """Estado de la ejecución con las filas procesadas hasta el momento."""
+        historial = self.get_object()
+        datos = HistorialReporteSerializer(historial, context=self.get_serializer_context()).data
+        datos['filas'] = ReporteService.filas_procesadas(historial)
+        return Response(datos)
+    
+    @action(detail=True, methods=['post'])
+    def cancelar(self, request, pk=None):
+        historial = self.get_object()
+        cancelado = ReporteService.cancelar(historial.pk)
+        historial.refresh_from_db()
+        if not cancelado:
+            return Response(
+                {'error': f'La ejecución ya terminó con estado {historial.get_estado_display()}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        serializer = HistorialReporteSerializer(historial, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,222 @@
+"""
+Comando para comparar los análisis de ``reportes.analytics`` con bucles del ORM.
+
+Genera los datos con el mismo procedimiento que ``benchmark_reportes`` (por
+defecto dos millones de líneas de venta), reparte los productos en categorías
+con distintos precios de compra y ejecuta cada análisis de dos formas:
+
+- ``pandas``: una carga de columnas con ``values_list`` por bloques
+  (``cargar_detalles_venta``) compartida por los cuatro análisis, que luego
+  se calculan con agrupaciones vectorizadas.
+- ``orm``: la implementación ad hoc equivalente, un recorrido de
+  ``DetalleVenta`` con ``select_related`` por análisis que acumula en
+  diccionarios con ``Decimal``.
+
+Se reportan los segundos y el aumento máximo del RSS de cada caso y se
+comprueba que ambas implementaciones den el mismo resultado. El RSS no
+siempre vuelve a bajar entre casos, por lo que el pico de los últimos es una
+cota inferior.
+
+Todo se ejecuta en una transacción que se revierte al terminar.
+"""
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventario.models import Categoria, Producto
+from reportes.analytics import (
+    cargar_detalles_venta, clasificacion_abc, margen_por_categoria, retencion_cohortes, tabla_dinamica,
+)
+from reportes.analytics.analisis import UMBRALES_ABC
+from reportes.analytics.carga import ESTADOS_VENTA
+from reportes.management.commands.benchmark_exportacion_reportes import _PicoRSS
+from reportes.management.commands.benchmark_reportes import Command as BenchmarkReportes, _Revertir
+from ventas.models import DetalleVenta
+
+ANALISIS = ('margen_categoria', 'abc', 'cohortes', 'tabla_dinamica')
+
+
+class Command(BaseCommand):
+    help = 'Compara los análisis con pandas/NumPy y con bucles del ORM (por defecto 2.000.000 de líneas de venta)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--detalles', type=int, default=2_000_000,
+                            help='Líneas de detalle de venta generadas (por defecto 2.000.000)')
+        parser.add_argument('--lineas', type=int, default=10,
+                            help='Líneas por venta (por defecto 10)')
+        parser.add_argument('--clientes', type=int, default=20000,
+                            help='Clientes generados (por defecto 20000)')
+        parser.add_argument('--productos', type=int, default=5000,
+                            help='Productos generados (por defecto 5000)')
+        parser.add_argument('--categorias', type=int, default=40,
+                            help='Categorías entre las que se reparten los productos (por defecto 40)')
+        parser.add_argument('--sin-orm', action='store_true',
+                            help='Mide solo la implementación con pandas')
+
+    def handle(self, *args, **options):
+        if options['detalles'] <= 0 or options['categorias'] <= 0:
+            raise CommandError('--detalles y --categorias deben ser positivos')
+
+        resultados = []
+        try:
+            with transaction.atomic():
+                self._generar_datos(options)
+                resultados = self._medir_pandas()
+                if not options['sin_orm']:
+                    for resultado in resultados[1:]:
+                        self._medir_orm(resultado)
+                raise _Revertir
+        except _Revertir:
+            pass
+
+        self.stdout.write(
+            f"{'análisis':<22}{'pandas s':>10}{'pico MiB':>10}{'orm s':>10}{'pico MiB':>10}"
+            f"{'orm/pandas':>12}  coincide"
+        )
+        for r in resultados:
+            orm = 'orm' in r
+            self.stdout.write(
+                f"{r['analisis']:<22}{r['segundos']:>10.2f}{r['pico'] / 2**20:>10.1f}"
+                + (f"{r['orm']:>10.1f}{r['pico_orm'] / 2**20:>10.1f}{r['orm'] / r['segundos']:>11.0f}x"
+                   f"  {'sí' if r['coincide'] else 'NO'}" if orm else '')
+            )
+        if len(resultados) > 1 and all('orm' in r for r in resultados[1:]):
+            carga = resultados[0]['segundos']
+            pandas = carga + sum(r['segundos'] for r in resultados[1:])
+            orm = sum(r['orm'] for r in resultados[1:])
+            self.stdout.write(
+                f'Los cuatro análisis: {pandas:.1f} s con pandas (carga incluida) '
+                f'frente a {orm:.1f} s con el ORM ({orm / pandas:.0f}x)'
+            )
+        if any(not r.get('coincide', True) for r in resultados):
+            self.stdout.write(self.style.ERROR('Los resultados de pandas y del ORM no coinciden'))
+
+    def _generar_datos(self, options):
+        """Datos de ``benchmark_reportes`` con los productos repartidos en categorías y costos."""
+        BenchmarkReportes(stdout=self.stdout, stderr=self.stderr)._generar_datos({**options, 'movimientos': 0})
+        categorias = Categoria.objects.bulk_create([
+            Categoria(nombre=f'Benchmark analítica {i}') for i in range(options['categorias'])
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Producto._meta.db_table} "
+                f"SET categoria_id = (%s::bigint[])[id %% %s + 1], precio_compra = (id %% 4 + 1)::numeric "
+                f"WHERE codigo LIKE 'BENCHREP-%%'",
+                [[categoria.pk for categoria in categorias], len(categorias)]
+            )
+            cursor.execute(f'ANALYZE {Producto._meta.db_table}')
+
+    def _medir_pandas(self):
+        with _PicoRSS() as memoria:
+            inicio = time.perf_counter()
+            df = cargar_detalles_venta()
+            segundos = time.perf_counter() - inicio
+        resultados = [{'analisis': f'carga ({len(df)} filas)', 'segundos': segundos, 'pico': memoria.pico}]
+
+        calculos = {
+            'margen_categoria': lambda: margen_por_categoria(df),
+            'abc': lambda: clasificacion_abc(df),
+            'cohortes': lambda: retencion_cohortes(df),
+            'tabla_dinamica': lambda: tabla_dinamica(df, 'categoria', 'mes', 'subtotal'),
+        }
+        for analisis in ANALISIS:
+            with _PicoRSS() as memoria:
+                inicio = time.perf_counter()
+                resultado = calculos[analisis]()
+                segundos = time.perf_counter() - inicio
+            resultados.append({
+                'analisis': analisis, 'segundos': segundos, 'pico': memoria.pico,
+                'resultado': getattr(self, f'_normalizar_{analisis}')(resultado),
+            })
+        return resultados
+
+    def _medir_orm(self, resultado):
+        detalles = DetalleVenta.objects.filter(venta__estado__in=ESTADOS_VENTA).select_related(
+            'venta', 'producto'
+        ).iterator(chunk_size=2000)
+        with _PicoRSS() as memoria:
+            inicio = time.perf_counter()
+            obtenido = getattr(self, f'_orm_{resultado["analisis"]}')(detalles)
+            resultado['orm'] = time.perf_counter() - inicio
+        resultado['pico_orm'] = memoria.pico
+        resultado['coincide'] = obtenido == resultado['resultado']
+
+    # Implementaciones con el ORM (bucles por línea con Decimal) y resultados comparables
+
+    @staticmethod
+    def _orm_margen_categoria(detalles):
+        acumulado = defaultdict(lambda: [Decimal('0'), Decimal('0'), Decimal('0')])
+        for detalle in detalles:
+            fila = acumulado[detalle.producto.categoria_id]
+            fila[0] += detalle.cantidad
+            fila[1] += detalle.subtotal
+            fila[2] += detalle.cantidad * detalle.producto.precio_compra
+        return {
+            categoria_id: (cantidad, ventas, costo, ventas - costo)
+            for categoria_id, (cantidad, ventas, costo) in acumulado.items()
+        }
+
+    @staticmethod
+    def _normalizar_margen_categoria(resultado):
+        return {
+            categoria_id: tuple(Decimal(int(fila[columna])).scaleb(-2)
+                                for columna in ('cantidad', 'ventas', 'costo', 'margen'))
+            for categoria_id, fila in resultado.iterrows()
+        }
+
+    @staticmethod
+    def _orm_abc(detalles):
+        ventas = defaultdict(Decimal)
+        for detalle in detalles:
+            ventas[detalle.producto_id] += detalle.subtotal
+        total = sum(ventas.values(), Decimal('0'))
+        umbral_a, umbral_b = (total * Decimal(str(umbral)) for umbral in UMBRALES_ABC)
+        clases, acumulado = {}, Decimal('0')
+        for producto_id, valor in sorted(ventas.items(), key=lambda item: (-item[1], item[0])):
+            clases[producto_id] = 'A' if acumulado < umbral_a else 'B' if acumulado < umbral_b else 'C'
+            acumulado += valor
+        return clases
+
+    @staticmethod
+    def _normalizar_abc(resultado):
+        return dict(zip(resultado.index.tolist(), resultado['clase'].tolist()))
+
+    @staticmethod
+    def _orm_cohortes(detalles):
+        meses = defaultdict(set)
+        for detalle in detalles:
+            meses[detalle.venta.cliente_id].add(timezone.localtime(detalle.venta.fecha).date().replace(day=1))
+        conteo = defaultdict(int)
+        for compras in meses.values():
+            primero = min(compras)
+            for mes in compras:
+                conteo[(primero, (mes.year - primero.year) * 12 + mes.month - primero.month)] += 1
+        return dict(conteo)
+
+    @staticmethod
+    def _normalizar_cohortes(resultado):
+        conteo = {}
+        for cohorte, fila in resultado.iterrows():
+            for periodo, fraccion in fila.drop('clientes').items():
+                if fraccion:
+                    conteo[(cohorte.date(), periodo)] = round(fraccion * fila['clientes'])
+        return conteo
+
+    @staticmethod
+    def _orm_tabla_dinamica(detalles):
+        celdas = defaultdict(Decimal)
+        for detalle in detalles:
+            mes = timezone.localtime(detalle.venta.fecha).date().replace(day=1)
+            celdas[(detalle.producto.categoria_id, mes)] += detalle.subtotal
+        return dict(celdas)
+
+    @staticmethod
+    def _normalizar_tabla_dinamica(resultado):
+        return {
+            (categoria_id, mes.date()): Decimal(int(valor)).scaleb(-2)
+            for (categoria_id, mes), valor in resultado.stack().items() if valor
+        }
@@ -0,0 +1,184 @@
+"""
+Comando para medir tiempo y memoria de la exportación de reportes
+personalizados (``ReporteService.ejecutar_reporte``) a CSV, Excel y Parquet.
+
+La consulta del reporte genera las filas con ``generate_series``, de modo que
+no se necesitan datos previos; el número de filas se pasa como parámetro
+enlazado. ``--consulta generica`` produce cinco columnas (entero, texto,
+numérico, fecha y texto fijo) y ``--consulta ventas`` filas con las columnas
+de una exportación de ventas (número, fecha con hora, cliente, tipo, estado e
+importes ``numeric(10,2)``).
+Para cada formato y cantidad de filas se ejecuta el reporte completo
+(consulta con cursor del servidor, escritura por lotes y guardado del archivo)
+y se reporta la duración, las filas por segundo, el tamaño del archivo y el
+pico de memoria: por defecto, el aumento del RSS del proceso sobre el valor
+inicial, muestreado cada 20 ms con psutil (mide crecimiento: la memoria que
+el proceso ya tiene reservada se reutiliza); con ``--memoria tracemalloc``, el
+pico de memoria asignada por Python (más preciso, pero varias veces más
+lento). Con ``--comparar`` se mide también la generación en memoria (todas
+las filas como diccionarios y el archivo completo en un buffer), que crece
+con el número de filas.
+
+Los reportes y sus historiales se crean en una transacción que se revierte
+y los archivos generados se eliminan al terminar.
+"""
+import threading
+import time
+import tracemalloc
+
+import psutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reportes.models import Reporte
+from reportes.services.reporte_service import ReporteService
+
+CONSULTA = (
+    "SELECT g AS id, 'Producto ' || g AS nombre, round((g % 10000) / 100.0, 2) AS precio, "
+    "DATE '2025-01-01' + (g % 365) AS fecha, :etiqueta AS etiqueta "
+    "FROM generate_series(1, :filas) AS g"
+)
+
+CONSULTA_VENTAS = (
+    "SELECT id, numero, fecha, cliente_id, cliente, tipo, estado, subtotal, iva, descuento, "
+    "subtotal + iva - descuento AS total FROM ("
+    "SELECT g AS id, 'FAC-001-' || lpad(g::text, 9, '0') AS numero, "
+    "TIMESTAMPTZ '2025-01-01 08:00:00-05' + g * INTERVAL '17 seconds' AS fecha, "
+    "g % 20000 + 1 AS cliente_id, 'Cliente ' || (g % 20000 + 1) AS cliente, "
+    "(ARRAY['factura', 'factura', 'factura', 'nota_venta'])[g % 4 + 1] AS tipo, "
+    "(ARRAY['pagada', 'pagada', 'emitida', 'anulada'])[g % 4 + 1] AS estado, "
+    "round((g::bigint * 7919 % 50000) / 100.0, 2)::numeric(10,2) AS subtotal, "
+    "round((g::bigint * 7919 % 50000) / 100.0 * 0.15, 2)::numeric(10,2) AS iva, "
+    "(CASE WHEN g % 10 = 0 THEN 1.50 ELSE 0 END)::numeric(10,2) AS descuento "
+    "FROM generate_series(1, :filas) AS g) AS v"
+)
+
+CONSULTAS = {'generica': CONSULTA, 'ventas': CONSULTA_VENTAS}
+
+
+class _Revertir(Exception):
+    """Provoca el rollback de la transacción del benchmark."""
+
+
+class _PicoRSS:
+    """Muestrea el RSS del proceso en un hilo y registra el aumento máximo."""
+
+    def __init__(self, intervalo=0.02):
+        self.intervalo = intervalo
+        self.proceso = psutil.Process()
+        self.pico = 0
+
+    def _muestrear(self):
+        self.pico = max(self.pico, self.proceso.memory_info().rss - self.base)
+
+    def _bucle(self):
+        while not self.detener.wait(self.intervalo):
+            self._muestrear()
+
+    def __enter__(self):
+        self.base = self.proceso.memory_info().rss
+        self.detener = threading.Event()
+        self.hilo = threading.Thread(target=self._bucle, daemon=True)
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.detener.set()
+        self.hilo.join()
+        self._muestrear()
+
+
+class _PicoTracemalloc:
+    """Pico de memoria asignada por Python durante el bloque."""
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.pico = 0
+        return self
+
+    def __exit__(self, *exc):
+        _, self.pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+
+MEDIDORES = {'rss': _PicoRSS, 'tracemalloc': _PicoTracemalloc}
+
+
+def _enteros(valor):
+    try:
+        return [int(parte) for parte in valor.split(',') if parte.strip()]
+    except ValueError:
+        raise CommandError(f'Lista de enteros no válida: {valor}')
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria de la exportación de reportes a CSV, Excel y Parquet (por defecto 5.000.000 de filas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', default='50000,5000000',
+                            help='Cantidades de filas separadas por comas (por defecto 50000,5000000)')
+        parser.add_argument('--formatos', default='csv,excel',
+                            help='Formatos medidos separados por comas (por defecto csv,excel)')
+        parser.add_argument('--consulta', choices=sorted(CONSULTAS), default='generica',
+                            help='Filas generadas: genérica (por defecto) o con las columnas de una venta')
+        parser.add_argument('--comparar', type=int, default=0, metavar='FILAS',
+                            help='Mide también la generación en memoria con esta cantidad de filas')
+        parser.add_argument('--memoria', choices=sorted(MEDIDORES), default='rss',
+                            help='Medición de memoria: aumento del RSS (por defecto) o tracemalloc')
+
+    def handle(self, *args, **options):
+        cantidades = _enteros(options['filas'])
+        formatos = [formato.strip() for formato in options['formatos'].split(',') if formato.strip()]
+        if any(formato not in ReporteService.FORMATOS_POR_LOTES for formato in formatos):
+            raise CommandError(f'Formatos admitidos: {", ".join(ReporteService.FORMATOS_POR_LOTES)}')
+
+        self.medidor = MEDIDORES[options['memoria']]
+        resultados = []
+        try:
+            with transaction.atomic():
+                for formato in formatos:
+                    reporte = Reporte.objects.create(
+                        nombre=f'Benchmark exportación {formato}', tipo='personalizado',
+                        formato=formato, consulta_sql=CONSULTAS[options['consulta']]
+                    )
+                    for filas in cantidades:
+                        resultados.append(self._medir_por_lotes(reporte, filas))
+                    if options['comparar']:
+                        resultados.append(self._medir_en_memoria(reporte, options['comparar']))
+                raise _Revertir
+        except _Revertir:
+            pass
+
+        self.stdout.write(
+            f"{'formato':<8}{'modo':<11}{'filas':>10}{'segundos':>10}{'filas/s':>10}{'archivo MiB':>13}"
+            f"{'pico MiB':>10}  ({options['memoria']})"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['formato']:<8}{r['modo']:<11}{r['filas']:>10}{r['segundos']:>10.1f}"
+                f"{r['filas'] / r['segundos']:>10.0f}{r['archivo'] / 2**20:>13.1f}{r['pico'] / 2**20:>10.1f}"
+            )
+
+    def _medir_por_lotes(self, reporte, filas):
+        with self.medidor() as memoria:
+            inicio = time.perf_counter()
+            historial = ReporteService.ejecutar_reporte(reporte, {'filas': filas, 'etiqueta': 'benchmark'})
+            segundos = time.perf_counter() - inicio
+        if historial.estado != 'exito':
+            raise CommandError(f'{reporte.formato}: {historial.mensaje_error}')
+        archivo = historial.archivo.size
+        historial.archivo.delete(save=False)
+        return {'formato': reporte.formato, 'modo': 'por lotes', 'filas': filas,
+                'segundos': segundos, 'archivo': archivo, 'pico': memoria.pico}
+
+    def _medir_en_memoria(self, reporte, filas):
+        parametros = {'filas': filas, 'etiqueta': 'benchmark'}
+        with self.medidor() as memoria:
+            inicio = time.perf_counter()
+            datos = ReporteService._ejecutar_consulta(reporte.consulta_sql, parametros)
+            archivo = len(ReporteService._generar_archivo(reporte, datos, parametros))
+            segundos = time.perf_counter() - inicio
+            del datos
+        return {'formato': reporte.formato, 'modo': 'en memoria', 'filas': filas,
+                'segundos': segundos, 'archivo': archivo, 'pico': memoria.pico}
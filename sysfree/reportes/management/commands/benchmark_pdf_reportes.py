@@ -0,0 +1,118 @@
+"""
+Comando para medir la generación de reportes tabulares en PDF.
+
+Compara, con la misma consulta de ``benchmark_exportacion_reportes``
+(``generate_series``, sin datos previos):
+
+- ``reportlab``: ``ReporteService.ejecutar_reporte`` con formato PDF sin
+  plantilla; las filas se leen del cursor del servidor, se renderizan por
+  partes en archivos temporales y las partes se concatenan en el archivo
+  final. Se mide en un proceso y, con ``--procesos``, renderizando las partes
+  en paralelo (``REPORTES_PDF_PROCESOS``).
+- ``weasyprint``: la ruta HTML (todas las filas en memoria, plantilla
+  ``reportes/reporte_generico.html`` convertida con WeasyPrint). Crece con el
+  número de filas en tiempo y memoria, por lo que solo se mide hasta
+  ``--html-hasta`` filas.
+
+Para cada caso se reporta la duración, las filas por segundo, las páginas,
+el tamaño del archivo y el aumento máximo del RSS del proceso principal (los
+procesos auxiliares del modo en paralelo no se incluyen).
+
+Los reportes y sus historiales se crean en una transacción que se revierte
+y los archivos generados se eliminan al terminar.
+"""
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from pypdf import PdfReader
+
+from reportes.management.commands.benchmark_exportacion_reportes import CONSULTA, _enteros, _PicoRSS, _Revertir
+from reportes.models import Reporte
+from reportes.services.reporte_service import ReporteService
+
+
+class Command(BaseCommand):
+    help = 'Compara la generación de PDF tabulares con ReportLab y con WeasyPrint (10.000 a 500.000 filas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', default='10000,100000,500000',
+                            help='Cantidades de filas separadas por comas (por defecto 10000,100000,500000)')
+        parser.add_argument('--procesos', default='0,4',
+                            help='Procesos de renderizado de ReportLab medidos, separados por comas; '
+                                 '0 = un solo proceso (por defecto 0,4)')
+        parser.add_argument('--html-hasta', type=int, default=100000, metavar='FILAS',
+                            help='Máximo de filas medidas con WeasyPrint (por defecto 100000; 0 = no medir)')
+
+    def handle(self, *args, **options):
+        cantidades = _enteros(options['filas'])
+        procesos = _enteros(options['procesos'])
+        if not cantidades or not procesos:
+            raise CommandError('Indique al menos una cantidad de filas y de procesos')
+
+        resultados, self.weasyprint_error = [], None
+        try:
+            with transaction.atomic():
+                reporte = Reporte.objects.create(
+                    nombre='Benchmark PDF', tipo='personalizado', formato='pdf', consulta_sql=CONSULTA
+                )
+                for filas in cantidades:
+                    for cantidad_procesos in procesos:
+                        resultados.append(self._medir_reportlab(reporte, filas, cantidad_procesos))
+                    if filas <= options['html_hasta'] and self.weasyprint_error is None:
+                        resultado = self._medir_weasyprint(reporte, filas)
+                        if resultado:
+                            resultados.append(resultado)
+                raise _Revertir
+        except _Revertir:
+            pass
+
+        self.stdout.write(
+            f"{'ruta':<12}{'procesos':>9}{'filas':>9}{'segundos':>10}{'filas/s':>9}{'páginas':>9}"
+            f"{'archivo MiB':>13}{'pico MiB':>10}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['ruta']:<12}{r['procesos']:>9}{r['filas']:>9}{r['segundos']:>10.1f}"
+                f"{r['filas'] / r['segundos']:>9.0f}{r['paginas']:>9}{r['archivo'] / 2**20:>13.1f}"
+                f"{r['pico'] / 2**20:>10.1f}"
+            )
+        omitidas = [filas for filas in cantidades if filas > options['html_hasta']]
+        if self.weasyprint_error:
+            self.stdout.write(self.style.WARNING(f'WeasyPrint no disponible: {self.weasyprint_error}'))
+        elif omitidas:
+            self.stdout.write(f"WeasyPrint no medido con {', '.join(map(str, omitidas))} filas (--html-hasta)")
+
+    def _medir_reportlab(self, reporte, filas, procesos):
+        with override_settings(REPORTES_PDF_PROCESOS=procesos), _PicoRSS() as memoria:
+            inicio = time.perf_counter()
+            historial = ReporteService.ejecutar_reporte(
+                reporte, {'filas': filas, 'etiqueta': 'benchmark'}, usar_cache=False
+            )
+            segundos = time.perf_counter() - inicio
+        if historial.estado != 'exito':
+            raise CommandError(f'ReportLab: {historial.mensaje_error}')
+        with historial.archivo.open('rb') as archivo:
+            paginas = len(PdfReader(archivo).pages)
+        archivo = historial.archivo.size
+        historial.archivo.delete(save=False)
+        return {'ruta': 'reportlab', 'procesos': procesos, 'filas': filas, 'segundos': segundos,
+                'paginas': paginas, 'archivo': archivo, 'pico': memoria.pico}
+
+    def _medir_weasyprint(self, reporte, filas):
+        parametros = {'filas': filas, 'etiqueta': 'benchmark'}
+        try:
+            with _PicoRSS() as memoria:
+                inicio = time.perf_counter()
+                datos = ReporteService._ejecutar_consulta(reporte.consulta_sql, parametros)
+                pdf = ReporteService._html_a_pdf(ReporteService._generar_html(reporte, datos, parametros))
+                segundos = time.perf_counter() - inicio
+                del datos
+        except (ImportError, OSError) as e:
+            # WeasyPrint necesita Pango y sus dependencias del sistema
+            self.weasyprint_error = str(e).splitlines()[0]
+            return None
+        return {'ruta': 'weasyprint', 'procesos': 0, 'filas': filas, 'segundos': segundos,
+                'paginas': len(PdfReader(io.BytesIO(pdf)).pages), 'archivo': len(pdf), 'pico': memoria.pico}
@@ -0,0 +1,246 @@
+"""
+Comando para medir los endpoints de ``/api/reportes/`` sobre un volumen
+grande de datos (por defecto, un millón de líneas de detalle de venta).
+
+Genera clientes, productos, ventas, detalles y movimientos de inventario con
+``INSERT ... SELECT generate_series`` (copiando una fila de plantilla creada
+con el ORM), reconstruye los acumulados de ventas y solicita cada reporte con
+el cliente de pruebas de DRF. Para cada endpoint reporta la mediana y el
+máximo de la latencia, las consultas ejecutadas, las filas devueltas y el pico
+de memoria Python asignada durante la solicitud (``tracemalloc``, medido en
+una pasada aparte para no inflar los tiempos). El objetivo es que todos
+respondan en menos de un segundo con memoria acotada por el tamaño de página
+o del ranking, no por el volumen de datos.
+
+Todo se ejecuta en una transacción que se revierte al terminar.
+"""
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from clientes.models import Cliente
+from core.models import Usuario
+from inventario.models import Almacen, Categoria, MovimientoInventario, Producto
+from reportes.services.hechos_ventas_service import HechosVentasService
+from ventas.models import DetalleVenta, Venta
+
+OBJETIVO_MS = 1000
+DIAS_HISTORIA = 730
+
+
+class _Revertir(Exception):
+    """Provoca el rollback de la transacción del benchmark."""
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y memoria de los reportes sobre un millón de líneas de venta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--detalles', type=int, default=1_000_000,
+                            help='Líneas de detalle de venta generadas (por defecto 1.000.000)')
+        parser.add_argument('--lineas', type=int, default=10,
+                            help='Líneas por venta (por defecto 10)')
+        parser.add_argument('--clientes', type=int, default=5000,
+                            help='Clientes generados (por defecto 5000)')
+        parser.add_argument('--productos', type=int, default=5000,
+                            help='Productos generados (por defecto 5000)')
+        parser.add_argument('--movimientos', type=int, default=1_000_000,
+                            help='Movimientos de inventario generados (por defecto 1.000.000)')
+        parser.add_argument('--repeticiones', type=int, default=5,
+                            help='Solicitudes medidas por endpoint (por defecto 5)')
+
+    def handle(self, *args, **options):
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        cliente_http = APIClient(HTTP_HOST=host)
+        resultados = []
+        try:
+            # Sin throttling: se mide la consulta, no el limitador
+            with mock.patch.object(APIView, 'throttle_classes', []), transaction.atomic():
+                datos = self._generar_datos(options)
+                cliente_http.force_authenticate(datos['usuario'])
+
+                inicio = time.perf_counter()
+                HechosVentasService.reconstruir()
+                self.stdout.write(f'Acumulados reconstruidos en {time.perf_counter() - inicio:.1f} s')
+
+                hoy = timezone.localdate()
+                anio = {'fecha_inicio': str(hoy - timedelta(days=365)), 'fecha_fin': str(hoy)}
+                endpoints = (
+                    ('ventas', 'api:reportes-ventas', {}),
+                    ('ventas por periodo (1 año)', 'api:reportes-ventas-por-periodo', anio),
+                    ('más vendidos', 'api:reportes-productos-mas-vendidos', {}),
+                    ('más vendidos (1 año)', 'api:reportes-productos-mas-vendidos', anio),
+                    ('clientes frecuentes', 'api:reportes-clientes-frecuentes', {}),
+                    ('inventario', 'api:reportes-inventario', {}),
+                    ('inventario (última pág.)', 'api:reportes-inventario',
+                     {'page': -(-options['productos'] // 500), 'page_size': 500}),
+                    ('movimientos', 'api:reportes-movimientos-inventario', {}),
+                    ('movimientos (producto, 1 año)', 'api:reportes-movimientos-inventario',
+                     {'producto_id': datos['producto_id'], **anio}),
+                )
+                for nombre, url, parametros in endpoints:
+                    resultados.append(self._medir(
+                        cliente_http, nombre, reverse(url), parametros, options['repeticiones']
+                    ))
+                raise _Revertir
+        except _Revertir:
+            pass
+
+        self.stdout.write(
+            f"{'endpoint':<32}{'p50 ms':>9}{'máx ms':>9}{'consultas':>11}{'filas':>8}{'pico KiB':>10}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['nombre']:<32}{r['p50']:>9.1f}{r['max']:>9.1f}{r['consultas']:>11}"
+                f"{r['filas']:>8}{r['pico'] / 1024:>10.0f}"
+            )
+        lentos = [r['nombre'] for r in resultados if r['max'] >= OBJETIVO_MS]
+        if lentos:
+            self.stdout.write(self.style.WARNING(f"Por encima de {OBJETIVO_MS} ms: {', '.join(lentos)}"))
+        elif resultados:
+            self.stdout.write(self.style.SUCCESS(f'Todos los reportes por debajo de {OBJETIVO_MS} ms'))
+
+    def _medir(self, cliente_http, nombre, url, parametros, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            reset_queries()
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                respuesta = cliente_http.get(url, parametros)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code != 200:
+                self.stdout.write(self.style.ERROR(f'{nombre}: {respuesta.status_code} {respuesta.content[:200]}'))
+                raise _Revertir
+
+        tracemalloc.start()
+        try:
+            respuesta = cliente_http.get(url, parametros)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        listas = [valor for valor in respuesta.data.values() if isinstance(valor, (list, dict))]
+        return {
+            'nombre': nombre,
+            'p50': statistics.median(tiempos),
+            'max': max(tiempos),
+            'consultas': len(consultas),
+            'filas': max((len(valor) for valor in listas), default=0),
+            'pico': pico,
+        }
+
+    def _generar_datos(self, options):
+        """Crea las filas de plantilla con el ORM y las replica en SQL."""
+        inicio = time.perf_counter()
+        usuario = Usuario.objects.create_user(
+            email='benchmark-reportes@sysfree.local', password=None, nombres='Reportes'
+        )
+        categoria = Categoria.objects.create(nombre='Benchmark reportes')
+        almacen = Almacen.objects.create(nombre='Almacén benchmark reportes')
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion='BENCHREP', nombres='Cliente', apellidos='Benchmark'
+        )
+        producto = Producto.objects.create(
+            codigo='BENCHREP', nombre='Producto benchmark', categoria=categoria,
+            precio_compra=Decimal('3.00'), precio_venta=Decimal('5.00'), stock=Decimal('100.00')
+        )
+        venta = Venta.objects.create(
+            numero='BENCHREP', cliente=cliente, tipo='factura', estado='pagada',
+            subtotal=Decimal('5.00'), total=Decimal('5.00')
+        )
+        detalle = DetalleVenta.objects.bulk_create([DetalleVenta(
+            venta=venta, producto=producto, cantidad=Decimal('1.00'), precio_unitario=Decimal('5.00'),
+            subtotal=Decimal('5.00'), total=Decimal('5.00')
+        )])[0]
+        movimiento = MovimientoInventario.objects.bulk_create([MovimientoInventario(
+            tipo='entrada', origen='compra', producto=producto, almacen=almacen, cantidad=Decimal('1.00'),
+            stock_anterior=Decimal('0.00'), stock_nuevo=Decimal('1.00'), costo_unitario=Decimal('3.00')
+        )])[0]
+
+        lineas = options['lineas']
+        num_ventas = -(-options['detalles'] // lineas)
+        clientes = self._replicar(Cliente, cliente.pk, options['clientes'], {
+            'identificacion': ("'BENCHREP-' || g", []),
+        })
+        productos = self._replicar(Producto, producto.pk, options['productos'], {
+            'codigo': ("'BENCHREP-' || g", []),
+            'nombre': ("'Producto ' || lpad(g::text, 6, '0')", []),
+            'stock': ('(g %% 500)::numeric', []),
+        })
+        # Ventas repartidas en los últimos DIAS_HISTORIA días, con un total de 1 a 100
+        ventas = self._replicar(Venta, venta.pk, num_ventas, {
+            'numero': ("'BENCHREP-' || g", []),
+            'cliente_id': ('(%s::bigint[])[g %% %s + 1]', [clientes, len(clientes)]),
+            'fecha': (f"now() - (g %% {DIAS_HISTORIA}) * interval '1 day' - (g %% 600) * interval '1 minute'", []),
+            'estado': ("(ARRAY['pagada', 'pagada', 'pagada', 'emitida', 'anulada'])[g %% 5 + 1]", []),
+            'subtotal': ('(g %% 100 + 1)::numeric', []),
+            'total': ('(g %% 100 + 1)::numeric', []),
+        })
+        self._replicar(DetalleVenta, detalle.pk, options['detalles'], devolver=False, columnas={
+            'venta_id': ('(%s::bigint[])[(g - 1) / %s + 1]', [ventas, lineas]),
+            'producto_id': ('(%s::bigint[])[(g::bigint * 7919) %% %s + 1]', [productos, len(productos)]),
+            'cantidad': ('(g %% 5 + 1)::numeric', []),
+            'subtotal': ('(g %% 5 + 1)::numeric * 5', []),
+            'total': ('(g %% 5 + 1)::numeric * 5', []),
+        })
+        self._replicar(MovimientoInventario, movimiento.pk, options['movimientos'], devolver=False, columnas={
+            'producto_id': ('(%s::bigint[])[g %% %s + 1]', [productos, len(productos)]),
+            'fecha': (f"now() - (g %% {DIAS_HISTORIA}) * interval '1 day'", []),
+        })
+        with connection.cursor() as cursor:
+            for modelo in (Cliente, Producto, Venta, DetalleVenta, MovimientoInventario):
+                cursor.execute(f'ANALYZE {modelo._meta.db_table}')
+
+        self.stdout.write(
+            f"Datos generados en {time.perf_counter() - inicio:.1f} s: {len(ventas)} ventas, "
+            f"{options['detalles']} detalles, {options['movimientos']} movimientos"
+        )
+        return {'usuario': usuario, 'producto_id': productos[0]}
+
+    def _replicar(self, modelo, plantilla_id, cantidad, columnas, devolver=True):
+        """
+        Inserta ``cantidad`` copias de la fila ``plantilla_id`` de ``modelo``.
+
+        Args:
+            modelo: Modelo de Django
+            plantilla_id (int): Clave de la fila copiada
+            cantidad (int): Filas insertadas
+            columnas (dict): Columna -> (expresión SQL en función de ``g``, parámetros);
+                las demás columnas se copian de la plantilla; los % literales van duplicados
+            devolver (bool): Si se devuelven las claves insertadas
+
+        Returns:
+            list: Claves de las filas insertadas, en el orden de ``g`` (vacía si no se piden)
+        """
+        if cantidad <= 0:
+            return []
+        tabla = modelo._meta.db_table
+        pk = modelo._meta.pk.column
+        nombres, expresiones, parametros = [], [], []
+        for campo in modelo._meta.concrete_fields:
+            if campo.primary_key:
+                continue
+            nombres.append(connection.ops.quote_name(campo.column))
+            expresion, params = columnas.get(campo.column, (f't.{connection.ops.quote_name(campo.column)}', []))
+            expresiones.append(expresion)
+            parametros.extend(params)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {tabla} ({', '.join(nombres)}) "
+                f"SELECT {', '.join(expresiones)} FROM {tabla} t, generate_series(1, %s) g "
+                f"WHERE t.{pk} = %s ORDER BY g" + (f" RETURNING {pk}" if devolver else ''),
+                parametros + [cantidad, plantilla_id]
+            )
+            return [fila[0] for fila in cursor.fetchall()] if devolver else []
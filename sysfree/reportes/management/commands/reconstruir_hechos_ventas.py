@@ -0,0 +1,35 @@
+"""
+Comando para reconstruir los acumulados de ventas (``VentaDiaria`` y
+``VentaMensual``) a partir de las ventas registradas: carga inicial tras
+instalar el módulo o corrección de un rango de meses.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from reportes.services.hechos_ventas_service import HechosVentasService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los acumulados diarios y mensuales de ventas (meses completos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', default=None,
+                            help='Fecha inicial AAAA-MM-DD; se amplía al inicio de su mes (por defecto, sin límite)')
+        parser.add_argument('--hasta', default=None,
+                            help='Fecha final AAAA-MM-DD; se amplía al fin de su mes (por defecto, sin límite)')
+        parser.add_argument('--lote', type=int, default=2000,
+                            help='Ventas procesadas por lote (por defecto 2000)')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion in ('desde', 'hasta'):
+            valor = options[opcion]
+            fechas[opcion] = parse_date(valor) if valor else None
+            if valor and fechas[opcion] is None:
+                raise CommandError(f'Fecha no válida para --{opcion}: {valor}')
+
+        resultado = HechosVentasService.reconstruir(tamano_lote=options['lote'], **fechas)
+        self.stdout.write(self.style.SUCCESS(
+            f"Acumulados reconstruidos: {resultado['ventas']} ventas, "
+            f"{resultado['diarias']} filas diarias, {resultado['mensuales']} filas mensuales"
+        ))
@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-17 20:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0001_initial'),
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AporteVenta',
+            fields=[
+                ('venta_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='venta')),
+                ('fecha', models.DateField(blank=True, null=True, verbose_name='fecha')),
+                ('aportes', models.JSONField(blank=True, default=list, verbose_name='aportes')),
+            ],
+            options={
+                'verbose_name': 'aporte de venta',
+                'verbose_name_plural': 'aportes de ventas',
+                'indexes': [models.Index(fields=['fecha'], name='reportes_aporte_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=10, verbose_name='tipo')),
+                ('estado', models.CharField(max_length=10, verbose_name='estado')),
+                ('num_ventas', models.IntegerField(default=0, verbose_name='número de ventas')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='cantidad')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='subtotal')),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='descuento')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='total')),
+                ('fecha', models.DateField(verbose_name='fecha')),
+                ('categoria', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventario.categoria', verbose_name='categoría')),
+                ('producto', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventario.producto', verbose_name='producto')),
+            ],
+            options={
+                'verbose_name': 'venta diaria',
+                'verbose_name_plural': 'ventas diarias',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tipo', 'estado', 'producto', 'categoria'), name='reportes_venta_diaria_unica', nulls_distinct=False)],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=10, verbose_name='tipo')),
+                ('estado', models.CharField(max_length=10, verbose_name='estado')),
+                ('num_ventas', models.IntegerField(default=0, verbose_name='número de ventas')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='cantidad')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='subtotal')),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='descuento')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='total')),
+                ('mes', models.DateField(verbose_name='mes')),
+                ('categoria', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventario.categoria', verbose_name='categoría')),
+                ('producto', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventario.producto', verbose_name='producto')),
+            ],
+            options={
+                'verbose_name': 'venta mensual',
+                'verbose_name_plural': 'ventas mensuales',
+                'constraints': [models.UniqueConstraint(fields=('mes', 'tipo', 'estado', 'producto', 'categoria'), name='reportes_venta_mensual_unica', nulls_distinct=False)],
+            },
+        ),
+    ]
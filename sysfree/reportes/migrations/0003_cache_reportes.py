@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_hechos_ventas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialreporte',
+            name='desde_cache',
+            field=models.BooleanField(default=False, verbose_name='desde caché'),
+        ),
+        migrations.CreateModel(
+            name='CacheReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True, verbose_name='clave')),
+                ('formato', models.CharField(max_length=5, verbose_name='formato')),
+                ('archivo', models.FileField(upload_to='reportes/cache/', verbose_name='archivo')),
+                ('tamano', models.BigIntegerField(verbose_name='tamaño (bytes)')),
+                ('aciertos', models.PositiveIntegerField(default=0, verbose_name='aciertos')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='fecha de creación')),
+                ('ultimo_acceso', models.DateTimeField(verbose_name='último acceso')),
+            ],
+            options={
+                'verbose_name': 'resultado de reporte en caché',
+                'verbose_name_plural': 'resultados de reportes en caché',
+                'indexes': [models.Index(fields=['ultimo_acceso'], name='reportes_cache_acceso_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 21:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0003_cache_reportes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialreporte',
+            name='fecha_inicio',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='fecha de inicio'),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='filas',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='filas procesadas'),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='tarea_id',
+            field=models.CharField(blank=True, max_length=50, verbose_name='ID de tarea'),
+        ),
+        migrations.AlterField(
+            model_name='historialreporte',
+            name='estado',
+            field=models.CharField(choices=[('en_cola', 'En cola'), ('ejecutando', 'En ejecución'), ('exito', 'Éxito'), ('error', 'Error'), ('cancelado', 'Cancelado')], default='en_cola', max_length=10, verbose_name='estado'),
+        ),
+        migrations.AddIndex(
+            model_name='historialreporte',
+            index=models.Index(fields=['estado', 'creado_por'], name='reportes_hist_estado_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-17 21:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0004_ejecucion_asincrona'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialreporte',
+            name='fecha_envio',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='fecha de envío por correo'),
+        ),
+        migrations.AddIndex(
+            model_name='programacionreporte',
+            index=models.Index(fields=['activo', 'proxima_ejecucion'], name='reportes_prog_proxima_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0005_despacho_programaciones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reporte',
+            name='tipo',
+            field=models.CharField(choices=[('ventas', 'Ventas'), ('inventario', 'Inventario'), ('clientes', 'Clientes'), ('reparaciones', 'Reparaciones'), ('contabilidad', 'Contabilidad'), ('analitico', 'Analítico'), ('personalizado', 'Personalizado')], max_length=15, verbose_name='tipo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0006_reporte_tipo_analitico'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cachereporte',
+            name='formato',
+            field=models.CharField(max_length=10, verbose_name='formato'),
+        ),
+        migrations.AlterField(
+            model_name='reporte',
+            name='formato',
+            field=models.CharField(choices=[('pdf', 'PDF'), ('excel', 'Excel'), ('csv', 'CSV'), ('html', 'HTML'), ('parquet', 'Parquet')], default='pdf', max_length=10, verbose_name='formato'),
+        ),
+    ]
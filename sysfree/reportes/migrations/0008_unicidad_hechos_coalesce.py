@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 00:01
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_indices_fecha_reportes'),
+        ('reportes', '0007_reporte_formato_parquet'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ventadiaria',
+            name='reportes_venta_diaria_unica',
+        ),
+        migrations.RemoveConstraint(
+            model_name='ventamensual',
+            name='reportes_venta_mensual_unica',
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(models.F('fecha'), models.F('tipo'), models.F('estado'), django.db.models.functions.comparison.Coalesce('producto', 0), django.db.models.functions.comparison.Coalesce('categoria', 0), name='reportes_venta_diaria_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventamensual',
+            constraint=models.UniqueConstraint(models.F('mes'), models.F('tipo'), models.F('estado'), django.db.models.functions.comparison.Coalesce('producto', 0), django.db.models.functions.comparison.Coalesce('categoria', 0), name='reportes_venta_mensual_unica'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 00:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0008_unicidad_hechos_coalesce'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialreporte',
+            index=models.Index(condition=models.Q(('estado', 'exito'), ('fecha_envio__isnull', True), ('programacion__isnull', False)), fields=['fecha_ejecucion'], name='reportes_hist_sin_envio_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 01:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0009_historial_sin_envio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='historialreporte',
+            name='reportes_hist_sin_envio_idx',
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='enviar_por_correo',
+            field=models.BooleanField(default=False, verbose_name='enviar por correo'),
+        ),
+        migrations.AddIndex(
+            model_name='historialreporte',
+            index=models.Index(condition=models.Q(('enviar_por_correo', True), ('estado', 'exito'), ('fecha_envio__isnull', True)), fields=['fecha_ejecucion'], name='reportes_hist_sin_envio_idx'),
+        ),
+    ]
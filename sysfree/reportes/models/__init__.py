@@ -1,9 +1,15 @@
 from .reporte import Reporte
 from .programacion_reporte import ProgramacionReporte
 from .historial_reporte import HistorialReporte
+from .hechos_venta import VentaDiaria, VentaMensual, AporteVenta
+from .cache_reporte import CacheReporte
 
 __all__ = [
     'Reporte',
     'ProgramacionReporte',
     'HistorialReporte',
+    'VentaDiaria',
+    'VentaMensual',
+    'AporteVenta',
+    'CacheReporte',
 ]
\ No newline at end of file
@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CacheReporte(models.Model):
+    """
+    Resultado de un reporte guardado para reutilizarlo.
+
+    ``clave`` resume la consulta, los parámetros, el formato y la versión de
+    los datos de las tablas consultadas, por lo que un cambio en los datos
+    produce otra clave. Las entradas las gestiona ``CacheReportesService``,
+    que desaloja las menos usadas recientemente cuando el tamaño total supera
+    ``REPORTES_CACHE_MAX_BYTES``.
+    """
+
+    clave = models.CharField(_('clave'), max_length=64, unique=True)
+    formato = models.CharField(_('formato'), max_length=10)
+    archivo = models.FileField(_('archivo'), upload_to='reportes/cache/')
+    tamano = models.BigIntegerField(_('tamaño (bytes)'))
+    aciertos = models.PositiveIntegerField(_('aciertos'), default=0)
+    fecha_creacion = models.DateTimeField(_('fecha de creación'), auto_now_add=True)
+    ultimo_acceso = models.DateTimeField(_('último acceso'))
+
+    class Meta:
+        verbose_name = _('resultado de reporte en caché')
+        verbose_name_plural = _('resultados de reportes en caché')
+        indexes = [
+            models.Index(fields=['ultimo_acceso'], name='reportes_cache_acceso_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.clave[:12]} ({self.formato}, {self.tamano} bytes)"
@@ -0,0 +1,116 @@
+from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext_lazy as _
+
+
+def unicidad_hechos(periodo, nombre):
+    """
+    Restricción única de los acumulados por período y dimensiones.
+
+    Las filas de totales tienen producto y categoría NULL; el índice usa
+    ``COALESCE(..., 0)`` para que esas filas también choquen entre sí (los
+    IDs nunca son 0). A diferencia de ``nulls_distinct=False`` funciona desde
+    PostgreSQL 9.5, y ``HechosVentasService._aplicar`` la usa como destino del
+    ``ON CONFLICT``.
+    """
+    return models.UniqueConstraint(
+        periodo, 'tipo', 'estado', Coalesce('producto', 0), Coalesce('categoria', 0), name=nombre,
+    )
+
+
+class HechoVentaBase(models.Model):
+    """
+    Acumulado de ventas por período, tipo, estado, producto y categoría.
+
+    Las filas sin producto llevan los totales de cabecera de las ventas
+    (número de ventas, subtotal, descuento y total); las filas con producto
+    acumulan las líneas de detalle (cantidad, subtotal, descuento y total de
+    las líneas). Las mantiene ``HechosVentasService``; no se editan
+    directamente.
+    """
+
+    tipo = models.CharField(_('tipo'), max_length=10)
+    estado = models.CharField(_('estado'), max_length=10)
+    producto = models.ForeignKey(
+        'inventario.Producto',
+        verbose_name=_('producto'),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    categoria = models.ForeignKey(
+        'inventario.Categoria',
+        verbose_name=_('categoría'),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    num_ventas = models.IntegerField(_('número de ventas'), default=0)
+    cantidad = models.DecimalField(_('cantidad'), max_digits=14, decimal_places=2, default=0)
+    subtotal = models.DecimalField(_('subtotal'), max_digits=14, decimal_places=2, default=0)
+    descuento = models.DecimalField(_('descuento'), max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(_('total'), max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class VentaDiaria(HechoVentaBase):
+    """Acumulado diario de ventas (fecha local de la venta)."""
+
+    fecha = models.DateField(_('fecha'))
+
+    class Meta:
+        verbose_name = _('venta diaria')
+        verbose_name_plural = _('ventas diarias')
+        constraints = [
+            unicidad_hechos('fecha', 'reportes_venta_diaria_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.tipo}/{self.estado}: {self.total}"
+
+
+class VentaMensual(HechoVentaBase):
+    """Acumulado mensual de ventas; ``mes`` es el primer día del mes."""
+
+    mes = models.DateField(_('mes'))
+
+    class Meta:
+        verbose_name = _('venta mensual')
+        verbose_name_plural = _('ventas mensuales')
+        constraints = [
+            unicidad_hechos('mes', 'reportes_venta_mensual_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} {self.tipo}/{self.estado}: {self.total}"
+
+
+class AporteVenta(models.Model):
+    """
+    Aporte de una venta ya aplicado a los acumulados.
+
+    Al procesar un cambio se aplica la diferencia entre el aporte actual y el
+    guardado aquí, de modo que reprocesar una venta no duplica importes. No
+    tiene clave foránea a la venta para conservar el aporte después de que
+    esta se elimine y poder descontarlo.
+    """
+
+    venta_id = models.BigIntegerField(_('venta'), primary_key=True)
+    fecha = models.DateField(_('fecha'), null=True, blank=True)
+    aportes = models.JSONField(_('aportes'), default=list, blank=True)
+
+    class Meta:
+        verbose_name = _('aporte de venta')
+        verbose_name_plural = _('aportes de ventas')
+        indexes = [
+            models.Index(fields=['fecha'], name='reportes_aporte_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Venta {self.venta_id}"
@@ -10,9 +10,14 @@ class HistorialReporte(ModeloBase):
     """Modelo para registrar el historial de ejecución de reportes."""
     
     ESTADO_CHOICES = (
+        ('en_cola', _('En cola')),
+        ('ejecutando', _('En ejecución')),
         ('exito', _('Éxito')),
         ('error', _('Error')),
+        ('cancelado', _('Cancelado')),
     )
+    # Estados en los que la ejecución todavía no terminó
+    ESTADOS_PENDIENTES = ('en_cola', 'ejecutando')
     
     reporte = models.ForeignKey(
         Reporte,
@@ -30,15 +35,31 @@ class HistorialReporte(ModeloBase):
     )
     fecha_ejecucion = models.DateTimeField(_('fecha de ejecución'), auto_now_add=True)
     duracion = models.IntegerField(_('duración (segundos)'), null=True, blank=True)
-    estado = models.CharField(_('estado'), max_length=5, choices=ESTADO_CHOICES)
+    estado = models.CharField(_('estado'), max_length=10, choices=ESTADO_CHOICES, default='en_cola')
+    tarea_id = models.CharField(_('ID de tarea'), max_length=50, blank=True)
+    fecha_inicio = models.DateTimeField(_('fecha de inicio'), null=True, blank=True)
+    filas = models.PositiveIntegerField(_('filas procesadas'), null=True, blank=True)
+    # Solo las ejecuciones del despacho de programaciones se envían a los destinatarios
+    enviar_por_correo = models.BooleanField(_('enviar por correo'), default=False)
+    fecha_envio = models.DateTimeField(_('fecha de envío por correo'), null=True, blank=True)
     mensaje_error = models.TextField(_('mensaje de error'), blank=True)
     parametros = models.JSONField(_('parámetros'), default=dict, blank=True)
     archivo = models.FileField(_('archivo'), upload_to='reportes/', null=True, blank=True)
+    desde_cache = models.BooleanField(_('desde caché'), default=False)
     
     class Meta:
         verbose_name = _('historial de reporte')
         verbose_name_plural = _('historial de reportes')
         ordering = ['-fecha_ejecucion']
+        indexes = [
+            # Conteo de ejecuciones en curso para los límites de concurrencia
+            models.Index(fields=['estado', 'creado_por'], name='reportes_hist_estado_idx'),
+            # Resultados programados pendientes de envío (ProgramacionReporteService.enviar_rezagados)
+            models.Index(
+                fields=['fecha_ejecucion'], name='reportes_hist_sin_envio_idx',
+                condition=models.Q(estado='exito', fecha_envio__isnull=True, enviar_por_correo=True),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.reporte} - {self.fecha_ejecucion}"
@@ -50,6 +50,10 @@ class ProgramacionReporte(ModeloBase):
         verbose_name = _('programación de reporte')
         verbose_name_plural = _('programaciones de reportes')
         ordering = ['nombre']
+        indexes = [
+            # Búsqueda de programaciones vencidas del despachador
+            models.Index(fields=['activo', 'proxima_ejecucion'], name='reportes_prog_proxima_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.reporte}"
@@ -12,6 +12,7 @@ class Reporte(ModeloBase):
         ('clientes', _('Clientes')),
         ('reparaciones', _('Reparaciones')),
         ('contabilidad', _('Contabilidad')),
+        ('analitico', _('Analítico')),
         ('personalizado', _('Personalizado')),
     )
     
@@ -20,12 +21,13 @@ class Reporte(ModeloBase):
         ('excel', _('Excel')),
         ('csv', _('CSV')),
         ('html', _('HTML')),
+        ('parquet', _('Parquet')),
     )
     
     nombre = models.CharField(_('nombre'), max_length=100)
     descripcion = models.TextField(_('descripción'), blank=True)
     tipo = models.CharField(_('tipo'), max_length=15, choices=TIPO_CHOICES)
-    formato = models.CharField(_('formato'), max_length=5, choices=FORMATO_CHOICES, default='pdf')
+    formato = models.CharField(_('formato'), max_length=10, choices=FORMATO_CHOICES, default='pdf')
     consulta_sql = models.TextField(_('consulta SQL'), blank=True)
     parametros = models.JSONField(_('parámetros'), default=dict, blank=True)
     plantilla = models.TextField(_('plantilla'), blank=True)
@@ -1,5 +1,13 @@
 from .reporte_service import ReporteService
+from .hechos_ventas_service import HechosVentasService
+from .cache_reportes_service import CacheReportesService
+from .programacion_reporte_service import ProgramacionReporteService
+from .analitica_service import AnaliticaService
 
 __all__ = [
     'ReporteService',
+    'HechosVentasService',
+    'CacheReportesService',
+    'ProgramacionReporteService',
+    'AnaliticaService',
 ]
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Servicio de los análisis de ventas e inventario (``reportes.analytics``).
+
+Carga las columnas necesarias, ejecuta el análisis con pandas y devuelve el
+resultado como columnas y filas con importes ``Decimal``, fracciones
+redondeadas y nombres en lugar de claves, listo para la API o para los
+escritores de archivos de ``ReporteService`` (reportes de tipo ``analitico``).
+"""
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+from django.utils.dateparse import parse_date
+
+from clientes.models import Cliente
+from inventario.models import Categoria, Producto
+from ventas.models import Venta
+from ..analytics import (
+    cargar_detalles_venta, cargar_movimientos_inventario, clasificacion_abc, margen_por_categoria,
+    retencion_cohortes, tabla_dinamica,
+)
+from ..analytics.analisis import DIMENSIONES_CLAVE, DIMENSIONES_FECHA, UMBRALES_ABC
+from ..analytics.carga import ESTADOS_VENTA
+
+FORMATOS_FECHA = {'dia': '%Y-%m-%d', 'mes': '%Y-%m', 'anio': '%Y'}
+DECIMALES_FRACCION = 4
+
+
+class AnaliticaService:
+    """Servicio para ejecutar los análisis y darles formato."""
+
+    ANALISIS = ('tabla_dinamica', 'cohortes', 'abc', 'margen_categoria')
+    FUENTES = ('ventas', 'inventario')
+
+    @classmethod
+    def ejecutar(cls, parametros):
+        """
+        Ejecuta un análisis.
+
+        Args:
+            parametros (dict): ``analisis`` (ver ``ANALISIS``), ``fecha_inicio``
+                y ``fecha_fin`` opcionales (AAAA-MM-DD) y los propios del análisis:
+                - tabla_dinamica: ``fuente`` (ventas o inventario), ``filas``,
+                  ``columnas``, ``valor`` y ``agregacion``
+                - abc: ``medida``, ``umbral_a`` y ``umbral_b``
+                - ventas en general: ``estados`` (lista o separados por comas)
+
+        Returns:
+            tuple: (columnas, filas) con los nombres de las columnas y una lista por fila
+
+        Raises:
+            ValueError: Si el análisis o sus parámetros no son válidos
+        """
+        analisis = parametros.get('analisis')
+        if analisis not in cls.ANALISIS:
+            raise ValueError(f"Análisis no válido: {analisis}. Opciones: {', '.join(cls.ANALISIS)}")
+        return getattr(cls, f'_{analisis}')(parametros)
+
+    @classmethod
+    def _tabla_dinamica(cls, parametros):
+        fuente = parametros.get('fuente', 'ventas')
+        if fuente not in cls.FUENTES:
+            raise ValueError(f"Fuente no válida: {fuente}. Opciones: {', '.join(cls.FUENTES)}")
+        if fuente == 'ventas':
+            df, valor = cls._detalles(parametros), parametros.get('valor', 'subtotal')
+        else:
+            df = cargar_movimientos_inventario(*cls._fechas(parametros))
+            valor = parametros.get('valor', 'cantidad')
+        filas = parametros.get('filas', 'categoria')
+        columnas = parametros.get('columnas', 'mes')
+        agregacion = parametros.get('agregacion', 'suma')
+
+        tabla = tabla_dinamica(df, filas, columnas, valor, agregacion)
+        formato = int if agregacion == 'conteo' else cls._importe
+        return (
+            [filas] + cls._etiquetas(columnas, tabla.columns),
+            [
+                [etiqueta] + [formato(valor) for valor in valores]
+                for etiqueta, valores in zip(cls._etiquetas(filas, tabla.index), tabla.to_numpy().tolist())
+            ],
+        )
+
+    @classmethod
+    def _cohortes(cls, parametros):
+        retencion = retencion_cohortes(cls._detalles(parametros))
+        meses = [columna for columna in retencion.columns if columna != 'clientes']
+        return (
+            ['cohorte', 'clientes'] + [f'mes_{mes}' for mes in meses],
+            [
+                [cohorte.strftime(FORMATOS_FECHA['mes']), int(fila['clientes'])]
+                + [cls._fraccion(fila[mes]) for mes in meses]
+                for cohorte, fila in retencion.iterrows()
+            ],
+        )
+
+    @classmethod
+    def _abc(cls, parametros):
+        try:
+            umbrales = (
+                float(parametros.get('umbral_a', UMBRALES_ABC[0])),
+                float(parametros.get('umbral_b', UMBRALES_ABC[1])),
+            )
+        except (TypeError, ValueError):
+            raise ValueError('Los umbrales deben ser números entre 0 y 1')
+        clasificacion = clasificacion_abc(cls._detalles(parametros), parametros.get('medida', 'subtotal'), umbrales)
+        productos = Producto.objects.filter(pk__in=clasificacion.index.tolist()).in_bulk()
+        return (
+            ['producto_id', 'codigo', 'producto', 'valor', 'participacion', 'acumulado', 'clase'],
+            [
+                [
+                    int(producto_id), productos[producto_id].codigo, productos[producto_id].nombre,
+                    cls._importe(valor), cls._fraccion(participacion), cls._fraccion(acumulado), clase,
+                ]
+                for producto_id, valor, participacion, acumulado, clase in clasificacion.itertuples()
+            ],
+        )
+
+    @classmethod
+    def _margen_categoria(cls, parametros):
+        margen = margen_por_categoria(cls._detalles(parametros))
+        nombres = cls._nombres('categoria', margen.index)
+        return (
+            ['categoria_id', 'categoria', 'cantidad', 'ventas', 'costo', 'margen', 'margen_porcentaje'],
+            [
+                [
+                    int(categoria_id), nombres[categoria_id],
+                    cls._importe(cantidad), cls._importe(ventas), cls._importe(costo), cls._importe(margen_total),
+                    cls._fraccion(porcentaje),
+                ]
+                for categoria_id, cantidad, ventas, costo, margen_total, porcentaje in margen.itertuples()
+            ],
+        )
+
+    @classmethod
+    def _detalles(cls, parametros):
+        estados = parametros.get('estados', ESTADOS_VENTA)
+        if isinstance(estados, str):
+            estados = [estado.strip() for estado in estados.split(',') if estado.strip()]
+        validos = {valor for valor, _ in Venta.ESTADO_CHOICES}
+        if not estados or not set(estados) <= validos:
+            raise ValueError(f"Estados no válidos: {estados}. Opciones: {', '.join(sorted(validos))}")
+        return cargar_detalles_venta(*cls._fechas(parametros), estados=tuple(estados))
+
+    @staticmethod
+    def _fechas(parametros):
+        """Lee fecha_inicio y fecha_fin (date o AAAA-MM-DD); cualquiera puede faltar."""
+        fechas = []
+        for clave in ('fecha_inicio', 'fecha_fin'):
+            valor = parametros.get(clave)
+            if valor and not isinstance(valor, date):
+                try:
+                    valor = parse_date(str(valor))
+                except ValueError:
+                    valor = None
+                if valor is None:
+                    raise ValueError(f'{clave} debe tener el formato AAAA-MM-DD')
+            fechas.append(valor or None)
+        return fechas
+
+    @classmethod
+    def _etiquetas(cls, dimension, valores):
+        """Texto de cada valor de una dimensión (fechas formateadas y nombres en lugar de claves)."""
+        if dimension in DIMENSIONES_FECHA:
+            return [pd.Timestamp(valor).strftime(FORMATOS_FECHA[dimension]) for valor in valores]
+        if dimension in DIMENSIONES_CLAVE:
+            nombres = cls._nombres(dimension, valores)
+            return [nombres.get(int(valor), str(valor)) for valor in valores]
+        return [str(valor) for valor in valores]
+
+    @staticmethod
+    def _nombres(dimension, claves):
+        """Nombre de cada clave de producto, categoría, cliente o venta (una consulta)."""
+        claves = [int(clave) for clave in claves]
+        if dimension == 'producto':
+            return {
+                pk: f'{codigo} - {nombre}'
+                for pk, codigo, nombre in Producto.objects.filter(pk__in=claves).values_list('id', 'codigo', 'nombre')
+            }
+        if dimension == 'categoria':
+            return dict(Categoria.objects.filter(pk__in=claves).values_list('id', 'nombre'))
+        if dimension == 'cliente':
+            clientes = Cliente.objects.only(
+                'tipo_cliente', 'nombre_comercial', 'nombres', 'apellidos'
+            ).in_bulk(claves)
+            return {pk: cliente.nombre_completo for pk, cliente in clientes.items()}
+        return dict(Venta.objects.filter(pk__in=claves).values_list('id', 'numero'))
+
+    @staticmethod
+    def _importe(centesimas):
+        """Centésimas (enteras o promedio) como Decimal con dos decimales."""
+        return Decimal(int(round(centesimas))).scaleb(-2)
+
+    @staticmethod
+    def _fraccion(valor):
+        return None if pd.isna(valor) else round(float(valor), DECIMALES_FRACCION)
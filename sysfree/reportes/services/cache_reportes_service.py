@@ -0,0 +1,220 @@
+"""
+Caché de resultados de reportes personalizados.
+
+Un reporte se identifica por una huella de su consulta (con los parámetros ya
+enlazados), los valores de los parámetros que usa, el formato y la versión de
+los datos: la generación de cada tabla que la consulta menciona
+(``CacheService.versiones_tablas``). Toda escritura en los modelos de
+``ModeloBase`` (``save``, ``delete``, ``update``, ``bulk_create`` y
+``bulk_update``) incrementa la generación de su tabla al confirmarse la
+transacción, así que un resultado calculado antes de que el cambio fuera
+visible queda con una clave que ya no se consulta. La versión se lee en Redis
+sin recorrer las tablas.
+
+Las consultas que mencionan tablas fuera de ``ModeloBase`` (o ninguna tabla
+del proyecto) no se guardan en caché.
+"""
+import hashlib
+import json
+import logging
+import re
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ModeloBase
+from core.services.cache_service import CacheService
+from sysfree.monitoring import REPORT_CACHE_EVICTIONS, REPORT_CACHE_REQUESTS, REPORT_CACHE_SIZE
+from ..models import CacheReporte
+
+logger = logging.getLogger('sysfree')
+
+_IDENTIFICADOR = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+# Extensión de archivo por formato de reporte
+EXTENSIONES = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv', 'html': 'html', 'parquet': 'parquet'}
+
+
+class CacheReportesService:
+    """Servicio para guardar y reutilizar los resultados de los reportes."""
+
+    _tablas = None
+
+    @classmethod
+    def calcular_clave(cls, reporte, parametros):
+        """
+        Calcula la clave de caché de una ejecución.
+
+        Args:
+            reporte (Reporte): Reporte a ejecutar
+            parametros (dict): Parámetros de la ejecución
+
+        Returns:
+            str: Clave (SHA-256 en hexadecimal), o None si el resultado no se
+                puede guardar en caché
+        """
+        from .reporte_service import ReporteService
+
+        if reporte.tipo == 'analitico':
+            # Sin consulta de la que obtener la versión de los datos
+            return None
+        try:
+            consulta, valores = ReporteService._preparar_consulta(reporte.consulta_sql, parametros)
+        except ValueError:
+            # La ejecución fallará y registrará el error
+            return None
+        version = cls.version_datos(consulta)
+        if version is None:
+            return None
+
+        huella = {'consulta': consulta.strip(), 'parametros': valores, 'formato': reporte.formato, 'version': version}
+        if reporte.formato not in ReporteService.FORMATOS_POR_LOTES:
+            # Las plantillas reciben el reporte y todos los parámetros
+            huella.update(
+                parametros=parametros, plantilla=reporte.plantilla,
+                nombre=reporte.nombre, descripcion=reporte.descripcion
+            )
+        contenido = json.dumps(huella, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def version_datos(cls, consulta_sql):
+        """
+        Versión de los datos que lee una consulta: {tabla: generación}.
+
+        Args:
+            consulta_sql (str): Consulta SQL
+
+        Returns:
+            dict: Versión por tabla, o None si alguna tabla mencionada no está
+                versionada, no se menciona ninguna o Redis no responde
+        """
+        tablas = cls._tablas_por_nombre()
+        mencionadas = sorted({palabra.lower() for palabra in _IDENTIFICADOR.findall(consulta_sql)} & tablas.keys())
+        if not mencionadas or not all(tablas[tabla] for tabla in mencionadas):
+            return None
+        try:
+            return CacheService.versiones_tablas(mencionadas)
+        except Exception as e:
+            logger.warning(f"No se pudo obtener la versión de datos de {mencionadas}: {str(e)}")
+            return None
+
+    @classmethod
+    def obtener(cls, clave):
+        """
+        Busca un resultado vigente y registra el acceso.
+
+        Args:
+            clave (str): Clave calculada con ``calcular_clave``; None = no cacheable
+
+        Returns:
+            CacheReporte: Entrada encontrada, o None
+        """
+        if clave is None:
+            REPORT_CACHE_REQUESTS.labels(result='bypass').inc()
+            return None
+
+        ahora = timezone.now()
+        entrada = CacheReporte.objects.filter(
+            clave=clave, fecha_creacion__gte=ahora - timedelta(seconds=settings.REPORTES_CACHE_TTL)
+        ).first()
+        if entrada is None or not entrada.archivo.storage.exists(entrada.archivo.name):
+            REPORT_CACHE_REQUESTS.labels(result='miss').inc()
+            return None
+
+        CacheReporte.objects.filter(pk=entrada.pk).update(ultimo_acceso=ahora, aciertos=F('aciertos') + 1)
+        REPORT_CACHE_REQUESTS.labels(result='hit').inc()
+        return entrada
+
+    @classmethod
+    def guardar(cls, clave, formato, archivo):
+        """
+        Guarda una copia del resultado y desaloja entradas si se supera el tamaño máximo.
+
+        Args:
+            clave (str): Clave calculada con ``calcular_clave``
+            formato (str): Formato del reporte
+            archivo: Archivo binario con el resultado, posicionado al inicio
+
+        Returns:
+            CacheReporte: Entrada creada, o None si no se guardó (resultado
+                mayor que la caché o clave ya guardada por otro proceso)
+        """
+        archivo.seek(0, 2)
+        tamano = archivo.tell()
+        archivo.seek(0)
+        if tamano > settings.REPORTES_CACHE_MAX_BYTES:
+            return None
+
+        entrada = CacheReporte(clave=clave, formato=formato, tamano=tamano, ultimo_acceso=timezone.now())
+        entrada.archivo.save(f"{clave}.{EXTENSIONES.get(formato, formato)}", File(archivo), save=False)
+        try:
+            with transaction.atomic():
+                entrada.save()
+        except IntegrityError:
+            entrada.archivo.delete(save=False)
+            return None
+
+        cls.liberar_espacio()
+        return entrada
+
+    @classmethod
+    def liberar_espacio(cls):
+        """
+        Elimina las entradas vencidas y, en orden de último acceso, las
+        necesarias para que el tamaño total no supere ``REPORTES_CACHE_MAX_BYTES``.
+
+        Las entradas bloqueadas por otro proceso se omiten; sus archivos se
+        eliminan después del commit.
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        limite = settings.REPORTES_CACHE_MAX_BYTES
+        vigencia = timezone.now() - timedelta(seconds=settings.REPORTES_CACHE_TTL)
+        with transaction.atomic():
+            entradas = list(
+                CacheReporte.objects.select_for_update(skip_locked=True)
+                .order_by('ultimo_acceso', 'pk')
+                .values_list('pk', 'tamano', 'archivo', 'fecha_creacion')
+            )
+            total = sum(tamano for _, tamano, _, _ in entradas)
+            eliminadas, archivos = [], []
+            for pk, tamano, nombre, fecha_creacion in entradas:
+                if total <= limite and fecha_creacion >= vigencia:
+                    continue
+                eliminadas.append(pk)
+                archivos.append(nombre)
+                total -= tamano
+            if eliminadas:
+                CacheReporte.objects.filter(pk__in=eliminadas).delete()
+                transaction.on_commit(lambda: cls._eliminar_archivos(archivos))
+        REPORT_CACHE_SIZE.set(total)
+        if eliminadas:
+            REPORT_CACHE_EVICTIONS.inc(len(eliminadas))
+            logger.info(f"Caché de reportes: {len(eliminadas)} entradas desalojadas, {total} bytes en uso")
+        return len(eliminadas)
+
+    @staticmethod
+    def _eliminar_archivos(nombres):
+        storage = CacheReporte._meta.get_field('archivo').storage
+        for nombre in nombres:
+            try:
+                storage.delete(nombre)
+            except Exception as e:
+                logger.error(f"No se pudo eliminar el archivo de caché {nombre}: {str(e)}")
+
+    @classmethod
+    def _tablas_por_nombre(cls):
+        """{tabla: True si sus escrituras incrementan su versión} de los modelos del proyecto."""
+        if cls._tablas is None:
+            cls._tablas = {
+                modelo._meta.db_table.lower(): issubclass(modelo, ModeloBase)
+                for modelo in apps.get_models(include_auto_created=True)
+            }
+        return cls._tablas
@@ -0,0 +1,424 @@
+"""
+Acumulados de ventas para reportes (``VentaDiaria`` y ``VentaMensual``).
+
+Los acumulados se actualizan de forma incremental: cada venta creada o
+modificada se procesa después del commit (``actualizar``), que calcula su
+aporte actual, lo compara con el último aporte aplicado (``AporteVenta``) y
+suma la diferencia con un ``INSERT ... ON CONFLICT DO UPDATE``. Reprocesar una
+venta no duplica importes y el orden de los eventos no importa. Para cargas
+iniciales o correcciones, ``reconstruir`` recalcula meses completos.
+
+Los reportes leen rangos arbitrarios de fechas combinando los meses completos
+de ``VentaMensual`` con los días sueltos de los extremos en ``VentaDiaria``.
+"""
+import logging
+import threading
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from inventario.models import Producto
+from ventas.models import Venta, DetalleVenta
+from ..models import VentaDiaria, VentaMensual, AporteVenta
+
+logger = logging.getLogger('sysfree')
+
+MEDIDAS = ('num_ventas', 'cantidad', 'subtotal', 'descuento', 'total')
+DIMENSIONES = ('tipo', 'estado', 'producto_id', 'categoria_id')
+
+# Clave del bloqueo consultivo que comparten actualizar (compartido) y reconstruir (exclusivo)
+BLOQUEO_HECHOS_VENTAS = zlib.crc32(b'reportes.hechos_ventas')
+
+
+def _inicio_mes_siguiente(fecha):
+    return (fecha.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+class HechosVentasService:
+    """Servicio de mantenimiento y consulta de los acumulados de ventas."""
+
+    # Ventas por encolar de la transacción abierta del hilo (la conexión es por hilo)
+    _local = threading.local()
+
+    @classmethod
+    def programar(cls, venta_id):
+        """
+        Procesa la venta al confirmar la transacción actual (o de inmediato fuera de ella).
+
+        Las ventas de una transacción se encolan juntas en una sola tarea: el
+        primer on_commit envía todas las pendientes y los siguientes no
+        encuentran ninguna. Las que queden de una transacción revertida se
+        envían con la siguiente; reprocesar una venta no altera los acumulados.
+        """
+        if venta_id:
+            cls._pendientes().add(venta_id)
+            transaction.on_commit(cls._encolar_pendientes)
+
+    @classmethod
+    def _pendientes(cls):
+        if not hasattr(cls._local, 'pendientes'):
+            cls._local.pendientes = set()
+        return cls._local.pendientes
+
+    @classmethod
+    def _encolar_pendientes(cls):
+        pendientes = cls._pendientes()
+        if pendientes:
+            venta_ids = sorted(pendientes)
+            pendientes.clear()
+            cls.encolar(venta_ids)
+
+    @classmethod
+    def encolar(cls, venta_ids):
+        """Envía las ventas a la tarea de Celery; si no se puede encolar las procesa en el proceso."""
+        from reportes.tasks import actualizar_hechos_ventas_task
+        try:
+            actualizar_hechos_ventas_task.delay(list(venta_ids))
+        except Exception as e:
+            logger.error(f"No se pudieron encolar los acumulados de las ventas {venta_ids}, se aplican directamente: {str(e)}")
+            cls.actualizar(venta_ids)
+
+    @classmethod
+    def calcular_aportes(cls, venta_ids):
+        """
+        Calcula el aporte actual de cada venta a los acumulados.
+
+        Args:
+            venta_ids (iterable): IDs de las ventas
+
+        Returns:
+            dict: {venta_id: (fecha, {(tipo, estado, producto_id, categoria_id): medidas})}
+                de las ventas que existen; medidas sigue el orden de ``MEDIDAS``
+        """
+        resultado = {}
+        ventas = Venta.objects.filter(pk__in=venta_ids).values_list(
+            'id', 'fecha', 'tipo', 'estado', 'subtotal', 'descuento', 'total'
+        )
+        for venta_id, fecha, tipo, estado, subtotal, descuento, total in ventas:
+            resultado[venta_id] = (timezone.localdate(fecha), tipo, estado, {
+                (tipo, estado, None, None): (1, Decimal('0.00'), subtotal, descuento, total),
+            })
+
+        detalles = DetalleVenta.objects.filter(venta_id__in=resultado).values_list(
+            'venta_id', 'producto_id', 'producto__categoria_id', 'cantidad', 'subtotal', 'descuento', 'total'
+        )
+        for venta_id, producto_id, categoria_id, cantidad, subtotal, descuento, total in detalles:
+            _, tipo, estado, aportes = resultado[venta_id]
+            cls._sumar(aportes, (tipo, estado, producto_id, categoria_id), (0, cantidad, subtotal, descuento, total))
+
+        return {venta_id: (fecha, aportes) for venta_id, (fecha, _, _, aportes) in resultado.items()}
+
+    @classmethod
+    def actualizar(cls, venta_ids):
+        """
+        Aplica a los acumulados la diferencia entre el aporte actual de cada
+        venta y el último aplicado. Las ventas eliminadas restan su aporte.
+
+        Args:
+            venta_ids (iterable): IDs de las ventas creadas, modificadas o eliminadas
+        """
+        venta_ids = sorted(set(venta_ids))
+        if not venta_ids:
+            return
+
+        with transaction.atomic():
+            cls._bloquear(exclusivo=False)
+            AporteVenta.objects.bulk_create(
+                [AporteVenta(venta_id=venta_id) for venta_id in venta_ids], ignore_conflicts=True
+            )
+            # Bloquear los aportes serializa el procesamiento concurrente de una misma venta
+            previos = {
+                aporte.venta_id: aporte
+                for aporte in AporteVenta.objects.select_for_update().filter(
+                    venta_id__in=venta_ids
+                ).order_by('venta_id')
+            }
+            actuales = cls.calcular_aportes(venta_ids)
+
+            diarios, mensuales = {}, {}
+            for venta_id, aporte in previos.items():
+                if aporte.fecha:
+                    cls._acumular(diarios, mensuales, aporte.fecha, cls._leer(aporte.aportes), -1)
+                fecha, aportes = actuales.get(venta_id, (None, {}))
+                if fecha:
+                    cls._acumular(diarios, mensuales, fecha, aportes, 1)
+                aporte.fecha = fecha
+                aporte.aportes = cls._escribir(aportes)
+
+            cls._aplicar(VentaDiaria, 'fecha', diarios)
+            cls._aplicar(VentaMensual, 'mes', mensuales)
+
+            AporteVenta.objects.filter(venta_id__in=[v for v in venta_ids if v not in actuales]).delete()
+            AporteVenta.objects.bulk_update([previos[v] for v in actuales], ['fecha', 'aportes'])
+
+        logger.debug(f"Acumulados de ventas actualizados para {len(venta_ids)} ventas")
+
+    @classmethod
+    def reconstruir(cls, desde=None, hasta=None, tamano_lote=2000):
+        """
+        Recalcula los acumulados de los meses completos que abarcan [desde, hasta].
+
+        Bloquea las actualizaciones incrementales mientras dura. Los acumulados
+        y los aportes se derivan del mismo cálculo, por lo que los cambios que
+        lleguen después se aplican sobre una base coherente.
+
+        Args:
+            desde (date): Fecha inicial (se amplía al primer día de su mes); None = sin límite
+            hasta (date): Fecha final (se amplía al último día de su mes); None = sin límite
+            tamano_lote (int): Ventas procesadas por lote
+
+        Returns:
+            dict: Ventas procesadas y filas diarias y mensuales escritas
+        """
+        if desde:
+            desde = desde.replace(day=1)
+        if hasta:
+            hasta = _inicio_mes_siguiente(hasta) - timedelta(days=1)
+
+        with transaction.atomic():
+            cls._bloquear(exclusivo=True)
+            ventas = Venta.objects.all()
+            diarias = VentaDiaria.objects.all()
+            mensuales_qs = VentaMensual.objects.all()
+            aportes_qs = AporteVenta.objects.all()
+            if desde:
+                ventas = ventas.filter(fecha__date__gte=desde)
+                diarias = diarias.filter(fecha__gte=desde)
+                mensuales_qs = mensuales_qs.filter(mes__gte=desde)
+                aportes_qs = aportes_qs.filter(fecha__gte=desde)
+            if hasta:
+                ventas = ventas.filter(fecha__date__lte=hasta)
+                diarias = diarias.filter(fecha__lte=hasta)
+                mensuales_qs = mensuales_qs.filter(mes__lte=hasta)
+                aportes_qs = aportes_qs.filter(fecha__lte=hasta)
+            diarias.delete()
+            mensuales_qs.delete()
+            aportes_qs.delete()
+
+            diarios, mensuales = {}, {}
+            procesadas = 0
+            ids = ventas.order_by('pk').values_list('pk', flat=True)
+            lote = []
+            for venta_id in ids.iterator(chunk_size=tamano_lote):
+                lote.append(venta_id)
+                if len(lote) >= tamano_lote:
+                    procesadas += cls._reconstruir_lote(lote, diarios, mensuales)
+                    lote = []
+            if lote:
+                procesadas += cls._reconstruir_lote(lote, diarios, mensuales)
+
+            VentaDiaria.objects.bulk_create(cls._filas(VentaDiaria, 'fecha', diarios), batch_size=1000)
+            VentaMensual.objects.bulk_create(cls._filas(VentaMensual, 'mes', mensuales), batch_size=1000)
+
+        logger.info(
+            f"Acumulados de ventas reconstruidos ({desde or 'inicio'} a {hasta or 'fin'}): "
+            f"{procesadas} ventas, {len(diarios)} filas diarias, {len(mensuales)} mensuales"
+        )
+        return {'ventas': procesadas, 'diarias': len(diarios), 'mensuales': len(mensuales)}
+
+    @classmethod
+    def _reconstruir_lote(cls, venta_ids, diarios, mensuales):
+        actuales = cls.calcular_aportes(venta_ids)
+        for fecha, aportes in actuales.values():
+            cls._acumular(diarios, mensuales, fecha, aportes, 1)
+        AporteVenta.objects.bulk_create([
+            AporteVenta(venta_id=venta_id, fecha=fecha, aportes=cls._escribir(aportes))
+            for venta_id, (fecha, aportes) in actuales.items()
+        ], batch_size=1000)
+        return len(actuales)
+
+    @classmethod
+    def resumen(cls, desde, hasta, agrupar='dia', estados=None, tipos=None):
+        """
+        Totales de las ventas por día o por mes entre dos fechas (inclusive).
+
+        Args:
+            desde (date): Fecha inicial
+            hasta (date): Fecha final
+            agrupar (str): 'dia' o 'mes'
+            estados (list): Estados de venta a incluir (None = todos)
+            tipos (list): Tipos de documento a incluir (None = todos)
+
+        Returns:
+            list: Diccionarios con periodo, num_ventas, subtotal, descuento y total,
+                ordenados por periodo
+        """
+        filtros = {'producto__isnull': True}
+        if estados is not None:
+            filtros['estado__in'] = estados
+        if tipos is not None:
+            filtros['tipo__in'] = tipos
+
+        if agrupar == 'dia':
+            fuentes = [(VentaDiaria.objects.filter(fecha__range=(desde, hasta)), F('fecha'))]
+        else:
+            fuentes = [
+                (queryset, F('mes') if queryset.model is VentaMensual else TruncMonth('fecha'))
+                for queryset in cls._fuentes(desde, hasta)
+            ]
+
+        periodos = {}
+        for queryset, periodo in fuentes:
+            filas = queryset.filter(**filtros).values(periodo=periodo).annotate(
+                **{medida: Sum(medida) for medida in MEDIDAS if medida != 'cantidad'}
+            )
+            for fila in filas:
+                actual = periodos.setdefault(fila['periodo'], {
+                    'periodo': fila['periodo'], 'num_ventas': 0,
+                    'subtotal': Decimal('0.00'), 'descuento': Decimal('0.00'), 'total': Decimal('0.00'),
+                })
+                for medida in ('num_ventas', 'subtotal', 'descuento', 'total'):
+                    actual[medida] += fila[medida]
+        return [periodos[periodo] for periodo in sorted(periodos) if periodos[periodo]['num_ventas']]
+
+    @classmethod
+    def productos_mas_vendidos(cls, desde=None, hasta=None, estados=None, limite=10):
+        """
+        Productos con mayor cantidad vendida entre dos fechas (inclusive).
+
+        Args:
+            desde (date): Fecha inicial (None = sin límite)
+            hasta (date): Fecha final (None = sin límite)
+            estados (list): Estados de venta a incluir (None = todos)
+            limite (int): Número máximo de productos
+
+        Returns:
+            list: Diccionarios con producto, cantidad y total, de mayor a menor cantidad
+        """
+        filtros = {'producto__isnull': False}
+        if estados is not None:
+            filtros['estado__in'] = estados
+
+        # Las fuentes se unen y agregan en una sola consulta: el orden y el
+        # límite se resuelven en SQL y solo viajan los N primeros productos
+        partes, parametros = [], []
+        for queryset in cls._fuentes(desde, hasta):
+            sql, params = queryset.filter(**filtros).values_list(
+                'producto_id', 'cantidad', 'total'
+            ).order_by().query.sql_with_params()
+            partes.append(sql)
+            parametros.extend(params)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT producto_id, SUM(cantidad), SUM(total) FROM ({' UNION ALL '.join(partes)}) fuentes "
+                f"GROUP BY producto_id HAVING SUM(cantidad) <> 0 ORDER BY 2 DESC, 1 LIMIT %s",
+                parametros + [limite]
+            )
+            mas_vendidos = cursor.fetchall()
+        productos = Producto.objects.in_bulk([producto_id for producto_id, _, _ in mas_vendidos])
+        return [
+            {'producto': productos[producto_id], 'cantidad': cantidad, 'total': total}
+            for producto_id, cantidad, total in mas_vendidos
+            if producto_id in productos
+        ]
+
+    @classmethod
+    def _fuentes(cls, desde=None, hasta=None):
+        """
+        Consultas que cubren [desde, hasta]: los meses completos en
+        ``VentaMensual`` y los días de los meses incompletos en ``VentaDiaria``.
+        """
+        primer_mes = None if desde is None else (desde if desde.day == 1 else _inicio_mes_siguiente(desde))
+        fin_meses = None
+        if hasta is not None:
+            siguiente = hasta + timedelta(days=1)
+            fin_meses = siguiente if siguiente.day == 1 else hasta.replace(day=1)
+
+        if primer_mes and fin_meses and primer_mes >= fin_meses:
+            return [VentaDiaria.objects.filter(fecha__range=(desde, hasta))]
+
+        mensual = VentaMensual.objects.all()
+        fuentes = []
+        if primer_mes:
+            mensual = mensual.filter(mes__gte=primer_mes)
+            if desde < primer_mes:
+                fuentes.append(VentaDiaria.objects.filter(fecha__gte=desde, fecha__lt=primer_mes))
+        if fin_meses:
+            mensual = mensual.filter(mes__lt=fin_meses)
+            if fin_meses <= hasta:
+                fuentes.append(VentaDiaria.objects.filter(fecha__gte=fin_meses, fecha__lte=hasta))
+        fuentes.append(mensual)
+        return fuentes
+
+    @staticmethod
+    def _bloquear(exclusivo):
+        funcion = 'pg_advisory_xact_lock' if exclusivo else 'pg_advisory_xact_lock_shared'
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {funcion}(%s)', [BLOQUEO_HECHOS_VENTAS])
+
+    @staticmethod
+    def _sumar(destino, clave, medidas, signo=1):
+        actual = destino.get(clave)
+        if actual is None:
+            destino[clave] = tuple(signo * valor for valor in medidas)
+        else:
+            destino[clave] = tuple(a + signo * valor for a, valor in zip(actual, medidas))
+
+    @classmethod
+    def _acumular(cls, diarios, mensuales, fecha, aportes, signo):
+        mes = fecha.replace(day=1)
+        for clave, medidas in aportes.items():
+            cls._sumar(diarios, (fecha, *clave), medidas, signo)
+            cls._sumar(mensuales, (mes, *clave), medidas, signo)
+
+    @staticmethod
+    def _escribir(aportes):
+        """Serializa los aportes para ``AporteVenta.aportes`` (importes como texto)."""
+        return [
+            [*clave, medidas[0], *(str(valor) for valor in medidas[1:])]
+            for clave, medidas in aportes.items()
+        ]
+
+    @staticmethod
+    def _leer(aportes):
+        return {
+            tuple(fila[:4]): (int(fila[4]), *(Decimal(valor) for valor in fila[5:]))
+            for fila in aportes
+        }
+
+    @staticmethod
+    def _filas(modelo, campo, acumulados):
+        return [
+            modelo(**{campo: clave[0]}, **dict(zip(DIMENSIONES, clave[1:])), **dict(zip(MEDIDAS, medidas)))
+            for clave, medidas in acumulados.items()
+            if any(medidas)
+        ]
+
+    @staticmethod
+    def _aplicar(modelo, campo, deltas):
+        """Suma los deltas con INSERT ... ON CONFLICT y elimina las filas que quedan en cero."""
+        filas = sorted(
+            ((clave, medidas) for clave, medidas in deltas.items() if any(medidas)),
+            key=lambda fila: tuple('' if valor is None else str(valor) for valor in fila[0])
+        )
+        if not filas:
+            return
+
+        qn = connection.ops.quote_name
+        tabla = qn(modelo._meta.db_table)
+        columnas = [campo, *DIMENSIONES, *MEDIDAS]
+        # Mismas expresiones que el índice de ``unicidad_hechos``
+        conflicto = ', '.join(
+            [qn(c) for c in (campo, 'tipo', 'estado')]
+            + [f'COALESCE({qn(c)}, 0)' for c in ('producto_id', 'categoria_id')]
+        )
+        asignaciones = ', '.join(f'{qn(m)} = {tabla}.{qn(m)} + EXCLUDED.{qn(m)}' for m in MEDIDAS)
+        vacias = []
+        with connection.cursor() as cursor:
+            for inicio in range(0, len(filas), 500):
+                lote = filas[inicio:inicio + 500]
+                marcadores = ', '.join(['(' + ', '.join(['%s'] * len(columnas)) + ')'] * len(lote))
+                cursor.execute(
+                    f'INSERT INTO {tabla} ({", ".join(qn(c) for c in columnas)}) VALUES {marcadores} '
+                    f'ON CONFLICT ({conflicto}) DO UPDATE SET {asignaciones} '
+                    f'RETURNING id, {", ".join(qn(m) for m in MEDIDAS)}',
+                    [valor for clave, medidas in lote for valor in (*clave, *medidas)],
+                )
+                vacias.extend(fila[0] for fila in cursor.fetchall() if not any(fila[1:]))
+        if vacias:
+            modelo.objects.filter(pk__in=vacias).delete()
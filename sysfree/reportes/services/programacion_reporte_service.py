@@ -0,0 +1,249 @@
+"""
+Despacho de los reportes programados (``ProgramacionReporte``).
+
+Cada minuto, ``despachar_programaciones_task`` toma las programaciones
+activas con ``proxima_ejecucion`` vencida (índice ``activo, proxima_ejecucion``)
+en lotes bloqueados con ``FOR UPDATE SKIP LOCKED`` y, en la misma transacción,
+registra sus ejecuciones en cola y avanza ``proxima_ejecucion``. Otro nodo
+que despache a la vez salta las filas bloqueadas y, tras el commit, ya no las
+ve vencidas: cada vencimiento se ejecuta una sola vez.
+
+Las ejecuciones de un lote se reparten entre los workers de la cola
+``reportes`` como un chord de Celery; al terminar todas, una tarea envía los
+resultados a los destinatarios por una única conexión SMTP. Si el chord no
+llega a ejecutarse (p. ej. el worker de una de las ejecuciones murió sin
+terminarla), el despacho envía después los resultados rezagados.
+
+Una programación cuya próxima ejecución no se puede calcular se desactiva.
+"""
+import logging
+import os
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import HistorialReporte, ProgramacionReporte
+from .reporte_service import MARGEN_LIMITE_DURO, ReporteService
+
+logger = logging.getLogger('sysfree')
+
+
+class ProgramacionReporteService:
+    """Servicio para despachar reportes programados y enviar sus resultados."""
+
+    # Programaciones tomadas por transacción (y ejecuciones por chord)
+    TAMANO_LOTE = 100
+    # Antigüedad máxima de los resultados que se envían fuera de su chord
+    VENTANA_REZAGADOS = timedelta(days=1)
+
+    @classmethod
+    def despachar_vencidas(cls):
+        """
+        Encola las programaciones vencidas, lote a lote.
+
+        Returns:
+            int: Programaciones despachadas por este proceso
+        """
+        try:
+            cls.enviar_rezagados()
+        except Exception as e:
+            logger.error(f"No se pudieron enviar los reportes programados rezagados: {str(e)}")
+        cls._programar_sin_fecha()
+        total = 0
+        while True:
+            despachadas = cls._despachar_lote()
+            total += despachadas
+            if despachadas < cls.TAMANO_LOTE:
+                break
+        if total:
+            logger.info(f"Reportes programados despachados: {total}")
+        return total
+
+    @classmethod
+    def reprogramar(cls, programacion):
+        """
+        Calcula y guarda la próxima ejecución de una programación (None si está
+        inactiva o se desactivó por no poder calcularla).
+
+        Args:
+            programacion (ProgramacionReporte): Programación creada o modificada
+        """
+        programacion.proxima_ejecucion = cls._siguiente_ejecucion(programacion) if programacion.activo else None
+        programacion.save(update_fields=['proxima_ejecucion', 'activo'])
+
+    @classmethod
+    def enviar_rezagados(cls):
+        """
+        Envía los resultados exitosos que su chord no envió: el chord no se
+        ejecuta si una de las ejecuciones del lote no termina (worker muerto)
+        y el envío puede agotar sus reintentos.
+
+        Se toman los del despacho (``enviar_por_correo``; las ejecuciones
+        manuales de una programación no se envían) terminados hace más que el
+        límite duro de una ejecución (el chord ya debió enviarlos) y creados
+        dentro de ``VENTANA_REZAGADOS``.
+        ``enviar_resultados`` marca cada historial antes de enviarlo, así que
+        un chord que termine después no los repite.
+
+        Returns:
+            int: Correos enviados
+        """
+        ahora = timezone.now()
+        limite = ahora - timedelta(seconds=settings.REPORTES_TIEMPO_MAXIMO + MARGEN_LIMITE_DURO)
+        rezagados = list(
+            HistorialReporte.objects.filter(
+                estado='exito', enviar_por_correo=True, fecha_envio__isnull=True,
+                fecha_ejecucion__gte=ahora - cls.VENTANA_REZAGADOS, fecha_modificacion__lte=limite,
+            ).values_list('pk', flat=True)
+        )
+        if not rezagados:
+            return 0
+        logger.warning(f"Reportes programados sin enviar por su lote, se envían ahora: {rezagados}")
+        return cls.enviar_resultados(rezagados)
+
+    @classmethod
+    def _programar_sin_fecha(cls):
+        """Asigna la próxima ejecución a las programaciones activas que no la tienen (p. ej. creadas en el admin)."""
+        with transaction.atomic():
+            programaciones = list(
+                ProgramacionReporte.objects.select_for_update(skip_locked=True)
+                .filter(activo=True, proxima_ejecucion__isnull=True)
+            )
+            for programacion in programaciones:
+                programacion.proxima_ejecucion = cls._siguiente_ejecucion(programacion)
+            ProgramacionReporte.objects.bulk_update(programaciones, ['proxima_ejecucion', 'activo'])
+
+    @classmethod
+    def _despachar_lote(cls):
+        """Toma un lote de programaciones vencidas, registra sus ejecuciones y las envía a Celery al confirmar."""
+        with transaction.atomic():
+            programaciones = list(
+                ProgramacionReporte.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('reporte', 'creado_por')
+                .filter(activo=True, proxima_ejecucion__lte=timezone.now())
+                .order_by('proxima_ejecucion')[:cls.TAMANO_LOTE]
+            )
+            historiales = []
+            for programacion in programaciones:
+                if programacion.reporte.activo:
+                    historiales.append(ReporteService.registrar_en_cola(
+                        programacion.reporte, programacion.parametros, programacion, programacion.creado_por,
+                        enviar_por_correo=True
+                    ))
+                programacion.proxima_ejecucion = cls._siguiente_ejecucion(programacion)
+            ProgramacionReporte.objects.bulk_update(programaciones, ['proxima_ejecucion', 'activo'])
+            if historiales:
+                transaction.on_commit(partial(
+                    cls._enviar_lote, [(historial.pk, historial.tarea_id) for historial in historiales]
+                ))
+        return len(programaciones)
+
+    @classmethod
+    def _siguiente_ejecucion(cls, programacion):
+        """
+        Próxima ejecución futura. Si no se puede calcular (programación
+        incompleta) desactiva la programación (sin guardarla) y devuelve None;
+        de lo contrario se volvería a calcular, con el mismo error, en cada despacho.
+        """
+        try:
+            siguiente = ReporteService._calcular_proxima_ejecucion(programacion)
+            error = None
+        except Exception as e:
+            siguiente, error = None, str(e)
+        # Nunca se devuelve una fecha vencida: el lote se volvería a tomar
+        if error is not None or siguiente is None or siguiente <= timezone.now():
+            logger.error(
+                f"Próxima ejecución no válida para la programación {programacion.pk} "
+                f"({error or siguiente}); se desactiva"
+            )
+            programacion.activo = False
+            return None
+        return siguiente
+
+    @classmethod
+    def _enviar_lote(cls, tareas):
+        """
+        Envía las ejecuciones del lote como un chord: se reparten entre los
+        workers y, al terminar todas, se envían los correos. Si no se puede
+        encolar, las ejecuta y envía en el proceso.
+        """
+        from celery import chord
+        from reportes.tasks import enviar_reportes_programados_task
+
+        historial_ids = [historial_id for historial_id, _ in tareas]
+        try:
+            chord([ReporteService.firma_tarea(historial_id, tarea_id) for historial_id, tarea_id in tareas])(
+                enviar_reportes_programados_task.si(historial_ids)
+            )
+        except Exception as e:
+            logger.error(f"No se pudieron encolar los reportes programados {historial_ids}, se ejecutan directamente: {str(e)}")
+            for historial_id in historial_ids:
+                ReporteService.procesar_historial(historial_id, limitar=False)
+            cls.enviar_resultados(historial_ids)
+
+    @classmethod
+    def enviar_resultados(cls, historial_ids):
+        """
+        Envía por correo a los destinatarios de cada programación los
+        resultados exitosos del lote, por una única conexión SMTP.
+
+        Cada historial se marca (``fecha_envio``) antes de enviarlo, de modo
+        que una tarea repetida o concurrente no lo envía dos veces; si el envío
+        falla, se desmarca y el error se propaga para reintentar.
+
+        Args:
+            historial_ids (list): IDs de los historiales del lote
+
+        Returns:
+            int: Correos enviados
+        """
+        pendientes = list(
+            HistorialReporte.objects.select_related('reporte', 'programacion')
+            .filter(pk__in=historial_ids, estado='exito', programacion__isnull=False, fecha_envio__isnull=True)
+            .order_by('pk')
+        )
+        if not pendientes:
+            return 0
+
+        enviados = 0
+        with get_connection() as conexion:
+            for historial in pendientes:
+                destinatarios = [d.strip() for d in historial.programacion.destinatarios.split(',') if d.strip()]
+                if not destinatarios:
+                    continue
+                if not HistorialReporte.objects.filter(pk=historial.pk, fecha_envio__isnull=True).update(
+                    fecha_envio=timezone.now()
+                ):
+                    continue
+                try:
+                    conexion.send_messages([cls._mensaje(historial, destinatarios)])
+                except Exception:
+                    HistorialReporte.objects.filter(pk=historial.pk).update(fecha_envio=None)
+                    raise
+                enviados += 1
+        return enviados
+
+    @classmethod
+    def _mensaje(cls, historial, destinatarios):
+        """Correo de un resultado, con el archivo adjunto si no supera ``REPORTES_CORREO_MAX_ADJUNTO``."""
+        programacion = historial.programacion
+        mensaje = EmailMessage(
+            subject=programacion.asunto,
+            body=programacion.mensaje or f"Se adjunta el reporte {historial.reporte.nombre}.",
+            to=destinatarios,
+        )
+        if historial.archivo:
+            tamano = historial.archivo.size
+            if tamano <= settings.REPORTES_CORREO_MAX_ADJUNTO:
+                with historial.archivo.open('rb') as archivo:
+                    mensaje.attach(os.path.basename(historial.archivo.name), archivo.read())
+            else:
+                mensaje.body += (
+                    f"\n\nEl archivo ({tamano / 2 ** 20:.1f} MiB) supera el tamaño máximo de adjunto; "
+                    f"está disponible en el historial de reportes (ejecución {historial.pk})."
+                )
+        return mensaje
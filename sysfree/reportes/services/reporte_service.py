@@ -1,63 +1,155 @@
-import os
+import csv
+import io
+import json
+import logging
+import re
 import time
 import tempfile
+import uuid
+import zlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from django.db import connection
+from functools import partial
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
 from django.template.loader import render_to_string
-from django.core.files.base import ContentFile
+from django.core.files import File
 from ..models import Reporte, HistorialReporte
+from .analitica_service import AnaliticaService
+from .cache_reportes_service import CacheReportesService
 from core.services.auditoria_service import AuditoriaService
+from core.services.cache_service import CacheService
+from ..utils.pdf_tabular import escribir_pdf
+
+logger = logging.getLogger('sysfree')
+
+# Literales, comentarios, conversiones (::) y parámetros (:nombre) de una consulta SQL
+_TOKENS_CONSULTA = re.compile(r"""'(?:[^']|'')*'|"[^"]*"|--[^\n]*|/\*.*?\*/|::|:([A-Za-z_]\w*)""", re.S)
+
+# Filas por hoja de Excel (límite del formato), incluida la fila de encabezados
+EXCEL_MAX_FILAS = 1048576
+
+# Bloqueo consultivo que serializa el control de capacidad de las ejecuciones asíncronas
+BLOQUEO_EJECUCION_REPORTES = zlib.crc32(b'reportes.ejecucion')
+
+# Segundos entre el límite suave (REPORTES_TIEMPO_MAXIMO) y el límite duro de la tarea
+MARGEN_LIMITE_DURO = 60
+
+
+class ReporteCancelado(Exception):
+    """La ejecución de un reporte fue cancelada por el usuario."""
+
+    def __init__(self, mensaje='Ejecución cancelada por el usuario'):
+        super().__init__(mensaje)
+
+
+class CapacidadReportesAgotada(Exception):
+    """Se alcanzó el máximo de ejecuciones simultáneas (global o del usuario)."""
 
 
 class ReporteService:
-    """Servicio para gestionar operaciones de reportes."""
+    """
+    Servicio para gestionar operaciones de reportes.
+
+    Las consultas se ejecutan con un cursor del servidor y se leen por lotes
+    (``TAMANO_LOTE``); los formatos CSV y Excel se escriben fila a fila en un
+    archivo temporal, Parquet por grupos de filas con los tipos de las
+    columnas de la consulta y el PDF tabular (sin plantilla) página a página
+    con ReportLab, por lo que la memoria no depende del número de filas. HTML y
+    PDF con plantilla renderizan la plantilla con todas las filas (el PDF,
+    con WeasyPrint).
+
+    Las ejecuciones solicitadas desde la API se encolan (``encolar_reporte``)
+    y las procesa la tarea ``ejecutar_reporte_task`` en la cola ``reportes``,
+    con límites de ejecuciones simultáneas, progreso en la caché y cancelación.
+    """
+
+    TAMANO_LOTE = 2000
+    FORMATOS_POR_LOTES = ('csv', 'excel', 'parquet')
     
     @classmethod
-    def ejecutar_reporte(cls, reporte, parametros=None, programacion=None, usuario=None):
+    def ejecutar_reporte(cls, reporte, parametros=None, programacion=None, usuario=None, usar_cache=True,
+                         historial=None, progreso=None):
         """
-        Ejecuta un reporte y genera el archivo correspondiente.
+        Ejecuta un reporte en el proceso actual y genera el archivo correspondiente.
+        
+        Si hay en caché un resultado de la misma consulta, parámetros y
+        formato con los datos en su versión actual, se copia ese archivo en
+        lugar de ejecutar la consulta (``historial.desde_cache``). Cada
+        sentencia de la consulta está limitada por ``REPORTES_STATEMENT_TIMEOUT``.
         
         Args:
             reporte: Reporte a ejecutar
             parametros: Parámetros para el reporte
             programacion: Programación que ejecuta el reporte (si aplica)
             usuario: Usuario que ejecuta el reporte
+            usar_cache: Si es False, ejecuta la consulta aunque haya un resultado en caché
+            historial: Historial ya registrado (ejecución asíncrona); por defecto se crea uno
+            progreso: Función que recibe las filas leídas tras cada lote; puede
+                lanzar ``ReporteCancelado`` para detener la ejecución
             
         Returns:
             HistorialReporte: Historial de la ejecución del reporte
         """
         parametros = parametros or {}
         inicio = time.time()
-        historial = HistorialReporte(
-            reporte=reporte,
-            programacion=programacion,
-            parametros=parametros,
-            estado='exito'
-        )
+        if historial is None:
+            historial = HistorialReporte(
+                reporte=reporte,
+                programacion=programacion,
+                parametros=parametros,
+                estado='ejecutando',
+                fecha_inicio=timezone.now()
+            )
+            
+            if usuario:
+                historial.creado_por = usuario
+                historial.modificado_por = usuario
         
-        if usuario:
-            historial.creado_por = usuario
-            historial.modificado_por = usuario
+        # Las ejecuciones registradas se identifican en pg_stat_activity para poder cancelarlas
+        etiqueta = cls._etiqueta(historial.pk) if historial.pk else None
         
         try:
-            # Ejecutar la consulta SQL
-            datos = cls._ejecutar_consulta(reporte.consulta_sql, parametros)
-            
-            # Generar el archivo según el formato
-            archivo = cls._generar_archivo(reporte, datos, parametros)
-            
-            # Guardar el archivo en el historial
             nombre_archivo = f"{reporte.nombre.lower().replace(' ', '_')}_{timezone.now().strftime('%Y%m%d%H%M%S')}"
-            historial.archivo.save(f"{nombre_archivo}.{reporte.formato}", ContentFile(archivo))
+            clave = CacheReportesService.calcular_clave(reporte, parametros) if usar_cache else None
+            en_cache = CacheReportesService.obtener(clave) if usar_cache else None
             
-            # Calcular la duración
-            historial.duracion = int(time.time() - inicio)
+            if en_cache:
+                historial.desde_cache = True
+                with en_cache.archivo.open('rb') as archivo:
+                    historial.archivo.save(f"{nombre_archivo}.{reporte.formato}", File(archivo))
+            else:
+                # Ejecutar la consulta y escribir el archivo en disco, sin retenerlo en memoria
+                with tempfile.TemporaryFile() as destino:
+                    historial.filas = cls._escribir_archivo(
+                        reporte, parametros, destino, progreso=progreso, etiqueta=etiqueta
+                    )
+                    destino.seek(0)
+                    
+                    # Guardar el archivo en el historial
+                    historial.archivo.save(f"{nombre_archivo}.{reporte.formato}", File(destino))
+                    
+                    if clave:
+                        destino.seek(0)
+                        CacheReportesService.guardar(clave, reporte.formato, destino)
             
-        except Exception as e:
-            historial.estado = 'error'
+            historial.estado = 'exito'
+            
+        except ReporteCancelado as e:
+            historial.estado = 'cancelado'
             historial.mensaje_error = str(e)
+        except Exception as e:
+            if historial.pk and cls._cancelacion_solicitada(historial.pk):
+                # pg_cancel_backend interrumpió la sentencia en curso
+                historial.estado = 'cancelado'
+                historial.mensaje_error = str(ReporteCancelado())
+            else:
+                historial.estado = 'error'
+                historial.mensaje_error = str(e) or e.__class__.__name__
         
+        # Calcular la duración
+        historial.duracion = int(time.time() - inicio)
         historial.save()
         
         # Registrar auditoría
@@ -74,38 +166,457 @@ class ReporteService:
             }
         )
         
-        # Si es una programación, actualizar la última ejecución
+        # Si es una programación, actualizar la última ejecución; la próxima la
+        # avanza el despachador (ProgramacionReporteService) al encolarla
         if programacion:
             programacion.ultima_ejecucion = timezone.now()
-            programacion.proxima_ejecucion = cls._calcular_proxima_ejecucion(programacion)
-            programacion.save(update_fields=['ultima_ejecucion', 'proxima_ejecucion'])
+            programacion.save(update_fields=['ultima_ejecucion'])
+        
+        return historial
+    
+    @classmethod
+    def encolar_reporte(cls, reporte, parametros=None, programacion=None, usuario=None, usar_cache=True):
+        """
+        Registra la ejecución de un reporte y la envía a la cola ``reportes``
+        de Celery al confirmar la transacción actual.
+        
+        Args:
+            reporte: Reporte a ejecutar
+            parametros: Parámetros para el reporte
+            programacion: Programación que ejecuta el reporte (si aplica)
+            usuario: Usuario que solicita el reporte
+            usar_cache: Si es False, ejecuta la consulta aunque haya un resultado en caché
+            
+        Returns:
+            HistorialReporte: Historial en estado ``en_cola``; su id identifica el trabajo
+        """
+        historial = cls.registrar_en_cola(reporte, parametros, programacion, usuario)
+        transaction.on_commit(partial(cls._enviar_a_cola, historial.pk, historial.tarea_id, usar_cache))
+        return historial
+    
+    @classmethod
+    def registrar_en_cola(cls, reporte, parametros=None, programacion=None, usuario=None, enviar_por_correo=False):
+        """
+        Registra una ejecución en estado ``en_cola`` sin enviarla a Celery.
+        
+        Args:
+            enviar_por_correo: Si el resultado se envía a los destinatarios de la
+                programación (solo las ejecuciones del despacho programado)
+        
+        Returns:
+            HistorialReporte: Historial con el ``tarea_id`` que debe usar la tarea
+        """
+        return HistorialReporte.objects.create(
+            reporte=reporte,
+            programacion=programacion,
+            parametros=parametros or {},
+            enviar_por_correo=enviar_por_correo,
+            estado='en_cola',
+            tarea_id=str(uuid.uuid4()),
+            creado_por=usuario,
+            modificado_por=usuario
+        )
+    
+    @classmethod
+    def firma_tarea(cls, historial_id, tarea_id, usar_cache=True):
+        """Firma de ``ejecutar_reporte_task`` para un historial en cola, con sus límites de tiempo."""
+        from reportes.tasks import ejecutar_reporte_task
+        return ejecutar_reporte_task.si(historial_id, usar_cache).set(
+            task_id=tarea_id,
+            soft_time_limit=settings.REPORTES_TIEMPO_MAXIMO,
+            time_limit=settings.REPORTES_TIEMPO_MAXIMO + MARGEN_LIMITE_DURO
+        )
+    
+    @classmethod
+    def _enviar_a_cola(cls, historial_id, tarea_id, usar_cache):
+        """Envía la ejecución a Celery; si no se puede encolar la ejecuta en el proceso."""
+        try:
+            cls.firma_tarea(historial_id, tarea_id, usar_cache).apply_async()
+        except Exception as e:
+            logger.error(f"No se pudo encolar el reporte {historial_id}, se ejecuta directamente: {str(e)}")
+            cls.procesar_historial(historial_id, usar_cache, limitar=False)
+    
+    @classmethod
+    def procesar_historial(cls, historial_id, usar_cache=True, limitar=True):
+        """
+        Ejecuta una ejecución encolada, publicando el progreso en la caché.
         
+        Args:
+            historial_id: ID del historial en estado ``en_cola``
+            usar_cache: Si es False, ejecuta la consulta aunque haya un resultado en caché
+            limitar: Si se aplican los límites de ejecuciones simultáneas
+            
+        Returns:
+            HistorialReporte: Historial terminado, o None si ya no estaba en cola
+                (cancelado o procesado por otra tarea)
+            
+        Raises:
+            CapacidadReportesAgotada: Si se alcanzó el máximo de ejecuciones
+                simultáneas; el historial sigue en cola
+        """
+        historial = cls._iniciar(historial_id, limitar)
+        if historial is None:
+            return None
+        
+        try:
+            return cls.ejecutar_reporte(
+                historial.reporte, historial.parametros, historial.programacion, historial.creado_por,
+                usar_cache=usar_cache, historial=historial,
+                progreso=partial(cls._registrar_progreso, historial.pk)
+            )
+        finally:
+            CacheService.delete(cls._clave_progreso(historial.pk))
+            CacheService.delete(cls._clave_cancelacion(historial.pk))
+    
+    @classmethod
+    def _iniciar(cls, historial_id, limitar):
+        """Pasa el historial de ``en_cola`` a ``ejecutando`` si hay capacidad."""
+        ahora = timezone.now()
+        with transaction.atomic():
+            if limitar:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [BLOQUEO_EJECUCION_REPORTES])
+            historial = (
+                HistorialReporte.objects.select_for_update(of=('self',))
+                .select_related('reporte', 'programacion', 'creado_por')
+                .filter(pk=historial_id)
+                .first()
+            )
+            if historial is None or historial.estado != 'en_cola':
+                return None
+            
+            if limitar:
+                # Las ejecuciones más antiguas que el límite duro ya fueron interrumpidas
+                vigencia = settings.REPORTES_TIEMPO_MAXIMO + MARGEN_LIMITE_DURO
+                en_curso = HistorialReporte.objects.filter(
+                    estado='ejecutando', fecha_inicio__gte=ahora - timedelta(seconds=vigencia)
+                )
+                if en_curso.count() >= settings.REPORTES_MAX_CONCURRENTES:
+                    raise CapacidadReportesAgotada('Se alcanzó el máximo de reportes en ejecución')
+                if (historial.creado_por_id and en_curso.filter(creado_por_id=historial.creado_por_id).count()
+                        >= settings.REPORTES_MAX_CONCURRENTES_USUARIO):
+                    raise CapacidadReportesAgotada('Se alcanzó el máximo de reportes en ejecución del usuario')
+            
+            historial.estado = 'ejecutando'
+            historial.fecha_inicio = ahora
+            historial.save(update_fields=['estado', 'fecha_inicio', 'fecha_modificacion'])
         return historial
     
     @classmethod
-    def _ejecutar_consulta(cls, consulta_sql, parametros):
+    def cancelar(cls, historial_id):
+        """
+        Cancela una ejecución asíncrona.
+        
+        Una ejecución en cola se marca cancelada y la tarea la descarta al
+        recibirla. A una en curso se le avisa por la caché (se detiene al
+        terminar el lote actual) y se interrumpe la sentencia que esté
+        ejecutando en PostgreSQL.
+        
+        Args:
+            historial_id: ID del historial
+            
+        Returns:
+            bool: False si la ejecución ya había terminado
+        """
+        if HistorialReporte.objects.filter(pk=historial_id, estado='en_cola').update(
+            estado='cancelado', mensaje_error=str(ReporteCancelado()), fecha_modificacion=timezone.now()
+        ):
+            return True
+        if not HistorialReporte.objects.filter(pk=historial_id, estado='ejecutando').exists():
+            return False
+        
+        CacheService.set(cls._clave_cancelacion(historial_id), True, timeout=cls._vigencia_claves())
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_cancel_backend(pid) FROM pg_stat_activity "
+                    "WHERE application_name = %s AND pid <> pg_backend_pid()",
+                    [cls._etiqueta(historial_id)]
+                )
+        except Exception as e:
+            logger.warning(f"No se pudo interrumpir la consulta del reporte {historial_id}: {str(e)}")
+        return True
+    
+    @classmethod
+    def filas_procesadas(cls, historial):
+        """
+        Filas leídas por una ejecución: el progreso publicado mientras está
+        pendiente y el total registrado cuando terminó.
+        """
+        if historial.estado in HistorialReporte.ESTADOS_PENDIENTES:
+            return CacheService.get(cls._clave_progreso(historial.pk), 0)
+        return historial.filas
+    
+    @classmethod
+    def _registrar_progreso(cls, historial_id, filas):
+        CacheService.set(cls._clave_progreso(historial_id), filas, timeout=cls._vigencia_claves())
+        if cls._cancelacion_solicitada(historial_id):
+            raise ReporteCancelado()
+    
+    @classmethod
+    def _cancelacion_solicitada(cls, historial_id):
+        return bool(CacheService.get(cls._clave_cancelacion(historial_id)))
+    
+    @staticmethod
+    def _clave_progreso(historial_id):
+        return f"reportes:progreso:{historial_id}"
+    
+    @staticmethod
+    def _clave_cancelacion(historial_id):
+        return f"reportes:cancelar:{historial_id}"
+    
+    @staticmethod
+    def _vigencia_claves():
+        return settings.REPORTES_TIEMPO_MAXIMO + MARGEN_LIMITE_DURO
+    
+    @staticmethod
+    def _etiqueta(historial_id):
+        """application_name de la conexión mientras ejecuta la consulta del historial."""
+        return f"sysfree-reporte-{historial_id}"
+    
+    @classmethod
+    def _preparar_consulta(cls, consulta_sql, parametros):
+        """
+        Convierte los parámetros ``:nombre`` de la consulta en parámetros
+        enlazados del driver; los valores nunca se insertan en el texto SQL.
+
+        Los literales, los comentarios y las conversiones ``::tipo`` se
+        conservan, y los ``%`` literales se escapan para el driver.
+        
+        Args:
+            consulta_sql: Consulta SQL con parámetros ``:nombre``
+            parametros: Valores de los parámetros
+            
+        Returns:
+            tuple: (consulta, valores) para ``cursor.execute``
+            
+        Raises:
+            ValueError: Si la consulta usa un parámetro que no se proporcionó
+        """
+        valores = {}
+        
+        def reemplazar(coincidencia):
+            nombre = coincidencia.group(1)
+            if nombre is None:
+                return coincidencia.group(0).replace('%', '%%')
+            if nombre not in parametros:
+                raise ValueError(f"Falta el parámetro de la consulta: {nombre}")
+            valores[nombre] = parametros[nombre]
+            return f"%({nombre})s"
+        
+        partes = []
+        posicion = 0
+        for coincidencia in _TOKENS_CONSULTA.finditer(consulta_sql):
+            partes.append(consulta_sql[posicion:coincidencia.start()].replace('%', '%%'))
+            partes.append(reemplazar(coincidencia))
+            posicion = coincidencia.end()
+        partes.append(consulta_sql[posicion:].replace('%', '%%'))
+        return ''.join(partes), valores
+    
+    @classmethod
+    @contextmanager
+    def _abrir_consulta(cls, consulta_sql, parametros, tamano_lote=None, progreso=None, etiqueta=None):
+        """
+        Ejecuta la consulta con un cursor del servidor.
+        
+        El cursor se abre dentro de una transacción para que no sea WITH HOLD
+        (PostgreSQL materializaría todo el resultado al confirmar). Con
+        ``DISABLE_SERVER_SIDE_CURSORS`` el driver carga el resultado completo.
+        ``statement_timeout`` y ``application_name`` se fijan solo para esa
+        transacción.
+        
+        Args:
+            consulta_sql: Consulta SQL con parámetros ``:nombre``
+            parametros: Valores de los parámetros
+            tamano_lote: Filas leídas por viaje al servidor (por defecto ``TAMANO_LOTE``)
+            progreso: Función que recibe las filas leídas tras cada lote
+            etiqueta: application_name de la conexión durante la consulta
+            
+        Yields:
+            tuple: (columnas, lotes, descripcion), donde lotes es un iterador de
+                listas de tuplas y descripcion es ``cursor.description``
         """
-        Ejecuta una consulta SQL con parámetros.
+        consulta, valores = cls._preparar_consulta(consulta_sql, parametros)
+        tamano_lote = tamano_lote or cls.TAMANO_LOTE
+        with transaction.atomic(), connection.chunked_cursor() as cursor:
+            ajustes = {'statement_timeout': str(settings.REPORTES_STATEMENT_TIMEOUT * 1000)}
+            if etiqueta:
+                ajustes['application_name'] = etiqueta
+            with connection.cursor() as cursor_ajustes:
+                cursor_ajustes.execute(
+                    'SELECT ' + ', '.join('set_config(%s, %s, true)' for _ in ajustes),
+                    [valor for ajuste in ajustes.items() for valor in ajuste]
+                )
+            cursor.execute(consulta, valores)
+            columnas = [col[0] for col in cursor.description]
+            lotes = iter(lambda: cursor.fetchmany(tamano_lote), [])
+            yield columnas, cls._notificar_progreso(lotes, progreso) if progreso else lotes, cursor.description
+    
+    @staticmethod
+    def _notificar_progreso(lotes, progreso):
+        """Entrega los lotes y llama a ``progreso`` con las filas leídas hasta el momento."""
+        filas = 0
+        for lote in lotes:
+            yield lote
+            filas += len(lote)
+            progreso(filas)
+    
+    @classmethod
+    def _ejecutar_consulta(cls, consulta_sql, parametros, **opciones):
+        """
+        Ejecuta una consulta SQL con parámetros y carga todas las filas.
         
         Args:
             consulta_sql: Consulta SQL a ejecutar
             parametros: Parámetros para la consulta
+            **opciones: ``progreso`` y ``etiqueta`` de ``_abrir_consulta``
             
         Returns:
             list: Lista de diccionarios con los resultados
         """
-        # Reemplazar parámetros en la consulta
-        for key, value in parametros.items():
-            placeholder = f":{key}"
-            if isinstance(value, str):
-                value = f"'{value}'"
-            consulta_sql = consulta_sql.replace(placeholder, str(value))
+        with cls._abrir_consulta(consulta_sql, parametros, **opciones) as (columnas, lotes, _):
+            return [dict(zip(columnas, fila)) for lote in lotes for fila in lote]
+    
+    @classmethod
+    def _escribir_archivo(cls, reporte, parametros, destino, **opciones):
+        """
+        Ejecuta la consulta del reporte y escribe el archivo en ``destino``.
+        
+        CSV, Excel, Parquet y PDF tabular se escriben por lotes a medida que llegan las
+        filas; los demás formatos se generan con todas las filas en memoria.
+        Los reportes de tipo ``analitico`` no tienen consulta: sus filas son
+        el resultado agregado de ``AnaliticaService`` con los parámetros del
+        reporte y los de la ejecución.
+        
+        Args:
+            reporte: Reporte a generar
+            parametros: Parámetros de la consulta
+            destino: Archivo binario abierto para escritura
+            **opciones: ``progreso`` y ``etiqueta`` de ``_abrir_consulta``
+            
+        Returns:
+            int: Número de filas escritas
+        """
+        por_lotes = reporte.formato in cls.FORMATOS_POR_LOTES or cls._es_pdf_tabular(reporte)
+        if reporte.tipo == 'analitico':
+            columnas, filas = AnaliticaService.ejecutar({**reporte.parametros, **parametros})
+            if por_lotes:
+                return cls._escribir_lotes(reporte, columnas, [filas], destino)
+            datos = [dict(zip(columnas, fila)) for fila in filas]
+        elif por_lotes:
+            with cls._abrir_consulta(reporte.consulta_sql, parametros, **opciones) as (columnas, lotes, descripcion):
+                return cls._escribir_lotes(reporte, columnas, lotes, destino, descripcion)
+        else:
+            datos = cls._ejecutar_consulta(reporte.consulta_sql, parametros, **opciones)
+        
+        destino.write(cls._generar_archivo(reporte, datos, parametros))
+        return len(datos)
+    
+    @classmethod
+    def _escribir_lotes(cls, reporte, columnas, lotes, destino, descripcion=None):
+        """
+        Escribe los lotes de filas con el escritor del formato del reporte
+        (CSV, Parquet, PDF tabular o Excel).
         
-        # Ejecutar la consulta
-        with connection.cursor() as cursor:
-            cursor.execute(consulta_sql)
-            columns = [col[0] for col in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        ``descripcion`` (``cursor.description`` de la consulta) da los tipos de
+        las columnas en Parquet; sin ella se infieren de las filas.
+        """
+        if reporte.formato == 'csv':
+            return cls._escribir_csv(columnas, lotes, destino)
+        if reporte.formato == 'parquet':
+            return cls._escribir_parquet(columnas, lotes, destino, descripcion)
+        if reporte.formato == 'pdf':
+            return cls._escribir_pdf(reporte, columnas, lotes, destino)
+        return cls._escribir_excel(columnas, lotes, destino)
+    
+    @classmethod
+    def _escribir_csv(cls, columnas, lotes, destino):
+        """Escribe las filas en CSV (UTF-8) en un archivo binario y devuelve cuántas escribió."""
+        texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+        total = 0
+        try:
+            writer = csv.writer(texto)
+            writer.writerow(columnas)
+            for lote in lotes:
+                writer.writerows(lote)
+                total += len(lote)
+        finally:
+            texto.flush()
+            texto.detach()
+        return total
+    
+    @classmethod
+    def _escribir_parquet(cls, columnas, lotes, destino, descripcion=None):
+        """
+        Escribe las filas en Parquet por grupos de filas y devuelve cuántas escribió.
+        
+        Los tipos salen de la descripción del cursor (decimales con su escala,
+        fechas con hora en UTC); ver ``reportes.utils.parquet_tabular``.
+        """
+        from ..utils.parquet_tabular import escribir_parquet, tipos_de_descripcion
+        
+        tipos = tipos_de_descripcion(descripcion) if descripcion else None
+        return escribir_parquet(columnas, lotes, destino, tipos)
+    
+    @staticmethod
+    def _es_pdf_tabular(reporte):
+        """Los PDF sin plantilla se generan como tabla con ReportLab."""
+        return reporte.formato == 'pdf' and not reporte.plantilla
+    
+    @classmethod
+    def _escribir_pdf(cls, reporte, columnas, lotes, destino):
+        """
+        Escribe las filas como tabla PDF, por partes de páginas, y devuelve cuántas escribió.
+        
+        Con ``REPORTES_PDF_PROCESOS`` > 1 las partes se renderizan en
+        paralelo (ver ``reportes.utils.pdf_tabular``).
+        """
+        return escribir_pdf(
+            columnas, lotes, destino,
+            titulo=reporte.nombre,
+            fecha=timezone.localtime().strftime('%d/%m/%Y %H:%M'),
+            procesos=settings.REPORTES_PDF_PROCESOS
+        )
+    
+    @classmethod
+    def _escribir_excel(cls, columnas, lotes, destino):
+        """
+        Escribe las filas en un libro de Excel y devuelve cuántas escribió.
+        
+        ``constant_memory`` vuelca cada fila a disco al pasar a la siguiente;
+        al llegar al límite de filas de una hoja se continúa en otra.
+        """
+        import xlsxwriter
+        
+        libro = xlsxwriter.Workbook(destino, {
+            'constant_memory': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        hoja, fila_hoja, total = None, EXCEL_MAX_FILAS, 0
+        try:
+            for lote in lotes:
+                for fila in lote:
+                    if fila_hoja >= EXCEL_MAX_FILAS:
+                        hoja, fila_hoja = cls._agregar_hoja(libro, columnas), 1
+                    hoja.write_row(fila_hoja, 0, fila)
+                    fila_hoja += 1
+                total += len(lote)
+            if hoja is None:
+                cls._agregar_hoja(libro, columnas)
+        finally:
+            libro.close()
+        return total
+    
+    @staticmethod
+    def _agregar_hoja(libro, columnas):
+        numero = len(libro.worksheets()) + 1
+        hoja = libro.add_worksheet('Datos' if numero == 1 else f'Datos {numero}')
+        # Tipos que xlsxwriter no escribe por sí mismo
+        for tipo in (uuid.UUID, dict, list):
+            hoja.add_write_handler(tipo, _escribir_como_texto)
+        hoja.write_row(0, 0, columnas)
+        return hoja
     
     @classmethod
     def _generar_archivo(cls, reporte, datos, parametros):
@@ -128,58 +639,52 @@ class ReporteService:
             return cls._generar_csv(reporte, datos, parametros)
         elif reporte.formato == 'html':
             return cls._generar_html(reporte, datos, parametros)
+        elif reporte.formato == 'parquet':
+            return cls._generar_parquet(reporte, datos, parametros)
         else:
             raise ValueError(f"Formato no soportado: {reporte.formato}")
     
     @classmethod
     def _generar_pdf(cls, reporte, datos, parametros):
         """Genera un archivo PDF con los datos del reporte."""
-        # Aquí se implementaría la generación del PDF
-        # Por ahora, generamos un HTML y lo convertimos a PDF
-        html = cls._generar_html(reporte, datos, parametros)
+        if reporte.plantilla:
+            return cls._html_a_pdf(cls._generar_html(reporte, datos, parametros))
         
-        # Convertir HTML a PDF (requiere una biblioteca como WeasyPrint o xhtml2pdf)
-        # Por ahora, devolvemos el HTML como PDF
-        return html
+        output = io.BytesIO()
+        columnas = list(datos[0].keys()) if datos else []
+        cls._escribir_pdf(reporte, columnas, [[tuple(fila.values()) for fila in datos]], output)
+        return output.getvalue()
+    
+    @staticmethod
+    def _html_a_pdf(html):
+        """Convierte a PDF un documento HTML (bytes) con WeasyPrint."""
+        from weasyprint import HTML
+        
+        return HTML(string=html.decode('utf-8')).write_pdf()
     
     @classmethod
     def _generar_excel(cls, reporte, datos, parametros):
         """Genera un archivo Excel con los datos del reporte."""
-        import xlsxwriter
-        from io import BytesIO
-        
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet()
-        
-        # Escribir encabezados
-        if datos:
-            headers = list(datos[0].keys())
-            for col, header in enumerate(headers):
-                worksheet.write(0, col, header)
-            
-            # Escribir datos
-            for row, data in enumerate(datos, start=1):
-                for col, header in enumerate(headers):
-                    worksheet.write(row, col, data.get(header, ''))
-        
-        workbook.close()
+        output = io.BytesIO()
+        columnas = list(datos[0].keys()) if datos else []
+        cls._escribir_excel(columnas, [[tuple(fila.values()) for fila in datos]], output)
         return output.getvalue()
     
     @classmethod
     def _generar_csv(cls, reporte, datos, parametros):
         """Genera un archivo CSV con los datos del reporte."""
-        import csv
-        from io import StringIO
-        
-        output = StringIO()
-        if datos:
-            headers = list(datos[0].keys())
-            writer = csv.DictWriter(output, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(datos)
-        
-        return output.getvalue().encode('utf-8')
+        output = io.BytesIO()
+        columnas = list(datos[0].keys()) if datos else []
+        cls._escribir_csv(columnas, [[tuple(fila.values()) for fila in datos]], output)
+        return output.getvalue()
+    
+    @classmethod
+    def _generar_parquet(cls, reporte, datos, parametros):
+        """Genera un archivo Parquet con los datos del reporte (tipos inferidos de los valores)."""
+        output = io.BytesIO()
+        columnas = list(datos[0].keys()) if datos else []
+        cls._escribir_parquet(columnas, [[tuple(fila.values()) for fila in datos]], output)
+        return output.getvalue()
     
     @classmethod
     def _generar_html(cls, reporte, datos, parametros):
@@ -292,4 +797,11 @@ class ReporteService:
             
             return datetime.combine(next_date, hora, tzinfo=timezone.get_current_timezone())
         
-        return None
\ No newline at end of file
+        return None
+
+
+def _escribir_como_texto(hoja, fila, columna, valor, *args):
+    """Escribe en Excel como texto los valores sin tipo nativo (JSON como JSON)."""
+    if isinstance(valor, (dict, list)):
+        valor = json.dumps(valor, ensure_ascii=False, default=str)
+    return hoja.write_string(fila, columna, str(valor), *args)
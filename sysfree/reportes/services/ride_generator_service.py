@@ -4,6 +4,7 @@ from django.template.loader import render_to_string
 from weasyprint import HTML, CSS
 from weasyprint import FontConfiguration
 import qrcode
+from core.services.empresa_service import EmpresaService
 
 class RIDEGeneratorService:
     """
@@ -46,8 +47,8 @@ class RIDEGeneratorService:
 
         context = {
             'venta': venta,
-            'empresa': venta.cliente.empresa, # Asumiendo que el cliente tiene una empresa asociada
-            'detalles': venta.detalles.all(),
+            'empresa': EmpresaService.get_empresa(),
+            'detalles': venta.detalles.select_related('producto', 'tipo_iva'),
             'qr_code': qr_code_img,
         }
         
@@ -1,7 +1,21 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from ventas.models import Venta, DetalleVenta
+from .services.hechos_ventas_service import HechosVentasService
+
 # Las señales de auditoría están en core.signals
 
-# Aquí se pueden agregar señales para generar reportes automáticamente
-# cuando ocurran ciertos eventos en el sistema
\ No newline at end of file
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def actualizar_hechos_venta(sender, instance, **kwargs):
+    """Actualiza los acumulados de ventas al confirmar la creación o el cambio de una venta."""
+    HechosVentasService.programar(instance.pk)
+
+
+@receiver(post_save, sender=DetalleVenta)
+@receiver(post_delete, sender=DetalleVenta)
+def actualizar_hechos_detalle_venta(sender, instance, **kwargs):
+    """Actualiza los acumulados de ventas al confirmar el cambio de un detalle."""
+    HechosVentasService.programar(instance.venta_id)
@@ -0,0 +1,52 @@
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def actualizar_hechos_ventas_task(self, venta_ids):
+    """
+    Aplica a los acumulados VentaDiaria y VentaMensual los cambios de las
+    ventas indicadas. Es idempotente: reintentarla no duplica importes.
+    """
+    from reportes.services.hechos_ventas_service import HechosVentasService
+    try:
+        HechosVentasService.actualizar(venta_ids)
+    except Exception as e:
+        raise self.retry(exc=e)
+
+
+# Segundos de espera antes de reintentar un reporte que no tuvo capacidad
+REINTENTO_CAPACIDAD_REPORTES = 15
+
+
+@shared_task(bind=True, max_retries=None)
+def ejecutar_reporte_task(self, historial_id, usar_cache=True):
+    """
+    Ejecuta un reporte encolado con ``ReporteService.encolar_reporte``. Si se
+    alcanzó el máximo de ejecuciones simultáneas (global o del usuario) se
+    reprograma y el historial sigue en cola; si fue cancelado, no hace nada.
+    """
+    from reportes.services.reporte_service import CapacidadReportesAgotada, ReporteService
+    try:
+        ReporteService.procesar_historial(historial_id, usar_cache)
+    except CapacidadReportesAgotada as e:
+        raise self.retry(exc=e, countdown=REINTENTO_CAPACIDAD_REPORTES)
+
+
+@shared_task
+def despachar_programaciones_task():
+    """
+    Tarea periódica que encola los reportes programados vencidos. Puede
+    ejecutarse a la vez en varios nodos sin duplicar ejecuciones.
+    """
+    from reportes.services.programacion_reporte_service import ProgramacionReporteService
+    return ProgramacionReporteService.despachar_vencidas()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def enviar_reportes_programados_task(self, historial_ids):
+    """Envía por correo, con una sola conexión SMTP, los resultados de un lote de reportes programados."""
+    from reportes.services.programacion_reporte_service import ProgramacionReporteService
+    try:
+        return ProgramacionReporteService.enviar_resultados(historial_ids)
+    except Exception as e:
+        raise self.retry(exc=e)
@@ -0,0 +1,126 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from inventario.models import Almacen, Categoria, MovimientoInventario, Producto
+from ventas.models import Venta
+
+User = get_user_model()
+
+
+def _fecha(dia):
+    return timezone.make_aware(datetime.combine(dia, datetime.min.time().replace(hour=12)))
+
+
+class ReportesAgregadosAPITest(TestCase):
+    """Reportes agregados en la base de datos y paginados."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='reportes@example.com', password='x', nombres='Reportes')
+        cls.clientes = [
+            Cliente.objects.create(
+                tipo_identificacion='cedula', identificacion=f'17000000{i:02d}', nombres=f'Cliente {i}', apellidos='R'
+            )
+            for i in range(3)
+        ]
+        # Cliente 0: 1 compra; cliente 1: 3 compras; cliente 2: 2 compras
+        compras = [(0, '10.00', date(2025, 1, 5)), (1, '1.00', date(2025, 1, 6)), (1, '2.00', date(2025, 1, 7)),
+                   (1, '3.00', date(2025, 2, 1)), (2, '4.00', date(2025, 1, 8)), (2, '5.00', date(2025, 1, 9))]
+        for i, (cliente, total, dia) in enumerate(compras):
+            venta = Venta.objects.create(
+                numero=f'FAC-AG{i}', cliente=cls.clientes[cliente], tipo='factura', estado='pagada',
+                subtotal=Decimal(total), total=Decimal(total)
+            )
+            Venta.objects.filter(pk=venta.pk).update(fecha=_fecha(dia))
+
+        categoria = Categoria.objects.create(nombre='Reportes')
+        cls.productos = [
+            Producto.objects.create(
+                codigo=f'AG{i:02d}', nombre=f'Producto {i:02d}', categoria=categoria,
+                precio_compra=Decimal('2.00'), precio_venta=Decimal('3.00'), stock=Decimal(i)
+            )
+            for i in range(3)
+        ]
+        almacen = Almacen.objects.create(nombre='Almacén reportes')
+        for i, dia in enumerate((date(2025, 1, 10), date(2025, 1, 20), date(2025, 2, 10))):
+            movimiento = MovimientoInventario.objects.create(
+                tipo='entrada', origen='compra', producto=cls.productos[0], cantidad=1, stock_anterior=i,
+                stock_nuevo=i + 1, costo_unitario=Decimal('2.00'), almacen=almacen
+            )
+            MovimientoInventario.objects.filter(pk=movimiento.pk).update(fecha=_fecha(dia))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_clientes_frecuentes_ordenados_y_limitados(self):
+        response = self.client.get(reverse('api:reportes-clientes-frecuentes'), {'limite': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(c['id'], c['compras'], c['total_comprado']) for c in response.data['clientes']],
+            [(self.clientes[1].pk, 3, Decimal('6.00')), (self.clientes[2].pk, 2, Decimal('9.00'))]
+        )
+        self.assertEqual(response.data['clientes'][0]['nombre'], 'Cliente 1 R')
+
+    def test_clientes_frecuentes_por_rango_de_fechas(self):
+        response = self.client.get(
+            reverse('api:reportes-clientes-frecuentes'), {'fecha_inicio': '2025-01-06', 'fecha_fin': '2025-01-31'}
+        )
+
+        self.assertEqual(
+            [(c['id'], c['compras']) for c in response.data['clientes']],
+            [(self.clientes[2].pk, 2), (self.clientes[1].pk, 2)]
+        )
+
+    def test_inventario_paginado_con_valor_total(self):
+        response = self.client.get(reverse('api:reportes-inventario'), {'page_size': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual([p['codigo'] for p in response.data['productos']], ['AG00', 'AG01'])
+        self.assertEqual(response.data['productos'][1]['valor_inventario'], Decimal('2.00'))
+        # Las entradas del producto 0 suman 3 unidades a su stock
+        self.assertEqual(response.data['valor_total'], Decimal('12.00'))
+
+        response = self.client.get(reverse('api:reportes-inventario'), {'page_size': 2, 'page': 2})
+        self.assertEqual([p['codigo'] for p in response.data['productos']], ['AG02'])
+        self.assertIsNone(response.data['next'])
+
+    def test_movimientos_filtrados_por_fecha_y_paginados(self):
+        response = self.client.get(
+            reverse('api:reportes-movimientos-inventario'),
+            {'producto_id': self.productos[0].pk, 'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-01-31'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([m['stock_nuevo'] for m in response.data['movimientos']], [Decimal('2.00'), Decimal('1.00')])
+        self.assertEqual(response.data['movimientos'][0]['producto'], 'Producto 00')
+
+    def test_fechas_no_validas(self):
+        response = self.client.get(
+            reverse('api:reportes-movimientos-inventario'), {'fecha_inicio': '2025-13-01', 'fecha_fin': '2025-01-31'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ventas_por_periodo_pagina_el_listado(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('api:reportes-ventas-por-periodo'),
+                {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-01-31', 'page_size': 2}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([v['numero'] for v in response.data['ventas']], ['FAC-AG5', 'FAC-AG4'])
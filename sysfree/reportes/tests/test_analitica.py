@@ -0,0 +1,182 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from inventario.models import Almacen, Categoria, MovimientoInventario, Producto
+from reportes.analytics import cargar_detalles_venta
+from reportes.models import Reporte
+from reportes.services.analitica_service import AnaliticaService
+from reportes.services.reporte_service import ReporteService
+from ventas.models import DetalleVenta, Venta
+
+User = get_user_model()
+
+
+def _fecha(dia):
+    return timezone.make_aware(datetime.combine(dia, datetime.min.time().replace(hour=12)))
+
+
+class AnaliticaServiceTest(TestCase):
+    """Análisis de ventas e inventario con pandas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='analitica@example.com', password='x', nombres='Analítica')
+        accesorios = Categoria.objects.create(nombre='Accesorios')
+        repuestos = Categoria.objects.create(nombre='Repuestos')
+        servicios = Categoria.objects.create(nombre='Servicios')
+        cls.clientes = [
+            Cliente.objects.create(
+                tipo_identificacion='cedula', identificacion=f'17100000{i:02d}', nombres=f'Cliente {i}', apellidos='A'
+            )
+            for i in range(2)
+        ]
+        cls.productos = [
+            Producto.objects.create(codigo='AN1', nombre='Cable', categoria=accesorios,
+                                    precio_compra=Decimal('2.00'), precio_venta=Decimal('5.00')),
+            Producto.objects.create(codigo='AN2', nombre='Funda', categoria=accesorios,
+                                    precio_compra=Decimal('1.00'), precio_venta=Decimal('1.00')),
+            Producto.objects.create(codigo='AN3', nombre='Pantalla', categoria=repuestos,
+                                    precio_compra=Decimal('4.00'), precio_venta=Decimal('6.00')),
+            Producto.objects.create(codigo='AN4', nombre='Instalación', categoria=servicios,
+                                    precio_venta=Decimal('3.00')),
+        ]
+        p1, p2, p3, p4 = cls.productos
+        c0, c1 = cls.clientes
+        ventas = [
+            (date(2025, 1, 10), c0, 'pagada', [(p1, '2.00', '10.00'), (p3, '1.00', '6.00')]),
+            (date(2025, 1, 15), c1, 'emitida', [(p2, '5.00', '5.00')]),
+            (date(2025, 2, 3), c0, 'pagada', [(p1, '1.00', '5.00')]),
+            (date(2025, 3, 1), c1, 'pagada', [(p4, '1.00', '3.00')]),
+            # Anulada: no cuenta en ningún análisis
+            (date(2025, 2, 20), c1, 'anulada', [(p1, '10.00', '50.00')]),
+        ]
+        for i, (dia, cliente, estado, lineas) in enumerate(ventas):
+            venta = Venta.objects.create(numero=f'FAC-AN{i}', cliente=cliente, tipo='factura', estado=estado)
+            Venta.objects.filter(pk=venta.pk).update(fecha=_fecha(dia))
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(venta=venta, producto=producto, cantidad=Decimal(cantidad),
+                             precio_unitario=Decimal(subtotal) / Decimal(cantidad),
+                             subtotal=Decimal(subtotal), total=Decimal(subtotal))
+                for producto, cantidad, subtotal in lineas
+            ])
+
+    def test_carga_columnas_tipadas_en_centesimas(self):
+        df = cargar_detalles_venta(tamano_bloque=2)
+
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df['subtotal'].dtype, np.int64)
+        self.assertEqual(df['dia'].dtype.kind, 'M')
+        self.assertEqual(df['estado'].dtype, 'category')
+        self.assertEqual(set(df['estado']), {'pagada', 'emitida'})
+        self.assertEqual(df['subtotal'].sum(), 2900)
+        # Costo: cantidad por el precio de compra actual
+        self.assertEqual(df['costo'].sum(), 2 * 200 + 400 + 5 * 100 + 200)
+        self.assertEqual(df['cliente_id'].dtype, np.int64)
+
+    def test_margen_por_categoria(self):
+        columnas, filas = AnaliticaService.ejecutar({'analisis': 'margen_categoria'})
+
+        self.assertEqual(columnas[:2], ['categoria_id', 'categoria'])
+        self.assertEqual([fila[1:] for fila in filas], [
+            ['Accesorios', Decimal('8.00'), Decimal('20.00'), Decimal('11.00'), Decimal('9.00'), 0.45],
+            ['Servicios', Decimal('1.00'), Decimal('3.00'), Decimal('0.00'), Decimal('3.00'), 1.0],
+            ['Repuestos', Decimal('1.00'), Decimal('6.00'), Decimal('4.00'), Decimal('2.00'), 0.3333],
+        ])
+
+    def test_clasificacion_abc(self):
+        columnas, filas = AnaliticaService.ejecutar({'analisis': 'abc', 'umbral_a': '0.5', 'umbral_b': '0.8'})
+
+        resultado = [dict(zip(columnas, fila)) for fila in filas]
+        self.assertEqual([(f['codigo'], f['valor'], f['clase']) for f in resultado], [
+            ('AN1', Decimal('15.00'), 'A'), ('AN3', Decimal('6.00'), 'B'),
+            ('AN2', Decimal('5.00'), 'B'), ('AN4', Decimal('3.00'), 'C'),
+        ])
+        self.assertEqual(resultado[-1]['acumulado'], 1.0)
+
+    def test_retencion_por_cohortes(self):
+        columnas, filas = AnaliticaService.ejecutar({'analisis': 'cohortes'})
+
+        # El cliente 1 no cuenta en febrero: su venta de ese mes está anulada
+        self.assertEqual(columnas, ['cohorte', 'clientes', 'mes_0', 'mes_1', 'mes_2'])
+        self.assertEqual(filas, [['2025-01', 2, 1.0, 0.5, 0.5]])
+
+    def test_tabla_dinamica_de_ventas_e_inventario(self):
+        columnas, filas = AnaliticaService.ejecutar({
+            'analisis': 'tabla_dinamica', 'filas': 'categoria', 'columnas': 'mes', 'valor': 'subtotal',
+            'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-03-31',
+        })
+        self.assertEqual(columnas, ['categoria', '2025-01', '2025-02', '2025-03'])
+        self.assertEqual(filas, [
+            ['Accesorios', Decimal('15.00'), Decimal('5.00'), Decimal('0.00')],
+            ['Repuestos', Decimal('6.00'), Decimal('0.00'), Decimal('0.00')],
+            ['Servicios', Decimal('0.00'), Decimal('0.00'), Decimal('3.00')],
+        ])
+
+        almacen = Almacen.objects.create(nombre='Bodega analítica')
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(tipo='entrada', origen='compra', producto=self.productos[0], almacen=almacen,
+                                 cantidad=Decimal('3.00'), stock_anterior=0, stock_nuevo=3,
+                                 costo_unitario=Decimal('1.50')),
+            # Sin costo unitario: se valora al precio de compra del producto
+            MovimientoInventario(tipo='salida', origen='venta', producto=self.productos[0], almacen=almacen,
+                                 cantidad=Decimal('1.00'), stock_anterior=3, stock_nuevo=2),
+        ])
+        columnas, filas = AnaliticaService.ejecutar({
+            'analisis': 'tabla_dinamica', 'fuente': 'inventario', 'filas': 'producto', 'columnas': 'tipo',
+            'valor': 'valor',
+        })
+        self.assertEqual(columnas, ['producto', 'entrada', 'salida'])
+        self.assertEqual(filas, [['AN1 - Cable', Decimal('4.50'), Decimal('2.00')]])
+
+        with self.assertRaisesMessage(ValueError, 'Dimensión no válida: bodega'):
+            AnaliticaService.ejecutar({'analisis': 'tabla_dinamica', 'filas': 'bodega'})
+
+    def test_reporte_analitico_y_api(self):
+        reporte = Reporte.objects.create(
+            nombre='Margen', tipo='analitico', formato='csv', parametros={'analisis': 'margen_categoria'}
+        )
+        historial = ReporteService.ejecutar_reporte(reporte, {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-01-31'})
+
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        self.assertEqual(historial.filas, 2)
+        with historial.archivo.open('rb') as archivo:
+            lineas = archivo.read().decode('utf-8-sig').splitlines()
+        self.assertEqual(lineas[0], 'categoria_id,categoria,cantidad,ventas,costo,margen,margen_porcentaje')
+        self.assertIn('Accesorios,7.00,15.00,9.00,6.00,0.4', lineas[1])
+
+        cliente_http = APIClient()
+        cliente_http.force_authenticate(self.user)
+        periodo = {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-12-31'}
+        respuesta = cliente_http.get(reverse('api:reportes-analitica', args=['abc']), periodo)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual([fila['clase'] for fila in respuesta.data['resultados']], ['A', 'A', 'A', 'B'])
+
+        respuesta = cliente_http.get(reverse('api:reportes-analitica', args=['pronostico']), periodo)
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Análisis no válido', respuesta.data['error'])
+
+    def test_api_analitica_exige_un_rango_de_fechas_acotado(self):
+        cliente_http = APIClient()
+        cliente_http.force_authenticate(self.user)
+        url = reverse('api:reportes-analitica', args=['abc'])
+
+        respuesta = cliente_http.get(url)
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fecha_inicio y fecha_fin', respuesta.data['error'])
+
+        with override_settings(REPORTES_ANALITICA_MAX_DIAS=31):
+            respuesta = cliente_http.get(url, {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-02-01'})
+            self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('no puede superar 31 días', respuesta.data['error'])
+
+            respuesta = cliente_http.get(url, {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-01-31'})
+            self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from inventario.models import Categoria, Producto
+from reportes.models import CacheReporte, Reporte
+from reportes.services.cache_reportes_service import CacheReportesService
+from reportes.services.reporte_service import ReporteService
+
+
+def _aciertos(resultado):
+    return REGISTRY.get_sample_value('report_cache_requests_total', {'result': resultado}) or 0
+
+
+class CacheReportesTest(TestCase):
+    """Caché de resultados de reportes por huella de consulta y versión de datos."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Caché')
+        cls.producto = Producto.objects.create(
+            codigo='CR001', nombre='Monitor', categoria=cls.categoria, precio_venta=Decimal('100.00')
+        )
+        cls.reporte = Reporte.objects.create(
+            nombre='Productos', tipo='inventario', formato='csv',
+            consulta_sql='SELECT codigo, nombre FROM inventario_producto WHERE precio_venta >= :minimo ORDER BY codigo'
+        )
+
+    def _ejecutar(self, **parametros):
+        return ReporteService.ejecutar_reporte(self.reporte, {'minimo': 0, **parametros})
+
+    def test_ejecucion_identica_reutiliza_el_resultado(self):
+        primera = self._ejecutar()
+        aciertos = _aciertos('hit')
+        with mock.patch.object(ReporteService, '_escribir_archivo') as escribir:
+            segunda = self._ejecutar(no_usado='x')
+
+        escribir.assert_not_called()
+        self.assertFalse(primera.desde_cache)
+        self.assertTrue(segunda.desde_cache)
+        self.assertEqual(segunda.estado, 'exito')
+        self.assertNotEqual(segunda.archivo.name, primera.archivo.name)
+        with primera.archivo.open('rb') as a, segunda.archivo.open('rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(_aciertos('hit'), aciertos + 1)
+        self.assertEqual(CacheReporte.objects.get().aciertos, 1)
+
+    def test_cambio_de_datos_o_parametros_no_reutiliza(self):
+        # Cada ejecución confirma su transacción antes del cambio de datos
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ejecutar()
+            self.assertFalse(self._ejecutar(minimo=50).desde_cache)
+
+        self.producto.nombre = 'Monitor 24'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+        historial = self._ejecutar()
+
+        self.assertFalse(historial.desde_cache)
+        with historial.archivo.open('rb') as archivo:
+            self.assertIn(b'Monitor 24', archivo.read())
+
+    def test_update_masivo_cambia_la_version_al_confirmar(self):
+        consulta = 'SELECT codigo, stock FROM inventario_producto'
+        version = CacheReportesService.version_datos(consulta)
+        antes = timezone.now()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Producto.objects.filter(pk=self.producto.pk).update(stock=Decimal('7.00'))
+            # Hasta el commit otras conexiones no ven el cambio: la versión se conserva
+            self.assertEqual(CacheReportesService.version_datos(consulta), version)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(CacheReportesService.version_datos(consulta), version)
+        self.producto.refresh_from_db()
+        self.assertGreaterEqual(self.producto.fecha_modificacion, antes)
+
+    def test_bulk_create_y_eliminacion_cambian_la_version(self):
+        consulta = 'SELECT nombre FROM inventario_categoria'
+        version = CacheReportesService.version_datos(consulta)
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.bulk_create([Categoria(nombre='Masiva')])
+        creada = CacheReportesService.version_datos(consulta)
+        self.assertNotEqual(creada, version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.filter(nombre='Masiva').delete()
+        self.assertNotEqual(CacheReportesService.version_datos(consulta), creada)
+
+    def test_sin_cache_o_no_cacheable(self):
+        self._ejecutar()
+        self.assertFalse(ReporteService.ejecutar_reporte(self.reporte, {'minimo': 0}, usar_cache=False).desde_cache)
+
+        # reportes_ventadiaria no es de ModeloBase: no se puede versionar
+        sin_version = Reporte(formato='csv', consulta_sql='SELECT fecha FROM reportes_ventadiaria')
+        self.assertIsNone(CacheReportesService.calcular_clave(sin_version, {}))
+        sin_tablas = Reporte(formato='csv', consulta_sql='SELECT 1')
+        self.assertIsNone(CacheReportesService.calcular_clave(sin_tablas, {}))
+
+    def test_entrada_vencida_no_se_usa(self):
+        self._ejecutar()
+        CacheReporte.objects.update(fecha_creacion=timezone.now() - timedelta(days=2))
+
+        with override_settings(REPORTES_CACHE_TTL=3600):
+            self.assertFalse(self._ejecutar().desde_cache)
+
+    @override_settings(REPORTES_CACHE_MAX_BYTES=25)
+    def test_desaloja_la_menos_usada_recientemente_al_superar_el_tamano(self):
+        ahora = timezone.now()
+        for i, clave in enumerate(('a' * 64, 'b' * 64)):
+            CacheReportesService.guardar(clave, 'csv', BytesIO(b'x' * 10))
+            CacheReporte.objects.filter(clave=clave).update(ultimo_acceso=ahora - timedelta(minutes=10 - i))
+        CacheReportesService.obtener('a' * 64)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CacheReportesService.guardar('c' * 64, 'csv', BytesIO(b'x' * 10))
+
+        self.assertEqual(sorted(CacheReporte.objects.values_list('clave', flat=True)), ['a' * 64, 'c' * 64])
+        self.assertIsNone(CacheReportesService.guardar('d' * 64, 'csv', BytesIO(b'x' * 26)))
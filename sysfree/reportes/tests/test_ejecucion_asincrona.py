@@ -0,0 +1,158 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.services.cache_service import CacheService
+from reportes.models import HistorialReporte, Reporte
+from reportes.services.reporte_service import CapacidadReportesAgotada, ReporteService
+
+User = get_user_model()
+
+CONSULTA = "SELECT g AS id, 'Item ' || g AS nombre FROM generate_series(1, :filas) AS g ORDER BY g"
+
+
+class EjecucionAsincronaTest(TestCase):
+    """Ejecución de reportes en cola con progreso, cancelación y límites de concurrencia."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='asincrono@example.com', password='x', nombres='Asíncrono')
+        cls.otro = User.objects.create_user(email='otro@example.com', password='x', nombres='Otro')
+        cls.reporte = Reporte.objects.create(
+            nombre='Items', tipo='personalizado', formato='csv', consulta_sql=CONSULTA
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _encolar(self, usuario=None, filas=5):
+        return ReporteService.encolar_reporte(self.reporte, {'filas': filas}, usuario=usuario or self.user)
+
+    def test_api_encola_y_devuelve_el_trabajo(self):
+        with mock.patch('celery.canvas.Signature.apply_async', autospec=True) as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api:reporte-ejecutar', args=[self.reporte.pk]), {'parametros': {'filas': 5}}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['estado'], 'en_cola')
+        historial = HistorialReporte.objects.get(pk=response.data['id'])
+        self.assertEqual(historial.creado_por, self.user)
+        apply_async.assert_called_once()
+        firma = apply_async.call_args.args[0]
+        self.assertEqual(firma.task, 'reportes.tasks.ejecutar_reporte_task')
+        self.assertEqual(tuple(firma.args), (historial.pk, True))
+        self.assertEqual(firma.options['task_id'], historial.tarea_id)
+
+        CacheService.set(ReporteService._clave_progreso(historial.pk), 1200)
+        self.addCleanup(CacheService.delete, ReporteService._clave_progreso(historial.pk))
+        response = self.client.get(reverse('api:historialreporte-estado', args=[historial.pk]))
+        self.assertEqual(response.data['estado'], 'en_cola')
+        self.assertEqual(response.data['filas'], 1200)
+
+    def test_procesa_publicando_el_progreso(self):
+        historial = self._encolar()
+        original = ReporteService._registrar_progreso
+        vistos = []
+
+        def registrar(historial_id, filas):
+            original(historial_id, filas)
+            vistos.append(ReporteService.filas_procesadas(HistorialReporte.objects.get(pk=historial_id)))
+
+        with mock.patch.object(ReporteService, 'TAMANO_LOTE', 2), \
+                mock.patch.object(ReporteService, '_registrar_progreso', side_effect=registrar):
+            ReporteService.procesar_historial(historial.pk)
+
+        historial.refresh_from_db()
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        self.assertEqual(vistos, [2, 4, 5])
+        self.assertEqual(historial.filas, 5)
+        self.assertIsNotNone(historial.fecha_inicio)
+        self.assertIsNone(CacheService.get(ReporteService._clave_progreso(historial.pk)))
+        # Una vez procesado, la tarea repetida no lo vuelve a ejecutar
+        self.assertIsNone(ReporteService.procesar_historial(historial.pk))
+
+    @override_settings(REPORTES_MAX_CONCURRENTES=2, REPORTES_MAX_CONCURRENTES_USUARIO=1)
+    def test_limites_de_concurrencia(self):
+        en_curso = self._encolar()
+        HistorialReporte.objects.filter(pk=en_curso.pk).update(estado='ejecutando', fecha_inicio=timezone.now())
+        historial = self._encolar()
+
+        with self.assertRaisesMessage(CapacidadReportesAgotada, 'usuario'):
+            ReporteService.procesar_historial(historial.pk)
+        historial.refresh_from_db()
+        self.assertEqual(historial.estado, 'en_cola')
+
+        # Otro usuario tiene capacidad propia, pero no global
+        del_otro = self._encolar(usuario=self.otro)
+        HistorialReporte.objects.filter(pk=del_otro.pk).update(estado='ejecutando', fecha_inicio=timezone.now())
+        with self.assertRaises(CapacidadReportesAgotada):
+            ReporteService.procesar_historial(self._encolar(usuario=self.otro).pk)
+
+        # Las ejecuciones que superaron el límite duro ya no ocupan capacidad
+        HistorialReporte.objects.filter(estado='ejecutando').update(fecha_inicio=timezone.now() - timedelta(days=1))
+        self.assertEqual(ReporteService.procesar_historial(historial.pk).estado, 'exito')
+
+    def test_cancelar_en_cola_y_terminado(self):
+        historial = self._encolar()
+
+        response = self.client.post(reverse('api:historialreporte-cancelar', args=[historial.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['estado'], 'cancelado')
+        self.assertIsNone(ReporteService.procesar_historial(historial.pk))
+        response = self.client.post(reverse('api:historialreporte-cancelar', args=[historial.pk]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_cancelar_en_ejecucion_se_detiene_entre_lotes(self):
+        historial = self._encolar()
+        clave = ReporteService._clave_cancelacion(historial.pk)
+        self.addCleanup(CacheService.delete, clave)
+        # La cancelación llega cuando la tarea ya tomó el historial
+        iniciar = ReporteService._iniciar
+
+        def iniciar_y_cancelar(historial_id, limitar):
+            resultado = iniciar(historial_id, limitar)
+            self.assertTrue(ReporteService.cancelar(historial_id))
+            return resultado
+
+        with mock.patch.object(ReporteService, 'TAMANO_LOTE', 2), \
+                mock.patch.object(ReporteService, '_iniciar', side_effect=iniciar_y_cancelar):
+            ReporteService.procesar_historial(historial.pk)
+
+        historial.refresh_from_db()
+        self.assertEqual(historial.estado, 'cancelado')
+        self.assertFalse(historial.archivo)
+        self.assertIsNone(CacheService.get(clave))
+
+    @override_settings(REPORTES_STATEMENT_TIMEOUT=1)
+    def test_statement_timeout(self):
+        reporte = Reporte.objects.create(
+            nombre='Lento', tipo='personalizado', formato='csv', consulta_sql='SELECT pg_sleep(:segundos)'
+        )
+
+        historial = ReporteService.ejecutar_reporte(reporte, {'segundos': 3}, usar_cache=False)
+
+        self.assertEqual(historial.estado, 'error')
+        self.assertIn('statement timeout', historial.mensaje_error)
@@ -0,0 +1,157 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from clientes.models import Cliente
+from inventario.models import Categoria, Producto
+from reportes.models import AporteVenta, VentaDiaria, VentaMensual
+from reportes.services.hechos_ventas_service import HechosVentasService
+from ventas.models import DetalleVenta, Venta
+
+
+class HechosVentasServiceTest(TestCase):
+    """Acumulados diarios y mensuales de ventas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='1234567890', nombres='Cliente', apellidos='Hechos'
+        )
+        cls.categoria = Categoria.objects.create(nombre='Accesorios')
+        cls.producto = Producto.objects.create(
+            codigo='HV001', nombre='Cable', categoria=cls.categoria, precio_venta=Decimal('5.00')
+        )
+
+    def setUp(self):
+        # Ventas programadas por otras pruebas cuyas transacciones nunca se confirman
+        HechosVentasService._pendientes().clear()
+
+    def _venta(self, numero, fecha, total, estado='pagada', cantidad=Decimal('2.00')):
+        venta = Venta.objects.create(
+            numero=numero, cliente=self.cliente, tipo='factura', estado=estado,
+            subtotal=total, total=total
+        )
+        Venta.objects.filter(pk=venta.pk).update(
+            fecha=timezone.make_aware(datetime.combine(fecha, datetime.min.time().replace(hour=10)))
+        )
+        DetalleVenta.objects.bulk_create([DetalleVenta(
+            venta=venta, producto=self.producto, cantidad=cantidad, precio_unitario=total / cantidad,
+            subtotal=total, total=total
+        )])
+        return venta
+
+    def _cabecera(self, modelo, **filtros):
+        return modelo.objects.get(producto__isnull=True, **filtros)
+
+    def test_actualizar_agrega_cabecera_y_lineas(self):
+        venta = self._venta('FAC-HV1', date(2025, 3, 10), Decimal('20.00'))
+
+        HechosVentasService.actualizar([venta.pk])
+
+        diaria = self._cabecera(VentaDiaria, fecha=date(2025, 3, 10), estado='pagada')
+        self.assertEqual((diaria.num_ventas, diaria.total), (1, Decimal('20.00')))
+        linea = VentaMensual.objects.get(mes=date(2025, 3, 1), producto=self.producto)
+        self.assertEqual(linea.categoria_id, self.categoria.pk)
+        self.assertEqual((linea.cantidad, linea.total), (Decimal('2.00'), Decimal('20.00')))
+
+    def test_reprocesar_no_duplica_y_cambio_de_estado_mueve_el_aporte(self):
+        venta = self._venta('FAC-HV2', date(2025, 3, 10), Decimal('20.00'))
+        HechosVentasService.actualizar([venta.pk])
+        HechosVentasService.actualizar([venta.pk])
+        self.assertEqual(self._cabecera(VentaMensual, estado='pagada').num_ventas, 1)
+
+        Venta.objects.filter(pk=venta.pk).update(estado='anulada')
+        HechosVentasService.actualizar([venta.pk])
+
+        self.assertFalse(VentaMensual.objects.filter(estado='pagada').exists())
+        self.assertEqual(self._cabecera(VentaMensual, estado='anulada').total, Decimal('20.00'))
+
+    def test_venta_eliminada_resta_su_aporte(self):
+        venta = self._venta('FAC-HV3', date(2025, 3, 10), Decimal('20.00'))
+        HechosVentasService.actualizar([venta.pk])
+
+        # Los detalles se borran sin señales: la que recalcula los totales de la
+        # venta al borrar un detalle intenta guardar Venta.iva, que es una propiedad
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {DetalleVenta._meta.db_table} WHERE venta_id = %s', [venta.pk])
+        Venta.objects.filter(pk=venta.pk).delete()
+        HechosVentasService.actualizar([venta.pk])
+
+        self.assertFalse(VentaDiaria.objects.exists())
+        self.assertFalse(VentaMensual.objects.exists())
+        self.assertFalse(AporteVenta.objects.exists())
+
+    def test_reconstruir_coincide_con_incremental(self):
+        ventas = [
+            self._venta('FAC-HV4', date(2025, 1, 31), Decimal('10.00')),
+            self._venta('FAC-HV5', date(2025, 2, 1), Decimal('15.00')),
+            self._venta('FAC-HV6', date(2025, 2, 1), Decimal('5.00'), estado='emitida'),
+        ]
+        HechosVentasService.actualizar([venta.pk for venta in ventas])
+        campos = ('tipo', 'estado', 'producto_id', 'categoria_id', 'num_ventas', 'cantidad', 'total')
+        incremental = sorted(VentaDiaria.objects.values_list('fecha', *campos), key=str)
+
+        call_command('reconstruir_hechos_ventas', stdout=mock.MagicMock())
+
+        self.assertEqual(sorted(VentaDiaria.objects.values_list('fecha', *campos), key=str), incremental)
+        self.assertEqual(self._cabecera(VentaMensual, mes=date(2025, 2, 1), estado='pagada').total, Decimal('15.00'))
+        # Reprocesar tras la reconstrucción no duplica
+        HechosVentasService.actualizar([venta.pk for venta in ventas])
+        self.assertEqual(sorted(VentaDiaria.objects.values_list('fecha', *campos), key=str), incremental)
+
+    def test_resumen_combina_meses_completos_y_dias_sueltos(self):
+        ventas = [
+            self._venta('FAC-HV7', date(2025, 1, 20), Decimal('1.00')),
+            self._venta('FAC-HV8', date(2025, 2, 14), Decimal('2.00')),
+            self._venta('FAC-HV9', date(2025, 3, 5), Decimal('4.00')),
+            self._venta('FAC-HV10', date(2025, 3, 25), Decimal('8.00')),
+        ]
+        HechosVentasService.actualizar([venta.pk for venta in ventas])
+
+        por_mes = HechosVentasService.resumen(date(2025, 1, 15), date(2025, 3, 10), agrupar='mes')
+        self.assertEqual(
+            [(fila['periodo'], fila['total']) for fila in por_mes],
+            [(date(2025, 1, 1), Decimal('1.00')), (date(2025, 2, 1), Decimal('2.00')),
+             (date(2025, 3, 1), Decimal('4.00'))]
+        )
+        por_dia = HechosVentasService.resumen(date(2025, 3, 1), date(2025, 3, 31), estados=['pagada'])
+        self.assertEqual([fila['periodo'] for fila in por_dia], [date(2025, 3, 5), date(2025, 3, 25)])
+
+        mas_vendidos = HechosVentasService.productos_mas_vendidos(date(2025, 2, 1), date(2025, 3, 10))
+        self.assertEqual(mas_vendidos[0]['producto'], self.producto)
+        self.assertEqual(mas_vendidos[0]['cantidad'], Decimal('4.00'))
+
+    def test_cambios_de_venta_se_programan_al_confirmar(self):
+        with mock.patch.object(HechosVentasService, 'encolar') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                venta = Venta.objects.create(
+                    numero='FAC-HV11', cliente=self.cliente, tipo='factura', subtotal=1, total=1
+                )
+
+        encolar.assert_called_with([venta.pk])
+
+    def test_una_tarea_por_transaccion(self):
+        with mock.patch.object(HechosVentasService, 'encolar') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                ventas = [
+                    Venta.objects.create(numero=f'FAC-HV2{i}', cliente=self.cliente, tipo='factura', subtotal=1, total=1)
+                    for i in range(3)
+                ]
+                ventas[0].estado = 'pagada'
+                ventas[0].save()
+
+        encolar.assert_called_once_with(sorted(venta.pk for venta in ventas))
+
+    def test_filas_de_totales_sin_producto_se_acumulan_en_una(self):
+        self._venta('FAC-HV31', date(2025, 4, 2), Decimal('10.00'))
+        self._venta('FAC-HV32', date(2025, 4, 2), Decimal('15.00'))
+        HechosVentasService.actualizar(Venta.objects.values_list('pk', flat=True))
+
+        cabecera = self._cabecera(VentaDiaria, fecha=date(2025, 4, 2))
+        self.assertEqual((cabecera.num_ventas, cabecera.total), (2, Decimal('25.00')))
+
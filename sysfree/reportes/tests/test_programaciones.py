@@ -0,0 +1,177 @@
+import shutil
+import tempfile
+from datetime import time, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from reportes.models import HistorialReporte, ProgramacionReporte, Reporte
+from reportes.services import programacion_reporte_service
+from reportes.services.programacion_reporte_service import ProgramacionReporteService
+
+User = get_user_model()
+
+
+class ProgramacionesTest(TestCase):
+    """Despacho de reportes programados vencidos y envío de sus resultados."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='programador@example.com', password='x', nombres='Programador')
+        cls.reporte = Reporte.objects.create(
+            nombre='Numeros', tipo='personalizado', formato='csv',
+            consulta_sql='SELECT g AS numero FROM generate_series(1, 3) AS g'
+        )
+
+    def _programacion(self, nombre, proxima, activo=True, **extra):
+        return ProgramacionReporte.objects.create(
+            reporte=self.reporte, nombre=nombre, frecuencia='diaria', hora=time(6, 0),
+            destinatarios='a@example.com, b@example.com', asunto=f'Reporte {nombre}',
+            proxima_ejecucion=proxima, activo=activo, creado_por=self.user, **extra
+        )
+
+    def test_despacha_solo_las_vencidas_una_vez(self):
+        ahora = timezone.now()
+        vencida = self._programacion('vencida', ahora - timedelta(minutes=5))
+        futura = self._programacion('futura', ahora + timedelta(hours=1))
+        inactiva = self._programacion('inactiva', ahora - timedelta(minutes=5), activo=False)
+        sin_fecha = self._programacion('sin fecha', None)
+
+        with mock.patch.object(ProgramacionReporteService, '_enviar_lote') as enviar_lote, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ProgramacionReporteService.despachar_vencidas(), 1)
+            self.assertEqual(ProgramacionReporteService.despachar_vencidas(), 0)
+
+        historial = HistorialReporte.objects.get()
+        self.assertEqual(historial.programacion, vencida)
+        self.assertEqual(historial.estado, 'en_cola')
+        self.assertEqual(historial.creado_por, self.user)
+        self.assertTrue(historial.enviar_por_correo)
+        enviar_lote.assert_called_once_with([(historial.pk, historial.tarea_id)])
+        for programacion in (vencida, futura, inactiva, sin_fecha):
+            programacion.refresh_from_db()
+        self.assertGreater(vencida.proxima_ejecucion, ahora)
+        self.assertGreater(sin_fecha.proxima_ejecucion, ahora)
+        self.assertLess(inactiva.proxima_ejecucion, ahora)
+
+    def test_envia_el_lote_por_una_conexion(self):
+        historiales = []
+        for nombre in ('uno', 'dos'):
+            historial = HistorialReporte.objects.create(
+                reporte=self.reporte, programacion=self._programacion(nombre, None), estado='exito'
+            )
+            historial.archivo.save(f'{nombre}.csv', ContentFile(b'numero\n1\n'))
+            historiales.append(historial.pk)
+        fallido = HistorialReporte.objects.create(
+            reporte=self.reporte, programacion=self._programacion('fallido', None), estado='error'
+        )
+
+        with mock.patch.object(
+            programacion_reporte_service, 'get_connection', wraps=programacion_reporte_service.get_connection
+        ) as get_connection:
+            enviados = ProgramacionReporteService.enviar_resultados(historiales + [fallido.pk])
+
+        self.assertEqual(enviados, 2)
+        get_connection.assert_called_once()
+        self.assertEqual([m.subject for m in mail.outbox], ['Reporte uno', 'Reporte dos'])
+        self.assertEqual(mail.outbox[0].to, ['a@example.com', 'b@example.com'])
+        self.assertEqual(mail.outbox[0].attachments[0][1], 'numero\n1\n')
+        # Un reintento no vuelve a enviar
+        self.assertEqual(ProgramacionReporteService.enviar_resultados(historiales), 0)
+
+    @override_settings(REPORTES_CORREO_MAX_ADJUNTO=4)
+    def test_sin_broker_ejecuta_y_envia_en_el_proceso(self):
+        programacion = self._programacion('directa', timezone.now() - timedelta(minutes=1))
+
+        with mock.patch('celery.chord', side_effect=ConnectionError('broker caído')), \
+                self.captureOnCommitCallbacks(execute=True):
+            ProgramacionReporteService.despachar_vencidas()
+
+        historial = HistorialReporte.objects.get(programacion=programacion)
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        self.assertIsNotNone(historial.fecha_envio)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].attachments, [])
+        self.assertIn('supera el tamaño máximo', mail.outbox[0].body)
+
+    def test_despacho_envia_los_resultados_que_su_lote_no_envio(self):
+        ahora = timezone.now()
+        historiales = {
+            nombre: HistorialReporte.objects.create(
+                reporte=self.reporte, programacion=self._programacion(nombre, None), estado='exito',
+                enviar_por_correo=nombre != 'manual'
+            )
+            for nombre in ('rezagado', 'reciente', 'antiguo', 'manual')
+        }
+        rezagado, reciente, antiguo = historiales['rezagado'], historiales['reciente'], historiales['antiguo']
+        # Terminados antes del límite duro de una ejecución; el antiguo, fuera de la ventana. La ejecución
+        # manual (ejecutar_ahora) no pasa por el despacho y no se envía
+        HistorialReporte.objects.filter(pk__in=[rezagado.pk, antiguo.pk, historiales['manual'].pk]).update(
+            fecha_modificacion=ahora - timedelta(hours=1)
+        )
+        HistorialReporte.objects.filter(pk=antiguo.pk).update(fecha_ejecucion=ahora - timedelta(days=2))
+
+        ProgramacionReporteService.despachar_vencidas()
+        ProgramacionReporteService.despachar_vencidas()
+
+        self.assertEqual([m.subject for m in mail.outbox], ['Reporte rezagado'])
+        # El chord que termina después no lo repite
+        self.assertEqual(ProgramacionReporteService.enviar_resultados([rezagado.pk, reciente.pk]), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_programacion_sin_proxima_ejecucion_valida_se_desactiva(self):
+        mensual = self._programacion('sin día', None)
+        ProgramacionReporte.objects.filter(pk=mensual.pk).update(frecuencia='mensual')
+
+        with self.assertLogs('sysfree', 'ERROR') as registros:
+            ProgramacionReporteService.despachar_vencidas()
+        with self.assertNoLogs('sysfree', 'ERROR'):
+            ProgramacionReporteService.despachar_vencidas()
+
+        mensual.refresh_from_db()
+        self.assertFalse(mensual.activo)
+        self.assertIsNone(mensual.proxima_ejecucion)
+        self.assertIn(f'programación {mensual.pk}', registros.output[0])
+
+    def test_api_calcula_la_proxima_ejecucion(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('api:programacionreporte-list'), {
+            'reporte': self.reporte.pk, 'nombre': 'Diaria', 'frecuencia': 'diaria', 'hora': '06:00',
+            'destinatarios': 'a@example.com', 'asunto': 'Diario',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        programacion = ProgramacionReporte.objects.get(pk=response.data['id'])
+        self.assertGreater(programacion.proxima_ejecucion, timezone.now())
+
+    def test_ejecutar_ahora_no_envia_por_correo(self):
+        programacion = self._programacion('manual', timezone.now() + timedelta(hours=1))
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('api:programacionreporte-ejecutar-ahora', args=[programacion.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        historial = HistorialReporte.objects.get(pk=response.data['id'])
+        self.assertEqual(historial.programacion, programacion)
+        self.assertFalse(historial.enviar_por_correo)
@@ -0,0 +1,211 @@
+import csv
+import io
+import shutil
+import tempfile
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from django.test import TestCase, override_settings
+from openpyxl import load_workbook
+from pypdf import PdfReader
+
+from reportes.models import Reporte
+from reportes.services import reporte_service
+from reportes.services.reporte_service import ReporteService
+from reportes.utils import parquet_tabular, pdf_tabular
+
+CONSULTA = (
+    "SELECT g AS id, 'Item ' || g AS nombre, (g % 3)::numeric AS resto, :etiqueta AS etiqueta "
+    "FROM generate_series(1, :filas) AS g ORDER BY g"
+)
+
+CONSULTA_TIPOS = (
+    "SELECT g AS id, 'Item ' || g AS nombre, (g * 1.005)::numeric(12,2) AS importe, g / 4.0 AS razon, "
+    "TIMESTAMPTZ '2025-01-01 10:00:00-05' + g * INTERVAL '1 hour' AS fecha, DATE '2025-01-01' + g AS dia, "
+    "('{\"g\": ' || g || '}')::jsonb AS extra FROM generate_series(1, :filas) AS g ORDER BY g"
+)
+
+
+class ReporteServiceTest(TestCase):
+    """Ejecución de reportes con consultas parametrizadas y escritura por lotes."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    def _reporte(self, formato):
+        return Reporte.objects.create(nombre='Items', tipo='personalizado', formato=formato, consulta_sql=CONSULTA)
+
+    def test_preparar_consulta_enlaza_parametros(self):
+        consulta, valores = ReporteService._preparar_consulta(
+            "SELECT '10:30' AS hora, fecha::date, 50 % 7 -- :comentario\n"
+            "FROM t WHERE nombre LIKE '%x' AND id = :id AND fecha > :desde",
+            {'id': 5, 'desde': '2025-01-01', 'otro': 1}
+        )
+
+        self.assertEqual(
+            consulta,
+            "SELECT '10:30' AS hora, fecha::date, 50 %% 7 -- :comentario\n"
+            "FROM t WHERE nombre LIKE '%%x' AND id = %(id)s AND fecha > %(desde)s"
+        )
+        self.assertEqual(valores, {'id': 5, 'desde': '2025-01-01'})
+
+    def test_parametro_faltante(self):
+        with self.assertRaisesMessage(ValueError, 'filas'):
+            ReporteService._preparar_consulta(CONSULTA, {'etiqueta': 'x'})
+
+    def test_csv_por_lotes_con_valores_enlazados(self):
+        with mock.patch.object(ReporteService, 'TAMANO_LOTE', 2):
+            historial = ReporteService.ejecutar_reporte(
+                self._reporte('csv'), {'filas': 5, 'etiqueta': "O'Brien'; DROP TABLE x; --"}
+            )
+
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        with historial.archivo.open('rb') as archivo:
+            filas = list(csv.reader(io.TextIOWrapper(archivo, encoding='utf-8', newline='')))
+        self.assertEqual(filas[0], ['id', 'nombre', 'resto', 'etiqueta'])
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(filas[5], ['5', 'Item 5', '2', "O'Brien'; DROP TABLE x; --"])
+
+    def test_excel_continua_en_otra_hoja_al_llegar_al_limite(self):
+        with mock.patch.object(reporte_service, 'EXCEL_MAX_FILAS', 3):
+            historial = ReporteService.ejecutar_reporte(self._reporte('excel'), {'filas': 5, 'etiqueta': 'a'})
+
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        with historial.archivo.open('rb') as archivo:
+            libro = load_workbook(archivo, read_only=True)
+            hojas = [list(hoja.values) for hoja in libro.worksheets]
+        self.assertEqual(libro.sheetnames, ['Datos', 'Datos 2', 'Datos 3'])
+        self.assertEqual([len(hoja) for hoja in hojas], [3, 3, 2])
+        self.assertEqual(hojas[2][1], (5, 'Item 5', 2, 'a'))
+
+    def _tabla_parquet(self, historial):
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        with historial.archivo.open('rb') as archivo:
+            parquet = pq.ParquetFile(io.BytesIO(archivo.read()))
+        return parquet, parquet.read(use_threads=False)
+
+    def test_parquet_por_grupos_con_los_tipos_de_la_consulta(self):
+        reporte = Reporte.objects.create(
+            nombre='Tipos', tipo='personalizado', formato='parquet', consulta_sql=CONSULTA_TIPOS
+        )
+        with mock.patch.object(ReporteService, 'TAMANO_LOTE', 2), \
+                mock.patch.object(parquet_tabular, 'FILAS_POR_GRUPO', 2):
+            historial = ReporteService.ejecutar_reporte(reporte, {'filas': 5})
+
+        parquet, tabla = self._tabla_parquet(historial)
+        self.assertEqual(historial.filas, 5)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        self.assertEqual(parquet.schema_arrow.types, [
+            pa.int32(), pa.string(), pa.decimal128(12, 2), pa.decimal128(38, 20),
+            pa.timestamp('us', tz='UTC'), pa.date32(), pa.string(),
+        ])
+        ultima = tabla.slice(4).to_pylist()[0]
+        self.assertEqual(ultima['importe'], Decimal('5.03'))
+        self.assertEqual(ultima['razon'], Decimal('1.25'))
+        self.assertEqual(ultima['fecha'], datetime(2025, 1, 1, 20, tzinfo=dt_timezone.utc))
+        self.assertEqual(ultima['dia'], date(2025, 1, 6))
+        self.assertEqual(ultima['extra'].replace(' ', ''), '{"g":5}')
+
+    def test_parquet_sin_filas_conserva_el_esquema(self):
+        historial = ReporteService.ejecutar_reporte(self._reporte('parquet'), {'filas': 0, 'etiqueta': 'a'})
+
+        parquet, tabla = self._tabla_parquet(historial)
+        self.assertEqual(tabla.num_rows, 0)
+        self.assertEqual(tabla.column_names, ['id', 'nombre', 'resto', 'etiqueta'])
+        self.assertEqual(tabla.schema.field('id').type, pa.int32())
+
+    def test_error_de_consulta_queda_en_el_historial(self):
+        historial = ReporteService.ejecutar_reporte(self._reporte('csv'), {'etiqueta': 'a'})
+
+        self.assertEqual(historial.estado, 'error')
+        self.assertIn('filas', historial.mensaje_error)
+
+    def _paginas_pdf(self, historial):
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        with historial.archivo.open('rb') as archivo:
+            return [pagina.extract_text() for pagina in PdfReader(io.BytesIO(archivo.read())).pages]
+
+    def test_pdf_tabular_por_paginas_con_encabezados(self):
+        historial = ReporteService.ejecutar_reporte(self._reporte('pdf'), {'filas': 300, 'etiqueta': 'a'})
+
+        paginas = self._paginas_pdf(historial)
+        self.assertGreater(len(paginas), 1)
+        self.assertEqual(historial.filas, 300)
+        for numero, texto in enumerate(paginas, start=1):
+            self.assertIn('id\nnombre\nresto\netiqueta\n', texto)
+            self.assertIn(f'Página {numero}', texto)
+        self.assertIn('Item 300', paginas[-1])
+
+    def test_pdf_tabular_en_procesos_concatena_las_partes(self):
+        # La fecha impresa en cada página debe ser la misma en ambas ejecuciones
+        ahora = reporte_service.timezone.now()
+        with mock.patch.object(reporte_service.timezone, 'now', return_value=ahora):
+            with mock.patch.object(pdf_tabular, 'PAGINAS_POR_PARTE', 1), \
+                    override_settings(REPORTES_PDF_PROCESOS=2):
+                historial = ReporteService.ejecutar_reporte(self._reporte('pdf'), {'filas': 300, 'etiqueta': 'a'})
+            secuencial = ReporteService.ejecutar_reporte(
+                self._reporte('pdf'), {'filas': 300, 'etiqueta': 'a'}, usar_cache=False
+            )
+
+        paginas = self._paginas_pdf(historial)
+        self.assertEqual(historial.filas, 300)
+        self.assertEqual(paginas, self._paginas_pdf(secuencial))
+
+    def test_pdf_tabular_en_proceso_daemon_renderiza_sin_procesos_hijos(self):
+        # Los workers prefork de Celery son daemon: un ProcessPoolExecutor fallaría
+        destino = io.BytesIO()
+        with mock.patch.object(pdf_tabular.multiprocessing, 'current_process',
+                               return_value=mock.Mock(daemon=True)), \
+                mock.patch.object(pdf_tabular, 'ProcessPoolExecutor') as grupo, \
+                mock.patch.object(pdf_tabular, 'PAGINAS_POR_PARTE', 1):
+            filas = pdf_tabular.escribir_pdf(
+                ['id', 'nombre'], [[(i, f'Item {i}') for i in range(1, 201)]], destino, procesos=2
+            )
+
+        grupo.assert_not_called()
+        self.assertEqual(filas, 200)
+        self.assertIn('Item 200', PdfReader(io.BytesIO(destino.getvalue())).pages[-1].extract_text())
+
+    def test_pdf_tabular_concatena_las_partes_objeto_por_objeto(self):
+        destino = io.BytesIO()
+        with mock.patch.object(pdf_tabular, 'PAGINAS_POR_PARTE', 2):
+            filas = pdf_tabular.escribir_pdf(
+                ['id', 'nombre'], [[(i, f'Item {i}') for i in range(1, 501)]], destino, titulo='Ventas'
+            )
+
+        pdf = destino.getvalue()
+        lector = PdfReader(io.BytesIO(pdf), strict=True)
+        self.assertEqual(filas, 500)
+        self.assertGreater(len(lector.pages), 4)
+        self.assertEqual(lector.metadata.title, 'Ventas')
+        for numero, pagina in enumerate(lector.pages, start=1):
+            self.assertIn(f'Página {numero}', pagina.extract_text())
+        self.assertIn('Item 500', lector.pages[-1].extract_text())
+        # Cada entrada de la tabla de referencias cruzadas apunta a su objeto
+        inicio = int(pdf.rsplit(b'startxref\n', 1)[1].split()[0])
+        entradas = pdf[inicio:].split(b'\n')[2:]
+        for numero in range(1, int(pdf[inicio:].split(b'\n')[1].split()[1])):
+            posicion = int(entradas[numero][:10])
+            self.assertTrue(pdf[posicion:].startswith(f'{numero} 0 obj'.encode()), numero)
+
+    def test_html_generico(self):
+        historial = ReporteService.ejecutar_reporte(self._reporte('html'), {'filas': 2, 'etiqueta': '<b>'})
+
+        self.assertEqual(historial.estado, 'exito', historial.mensaje_error)
+        with historial.archivo.open('rb') as archivo:
+            html = archivo.read().decode('utf-8')
+        self.assertIn('<th>nombre</th>', html)
+        self.assertIn('<td>Item 2</td>', html)
+        self.assertIn('&lt;b&gt;', html)
@@ -0,0 +1,4 @@
+"""
+Utilidades de la aplicación reportes que no dependen de Django (se pueden
+importar en procesos auxiliares sin configurar el proyecto).
+"""
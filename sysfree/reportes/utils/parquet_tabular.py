@@ -0,0 +1,200 @@
+"""
+Reportes tabulares en Parquet con pyarrow, escritos por grupos de filas.
+
+Las filas llegan por lotes (p. ej. del cursor del servidor); cada lote se
+convierte en un ``RecordBatch`` columnar y, al acumular ``FILAS_POR_GRUPO``
+filas, se escriben como un grupo de filas (row group) comprimido, de modo que
+en memoria hay a lo sumo un grupo.
+
+El esquema se fija antes de escribir el primer grupo: los tipos conocidos se
+reciben en ``tipos`` (ver ``tipos_de_descripcion`` y ``tipo_de_campo``) y el
+resto se infiere del primer lote. Los importes se guardan como ``decimal``
+con su precisión y escala, las fechas con hora como ``timestamp`` en UTC y
+los valores sin tipo propio en Arrow (UUID, JSON) como texto.
+"""
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+FILAS_POR_GRUPO = 100_000
+COMPRESION = 'zstd'
+# Precisión de los decimales cuya precisión no se conoce (numeric sin modificador)
+PRECISION_DECIMAL = 38
+
+# Tipos de PostgreSQL (nombre en psycopg) con equivalente directo en Arrow; los
+# demás se guardan como texto, salvo numeric, que depende de su precisión
+TIPOS_POSTGRES = {
+    'bool': pa.bool_(),
+    'int2': pa.int16(),
+    'int4': pa.int32(),
+    'int8': pa.int64(),
+    'oid': pa.int64(),
+    'float4': pa.float32(),
+    'float8': pa.float64(),
+    'date': pa.date32(),
+    'time': pa.time64('us'),
+    'timestamp': pa.timestamp('us'),
+    'timestamptz': pa.timestamp('us', tz='UTC'),
+    'interval': pa.duration('us'),
+    'bytea': pa.binary(),
+}
+
+# Tipos internos de los campos de Django con equivalente directo en Arrow
+TIPOS_DJANGO = {
+    'AutoField': pa.int32(),
+    'BigAutoField': pa.int64(),
+    'SmallAutoField': pa.int16(),
+    'IntegerField': pa.int32(),
+    'BigIntegerField': pa.int64(),
+    'SmallIntegerField': pa.int16(),
+    'PositiveIntegerField': pa.int64(),
+    'PositiveBigIntegerField': pa.int64(),
+    'PositiveSmallIntegerField': pa.int32(),
+    'BooleanField': pa.bool_(),
+    'FloatField': pa.float64(),
+    'DateField': pa.date32(),
+    'TimeField': pa.time64('us'),
+    'DurationField': pa.duration('us'),
+    'BinaryField': pa.binary(),
+}
+
+
+def escribir_parquet(columnas, lotes, destino, tipos=None):
+    """
+    Escribe una tabla en Parquet.
+
+    Args:
+        columnas (list): Nombres de las columnas
+        lotes: Iterable de listas de filas (tuplas)
+        destino: Archivo binario abierto para escritura
+        tipos (list): Tipo de Arrow de cada columna; None (en la lista o en
+            lugar de ella) = se infiere del primer lote
+
+    Returns:
+        int: Número de filas escritas
+    """
+    columnas = [str(columna) for columna in columnas]
+    tipos = list(tipos) if tipos else [None] * len(columnas)
+    esquema, escritor = None, None
+    pendientes, filas_pendientes, total = [], 0, 0
+    try:
+        for lote in lotes:
+            if not lote:
+                continue
+            valores = list(zip(*lote))
+            if escritor is None:
+                esquema = pa.schema([
+                    pa.field(nombre, tipo or _inferir(columna))
+                    for nombre, tipo, columna in zip(columnas, tipos, valores)
+                ])
+                escritor = pq.ParquetWriter(destino, esquema, compression=COMPRESION)
+            pendientes.append(pa.record_batch(
+                [_arreglo(columna, campo.type) for columna, campo in zip(valores, esquema)], schema=esquema
+            ))
+            filas_pendientes += len(lote)
+            total += len(lote)
+            del valores
+            if filas_pendientes >= FILAS_POR_GRUPO:
+                escritor.write_table(pa.Table.from_batches(pendientes), row_group_size=FILAS_POR_GRUPO)
+                pendientes, filas_pendientes = [], 0
+
+        if escritor is None:
+            # Sin filas: archivo con el esquema conocido (texto donde no hay tipo)
+            esquema = pa.schema([pa.field(nombre, tipo or pa.string()) for nombre, tipo in zip(columnas, tipos)])
+            escritor = pq.ParquetWriter(destino, esquema, compression=COMPRESION)
+        if pendientes:
+            escritor.write_table(pa.Table.from_batches(pendientes), row_group_size=FILAS_POR_GRUPO)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+
+def tipos_de_descripcion(descripcion):
+    """
+    Tipos de Arrow de las columnas de ``cursor.description`` (psycopg).
+
+    Los numeric con precisión declarada se guardan como decimal con esa
+    precisión y escala; los numeric sin ella (p. ej. resultados de SUM o AVG)
+    se infieren del primer lote.
+
+    Returns:
+        list: Tipo de Arrow (o None) por columna
+    """
+    from psycopg.postgres import types as tipos_postgres
+
+    tipos = []
+    for columna in descripcion:
+        info = tipos_postgres.get(columna.type_code)
+        nombre = info.name if info else None
+        if nombre == 'numeric':
+            tipos.append(_decimal(columna.precision, columna.scale) if columna.precision else None)
+        else:
+            tipos.append(TIPOS_POSTGRES.get(nombre, pa.string()))
+    return tipos
+
+
+def tipo_de_campo(campo):
+    """
+    Tipo de Arrow de un campo de modelo de Django.
+
+    Las claves foráneas toman el tipo de la clave que referencian; los campos
+    sin equivalente (textos, UUID, JSON) se guardan como texto.
+    """
+    if campo.is_relation:
+        return tipo_de_campo(campo.target_field)
+    tipo = campo.get_internal_type()
+    if tipo == 'DecimalField':
+        return _decimal(campo.max_digits, campo.decimal_places)
+    if tipo == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    return TIPOS_DJANGO.get(tipo, pa.string())
+
+
+def _decimal(precision, escala):
+    if precision <= 38:
+        return pa.decimal128(precision, escala)
+    return pa.decimal256(precision, escala)
+
+
+def _inferir(valores):
+    """Tipo de una columna a partir de sus valores en el primer lote."""
+    try:
+        tipo = pa.array(valores).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.string()
+    if pa.types.is_null(tipo):
+        return pa.string()
+    if pa.types.is_decimal(tipo):
+        # La precisión y escala inferidas son las del lote; los siguientes pueden tener más dígitos
+        return pa.decimal128(PRECISION_DECIMAL, max(min(tipo.scale, PRECISION_DECIMAL), 0))
+    if pa.types.is_integer(tipo):
+        return pa.int64()
+    return tipo
+
+
+def _arreglo(valores, tipo):
+    """Arreglo de Arrow de ``tipo`` con los valores de una columna."""
+    try:
+        return pa.array(valores, type=tipo)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if pa.types.is_decimal(tipo):
+            # Más decimales que la escala de la columna: se redondean como PostgreSQL
+            return pc.round(
+                pa.array(valores), ndigits=tipo.scale, round_mode='half_towards_infinity'
+            ).cast(tipo)
+        if pa.types.is_string(tipo):
+            return pa.array([_texto(valor) for valor in valores], type=tipo)
+        raise
+
+
+def _texto(valor):
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, (bytes, memoryview)):
+        return bytes(valor).hex()
+    return str(valor)
@@ -0,0 +1,375 @@
+"""
+Reportes tabulares en PDF con ReportLab, escritos por partes.
+
+Las filas llegan por lotes (p. ej. del cursor del servidor) y se reparten en
+páginas de tamaño fijo: cada página es un ``Table`` de platypus con la fila de
+encabezados. El alto de fila es fijo (los textos se recortan al ancho de su
+columna), así que cada página lleva exactamente ``filas_por_pagina`` filas y
+el documento se divide en partes independientes de ``PAGINAS_POR_PARTE``
+páginas.
+
+Cada parte se renderiza en un archivo temporal y al final ``concatenar`` las
+une escribiendo el documento objeto por objeto, sin cargar todas las partes:
+la memoria depende del tamaño de una parte y no del número de filas. Con
+``procesos`` > 1 las partes se renderizan en un ``ProcessPoolExecutor``; los
+procesos se crean con ``spawn`` para no heredar las conexiones a la base de
+datos, por eso este módulo no importa Django. Dentro de un proceso daemon,
+como los workers prefork de Celery, que no pueden crear procesos hijos, se
+renderiza en el proceso actual.
+"""
+import json
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, create_string_object,
+)
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import BaseDocTemplate, Frame, PageBreak, PageTemplate, Table, TableStyle
+
+TAMANO_FUENTE = 7
+# Alto fijo de cada fila (puntos)
+ALTO_FILA = 11
+MARGEN = 28
+# Espacio reservado arriba de la tabla para el título de la página
+ALTO_TITULO = 22
+# Ancho medio aproximado de un carácter de Helvetica, en fracción del tamaño de fuente
+ANCHO_CARACTER = 0.55
+# Filas usadas para estimar el ancho de las columnas
+FILAS_MUESTRA = 500
+MIN_CARACTERES, MAX_CARACTERES = 4, 40
+# Páginas de cada parte renderizada por separado
+PAGINAS_POR_PARTE = 50
+# Atributos de página que pueden venir del árbol de páginas
+ATRIBUTOS_HEREDABLES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+def escribir_pdf(columnas, lotes, destino, titulo='', fecha='', procesos=1):
+    """
+    Escribe una tabla en PDF.
+
+    Args:
+        columnas (list): Nombres de las columnas
+        lotes: Iterable de listas de filas (tuplas)
+        destino: Archivo binario abierto para escritura
+        titulo (str): Título impreso en cada página
+        fecha (str): Fecha de generación impresa en cada página
+        procesos (int): Procesos de renderizado; 0 o 1 (o dentro de un
+            proceso daemon) = en este proceso
+
+    Returns:
+        int: Número de filas escritas
+    """
+    # Sin columnas (consulta sin resultados) la tabla lleva solo un aviso
+    columnas = list(columnas) or ['Sin resultados']
+    filas = chain.from_iterable(lotes)
+    muestra = list(islice(filas, FILAS_MUESTRA))
+    diseno = calcular_diseno(columnas, muestra, titulo, fecha)
+    filas = chain(muestra, filas)
+    with tempfile.TemporaryDirectory() as directorio:
+        if procesos > 1 and muestra and not multiprocessing.current_process().daemon:
+            partes, total = _renderizar_en_procesos(diseno, filas, directorio, procesos)
+        else:
+            partes, total = [], 0
+            for ruta, bloque, pagina_inicial in _partes(diseno, filas, directorio):
+                total += renderizar(diseno, bloque, ruta, pagina_inicial)
+                partes.append(ruta)
+        concatenar(partes, destino, diseno['titulo'])
+    return total
+
+
+def calcular_diseno(columnas, muestra, titulo='', fecha=''):
+    """
+    Orientación, anchos de columna y filas por página a partir de una muestra de filas.
+
+    Returns:
+        dict: Diseño serializable (se envía a los procesos de renderizado)
+    """
+    caracteres, numericas = [], []
+    for i, columna in enumerate(columnas):
+        largos = sorted(len(_texto(fila[i])) for fila in muestra)
+        # Percentil 90: un valor excepcionalmente largo no ensancha toda la columna
+        tipico = largos[int(len(largos) * 0.9)] if largos else 0
+        caracteres.append(min(max(len(str(columna)), tipico, MIN_CARACTERES), MAX_CARACTERES))
+        numericas.append(bool(muestra) and all(
+            isinstance(fila[i], (int, float, Decimal)) and not isinstance(fila[i], bool)
+            for fila in muestra if fila[i] is not None
+        ))
+
+    ancho_caracter = TAMANO_FUENTE * ANCHO_CARACTER
+    necesario = sum(c + 1 for c in caracteres) * ancho_caracter
+    horizontal = necesario > A4[0] - 2 * MARGEN
+    ancho_pagina, alto_pagina = landscape(A4) if horizontal else A4
+    disponible = ancho_pagina - 2 * MARGEN
+    escala = disponible / necesario if necesario else 1
+    anchos = [(c + 1) * ancho_caracter * escala for c in caracteres]
+    alto_tabla = alto_pagina - 2 * MARGEN - ALTO_TITULO
+    return {
+        'columnas': [str(columna) for columna in columnas],
+        'anchos': anchos,
+        'max_caracteres': [max(int(ancho / ancho_caracter) - 1, 1) for ancho in anchos],
+        'numericas': numericas,
+        'horizontal': horizontal,
+        # Una fila de la tabla es el encabezado
+        'filas_por_pagina': max(int(alto_tabla // ALTO_FILA) - 1, 1),
+        'titulo': titulo,
+        'fecha': fecha,
+    }
+
+
+def renderizar(diseno, filas, destino, pagina_inicial=1):
+    """
+    Escribe las filas en ``destino`` con el diseño dado.
+
+    Las tablas de todas las páginas se crean antes de construir el documento,
+    así que se usa con las filas de una parte (``PAGINAS_POR_PARTE`` páginas).
+
+    Args:
+        diseno (dict): Diseño calculado con ``calcular_diseno``
+        filas: Iterable de filas
+        destino: Ruta o archivo binario
+        pagina_inicial (int): Número impreso en la primera página
+
+    Returns:
+        int: Número de filas escritas
+    """
+    tamano = landscape(A4) if diseno['horizontal'] else A4
+    documento = BaseDocTemplate(
+        destino, pagesize=tamano, leftMargin=MARGEN, rightMargin=MARGEN, topMargin=MARGEN,
+        bottomMargin=MARGEN, title=diseno['titulo'], creator='SysFree'
+    )
+    marco = Frame(
+        MARGEN, MARGEN, tamano[0] - 2 * MARGEN, tamano[1] - 2 * MARGEN - ALTO_TITULO,
+        leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0, id='tabla'
+    )
+
+    def encabezado(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica-Bold', 10)
+        canvas.drawString(MARGEN, tamano[1] - MARGEN - 10, diseno['titulo'])
+        canvas.setFont('Helvetica', 7)
+        canvas.drawRightString(tamano[0] - MARGEN, tamano[1] - MARGEN - 10, diseno['fecha'])
+        canvas.drawRightString(tamano[0] - MARGEN, MARGEN / 2, f"Página {pagina_inicial + doc.page - 1}")
+        canvas.restoreState()
+
+    documento.addPageTemplates([PageTemplate(id='tabla', frames=[marco], onPage=encabezado)])
+    total = [0]
+    documento.build(list(_paginas(diseno, filas, total)))
+    return total[0]
+
+
+def _partes(diseno, filas, directorio):
+    """
+    Reparte las filas en bloques de ``PAGINAS_POR_PARTE`` páginas.
+
+    Genera ``(ruta, filas, pagina_inicial)`` por bloque, con la ruta del
+    archivo de la parte en ``directorio``; sin filas genera una parte vacía
+    (la tabla lleva solo los encabezados).
+    """
+    por_parte = diseno['filas_por_pagina'] * PAGINAS_POR_PARTE
+    numero = 0
+    while True:
+        bloque = list(islice(filas, por_parte))
+        if not bloque and numero:
+            return
+        yield os.path.join(directorio, f'{numero:06d}.pdf'), bloque, numero * PAGINAS_POR_PARTE + 1
+        numero += 1
+
+
+def _renderizar_en_procesos(diseno, filas, directorio, procesos):
+    """
+    Renderiza las partes en paralelo y devuelve sus rutas en orden y el total
+    de filas. Como máximo hay dos partes por proceso pendientes de
+    renderizar, lo que acota la memoria.
+    """
+    contexto = multiprocessing.get_context('spawn')
+    partes, total = [], 0
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as ejecutor:
+        pendientes = deque()
+        for ruta, bloque, pagina_inicial in _partes(diseno, filas, directorio):
+            pendientes.append(ejecutor.submit(renderizar, diseno, bloque, ruta, pagina_inicial))
+            partes.append(ruta)
+            del bloque
+            while len(pendientes) >= 2 * procesos:
+                total += pendientes.popleft().result()
+        while pendientes:
+            total += pendientes.popleft().result()
+    return partes, total
+
+
+def concatenar(partes, destino, titulo=''):
+    """
+    Une las partes en un solo PDF escrito directamente en ``destino``.
+
+    Se lee una parte a la vez con pypdf: sus páginas y los objetos que
+    referencian (contenido, recursos, fuentes) se renumeran y se escriben de
+    inmediato, así que en memoria quedan solo una parte y la posición de cada
+    objeto escrito (para la tabla de referencias cruzadas).
+
+    Args:
+        partes (list): Rutas de los PDF en orden
+        destino: Archivo binario abierto para escritura
+        titulo (str): Título de los metadatos del documento
+    """
+    salida = _SalidaPDF(destino)
+    salida.write(b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n')
+    # 1: catálogo, 2: árbol de páginas y 3: metadatos, escritos al final
+    raiz = IndirectObject(2, 0, None)
+    paginas, siguiente = [], [4]
+    for ruta in partes:
+        lector = PdfReader(ruta)
+        numeros, cola = {}, deque()
+
+        def renumerar(referencia):
+            if referencia.idnum not in numeros:
+                numeros[referencia.idnum] = siguiente[0]
+                siguiente[0] += 1
+                cola.append(referencia)
+            return IndirectObject(numeros[referencia.idnum], 0, None)
+
+        for pagina in lector.pages:
+            paginas.append(renumerar(pagina.indirect_reference))
+        while cola:
+            referencia = cola.popleft()
+            objeto = referencia.get_object()
+            if objeto.get('/Type') == '/Page':
+                _heredar(objeto)
+                objeto[NameObject('/Parent')] = raiz
+                for clave in list(objeto):
+                    if clave != '/Parent':
+                        objeto[clave] = _renumerar(objeto.raw_get(clave), renumerar)
+            else:
+                objeto = _renumerar(objeto, renumerar)
+            salida.objeto(numeros[referencia.idnum], objeto)
+        del lector
+
+    salida.objeto(1, DictionaryObject({NameObject('/Type'): NameObject('/Catalog'), NameObject('/Pages'): raiz}))
+    salida.objeto(2, DictionaryObject({
+        NameObject('/Type'): NameObject('/Pages'), NameObject('/Kids'): ArrayObject(paginas),
+        NameObject('/Count'): NumberObject(len(paginas)),
+    }))
+    salida.objeto(3, DictionaryObject({
+        NameObject('/Title'): create_string_object(titulo), NameObject('/Creator'): create_string_object('SysFree'),
+    }))
+    salida.cerrar(siguiente[0], raiz=IndirectObject(1, 0, None), info=IndirectObject(3, 0, None))
+
+
+def _paginas(diseno, filas, total):
+    """Genera una tabla por página (con salto de página entre ellas) y cuenta las filas en ``total[0]``."""
+    maximos = diseno['max_caracteres']
+    estilo = TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'Helvetica', TAMANO_FUENTE),
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', TAMANO_FUENTE),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4B5563')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.HexColor('#D1D5DB')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 1),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ('LEFTPADDING', (0, 0), (-1, -1), 2),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ] + [('ALIGN', (i, 0), (i, -1), 'RIGHT') for i, numerica in enumerate(diseno['numericas']) if numerica])
+    encabezado = [_recortar(columna, maximo) for columna, maximo in zip(diseno['columnas'], maximos)]
+
+    def tabla(filas_pagina):
+        return Table(
+            [encabezado] + filas_pagina, colWidths=diseno['anchos'], rowHeights=ALTO_FILA,
+            repeatRows=1, style=estilo
+        )
+
+    pagina, emitidas = [], 0
+    for fila in filas:
+        pagina.append([_recortar(_texto(valor), maximo) for valor, maximo in zip(fila, maximos)])
+        if len(pagina) == diseno['filas_por_pagina']:
+            if emitidas:
+                yield PageBreak()
+            total[0] += len(pagina)
+            yield tabla(pagina)
+            pagina, emitidas = [], emitidas + 1
+    if pagina or not emitidas:
+        if emitidas:
+            yield PageBreak()
+        total[0] += len(pagina)
+        yield tabla(pagina)
+
+
+def _heredar(pagina):
+    """Copia en la página los atributos heredables definidos en el árbol de páginas de su parte."""
+    padre = pagina['/Parent'] if '/Parent' in pagina else None
+    while padre is not None:
+        for clave in ATRIBUTOS_HEREDABLES:
+            if clave not in pagina and clave in padre:
+                pagina[NameObject(clave)] = padre.raw_get(clave)
+        padre = padre['/Parent'] if '/Parent' in padre else None
+
+
+def _renumerar(valor, renumerar):
+    """Reemplaza (en el mismo objeto) las referencias indirectas por las que devuelve ``renumerar``."""
+    if isinstance(valor, IndirectObject):
+        return renumerar(valor)
+    if isinstance(valor, DictionaryObject):
+        for clave in list(valor):
+            valor[clave] = _renumerar(valor.raw_get(clave), renumerar)
+    elif isinstance(valor, ArrayObject):
+        for i, elemento in enumerate(valor):
+            valor[i] = _renumerar(elemento, renumerar)
+    return valor
+
+
+class _SalidaPDF:
+    """Escribe objetos numerados en un archivo y guarda su posición para la tabla de referencias cruzadas."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.posicion = 0
+        self.posiciones = {}
+
+    def write(self, datos):
+        self.destino.write(datos)
+        self.posicion += len(datos)
+
+    def objeto(self, numero, valor):
+        self.posiciones[numero] = self.posicion
+        self.write(f'{numero} 0 obj\n'.encode())
+        valor.write_to_stream(self)
+        self.write(b'\nendobj\n')
+
+    def cerrar(self, tamano, raiz, info):
+        """Escribe la tabla de referencias cruzadas y el trailer; ``tamano`` es el siguiente número libre."""
+        inicio = self.posicion
+        entradas = [b'0000000000 65535 f \n']
+        entradas += [f'{self.posiciones[numero]:010d} 00000 n \n'.encode() for numero in range(1, tamano)]
+        self.write(f'xref\n0 {tamano}\n'.encode() + b''.join(entradas) + b'trailer\n')
+        DictionaryObject({
+            NameObject('/Size'): NumberObject(tamano), NameObject('/Root'): raiz, NameObject('/Info'): info,
+        }).write_to_stream(self)
+        self.write(f'\nstartxref\n{inicio}\n%%EOF\n'.encode())
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return str(valor)
+
+
+def _recortar(texto, maximo):
+    """Texto en una sola línea y recortado a ``maximo`` caracteres."""
+    texto = ' '.join(texto.split()) if '\n' in texto or '\r' in texto else texto
+    return texto if len(texto) <= maximo else texto[:maximo - 1] + '…'
@@ -1,6 +1,53 @@
+import glob
+import os
+
 from django.http import HttpResponse, HttpResponseForbidden
 from django.conf import settings
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+class ColectorMultiproceso:
+    """
+    Suma las métricas escritas en modo multiproceso por los workers de
+    gunicorn y de Celery, repartidas en uno o más directorios (uno por
+    servicio).
+    """
+
+    def __init__(self, directorios):
+        self.directorios = directorios
+
+    def collect(self):
+        archivos = [
+            archivo for directorio in self.directorios for archivo in glob.glob(os.path.join(directorio, '*.db'))
+        ]
+        return MultiProcessCollector.merge(archivos, accumulate=True)
+
+
+def directorios_multiproceso():
+    """Directorios de métricas multiproceso a exponer: los de PROMETHEUS_MULTIPROC_ROOT y el propio."""
+    directorios = []
+    raiz = getattr(settings, 'PROMETHEUS_MULTIPROC_ROOT', '')
+    if raiz:
+        directorios.extend(
+            os.path.abspath(directorio) for directorio in sorted(glob.glob(os.path.join(raiz, '*')))
+            if os.path.isdir(directorio)
+        )
+    propio = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if propio and os.path.abspath(propio) not in directorios:
+        directorios.append(os.path.abspath(propio))
+    return directorios
+
+
+def registro_metricas():
+    """Registro a exponer: el de los directorios multiproceso o, sin ellos, el del proceso."""
+    directorios = directorios_multiproceso()
+    if not directorios:
+        return REGISTRY
+    registro = CollectorRegistry()
+    registro.register(ColectorMultiproceso(directorios))
+    return registro
+
 
 def metrics_view(request):
     """
@@ -17,7 +64,7 @@ def metrics_view(request):
     try:
         # Genera y retorna las métricas de Prometheus
         return HttpResponse(
-            generate_latest(),
+            generate_latest(registro_metricas()),
             content_type=CONTENT_TYPE_LATEST
         )
     except Exception as e:
@@ -25,4 +72,4 @@ def metrics_view(request):
         from logging import getLogger
         logger = getLogger('sysfree')
         logger.error(f"Error generating Prometheus metrics: {str(e)}")
-        return HttpResponse("Internal Server Error", status=500)
\ No newline at end of file
+        return HttpResponse("Internal Server Error", status=500)
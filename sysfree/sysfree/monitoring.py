@@ -34,15 +34,18 @@ DB_QUERY_LATENCY = Histogram(
     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0)
 )
 
-# Métricas del sistema
+# Métricas del sistema. Los Gauge usan el último valor escrito por cualquier
+# proceso en modo multiproceso (ver PROMETHEUS_MULTIPROC_ROOT en settings)
 MEMORY_USAGE = Gauge(
     'memory_usage_bytes',
-    'Uso de memoria del proceso en bytes'
+    'Uso de memoria del proceso en bytes',
+    multiprocess_mode='mostrecent'
 )
 
 CPU_USAGE = Gauge(
     'cpu_usage_percent',
-    'Uso de CPU del sistema en porcentaje'
+    'Uso de CPU del sistema en porcentaje',
+    multiprocess_mode='mostrecent'
 )
 
 # Contador de tareas de Celery
@@ -60,6 +63,43 @@ CELERY_TASK_LATENCY = Histogram(
     buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
 )
 
+# Caché de resultados de reportes
+REPORT_CACHE_REQUESTS = Counter(
+    'report_cache_requests_total',
+    'Consultas a la caché de resultados de reportes',
+    ['result']  # hit, miss o bypass (reporte no cacheable)
+)
+
+REPORT_CACHE_EVICTIONS = Counter(
+    'report_cache_evictions_total',
+    'Entradas desalojadas de la caché de resultados de reportes'
+)
+
+REPORT_CACHE_SIZE = Gauge(
+    'report_cache_size_bytes',
+    'Tamaño total de la caché de resultados de reportes en bytes',
+    multiprocess_mode='mostrecent'
+)
+
+# Consulta de autorizaciones del SRI por lotes
+SRI_AUTHORIZATION_POLLS = Counter(
+    'sri_authorization_polls_total',
+    'Comprobantes consultados por la consulta de autorizaciones por lotes',
+    ['result']  # autorizado, no_autorizado, en_proceso o error
+)
+
+SRI_AUTHORIZATION_POLL_DURATION = Histogram(
+    'sri_authorization_poll_duration_seconds',
+    'Duración de la consulta al SRI de cada lote de autorizaciones',
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+
+SRI_AUTHORIZATION_POLL_THROUGHPUT = Gauge(
+    'sri_authorization_poll_throughput',
+    'Comprobantes por segundo consultados en el último lote de autorizaciones',
+    multiprocess_mode='mostrecent'
+)
+
 def update_system_metrics():
     """
     Actualiza las métricas del sistema: uso de memoria y CPU.
@@ -219,6 +219,12 @@ PROMETHEUS_ALLOWED_IPS = config(
     cast=lambda v: [s.strip() for s in v.split(',')]
 )
 ENABLE_SYSTEM_MONITORING = config('ENABLE_SYSTEM_MONITORING', default=True, cast=bool)
+# Las métricas de los workers de Celery (tareas, caché de reportes, autorizaciones del SRI)
+# solo llegan a /metrics con el modo multiproceso de prometheus_client: cada servicio
+# exporta PROMETHEUS_MULTIPROC_DIR=<raíz>/<servicio> (un directorio propio, vaciado al
+# arrancar) y la vista suma todos los subdirectorios de PROMETHEUS_MULTIPROC_ROOT.
+# Sin ninguna de las dos variables se usa el registro del proceso.
+PROMETHEUS_MULTIPROC_ROOT = config('PROMETHEUS_MULTIPROC_ROOT', default='')
 
 # =========================
 # Cache (Redis recomendado en producción)
@@ -250,6 +256,116 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE  # Usa la misma zona horaria que TIME_ZONE
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Los reportes se procesan en su propia cola para no demorar las demás tareas:
+#   celery -A sysfree worker -Q reportes --concurrency=<REPORTES_MAX_CONCURRENTES>
+CELERY_TASK_ROUTES = {
+    'reportes.tasks.ejecutar_reporte_task': {'queue': 'reportes'},
+}
+
+# =========================
+# Auditoría
+# =========================
+# sync: inserción inmediata | transaccion: un bulk_create al confirmar | async: lote a Celery
+AUDITORIA_MODO = config('AUDITORIA_MODO', default='transaccion')
+# Meses completos de logs que se conservan en línea antes de archivarlos en JSONL comprimido
+AUDITORIA_RETENCION_MESES = config('AUDITORIA_RETENCION_MESES', default=12, cast=int)
+AUDITORIA_ARCHIVO_DIR = config('AUDITORIA_ARCHIVO_DIR', default=os.path.join(BASE_DIR, 'archivo_auditoria'))
+
+# =========================
+# Numeración de documentos
+# =========================
+# Tamaño de bloque preasignado por proceso para tipos sin correlatividad estricta,
+# p. ej. {'ticket': 50}. Los tipos no listados se numeran sin saltos (contador bloqueado).
+NUMERACION_BLOQUES = {}
+
+# =========================
+# Punto de venta
+# =========================
+# Tipos de venta cuyo comprobante se envía al SRI tras el commit
+FACTURACION_ELECTRONICA_TIPOS = ['factura']
+# Códigos de cuenta del asiento automático de ventas cobradas, p. ej.
+# {'cobro': '1.1.01', 'ingreso': '4.1.01', 'iva': '2.1.05'}; vacío = sin asiento
+CUENTAS_ASIENTO_VENTA = {}
+
+# =========================
+# Facturación electrónica
+# =========================
+# Cola de cada etapa (ver fiscal.services.facturacion_electronica_service). XML,
+# firma y RIDE usan CPU; recepción, autorización y correo esperan la red, así que
+# sus workers admiten mucha más concurrencia:
+#   celery -A sysfree worker -Q facturacion_xml,facturacion_firma --concurrency=<núcleos>
+#   celery -A sysfree worker -Q facturacion_sri --concurrency=16
+#   celery -A sysfree worker -Q facturacion_ride,facturacion_correo --concurrency=4
+FACTURACION_COLAS = {
+    'xml': 'facturacion_xml',
+    'firma': 'facturacion_firma',
+    'recepcion': 'facturacion_sri',
+    'autorizacion': 'facturacion_sri',
+    'ride': 'facturacion_ride',
+    'correo': 'facturacion_correo',
+}
+# Reintentos de una etapa ante fallos transitorios (red, SRI, SMTP) con espera
+# exponencial desde REINTENTO_BASE hasta REINTENTO_MAXIMO segundos
+FACTURACION_MAX_REINTENTOS = config('FACTURACION_MAX_REINTENTOS', default=8, cast=int)
+FACTURACION_REINTENTO_BASE = config('FACTURACION_REINTENTO_BASE', default=10, cast=int)
+FACTURACION_REINTENTO_MAXIMO = config('FACTURACION_REINTENTO_MAXIMO', default=10 * 60, cast=int)
+# Segundos tras los que se puede volver a tomar una etapa con efecto externo (envío al SRI, correo)
+# que quedó reservada, p. ej. porque su worker murió; debe superar la duración de una ejecución
+FACTURACION_RESERVA_VIGENCIA = config('FACTURACION_RESERVA_VIGENCIA', default=10 * 60, cast=int)
+# Segundos entre consultas de autorización mientras el SRI responde EN PROCESO
+FACTURACION_ESPERA_AUTORIZACION = config('FACTURACION_ESPERA_AUTORIZACION', default=15, cast=int)
+# Consulta periódica por lotes (fiscal.tasks.consultar_autorizaciones_task) de los comprobantes
+# recibidos sin autorizar; si está activa la etapa de autorización consulta una sola vez
+FACTURACION_CONSULTA_AUTORIZACIONES = config('FACTURACION_CONSULTA_AUTORIZACIONES', default=True, cast=bool)
+# Comprobantes reservados y consultados en cada lote de esa consulta
+FACTURACION_AUTORIZACION_LOTE = config('FACTURACION_AUTORIZACION_LOTE', default=200, cast=int)
+# False = la etapa RIDE no genera el PDF (el correo lleva solo el XML autorizado)
+FACTURACION_GENERAR_RIDE = config('FACTURACION_GENERAR_RIDE', default=True, cast=bool)
+# Valida el XML contra los esquemas XSD de fiscal/xsd antes de firmarlo y registra los errores
+# como advertencia (no detiene la factura). Desactivado hasta incluir los XSD oficiales del SRI
+FACTURACION_VALIDAR_XSD = config('FACTURACION_VALIDAR_XSD', default=False, cast=bool)
+# Timeouts (segundos) de conexión y de lectura de los web services del SRI
+SRI_TIMEOUT_CONEXION = config('SRI_TIMEOUT_CONEXION', default=5, cast=int)
+SRI_TIMEOUT_LECTURA = config('SRI_TIMEOUT_LECTURA', default=20, cast=int)
+# Conexiones persistentes por host del cliente del SRI (una sesión por proceso) y
+# reintentos ante errores de conexión o 5xx con espera FACTOR * 2^n más una variación aleatoria
+SRI_CONEXIONES = config('SRI_CONEXIONES', default=20, cast=int)
+SRI_REINTENTOS = config('SRI_REINTENTOS', default=2, cast=int)
+SRI_REINTENTO_FACTOR = config('SRI_REINTENTO_FACTOR', default=0.5, cast=float)
+# Consultas de autorización simultáneas de una consulta por lotes
+SRI_AUTORIZACION_PARALELO = config('SRI_AUTORIZACION_PARALELO', default=8, cast=int)
+# Interruptor de circuito del SRI: tras `umbral` fallos en `ventana` segundos no se
+# llama durante `apertura` segundos; una respuesta más lenta que `lentitud` cuenta como fallo
+SRI_CIRCUITO = {'umbral': 5, 'ventana': 60, 'apertura': 30, 'lentitud': 15}
+# Procesos de la firma por lotes (0 = uno por CPU)
+FIRMA_PROCESOS = config('FIRMA_PROCESOS', default=0, cast=int)
+
+# =========================
+# Reportes
+# =========================
+# Tamaño máximo de la caché de resultados de reportes; se desalojan las entradas menos usadas
+REPORTES_CACHE_MAX_BYTES = config('REPORTES_CACHE_MAX_BYTES', default=1024 ** 3, cast=int)
+# Vigencia de una entrada (segundos): cuánto se conserva y reutiliza un archivo generado. Acota
+# también lo que la versión de datos de las tablas no detecta: escrituras que no pasan por
+# ModeloBase (SQL directo, _raw_delete, cargas externas) o una invalidación perdida en Redis
+REPORTES_CACHE_TTL = config('REPORTES_CACHE_TTL', default=6 * 60 * 60, cast=int)
+# Ejecuciones asíncronas simultáneas en total y por usuario; las excedentes esperan en la cola
+REPORTES_MAX_CONCURRENTES = config('REPORTES_MAX_CONCURRENTES', default=4, cast=int)
+REPORTES_MAX_CONCURRENTES_USUARIO = config('REPORTES_MAX_CONCURRENTES_USUARIO', default=2, cast=int)
+# statement_timeout (segundos) de cada sentencia de la consulta de un reporte; 0 = sin límite
+REPORTES_STATEMENT_TIMEOUT = config('REPORTES_STATEMENT_TIMEOUT', default=5 * 60, cast=int)
+# Duración máxima (segundos) de una ejecución asíncrona; al superarla se interrumpe con error
+REPORTES_TIEMPO_MAXIMO = config('REPORTES_TIEMPO_MAXIMO', default=30 * 60, cast=int)
+# Tamaño máximo (bytes) del archivo adjunto a los correos de reportes programados;
+# los mayores se dejan en el historial y el correo lo indica
+REPORTES_CORREO_MAX_ADJUNTO = config('REPORTES_CORREO_MAX_ADJUNTO', default=20 * 1024 ** 2, cast=int)
+# Rango máximo (días) de /api/reportes/analitica/, que calcula el análisis en la petición;
+# los periodos mayores se ejecutan como reporte de tipo analitico
+REPORTES_ANALITICA_MAX_DIAS = config('REPORTES_ANALITICA_MAX_DIAS', default=366, cast=int)
+# Procesos que renderizan en paralelo las páginas de los PDF tabulares; 0 o 1 = en el mismo proceso.
+# Los workers prefork de Celery son procesos daemon y no pueden crear hijos: allí se renderiza en el
+# mismo proceso, así que el paralelo requiere un worker sin prefork (p. ej. --pool=threads o solo)
+REPORTES_PDF_PROCESOS = config('REPORTES_PDF_PROCESOS', default=0, cast=int)
 
 # =========================
 # Celery Beat
@@ -259,6 +375,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'core.tasks.update_system_metrics_task',  # Ajusta a 'sysfree.tasks' si usas sysfree/tasks.py
         'schedule': 60.0,  # Cada 60 segundos
     },
+    'mantener-logs-actividad-diario': {
+        'task': 'core.tasks.mantener_logs_actividad_task',
+        'schedule': 24 * 60 * 60.0,  # Crea particiones futuras y archiva las vencidas
+    },
+    'despachar-programaciones-reportes': {
+        'task': 'reportes.tasks.despachar_programaciones_task',
+        'schedule': 60.0,  # Encola los reportes programados vencidos
+    },
+    'consultar-autorizaciones-sri': {
+        'task': 'fiscal.tasks.consultar_autorizaciones_task',
+        'schedule': float(FACTURACION_ESPERA_AUTORIZACION),  # Comprobantes recibidos aún sin autorizar
+    },
 }
 # =========================
 # Logging
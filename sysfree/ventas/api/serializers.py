@@ -1,5 +1,7 @@
+from decimal import Decimal
 from rest_framework import serializers
 from ventas.models import Venta, DetalleVenta, Pago
+from ventas.services.pos_service import PuntoVentaService
 
 
 class DetalleVentaSerializer(serializers.ModelSerializer):
@@ -41,4 +43,28 @@ class VentaSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'numero', 'fecha', 'subtotal', 'iva', 'total',
             'fecha_pago', 'fecha_envio', 'fecha_entrega'
-        ]
\ No newline at end of file
+        ]
+
+class LineaPOSSerializer(serializers.Serializer):
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    precio_unitario = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    descuento = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+
+
+class PagoPOSSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Pago
+        fields = [
+            'metodo', 'monto', 'referencia', 'numero_tarjeta', 'titular_tarjeta',
+            'banco', 'numero_cuenta', 'numero_cheque', 'banco_cheque'
+        ]
+
+
+class VentaPOSSerializer(serializers.Serializer):
+    """Entrada de la ruta rápida de punto de venta."""
+    cliente_id = serializers.IntegerField()
+    tipo = serializers.ChoiceField(choices=PuntoVentaService.TIPOS, default='ticket')
+    almacen_id = serializers.IntegerField(required=False)
+    items = LineaPOSSerializer(many=True, allow_empty=False)
+    pagos = PagoPOSSerializer(many=True, required=False)
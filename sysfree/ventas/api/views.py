@@ -1,17 +1,21 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie
 from django.core.cache import cache
+from api.mixins import ExportableViewSetMixin
+from api.utils import export_queryset_to_csv, export_queryset_to_excel, export_queryset_to_parquet
 from ventas.models import Venta, DetalleVenta, Pago
 from ventas.services.venta_service import VentaService
-from .serializers import VentaSerializer, DetalleVentaSerializer, PagoSerializer
+from ventas.services.pos_service import PuntoVentaService
+from .serializers import VentaSerializer, DetalleVentaSerializer, PagoSerializer, VentaPOSSerializer
 
 
-class VentaViewSet(viewsets.ModelViewSet):
+class VentaViewSet(ExportableViewSetMixin, viewsets.ModelViewSet):
     queryset = Venta.objects.all()
     serializer_class = VentaSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -33,6 +37,18 @@ class VentaViewSet(viewsets.ModelViewSet):
         """Detalle de venta con caché de 15 minutos"""
         return super().retrieve(request, *args, **kwargs)
     
+    # Campos de la exportación (acción export: CSV, Excel o Parquet)
+    campos_exportacion = ['numero', 'fecha', 'cliente', 'tipo', 'estado', 'subtotal', 'descuento', 'total']
+    
+    def _export_csv(self, queryset):
+        return export_queryset_to_csv(queryset.select_related('cliente'), self.campos_exportacion, 'ventas.csv')
+    
+    def _export_excel(self, queryset):
+        return export_queryset_to_excel(queryset.select_related('cliente'), self.campos_exportacion, 'ventas.xlsx')
+    
+    def _export_parquet(self, queryset):
+        return export_queryset_to_parquet(queryset, self.campos_exportacion, 'ventas.parquet')
+    
     @action(detail=False, methods=['post'])
     def crear_venta(self, request):
         cache_key = 'ventas_list'
@@ -171,4 +187,54 @@ class PagoViewSet(viewsets.ModelViewSet):
     @method_decorator(vary_on_cookie)
     def retrieve(self, request, *args, **kwargs):
         """Detalle de pago con caché de 15 minutos"""
-        return super().retrieve(request, *args, **kwargs)
\ No newline at end of file
+        return super().retrieve(request, *args, **kwargs)
+
+class PuntoVentaView(APIView):
+    """
+    Ruta rápida de punto de venta: registra una venta de mostrador cobrada y
+    responde solo con los datos necesarios para el comprobante. La auditoría,
+    la caché, el asiento contable y la facturación electrónica se procesan
+    después del commit.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        entrada = VentaPOSSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        datos = entrada.validated_data
+
+        from clientes.models import Cliente
+        from inventario.models import Almacen
+
+        cliente = Cliente.objects.filter(pk=datos['cliente_id']).first()
+        if cliente is None:
+            return Response({'error': 'Cliente no encontrado'}, status=status.HTTP_400_BAD_REQUEST)
+        almacen = None
+        if datos.get('almacen_id'):
+            almacen = Almacen.objects.filter(pk=datos['almacen_id'], activo=True).first()
+            if almacen is None:
+                return Response({'error': 'Almacén no encontrado'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            venta, cambio = PuntoVentaService.registrar_venta(
+                cliente=cliente,
+                tipo=datos['tipo'],
+                items=datos['items'],
+                pagos=datos.get('pagos'),
+                almacen=almacen,
+                usuario=request.user
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'id': venta.id,
+            'numero': venta.numero,
+            'tipo': venta.tipo,
+            'estado': venta.estado,
+            'subtotal': str(venta.subtotal),
+            'iva': str(venta.total - venta.subtotal),
+            'descuento': str(venta.descuento),
+            'total': str(venta.total),
+            'cambio': str(cambio),
+        }, status=status.HTTP_201_CREATED)
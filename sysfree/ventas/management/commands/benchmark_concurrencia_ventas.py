@@ -0,0 +1,166 @@
+"""
+Prueba de estrés de ventas concurrentes: varios vendedores crean ventas de
+varias líneas (en orden aleatorio) contra un stock limitado y se verifica que
+no haya sobreventa.
+
+A diferencia de otros benchmarks, este comando necesita transacciones reales
+(cada hilo usa su propia conexión), por lo que crea sus propios datos de prueba
+y los elimina al terminar.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from clientes.models import Cliente
+from inventario.models import Almacen, Categoria, MovimientoInventario, Producto, StockAlmacen
+from ventas.models import DetalleVenta, Venta
+from ventas.services.venta_service import VentaService
+
+
+class Command(BaseCommand):
+    help = 'Prueba de estrés de ventas concurrentes: throughput, conflictos y verificación de sobreventa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendedores', default='1,8,32',
+                            help='Niveles de concurrencia separados por coma (por defecto 1,8,32)')
+        parser.add_argument('--productos', type=int, default=5,
+                            help='Productos compartidos por todos los vendedores (por defecto 5)')
+        parser.add_argument('--stock', type=int, default=40,
+                            help='Stock inicial por producto (por defecto 40)')
+        parser.add_argument('--lineas', type=int, default=3,
+                            help='Líneas por venta (por defecto 3)')
+
+    def handle(self, *args, **options):
+        niveles = [int(n) for n in options['vendedores'].split(',') if n.strip()]
+        self.stdout.write(
+            f"{'vendedores':>10}{'ventas':>8}{'rechazos':>10}{'conflictos':>12}{'otros':>7}"
+            f"{'ventas/s':>10}{'sobreventa':>12}"
+        )
+        hubo_sobreventa = False
+        for vendedores in niveles:
+            datos = self._crear_datos(options['productos'], options['stock'])
+            try:
+                resultado, segundos = self._ejecutar(datos, vendedores, options)
+                sobreventa = self._verificar(datos, options['stock'], resultado['ventas'], options['lineas'])
+            finally:
+                self._eliminar_datos(datos)
+            hubo_sobreventa = hubo_sobreventa or bool(sobreventa)
+            otros = sum(v for k, v in resultado.items() if k not in ('ventas', 'stock', 'conflicto'))
+            self.stdout.write(
+                f"{vendedores:>10}{resultado['ventas']:>8}{resultado['stock']:>10}"
+                f"{resultado['conflicto']:>12}{otros:>7}{resultado['ventas'] / segundos:>10.1f}"
+                f"{'SI' if sobreventa else 'no':>12}"
+            )
+            for error, cantidad in resultado.items():
+                if error not in ('ventas', 'stock', 'conflicto'):
+                    self.stdout.write(f'    {error}: {cantidad}')
+            for detalle in sobreventa:
+                self.stdout.write(self.style.ERROR(f'    {detalle}'))
+
+        if hubo_sobreventa:
+            self.stdout.write(self.style.ERROR('Se detectó sobreventa'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin sobreventa en ningún nivel de concurrencia'))
+
+    def _crear_datos(self, total_productos, stock):
+        sufijo = timezone.now().strftime('%H%M%S%f')
+        categoria = Categoria.objects.create(nombre=f'Estrés ventas {sufijo}')
+        almacen = Almacen.objects.create(nombre=f'Almacén estrés {sufijo}')
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion=f'EST{sufijo}', nombres='Cliente estrés'
+        )
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'EST-{sufijo}-{i}', nombre=f'Estrés {i}', categoria=categoria,
+                     precio_venta=Decimal('1.00'), stock=Decimal(stock))
+            for i in range(total_productos)
+        ])
+        StockAlmacen.objects.bulk_create([
+            StockAlmacen(producto=producto, almacen=almacen, cantidad=Decimal(stock))
+            for producto in productos
+        ])
+        return {'categoria': categoria, 'almacen': almacen, 'cliente': cliente, 'productos': productos}
+
+    def _ejecutar(self, datos, vendedores, options):
+        """Lanza los vendedores a la vez; en total intentan vender el doble del stock disponible."""
+        lineas = min(options['lineas'], len(datos['productos']))
+        intentos = -(-2 * options['stock'] * len(datos['productos']) // (lineas * vendedores))
+        resultado = Counter()
+        candado = threading.Lock()
+        barrera = threading.Barrier(vendedores)
+
+        def vendedor():
+            local = Counter()
+            try:
+                barrera.wait()
+                for _ in range(intentos):
+                    seleccion = random.sample(datos['productos'], lineas)
+                    items = [{'producto_id': p.pk, 'cantidad': Decimal('1.00')} for p in seleccion]
+                    try:
+                        VentaService.crear_venta(datos['cliente'], 'factura', items, almacen=datos['almacen'])
+                        local['ventas'] += 1
+                    except ValueError:
+                        local['stock'] += 1
+                    except OperationalError:
+                        local['conflicto'] += 1
+                    except IntegrityError as e:
+                        local[f'IntegrityError: {str(e).splitlines()[0][:80]}'] += 1
+                    except Exception as e:
+                        local[f'{type(e).__name__}: {str(e)[:80]}'] += 1
+            finally:
+                connection.close()
+                with candado:
+                    resultado.update(local)
+
+        hilos = [threading.Thread(target=vendedor) for _ in range(vendedores)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+        for clave in ('ventas', 'stock', 'conflicto'):
+            resultado.setdefault(clave, 0)
+        return resultado, segundos
+
+    def _verificar(self, datos, stock_inicial, ventas, lineas):
+        """Devuelve las inconsistencias encontradas (lista vacía si no hay sobreventa)."""
+        errores = []
+        vendido_total = Decimal('0.00')
+        for producto in datos['productos']:
+            producto.refresh_from_db(fields=['stock'])
+            en_almacen = StockAlmacen.objects.get(producto=producto, almacen=datos['almacen']).cantidad
+            vendido = MovimientoInventario.objects.filter(
+                producto=producto, tipo='salida'
+            ).aggregate(total=Sum('cantidad'))['total'] or Decimal('0.00')
+            vendido_total += vendido
+            if en_almacen < 0 or producto.stock < 0:
+                errores.append(f'{producto.codigo}: stock negativo ({en_almacen})')
+            if vendido + en_almacen != stock_inicial:
+                errores.append(f'{producto.codigo}: vendido {vendido} + stock {en_almacen} != {stock_inicial}')
+            if producto.stock != en_almacen:
+                errores.append(f'{producto.codigo}: Producto.stock {producto.stock} != almacén {en_almacen}')
+        if vendido_total != ventas * lineas:
+            errores.append(f'unidades vendidas {vendido_total} != ventas confirmadas x líneas ({ventas * lineas})')
+        return errores
+
+    def _eliminar_datos(self, datos):
+        productos = datos['productos']
+        ventas = Venta.objects.filter(cliente=datos['cliente'])
+        MovimientoInventario.objects.filter(producto__in=productos).delete()
+        # Borrado directo de los detalles: las señales post_delete recalcularían
+        # los totales de ventas que también se van a eliminar
+        detalles = DetalleVenta.objects.filter(venta__in=ventas)
+        detalles._raw_delete(detalles.db)
+        ventas.delete()
+        StockAlmacen.objects.filter(producto__in=productos).delete()
+        Producto.objects.filter(pk__in=[p.pk for p in productos]).delete()
+        datos['almacen'].delete()
+        datos['categoria'].delete()
+        datos['cliente'].delete()
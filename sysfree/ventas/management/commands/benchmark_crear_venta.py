@@ -0,0 +1,147 @@
+"""
+Comando para medir la creación de ventas de 1, 20 y 200 líneas.
+
+Compara dos escenarios sobre los mismos productos:
+
+- esquema anterior: un ``get`` y un cálculo de IVA por línea, una salida de
+  inventario por línea (cada una con su validación, auditoría y limpieza de
+  caché) y ``actualizar_totales()`` al final,
+- esquema actual: ``VentaService.crear_venta`` (productos con ``in_bulk``,
+  totales en una pasada, salidas en un lote y la venta guardada una vez).
+
+Reporta las consultas SQL por venta y la mediana de latencia. La auditoría se
+ejecuta en modo ``sync`` para que sus inserciones cuenten en las consultas.
+Todo se ejecuta en una transacción que se revierte al terminar: no quedan
+ventas, movimientos, registros de auditoría ni números de secuencia consumidos.
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from clientes.models import Cliente
+from core.services import IVAService
+from core.services.auditoria_service import AuditoriaService
+from inventario.models import Almacen, Categoria, Producto, StockAlmacen
+from inventario.services import InventarioService
+from ventas.models import DetalleVenta, Venta
+from ventas.services.venta_service import VentaService
+
+
+class _Revertir(Exception):
+    """Provoca el rollback de la transacción del benchmark."""
+
+
+def crear_venta_por_linea(cliente, tipo, items, almacen):
+    """Reproduce el flujo anterior de VentaService.crear_venta, línea por línea."""
+    with transaction.atomic():
+        tipo_iva_default = IVAService.get_default()
+        detalles = []
+        salidas = []
+        for item in items:
+            producto = Producto.objects.select_related('tipo_iva').get(id=item['producto_id'])
+            cantidad = item.get('cantidad', 1)
+            precio_unitario = item.get('precio_unitario', producto.precio_venta)
+            descuento = item.get('descuento', 0)
+            subtotal = cantidad * precio_unitario - descuento
+            tipo_iva = item.get('tipo_iva') or producto.tipo_iva or tipo_iva_default
+            iva, total = IVAService.calcular_iva(subtotal, tipo_iva)
+            detalles.append(DetalleVenta(
+                producto=producto, cantidad=cantidad, precio_unitario=precio_unitario,
+                descuento=descuento, tipo_iva=tipo_iva, iva=iva, subtotal=subtotal, total=total
+            ))
+            if producto.es_inventariable:
+                salidas.append((producto, cantidad))
+
+        venta = Venta.objects.create(numero=VentaService.generar_numero(tipo), cliente=cliente, tipo=tipo)
+        for detalle in detalles:
+            detalle.venta = venta
+        DetalleVenta.objects.bulk_create(detalles)
+        venta.actualizar_totales()
+
+        for producto, cantidad in salidas:
+            InventarioService.registrar_salida(
+                producto=producto, cantidad=cantidad, origen='venta', documento=venta.numero,
+                referencia_id=venta.id, referencia_tipo='Venta', almacen=almacen
+            )
+        AuditoriaService.venta_creada(venta, detalles)
+        return venta
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y latencia de crear_venta con 1, 20 y 200 líneas: esquema anterior vs. actual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', default='1,20,200',
+                            help='Tamaños de factura separados por coma (por defecto 1,20,200)')
+        parser.add_argument('--repeticiones', type=int, default=5,
+                            help='Ventas medidas por escenario, se toma la mediana (por defecto 5)')
+
+    def handle(self, *args, **options):
+        tamanos = [int(n) for n in options['lineas'].split(',') if n.strip()]
+        repeticiones = options['repeticiones']
+        escenarios = (
+            ('anterior', lambda datos, items: crear_venta_por_linea(datos['cliente'], 'factura', items, datos['almacen'])),
+            ('actual', lambda datos, items: VentaService.crear_venta(
+                datos['cliente'], 'factura', items, almacen=datos['almacen'])),
+        )
+
+        self.stdout.write(f"{'líneas':>7}  {'esquema':<10}{'consultas':>11}{'ms (mediana)':>15}")
+        try:
+            with override_settings(AUDITORIA_MODO='sync'), transaction.atomic():
+                datos = self._crear_datos(max(tamanos))
+                for tamano in tamanos:
+                    items = [
+                        {'producto_id': producto.pk, 'cantidad': Decimal('1.00')}
+                        for producto in datos['productos'][:tamano]
+                    ]
+                    resultados = {}
+                    for nombre, crear in escenarios:
+                        crear(datos, items)  # calentamiento
+                        consultas, tiempos = self._medir(crear, datos, items, repeticiones)
+                        resultados[nombre] = (consultas, statistics.median(tiempos))
+                        self.stdout.write(
+                            f"{tamano:>7}  {nombre:<10}{consultas:>11}{statistics.median(tiempos) * 1000:>15.1f}"
+                        )
+                    (consultas_antes, ms_antes), (consultas_despues, ms_despues) = resultados.values()
+                    self.stdout.write(
+                        f"{'':>7}  {'reducción':<10}{(1 - consultas_despues / consultas_antes) * 100:>10.0f}%"
+                        f"{(1 - ms_despues / ms_antes) * 100:>14.0f}%"
+                    )
+                raise _Revertir
+        except _Revertir:
+            pass
+        self.stdout.write(self.style.SUCCESS('Benchmark completado (transacción revertida)'))
+
+    def _medir(self, crear, datos, items, repeticiones):
+        consultas = 0
+        tiempos = []
+        for _ in range(repeticiones):
+            reset_queries()  # el registro de consultas tiene un tope de 9000 entradas
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                crear(datos, items)
+                tiempos.append(time.perf_counter() - inicio)
+            consultas = len(capturadas)
+        return consultas, tiempos
+
+    def _crear_datos(self, total_productos):
+        categoria = Categoria.objects.create(nombre='Benchmark crear_venta')
+        almacen = Almacen.objects.create(nombre='Almacén benchmark crear_venta')
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion='BENCHVENTA', nombres='Cliente benchmark'
+        )
+        tipo_iva = IVAService.get_default()
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'BENCHVENTA-{i}', nombre=f'Producto benchmark {i}', categoria=categoria,
+                     tipo_iva=tipo_iva, precio_venta=Decimal('3.35'), stock=Decimal('100000.00'))
+            for i in range(total_productos)
+        ])
+        StockAlmacen.objects.bulk_create([
+            StockAlmacen(producto=producto, almacen=almacen, cantidad=Decimal('100000.00'))
+            for producto in productos
+        ])
+        return {'almacen': almacen, 'cliente': cliente, 'productos': productos}
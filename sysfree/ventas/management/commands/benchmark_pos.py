@@ -0,0 +1,139 @@
+"""
+Comando para medir la latencia del punto de venta con tickets de 10 líneas.
+
+Envía las mismas solicitudes HTTP (cliente de pruebas de DRF, con middleware
+y autenticación) a la ruta rápida ``/api/ventas/pos/`` y, como referencia, a
+la acción ``crear_venta`` del ViewSet de ventas, y reporta p50, p95, p99 y el
+máximo. El objetivo de la ruta rápida es p95 < 50 ms. La limitación de
+solicitudes (throttling) se desactiva durante la medición. Debe ejecutarse con
+``DEBUG=False``, como en producción; las solicitudes se envían por HTTPS.
+
+Todo se ejecuta en una transacción que se revierte al terminar, por lo que
+los efectos posteriores al commit no llegan a encolarse: la medición cubre lo
+que espera el cajero, que es precisamente lo que se difiere. Como nada se
+confirma, PostgreSQL no puede depurar las versiones de fila de los productos y
+saldos actualizados; para no medir esa cadena creciente, cada venta usa sus
+propios productos (en producción cada venta confirma su transacción).
+"""
+import statistics
+import time
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from core.models import Usuario
+from core.services import IVAService
+from inventario.models import Almacen, Categoria, Producto, StockAlmacen
+from ventas.api.views import PuntoVentaView, VentaViewSet
+
+OBJETIVO_P95_MS = 50
+
+
+class _Revertir(Exception):
+    """Provoca el rollback de la transacción del benchmark."""
+
+
+def percentil(valores, porcentaje):
+    """Percentil por rango más cercano de una lista de valores."""
+    ordenados = sorted(valores)
+    indice = max(0, -(-len(ordenados) * porcentaje // 100) - 1)
+    return ordenados[int(indice)]
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia (p50/p95/p99) del punto de venta con tickets de 10 líneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=200,
+                            help='Ventas medidas por endpoint (por defecto 200)')
+        parser.add_argument('--lineas', type=int, default=10,
+                            help='Líneas por ticket (por defecto 10)')
+        parser.add_argument('--calentamiento', type=int, default=10,
+                            help='Ventas previas no medidas (por defecto 10)')
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stdout.write(self.style.WARNING(
+                'DEBUG está activo: cada consulta se registra en connection.queries; mida con DEBUG=False'
+            ))
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        cliente_http = APIClient(HTTP_HOST=host)
+        resultados = {}
+        try:
+            with ExitStack() as pila, transaction.atomic():
+                for vista in (PuntoVentaView, VentaViewSet):
+                    pila.enter_context(mock.patch.object(vista, 'throttle_classes', []))
+                lineas = options['lineas']
+                por_endpoint = options['calentamiento'] + options['ventas']
+                datos = self._crear_datos(lineas * por_endpoint * 2)
+                cliente_http.force_authenticate(datos['usuario'])
+                productos = iter(datos['productos'])
+                endpoints = (
+                    ('pos', reverse('api:venta_pos'), lambda ids: {
+                        'cliente_id': datos['cliente'].pk, 'tipo': 'ticket', 'almacen_id': datos['almacen'].pk,
+                        'items': [{'producto_id': pk, 'cantidad': '1.00'} for pk in ids],
+                        'pagos': [{'metodo': 'efectivo', 'monto': '100.00'}],
+                    }),
+                    # La acción crear_venta no convierte los importes: se envían como números
+                    ('crear_venta', reverse('api:venta-crear-venta'), lambda ids: {
+                        'cliente_id': datos['cliente'].pk, 'tipo': 'ticket',
+                        'items': [{'producto_id': pk, 'cantidad': 1} for pk in ids],
+                    }),
+                )
+                for nombre, url, construir in endpoints:
+                    tiempos = []
+                    for i in range(por_endpoint):
+                        cuerpo = construir([next(productos).pk for _ in range(lineas)])
+                        inicio = time.perf_counter()
+                        # HTTPS: con DEBUG=False, SECURE_SSL_REDIRECT redirige las solicitudes HTTP
+                        respuesta = cliente_http.post(url, cuerpo, format='json', secure=True)
+                        duracion = time.perf_counter() - inicio
+                        if respuesta.status_code != 201:
+                            self.stdout.write(self.style.ERROR(f'{nombre}: {respuesta.status_code} {respuesta.content[:200]}'))
+                            raise _Revertir
+                        if i >= options['calentamiento']:
+                            tiempos.append(duracion * 1000)
+                    resultados[nombre] = tiempos
+                raise _Revertir
+        except _Revertir:
+            pass
+        if 'pos' not in resultados:
+            return
+
+        self.stdout.write(f"{'endpoint':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+        for nombre, tiempos in resultados.items():
+            self.stdout.write(
+                f"{nombre:<14}{statistics.median(tiempos):>9.1f}{percentil(tiempos, 95):>9.1f}"
+                f"{percentil(tiempos, 99):>9.1f}{max(tiempos):>9.1f}"
+            )
+        p95 = percentil(resultados['pos'], 95)
+        if p95 < OBJETIVO_P95_MS:
+            self.stdout.write(self.style.SUCCESS(f'p95 del punto de venta {p95:.1f} ms < {OBJETIVO_P95_MS} ms'))
+        else:
+            self.stdout.write(self.style.WARNING(f'p95 del punto de venta {p95:.1f} ms >= {OBJETIVO_P95_MS} ms'))
+
+    def _crear_datos(self, total_productos):
+        usuario = Usuario.objects.create_user(email='benchmark-pos@sysfree.local', password=None, nombres='Cajero')
+        categoria = Categoria.objects.create(nombre='Benchmark POS')
+        almacen = Almacen.objects.create(nombre='Almacén benchmark POS')
+        cliente = Cliente.objects.create(
+            tipo_identificacion='pasaporte', identificacion='BENCHPOS', nombres='Consumidor final'
+        )
+        tipo_iva = IVAService.get_default()
+        productos = Producto.objects.bulk_create([
+            Producto(codigo=f'BENCHPOS-{i}', nombre=f'Producto POS {i}', categoria=categoria,
+                     tipo_iva=tipo_iva, precio_venta=Decimal('1.25'), stock=Decimal('100000.00'))
+            for i in range(total_productos)
+        ])
+        StockAlmacen.objects.bulk_create([
+            StockAlmacen(producto=producto, almacen=almacen, cantidad=Decimal('100000.00'))
+            for producto in productos
+        ])
+        return {'usuario': usuario, 'cliente': cliente, 'almacen': almacen, 'productos': productos}
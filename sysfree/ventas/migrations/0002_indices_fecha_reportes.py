@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['-fecha'], name='ventas_venta_fecha_idx'),
+        ),
+    ]
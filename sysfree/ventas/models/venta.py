@@ -100,7 +100,8 @@ class Venta(ModeloBase):
         verbose_name_plural = _('ventas')
         ordering = ['-fecha']
         indexes = [
-            models.Index(fields=['numero', 'clave_acceso'])
+            models.Index(fields=['numero', 'clave_acceso']),
+            models.Index(fields=['-fecha'], name='ventas_venta_fecha_idx'),
         ]
     
     def __str__(self):
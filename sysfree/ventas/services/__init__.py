@@ -1,5 +1,7 @@
 from .venta_service import VentaService
+from .pos_service import PuntoVentaService
 
 __all__ = [
     'VentaService',
+    'PuntoVentaService',
 ]
\ No newline at end of file
@@ -0,0 +1,236 @@
+import logging
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from core.constants import AccionesAuditoria
+from core.middleware import get_request_actual
+from core.services.log_service import LogService
+from core.utils.transacciones import reintentar_transaccion
+from inventario.models import MovimientoInventario
+from inventario.services import InventarioService, StockLedgerService, StockInsuficienteError
+from ventas.models import Venta, DetalleVenta, Pago
+from .venta_service import VentaService
+
+logger = logging.getLogger('sysfree')
+
+
+class PuntoVentaService:
+    """
+    Ruta rápida de ventas de mostrador (tickets, notas de venta y facturas a
+    consumidor).
+
+    En la transacción solo se escriben las filas esenciales: la venta con sus
+    totales, los detalles, los movimientos y saldos de stock y los pagos, sin
+    ``full_clean()`` con consultas, señales por fila ni auditoría síncrona. La
+    auditoría, la invalidación de caché, el asiento contable y el envío de la
+    factura electrónica se encolan con ``transaction.on_commit`` en una tarea
+    de Celery (``procesar_efectos_venta_pos_task``).
+    """
+
+    TIPOS = ('ticket', 'nota_venta', 'factura')
+
+    @classmethod
+    @reintentar_transaccion()
+    @transaction.atomic
+    def registrar_venta(cls, cliente, tipo, items, pagos=None, almacen=None, usuario=None):
+        """
+        Registra una venta de mostrador cobrada.
+
+        El stock se bloquea antes que el contador de numeración, en el mismo
+        orden que ``VentaService.crear_venta``, para que ambas rutas no se
+        bloqueen mutuamente.
+
+        Args:
+            cliente (Cliente): Cliente de la venta
+            tipo (str): 'ticket', 'nota_venta' o 'factura'
+            items (list): Líneas como en ``VentaService.crear_venta``
+            pagos (list): Diccionarios con metodo, monto y los datos del medio de
+                pago; por defecto, un pago en efectivo por el total
+            almacen (Almacen): Almacén de las salidas (por defecto, el predeterminado)
+            usuario (Usuario): Usuario que registra la venta
+
+        Returns:
+            tuple: (venta, cambio)
+
+        Raises:
+            ValueError: Si los datos no son válidos, el pago no cubre el total
+                o no hay stock suficiente
+        """
+        if tipo not in cls.TIPOS:
+            raise ValueError(f"Tipo de documento no válido para punto de venta: {tipo}")
+        if not items:
+            raise ValueError("Se requiere al menos un producto")
+
+        detalles, salidas, totales = VentaService.preparar_detalles(items, usuario)
+        for detalle in detalles:
+            if detalle.cantidad <= 0 or detalle.precio_unitario < 0 or detalle.descuento < 0:
+                raise ValueError(f"Línea no válida para el producto {detalle.producto.nombre}")
+
+        pagos = pagos or [{'metodo': 'efectivo', 'monto': totales['total']}]
+        pagos_a_crear = [
+            Pago(estado='aprobado', creado_por=usuario, modificado_por=usuario, **pago) for pago in pagos
+        ]
+        pagado = sum((Decimal(pago.monto) for pago in pagos_a_crear), Decimal('0.00'))
+        if pagado < totales['total']:
+            raise ValueError(f"El pago ({pagado}) no cubre el total ({totales['total']})")
+
+        if salidas:
+            almacen = almacen or InventarioService.obtener_almacen_predeterminado()
+            if not almacen:
+                raise ValueError("No hay almacenes activos disponibles para registrar la salida.")
+            try:
+                StockLedgerService.reservar_salidas(
+                    [(salida['producto'], almacen, salida['cantidad']) for salida in salidas]
+                )
+            except StockInsuficienteError as e:
+                raise ValueError(str(e)) from e
+
+        ahora = timezone.now()
+        venta = Venta(
+            numero=VentaService.generar_numero(tipo),
+            cliente=cliente,
+            tipo=tipo,
+            estado='pagada',
+            fecha_pago=ahora,
+            **totales,
+            creado_por=usuario,
+            modificado_por=usuario
+        )
+        try:
+            # clean() sin consultas; full_clean() validaría claves foráneas y unicidad con SELECTs
+            venta.clean()
+            for pago in pagos_a_crear:
+                pago.clean()
+        except ValidationError as e:
+            raise ValueError('; '.join(e.messages)) from e
+
+        # bulk_create no dispara señales: la auditoría por fila y el registro de
+        # salidas de Venta.post_save se sustituyen por los efectos posteriores
+        Venta.objects.bulk_create([venta])
+        for detalle in detalles:
+            detalle.venta = venta
+        DetalleVenta.objects.bulk_create(detalles)
+
+        if salidas:
+            StockLedgerService.registrar_lote([
+                MovimientoInventario(
+                    tipo='salida',
+                    origen='venta',
+                    producto=salida['producto'],
+                    cantidad=Decimal(salida['cantidad']),
+                    documento=venta.numero,
+                    referencia_id=venta.id,
+                    referencia_tipo='Venta',
+                    almacen=almacen,
+                    creado_por=usuario,
+                    modificado_por=usuario
+                )
+                for salida in salidas
+            ])
+
+        for pago in pagos_a_crear:
+            pago.venta = venta
+        Pago.objects.bulk_create(pagos_a_crear)
+
+        request = get_request_actual()
+        contexto = {
+            'usuario_id': usuario.pk if usuario else None,
+            'ip': request.META.get('REMOTE_ADDR') if request else None,
+            'user_agent': request.META.get('HTTP_USER_AGENT', '') if request else None,
+        }
+        transaction.on_commit(partial(cls.encolar_efectos, venta.pk, contexto))
+
+        return venta, pagado - totales['total']
+
+    @classmethod
+    def encolar_efectos(cls, venta_id, contexto):
+        """Encola los efectos posteriores; si Celery no está disponible los aplica en el proceso."""
+        from ventas.tasks import procesar_efectos_venta_pos_task
+        try:
+            procesar_efectos_venta_pos_task.delay(venta_id, contexto)
+        except Exception as e:
+            logger.error(f"No se pudieron encolar los efectos de la venta {venta_id}, se aplican directamente: {str(e)}")
+            cls.aplicar_efectos(venta_id, contexto)
+
+    @classmethod
+    def aplicar_efectos(cls, venta_id, contexto):
+        """
+        Aplica los efectos posteriores de una venta de mostrador confirmada:
+        auditoría, invalidación de caché, acumulados de reportes, asiento
+        contable y envío de la factura electrónica. Cada efecto es
+        independiente: un fallo se registra en el log sin impedir los demás.
+
+        Args:
+            venta_id (int): ID de la venta
+            contexto (dict): usuario_id, ip y user_agent de la solicitud original
+        """
+        from core.models import Usuario
+        from fiscal.services.contabilidad_service import ContabilidadService
+        from reportes.services.hechos_ventas_service import HechosVentasService
+
+        venta = Venta.objects.select_related('cliente').get(pk=venta_id)
+        usuario = Usuario.objects.filter(pk=contexto.get('usuario_id')).first() if contexto.get('usuario_id') else None
+        movimientos = list(MovimientoInventario.objects.filter(referencia_tipo='Venta', referencia_id=venta.id))
+        pagos = list(venta.pagos.all())
+        origen = {'usuario': usuario, 'ip': contexto.get('ip'), 'user_agent': contexto.get('user_agent')}
+
+        def auditar():
+            LogService.negocio(
+                accion=AccionesAuditoria.VENTA_CREADA,
+                descripcion=f"Se creó una nueva venta #{venta.id} por valor de ${venta.total}",
+                modelo='Venta',
+                objeto_id=venta.id,
+                datos={
+                    'total': str(venta.total),
+                    'cliente': str(venta.cliente),
+                    'items': venta.detalles.count(),
+                    'pagos': [{'metodo': pago.metodo, 'monto': str(pago.monto)} for pago in pagos],
+                },
+                **origen
+            )
+            if movimientos:
+                LogService.negocio(
+                    accion=AccionesAuditoria.STOCK_ACTUALIZADO_LOTE,
+                    descripcion=(
+                        f"Actualización de stock en lote: {len(movimientos)} movimientos - Salida - venta {venta.numero}"
+                    ),
+                    modelo='MovimientoInventario',
+                    datos={'movimientos': [
+                        {
+                            'id': m.pk,
+                            'producto': m.producto_id,
+                            'almacen': m.almacen_id,
+                            'cantidad_anterior': float(m.stock_anterior),
+                            'cantidad_nueva': float(m.stock_nuevo),
+                        }
+                        for m in movimientos
+                    ]},
+                    **origen
+                )
+
+        def invalidar_cache():
+            InventarioService.invalidar_cache_productos({m.producto_id for m in movimientos})
+
+        def acumular():
+            # bulk_create no dispara las señales que actualizan los acumulados
+            HechosVentasService.actualizar([venta.id])
+
+        def crear_asiento():
+            ContabilidadService.crear_asiento_venta(venta, usuario)
+
+        def facturar():
+            if venta.tipo in getattr(settings, 'FACTURACION_ELECTRONICA_TIPOS', ('factura',)):
+                from ventas.tasks import procesar_facturacion_electronica_task
+                procesar_facturacion_electronica_task.delay(venta.id)
+
+        for nombre, efecto in (('auditoría', auditar), ('caché', invalidar_cache), ('acumulados', acumular),
+                               ('asiento contable', crear_asiento), ('facturación electrónica', facturar)):
+            try:
+                efecto()
+            except Exception as e:
+                logger.error(f"Error en el efecto '{nombre}' de la venta {venta.numero}: {str(e)}")
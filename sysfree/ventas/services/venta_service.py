@@ -1,112 +1,119 @@
 import logging
-from django.utils import timezone
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
-from ventas.models import Venta, DetalleVenta
+from ventas.models import Venta, DetalleVenta, NotaCredito
 from inventario.models import Producto
-from core.models import ConfiguracionSistema
-from core.services import IVAService
-from core.services.cache_service import CacheService
+from core.services import IVAService, ConfiguracionService, NumeracionService
 from core.services.auditoria_service import AuditoriaService
 from core.log_utils import log_function_call
-from inventario.services import InventarioService
+from core.utils.transacciones import reintentar_transaccion
+from inventario.services import InventarioService, StockLedgerService, StockInsuficienteError
 
 logger = logging.getLogger('sysfree')
 
+CENTAVOS = Decimal('0.01')
+
+
+def _centavos(valor):
+    """Redondea un importe a centavos como PostgreSQL al guardarlo en numeric(10, 2)."""
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
 class VentaService:
     """Servicio para gestionar ventas, incluyendo proformas."""
     
-    @classmethod
-    def invalidar_cache_venta(cls, venta_id=None):
-        """Invalida el caché relacionado con ventas."""
-        try:
-            CacheService.delete('ventas_list')
-            if venta_id:
-                CacheService.delete_pattern(f'*venta*{venta_id}*')
-        except Exception as e:
-            logger.error(f"Error al invalidar caché de venta: {str(e)}")
-    
+    # Tipo de documento -> campos de prefijo y número inicial en ConfiguracionSistema
+    NUMERACION = {
+        'factura': ('PREFIJO_FACTURA', 'INICIO_FACTURA'),
+        'proforma': ('PREFIJO_PROFORMA', 'INICIO_PROFORMA'),
+        'nota_venta': ('PREFIJO_NOTA_VENTA', 'INICIO_NOTA_VENTA'),
+        'ticket': ('PREFIJO_TICKET', 'INICIO_TICKET'),
+        'nota_credito': ('PREFIJO_NOTA_CREDITO', None),
+    }
+
     @classmethod
     def generar_numero(cls, tipo):
-        """Genera un número secuencial para el documento según su tipo."""
-        try:
-            config = ConfiguracionSistema.objects.first()
-            if not config:
-                config = ConfiguracionSistema.objects.create()
-                
-            if tipo == 'factura':
-                prefijo = config.PREFIJO_FACTURA
-                ultimo = Venta.objects.filter(tipo='factura').order_by('-numero').first()
-                num = int(ultimo.numero[len(prefijo):]) + 1 if ultimo and ultimo.numero.startswith(prefijo) else config.INICIO_FACTURA
-            elif tipo == 'proforma':
-                prefijo = config.PREFIJO_PROFORMA
-                ultimo = Venta.objects.filter(tipo='proforma').order_by('-numero').first()
-                num = int(ultimo.numero[len(prefijo):]) + 1 if ultimo and ultimo.numero.startswith(prefijo) else config.INICIO_PROFORMA
-            elif tipo == 'nota_venta':
-                prefijo = config.PREFIJO_NOTA_VENTA
-                ultimo = Venta.objects.filter(tipo='nota_venta').order_by('-numero').first()
-                num = int(ultimo.numero[len(prefijo):]) + 1 if ultimo and ultimo.numero.startswith(prefijo) else config.INICIO_NOTA_VENTA
-            elif tipo == 'ticket':
-                prefijo = config.PREFIJO_TICKET
-                ultimo = Venta.objects.filter(tipo='ticket').order_by('-numero').first()
-                num = int(ultimo.numero[len(prefijo):]) + 1 if ultimo and ultimo.numero.startswith(prefijo) else config.INICIO_TICKET
-            else:
-                raise ValueError(f"Tipo de documento no válido: {tipo}")
-                
-            return f"{prefijo}{num:06d}"
-            
-        except Exception as e:
-            logger.error(f"Error al generar número para {tipo}: {str(e)}")
-            return f"{tipo.upper()}-{timezone.now().strftime('%Y%m%d')}-{timezone.now().strftime('%H%M%S')}"
+        """
+        Genera un número secuencial para el documento según su tipo.
+
+        El número sale del contador de NumeracionService para la serie
+        (establecimiento, punto de emisión) configurada; dentro de una
+        transacción el contador queda bloqueado hasta su fin, por lo que no
+        hay números duplicados ni saltos.
+        """
+        if tipo not in cls.NUMERACION:
+            raise ValueError(f"Tipo de documento no válido: {tipo}")
+        config = ConfiguracionService.get_configuracion()
+        campo_prefijo, campo_inicio = cls.NUMERACION[tipo]
+        prefijo = getattr(config, campo_prefijo)
+        existentes = NotaCredito.objects.all() if tipo == 'nota_credito' else Venta.objects.filter(tipo=tipo)
+
+        num = NumeracionService.siguiente(
+            tipo,
+            establecimiento=config.ESTABLECIMIENTO,
+            punto_emision=config.PUNTO_EMISION,
+            inicio=getattr(config, campo_inicio) if campo_inicio else 1,
+            inicializar=lambda: NumeracionService.maximo_existente(existentes, 'numero', prefijo),
+        )
+        return f"{prefijo}{num:06d}"
     
     @classmethod
-    @log_function_call
-    @transaction.atomic
-    def crear_venta(cls, cliente, tipo, items, direccion_facturacion=None, 
-                   direccion_envio=None, notas="", reparacion=None, validez=15, usuario=None):
-        """Crea una nueva venta o proforma."""
-        numero = cls.generar_numero(tipo)
-        
-        venta = Venta.objects.create(
-            numero=numero,
-            cliente=cliente,
-            tipo=tipo,
-            estado='borrador' if tipo != 'proforma' else 'enviada',
-            direccion_facturacion=direccion_facturacion,
-            direccion_envio=direccion_envio,
-            notas=notas,
-            reparacion=reparacion,
-            validez=validez if tipo == 'proforma' else 0,
-            creado_por=usuario,
-            modificado_por=usuario
-        )
-        
-        detalles_a_crear = []
-        productos_a_actualizar = []
-        
-        tipo_iva_default = IVAService.get_default()
+    def preparar_detalles(cls, items, usuario=None):
+        """
+        Construye en una pasada los detalles (sin guardar) y los totales de una venta.
+
+        Los productos se leen en una sola consulta (``in_bulk``) y los importes
+        de cada línea se redondean a centavos como en la columna, de modo que
+        los totales coinciden con la suma de los detalles guardados.
 
+        Args:
+            items (list): Diccionarios con producto_id, cantidad y, opcionalmente,
+                precio_unitario, descuento y tipo_iva
+            usuario (Usuario): Usuario que crea la venta
+
+        Returns:
+            tuple: (detalles, salidas, totales), donde salidas son diccionarios
+                {'producto', 'cantidad'} de los productos inventariables y totales
+                tiene subtotal, descuento y total
+
+        Raises:
+            ValueError: Si algún producto no existe
+        """
+        detalles = []
+        salidas = []
+        totales = {'subtotal': Decimal('0.00'), 'descuento': Decimal('0.00'), 'total': Decimal('0.00')}
+
+        tipo_iva_default = IVAService.get_default()
+        producto_ids = []
         for item in items:
             try:
-                producto = Producto.objects.select_related('tipo_iva').get(id=item['producto_id'])
-            except Producto.DoesNotExist:
+                producto_ids.append(Producto._meta.pk.to_python(item['producto_id']))
+            except ValidationError:
+                raise ValueError(f"Producto con id {item['producto_id']} no encontrado.")
+        productos = Producto.objects.select_related('tipo_iva').in_bulk(set(producto_ids))
+
+        for item, producto_id in zip(items, producto_ids):
+            producto = productos.get(producto_id)
+            if producto is None:
                 raise ValueError(f"Producto con id {item['producto_id']} no encontrado.")
 
             cantidad = item.get('cantidad', 1)
             precio_unitario = item.get('precio_unitario', producto.precio_venta)
             item_descuento = item.get('descuento', 0)
-            
-            if producto.es_inventariable and producto.stock < cantidad:
-                raise ValueError(f"Stock insuficiente para el producto {producto.nombre}.")
 
-            subtotal_item = cantidad * precio_unitario - item_descuento
-            
             tipo_iva = item.get('tipo_iva') or producto.tipo_iva or tipo_iva_default
-            iva_item, total_item = IVAService.calcular_iva(subtotal_item, tipo_iva)
-            
-            detalles_a_crear.append(
+            subtotal_item = _centavos(cantidad * precio_unitario - item_descuento)
+            if tipo_iva is None:
+                # Sin tipos de IVA: calcular_iva volvería a buscar el predeterminado en cada línea
+                iva_item, total_item = Decimal('0.00'), subtotal_item
+            else:
+                iva_item, total_item = IVAService.calcular_iva(subtotal_item, tipo_iva)
+            iva_item, total_item = _centavos(iva_item), _centavos(total_item)
+
+            detalles.append(
                 DetalleVenta(
-                    venta=venta,
                     producto=producto,
                     cantidad=cantidad,
                     precio_unitario=precio_unitario,
@@ -119,19 +126,71 @@ class VentaService:
                     modificado_por=usuario
                 )
             )
-            
+            totales['subtotal'] += subtotal_item
+            totales['descuento'] += _centavos(item_descuento)
+            totales['total'] += total_item
+
             if producto.es_inventariable:
-                productos_a_actualizar.append({'producto': producto, 'cantidad': cantidad})
+                salidas.append({'producto': producto, 'cantidad': cantidad})
 
-        DetalleVenta.objects.bulk_create(detalles_a_crear)
+        return detalles, salidas, totales
+
+    @classmethod
+    @reintentar_transaccion()
+    @log_function_call
+    @transaction.atomic
+    def crear_venta(cls, cliente, tipo, items, direccion_facturacion=None, 
+                   direccion_envio=None, notas="", reparacion=None, validez=15, usuario=None,
+                   almacen=None):
+        """
+        Crea una nueva venta o proforma.
         
-        # Actualizar stock y totales
-        venta.actualizar_totales()
+        Los detalles y totales se calculan en una pasada (``preparar_detalles``),
+        la venta se guarda una vez con sus totales y las salidas de inventario
+        se registran en un solo lote sobre ``almacen`` (por defecto, el primer
+        almacén activo). El stock se bloquea y valida
+        antes de crear la venta, de modo que vendedores concurrentes no pueden
+        sobrevender; ante deadlocks o lock timeouts la operación se reintenta.
+        """
+        detalles_a_crear, productos_a_actualizar, totales = cls.preparar_detalles(items, usuario)
+
+        # Reservar el stock bajo bloqueo antes de escribir la venta
+        if productos_a_actualizar:
+            almacen = almacen or InventarioService.obtener_almacen_predeterminado()
+            if not almacen:
+                raise ValueError("No hay almacenes activos disponibles para registrar la salida.")
+            try:
+                StockLedgerService.reservar_salidas(
+                    [(item['producto'], almacen, item['cantidad']) for item in productos_a_actualizar]
+                )
+            except StockInsuficienteError as e:
+                raise ValueError(str(e)) from e
+
+        numero = cls.generar_numero(tipo)
         
-        for item_actualizar in productos_a_actualizar:
-            InventarioService.registrar_salida(
-                producto=item_actualizar['producto'],
-                cantidad=item_actualizar['cantidad'],
+        venta = Venta.objects.create(
+            numero=numero,
+            cliente=cliente,
+            tipo=tipo,
+            estado='borrador' if tipo != 'proforma' else 'enviada',
+            direccion_facturacion=direccion_facturacion,
+            direccion_envio=direccion_envio,
+            notas=notas,
+            reparacion=reparacion,
+            validez=validez,  # Venta.clean() exige validez positiva para todo tipo
+            **totales,
+            creado_por=usuario,
+            modificado_por=usuario
+        )
+        
+        for detalle in detalles_a_crear:
+            detalle.venta = venta
+        DetalleVenta.objects.bulk_create(detalles_a_crear)
+        
+        if productos_a_actualizar:
+            InventarioService.registrar_movimientos_lote(
+                [(item['producto'], almacen, item['cantidad'], None) for item in productos_a_actualizar],
+                tipo='salida',
                 origen='venta',
                 documento=venta.numero,
                 usuario=usuario,
@@ -142,9 +201,6 @@ class VentaService:
         # Registrar auditoría
         AuditoriaService.venta_creada(venta, detalles_a_crear)
         
-        # Invalidar caché
-        cls.invalidar_cache_venta()
-        
         logger.info(f"{tipo.capitalize()} {venta.numero} creada para cliente {cliente}")
         
         return venta
@@ -171,9 +227,6 @@ class VentaService:
             datos={'estado_anterior': venta.estado, 'estado_nuevo': nuevo_estado}
         )
         
-        # Invalidar caché
-        cls.invalidar_cache_venta(venta.id)
-        
         logger.info(f"Venta {venta.numero} actualizada a estado {nuevo_estado}")
         
         return venta
@@ -218,9 +271,6 @@ class VentaService:
             datos={'venta': venta.numero, 'metodo': metodo, 'monto': str(monto)}
         )
         
-        # Invalidar caché
-        cls.invalidar_cache_venta(venta.id)
-        
         logger.info(f"Pago registrado para venta {venta.numero}: {metodo} - {monto}")
         
         return pago
@@ -266,11 +316,6 @@ class VentaService:
         factura.venta_relacionada = proforma
         factura.save()
         
-        # Invalidar caché
-        cls.invalidar_cache_venta()
-        cls.invalidar_cache_venta(proforma.id)
-        cls.invalidar_cache_venta(factura.id)
-        
         logger.info(f"Proforma {proforma.numero} convertida a factura {factura.numero}")
         
         return factura
\ No newline at end of file
@@ -132,4 +132,12 @@ def registrar_movimiento_inventario_nota_credito(sender, instance, created, **kw
                 except ValueError as e:
                     # Manejar errores
                     pass
-        instance._movimientos_registrados = True
\ No newline at end of file
+        instance._movimientos_registrados = True
+
+
+@receiver(pre_save, sender=NotaCredito)
+def asignar_numero_nota_credito(sender, instance, **kwargs):
+    """Asigna el número de la nota de crédito desde la secuencia si no tiene uno."""
+    if not instance.numero:
+        from .services.venta_service import VentaService
+        instance.numero = VentaService.generar_numero('nota_credito')
@@ -1,3 +1,9 @@
+import io
+from decimal import Decimal
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -183,4 +189,65 @@ class VentasAPITests(TestCase):
         detalles = response.data['detalles']
         self.assertEqual(len(detalles), 1)
         self.assertEqual(float(detalles[0]['cantidad']), 1.0)
-        self.assertEqual(detalles[0]['precio_unitario'], '150.00')
\ No newline at end of file
+        self.assertEqual(detalles[0]['precio_unitario'], '150.00')
+
+
+class ExportacionVentasAPITests(TestCase):
+    """Pruebas de la exportación de ventas."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='exportacion@example.com',
+            password='testpass123',
+            nombres='Exportación'
+        )
+        self.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula',
+            identificacion='1234567891',
+            nombres='Cliente',
+            apellidos='Exportación'
+        )
+        Venta.objects.create(
+            numero='FAC-EXP-1',
+            cliente=self.cliente,
+            tipo='factura',
+            estado='emitida',
+            subtotal=150,
+            total=150
+        )
+        self.client = APIClient()
+    
+    def test_exportar_ventas(self):
+        """Prueba la exportación de ventas a CSV y a Parquet con los tipos de los campos."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('api:venta-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('FAC-EXP-1', response.content.decode('utf-8'))
+        
+        response = self.client.get(reverse('api:venta-export'), {'formato': 'parquet'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ventas.parquet', response['Content-Disposition'])
+        tabla = pq.ParquetFile(io.BytesIO(b''.join(response.streaming_content))).read(use_threads=False)
+        # Mismos encabezados que el CSV
+        self.assertEqual(tabla.column_names, [
+            'número', 'fecha', 'cliente', 'tipo', 'estado', 'subtotal', 'descuento', 'total'
+        ])
+        self.assertEqual(tabla.schema.field('total').type, pa.decimal128(10, 2))
+        self.assertEqual(tabla.schema.field('fecha').type, pa.timestamp('us', tz='UTC'))
+        fila = tabla.to_pylist()[0]
+        self.assertEqual(
+            (fila['número'], fila['cliente'], fila['total']), ('FAC-EXP-1', self.cliente.id, Decimal('150.00'))
+        )
+        
+        response = self.client.get(reverse('api:venta-export'), {'formato': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_exportar_parquet_cierra_el_archivo_temporal_si_falla(self):
+        """Prueba que un error al escribir el Parquet no deja abierto el archivo temporal."""
+        self.client.force_authenticate(user=self.user)
+        archivo = io.BytesIO()
+        with mock.patch('api.utils.tempfile.TemporaryFile', return_value=archivo), \
+                mock.patch('reportes.utils.parquet_tabular.pq.ParquetWriter', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                self.client.get(reverse('api:venta-export'), {'formato': 'parquet'})
+        self.assertTrue(archivo.closed)
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from core.models import TipoIVA
+from fiscal.models import AsientoContable, CuentaContable, PeriodoFiscal
+from inventario.models import Almacen, Categoria, MovimientoInventario, Producto, StockAlmacen
+from ventas.models import Venta
+from ventas.services.pos_service import PuntoVentaService
+
+User = get_user_model()
+
+
+class PuntoVentaServiceTest(TestCase):
+    """Ruta rápida de ventas de mostrador."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email='cajero@example.com', password='x', nombres='Cajero')
+        cls.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='1234567890', nombres='Consumidor', apellidos='Final'
+        )
+        cls.tipo_iva = TipoIVA.objects.create(codigo='IVA15', nombre='IVA 15%', porcentaje=15, es_default=True)
+        categoria = Categoria.objects.create(nombre='Mostrador')
+        cls.almacen = Almacen.objects.create(nombre='Tienda')
+        cls.productos = [
+            Producto.objects.create(
+                codigo=f'POS{i:03d}', nombre=f'Producto {i}', categoria=categoria, tipo_iva=cls.tipo_iva,
+                precio_venta=Decimal('10.00'), stock=Decimal('5.00')
+            )
+            for i in range(2)
+        ]
+        for producto in cls.productos:
+            StockAlmacen.objects.create(producto=producto, almacen=cls.almacen, cantidad=Decimal('5.00'))
+
+    def _items(self, cantidad='1.00'):
+        return [{'producto_id': p.pk, 'cantidad': Decimal(cantidad)} for p in self.productos]
+
+    def test_registra_venta_pagada_y_encola_efectos(self):
+        with mock.patch.object(PuntoVentaService, 'encolar_efectos') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                venta, cambio = PuntoVentaService.registrar_venta(
+                    self.cliente, 'ticket', self._items('2.00'),
+                    pagos=[{'metodo': 'efectivo', 'monto': Decimal('50.00')}],
+                    almacen=self.almacen, usuario=self.usuario
+                )
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.estado, 'pagada')
+        self.assertEqual(venta.subtotal, Decimal('40.00'))
+        self.assertEqual(venta.total, Decimal('46.00'))
+        self.assertEqual(cambio, Decimal('4.00'))
+        self.assertEqual(venta.detalles.count(), 2)
+        self.assertEqual(venta.pagos.get().estado, 'aprobado')
+        self.assertEqual(
+            MovimientoInventario.objects.filter(referencia_tipo='Venta', referencia_id=venta.id).count(), 2
+        )
+        for producto in self.productos:
+            producto.refresh_from_db()
+            self.assertEqual(producto.stock, Decimal('3.00'))
+        encolar.assert_called_once()
+        self.assertEqual(encolar.call_args.args[0], venta.pk)
+        self.assertEqual(encolar.call_args.args[1]['usuario_id'], self.usuario.pk)
+
+    def test_pago_insuficiente(self):
+        with self.assertRaisesMessage(ValueError, 'no cubre el total'):
+            PuntoVentaService.registrar_venta(
+                self.cliente, 'ticket', self._items(),
+                pagos=[{'metodo': 'efectivo', 'monto': Decimal('1.00')}], almacen=self.almacen
+            )
+        self.assertFalse(Venta.objects.exists())
+
+    def test_stock_insuficiente(self):
+        with self.assertRaisesMessage(ValueError, 'Stock insuficiente'):
+            PuntoVentaService.registrar_venta(self.cliente, 'ticket', self._items('6.00'), almacen=self.almacen)
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(
+            StockAlmacen.objects.get(producto=self.productos[0], almacen=self.almacen).cantidad, Decimal('5.00')
+        )
+
+    @override_settings(CUENTAS_ASIENTO_VENTA={'cobro': '1.1.01', 'ingreso': '4.1.01', 'iva': '2.1.01'})
+    def test_efectos_auditan_y_crean_asiento(self):
+        hoy = timezone.localdate()
+        PeriodoFiscal.objects.create(
+            nombre='Actual', fecha_inicio=hoy - timedelta(days=30), fecha_fin=hoy + timedelta(days=30),
+            estado='abierto'
+        )
+        for codigo, tipo in (('1.1.01', 'activo'), ('4.1.01', 'ingreso'), ('2.1.01', 'pasivo')):
+            CuentaContable.objects.create(codigo=codigo, nombre=codigo, tipo=tipo)
+        venta, _ = PuntoVentaService.registrar_venta(
+            self.cliente, 'ticket', self._items(), almacen=self.almacen, usuario=self.usuario
+        )
+
+        with mock.patch('ventas.services.pos_service.LogService.negocio') as negocio:
+            PuntoVentaService.aplicar_efectos(venta.pk, {'usuario_id': self.usuario.pk, 'ip': '10.0.0.1'})
+            # Los efectos son idempotentes respecto del asiento
+            PuntoVentaService.aplicar_efectos(venta.pk, {'usuario_id': self.usuario.pk})
+
+        self.assertEqual(negocio.call_args_list[0].kwargs['objeto_id'], venta.pk)
+        self.assertEqual(negocio.call_args_list[0].kwargs['ip'], '10.0.0.1')
+        asiento = AsientoContable.objects.get(tipo='venta', referencia_tipo='Venta', referencia_id=venta.pk)
+        lineas = list(asiento.lineas.order_by('id').values_list('debe', 'haber'))
+        self.assertEqual(lineas, [
+            (Decimal('23.00'), Decimal('0.00')),
+            (Decimal('0.00'), Decimal('20.00')),
+            (Decimal('0.00'), Decimal('3.00')),
+        ])
+
+
+class PuntoVentaAPITest(TestCase):
+    """Endpoint /api/ventas/pos/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='pos@example.com', password='x', nombres='POS')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='0912345678', nombres='Cliente', apellidos='POS'
+        )
+        categoria = Categoria.objects.create(nombre='Mostrador')
+        self.almacen = Almacen.objects.create(nombre='Tienda')
+        self.producto = Producto.objects.create(
+            codigo='POSAPI', nombre='Producto API', categoria=categoria,
+            precio_venta=Decimal('2.50'), stock=Decimal('10.00')
+        )
+        StockAlmacen.objects.create(producto=self.producto, almacen=self.almacen, cantidad=Decimal('10.00'))
+
+    def test_registrar_ticket(self):
+        data = {
+            'cliente_id': self.cliente.pk,
+            'almacen_id': self.almacen.pk,
+            'items': [{'producto_id': self.producto.pk, 'cantidad': '2'}],
+            'pagos': [{'metodo': 'efectivo', 'monto': '10.00'}],
+        }
+        response = self.client.post(reverse('api:venta_pos'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['tipo'], 'ticket')
+        self.assertEqual(response.data['estado'], 'pagada')
+        self.assertEqual(response.data['total'], '5.00')
+        self.assertEqual(response.data['cambio'], '5.00')
+
+    def test_pago_insuficiente(self):
+        data = {
+            'cliente_id': self.cliente.pk,
+            'items': [{'producto_id': self.producto.pk, 'cantidad': '2'}],
+            'pagos': [{'metodo': 'efectivo', 'monto': '1.00'}],
+        }
+        response = self.client.post(reverse('api:venta_pos'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Venta.objects.exists())
@@ -0,0 +1,126 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from decimal import Decimal
+from clientes.models import Cliente
+from inventario.models import Producto, Categoria, Almacen, StockAlmacen
+from ventas.models import Venta
+from ventas.services.venta_service import VentaService
+
+
+class CrearVentaConcurrenciaTest(TestCase):
+    """Pruebas de reserva de stock en VentaService.crear_venta."""
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula',
+            identificacion='1234567890',
+            nombres='Cliente',
+            apellidos='Prueba'
+        )
+        categoria = Categoria.objects.create(nombre='Electrónica')
+        self.almacen = Almacen.objects.create(nombre='Bodega Principal')
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'V{i:03d}',
+                nombre=f'Producto {i}',
+                categoria=categoria,
+                precio_venta=Decimal('10.00'),
+                stock=Decimal('2.00')
+            )
+            for i in range(2)
+        ]
+        for producto in self.productos:
+            StockAlmacen.objects.create(producto=producto, almacen=self.almacen, cantidad=Decimal('2.00'))
+
+    def test_venta_descuenta_stock(self):
+        items = [{'producto_id': p.id, 'cantidad': Decimal('2.00')} for p in self.productos]
+        venta = VentaService.crear_venta(self.cliente, 'factura', items, almacen=self.almacen)
+
+        self.assertEqual(venta.detalles.count(), 2)
+        for producto in self.productos:
+            producto.refresh_from_db()
+            self.assertEqual(producto.stock, Decimal('0.00'))
+
+    def test_stock_insuficiente_no_crea_venta(self):
+        # La segunda línea excede el stock: se rechaza antes de escribir la venta
+        items = [
+            {'producto_id': self.productos[0].id, 'cantidad': Decimal('1.00')},
+            {'producto_id': self.productos[1].id, 'cantidad': Decimal('3.00')},
+        ]
+        with self.assertRaisesMessage(ValueError, 'Stock insuficiente'):
+            VentaService.crear_venta(self.cliente, 'factura', items, almacen=self.almacen)
+
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(
+            StockAlmacen.objects.get(producto=self.productos[0], almacen=self.almacen).cantidad,
+            Decimal('2.00')
+        )
+
+
+class GenerarNumeroTest(TestCase):
+    """Numeración de documentos de venta."""
+
+    def test_continua_numeracion_existente(self):
+        cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='0912345678', nombres='Cliente', apellidos='Previo'
+        )
+        Venta.objects.create(numero='FAC-000007', tipo='factura', cliente=cliente)
+
+        self.assertEqual(VentaService.generar_numero('factura'), 'FAC-000008')
+        self.assertEqual(VentaService.generar_numero('factura'), 'FAC-000009')
+        self.assertEqual(VentaService.generar_numero('proforma'), 'PRO-000001')
+
+    def test_tipo_invalido(self):
+        with self.assertRaises(ValueError):
+            VentaService.generar_numero('desconocido')
+
+
+class CrearVentaUnaPasadaTest(TestCase):
+    """crear_venta lee productos, calcula totales y registra salidas en lote."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(
+            tipo_identificacion='cedula', identificacion='1712345678', nombres='Cliente', apellidos='Lote'
+        )
+        categoria = Categoria.objects.create(nombre='Lote')
+        cls.almacen = Almacen.objects.create(nombre='Bodega Lote')
+        cls.productos = Producto.objects.bulk_create([
+            Producto(codigo=f'L{i:03d}', nombre=f'Lote {i}', categoria=categoria,
+                     precio_venta=Decimal('3.35'), stock=Decimal('50.00'))
+            for i in range(20)
+        ])
+        StockAlmacen.objects.bulk_create([
+            StockAlmacen(producto=p, almacen=cls.almacen, cantidad=Decimal('50.00')) for p in cls.productos
+        ])
+
+    def _items(self, cantidad):
+        return [
+            {'producto_id': p.id, 'cantidad': Decimal('3.00'), 'descuento': Decimal('0.15')}
+            for p in self.productos[:cantidad]
+        ]
+
+    def test_totales_coinciden_con_detalles(self):
+        venta = VentaService.crear_venta(self.cliente, 'factura', self._items(20), almacen=self.almacen)
+
+        venta.refresh_from_db()
+        detalles = list(venta.detalles.all())
+        self.assertEqual(len(detalles), 20)
+        self.assertEqual(venta.subtotal, sum(d.subtotal for d in detalles))
+        self.assertEqual(venta.descuento, sum(d.descuento for d in detalles))
+        self.assertEqual(venta.total, sum(d.total for d in detalles))
+        self.assertEqual(venta.subtotal, Decimal('198.00'))
+
+    def test_consultas_no_dependen_de_las_lineas(self):
+        VentaService.crear_venta(self.cliente, 'factura', self._items(1), almacen=self.almacen)  # calienta cachés
+        with CaptureQueriesContext(connection) as una:
+            VentaService.crear_venta(self.cliente, 'factura', self._items(1), almacen=self.almacen)  # calienta cachés
+        with CaptureQueriesContext(connection) as veinte:
+            VentaService.crear_venta(self.cliente, 'factura', self._items(20), almacen=self.almacen)
+
+        self.assertEqual(len(veinte), len(una))
+
+    def test_producto_inexistente(self):
+        with self.assertRaisesMessage(ValueError, 'no encontrado'):
+            VentaService.crear_venta(self.cliente, 'factura', [{'producto_id': 999999}], almacen=self.almacen)